@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for statikos.
+
+Run with `make benchmark` (or `python -m benchmarks --help`).
+"""
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Run the benchmarks and compare them against the baseline.
+
+Example:
+
+python -m benchmarks --sizes 1000,100000,1000000
+python -m benchmarks --only sync --save
+"""
+
+import argparse
+import os
+import sys
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def isolate() -> None:
+    """
+    Keep the benchmarks away from real AWS credentials and configuration.
+
+    Requests are answered by `benchmarks.fake.FakeAWS` and never signed or
+    sent, but botocore still resolves a configuration for every client.
+
+    :rtype: None
+    :return: None
+    """
+    os.environ.pop('AWS_PROFILE', None)
+    os.environ.update({
+        'AWS_ACCESS_KEY_ID': 'benchmark',
+        'AWS_SECRET_ACCESS_KEY': 'benchmark',
+        'AWS_CONFIG_FILE': os.devnull,
+        'AWS_SHARED_CREDENTIALS_FILE': os.devnull,
+        'AWS_EC2_METADATA_DISABLED': 'true',
+    })
+
+
+def main(argv: list = None) -> int:
+    """
+    Run the benchmarks.
+
+    :type argv: list
+    :param argv: command line arguments
+
+    :rtype: int
+    :return: exit status, 1 if any benchmark regressed
+    """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument(
+        '--sizes',
+        default='1000',
+        help='comma-separated site sizes, in files (default: 1000)'
+    )
+    parser.add_argument('--only', help='run benchmarks whose name contains')
+    parser.add_argument('--repeat', type=int, help='override repetitions')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument(
+        '--save', action='store_true', help='record results as the baseline'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='allowed slowdown, as a fraction (default: 0.25)'
+    )
+    parser.add_argument(
+        '--floor',
+        type=float,
+        default=0.005,
+        help='slowdown in seconds always allowed (default: 0.005)'
+    )
+    parser.add_argument('--workdir', default='.benchmarks')
+    args = parser.parse_args(argv)
+    isolate()
+    from . import cases  # noqa: F401 (registers the cases)
+    from . import harness
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    baseline = harness.load_baseline(args.baseline)
+    results = {}
+    regressed = []
+    for case in harness.cases(args.workdir, sizes, args.only):
+        result = case.measure(args.repeat)
+        status = harness.compare(
+            case.id, result, baseline, args.tolerance, args.floor
+        )
+        print(harness.format_row(case.id, result, baseline, status))
+        results[case.id] = result
+        if status == 'regressed':
+            regressed.append(case.id)
+    if args.save:
+        harness.save_baseline(args.baseline, results, baseline)
+        print(f'Saved {len(results)} result(s) to {args.baseline}')
+        return 0
+    if regressed:
+        print(f'{len(regressed)} benchmark(s) regressed: '
+              f'{", ".join(regressed)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
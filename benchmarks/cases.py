@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""Benchmark cases."""
+
+import os
+import shutil
+import subprocess
+import sys
+
+from statikos import invalidation, template, utils
+from statikos.statikos import Statikos
+from statikos.sync import walk
+
+from . import sites
+from .fake import FakeAWS
+from .harness import Case, register
+
+CONFIG = {
+    'stack_name': 'benchmark',
+    'domain_name': 'example.com',
+    'default_cache_behavior': {
+        'default_ttl': 300,
+        'query_strings': ['page'],
+    },
+    'cache_behaviors': [
+        {
+            'path_pattern': 'assets/*',
+            'min_ttl': 31536000,
+            'default_ttl': 31536000,
+        },
+        {
+            'path_pattern': '*.json',
+            'default_ttl': 60,
+            'headers': ['Origin'],
+        },
+    ],
+    'invalidation': {
+        'max_paths': 1000,
+    },
+}
+
+# Files in the site deployed by `deploy`.
+DEPLOY_SITE_SIZE = 100
+
+IMPORT_CLI = (
+    'import time; start = time.perf_counter(); import statikos.cli; '
+    'print(time.perf_counter() - start)'
+)
+
+
+class ServiceCase(Case):
+    """
+    Case that runs against a Statikos service backed by `FakeAWS`.
+    """
+    def service(self, size: int, config: dict = None) -> str:
+        """
+        Create a fresh service for a generated site.
+
+        :type size: int
+        :param size: number of files in the site
+        :type config: dict
+        :param config: `statikos.yml` settings to override
+
+        :rtype: str
+        :return: path to the service
+        """
+        site = sites.generate(
+            os.path.join(self.workdir, 'sites', str(size)), size
+        )
+        root = os.path.join(self.workdir, 'services', self.id)
+        shutil.rmtree(root, ignore_errors=True)
+        os.makedirs(root)
+        settings = dict(CONFIG, **(config or {}))
+        settings['sync'] = {'source': os.path.abspath(site)}
+        utils.write_yaml_file(settings, os.path.join(root, 'statikos.yml'))
+        return root
+
+    def reset(self, root: str) -> None:
+        """
+        Forget the local state of a service.
+
+        :type root: str
+        :param root: path to the service
+
+        :rtype: None
+        :return: None
+        """
+        shutil.rmtree(
+            os.path.join(root, Statikos.STATIKOS_DIR), ignore_errors=True
+        )
+
+    def backend(self) -> FakeAWS:
+        """
+        Install a fresh, empty fake backend.
+
+        :rtype: FakeAWS
+        :return: the backend
+        """
+        fake = FakeAWS()
+        fake.install()
+        return fake
+
+
+@register
+class CliImport(Case):
+    """
+    Time to import the CLI, in a fresh interpreter.
+    """
+    name = 'cli-import'
+    repeat = 10
+
+    def run(self) -> float:
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_CLI])
+        return float(output)
+
+
+@register
+class TemplateBuild(Case):
+    """
+    Build the CloudFormation template.
+    """
+    name = 'template-build'
+    repeat = 20
+
+    def run(self) -> None:
+        template.create_template(parameters=CONFIG)
+
+
+@register
+class TemplateSerialize(Case):
+    """
+    Serialize the CloudFormation template to compact, canonical JSON.
+    """
+    name = 'template-serialize'
+    repeat = 20
+
+    def prepare(self) -> None:
+        self.template = template.create_template(parameters=CONFIG)
+        os.makedirs(self.workdir, exist_ok=True)
+        self.path = os.path.join(self.workdir, 'cloudformation.json')
+
+    def run(self) -> None:
+        utils.write_json_file(
+            self.template.to_dict(), self.path, compact=True, sort_keys=True
+        )
+
+
+@register
+class ConfigIO(Case):
+    """
+    Read `statikos.yml`, and write and read back a JSON state file.
+    """
+    name = 'config-io'
+    repeat = 20
+
+    def prepare(self) -> None:
+        os.makedirs(self.workdir, exist_ok=True)
+        self.yml = os.path.join(self.workdir, 'statikos.yml')
+        self.json = os.path.join(self.workdir, 'state.json')
+        utils.write_yaml_file(CONFIG, self.yml)
+        self.data = template.create_template(parameters=CONFIG).to_dict()
+
+    def run(self) -> None:
+        for _ in range(100):
+            utils.read_yaml_file(self.yml)
+            utils.write_json_file(self.data, self.json, sort_keys=True)
+            utils.read_json_file(self.json)
+
+
+@register
+class Deploy(ServiceCase):
+    """
+    Deploy a new stack and its content.
+    """
+    name = 'deploy'
+
+    def prepare(self) -> None:
+        self.root = self.service(DEPLOY_SITE_SIZE)
+
+    def setup(self) -> None:
+        self.reset(self.root)
+        self.backend()
+
+    def run(self) -> None:
+        Statikos(root=self.root).deploy()
+
+
+@register
+class DeployUnchanged(ServiceCase):
+    """
+    Deploy a service that is already deployed.
+    """
+    name = 'deploy-unchanged'
+
+    def prepare(self) -> None:
+        self.root = self.service(DEPLOY_SITE_SIZE)
+        self.backend()
+        Statikos(root=self.root).deploy()
+
+    def run(self) -> None:
+        Statikos(root=self.root).deploy()
+
+
+@register
+class SyncCold(ServiceCase):
+    """
+    Sync a site to an empty bucket, with no local state.
+    """
+    name = 'sync'
+    sized = True
+    repeat = 3
+
+    def prepare(self) -> None:
+        self.root = self.service(self.size)
+
+    def setup(self) -> None:
+        self.reset(self.root)
+        self.backend()
+
+    def run(self) -> None:
+        Statikos(root=self.root).sync()
+
+
+@register
+class SyncUnchanged(ServiceCase):
+    """
+    Sync a site that is already in the bucket.
+    """
+    name = 'sync-unchanged'
+    sized = True
+    repeat = 3
+
+    def prepare(self) -> None:
+        self.root = self.service(self.size)
+        self.backend()
+        Statikos(root=self.root).sync()
+
+    def run(self) -> None:
+        Statikos(root=self.root).sync()
+
+
+@register
+class PlanUnchanged(ServiceCase):
+    """
+    Plan a deploy of a service whose stack and content are already deployed.
+    """
+    name = 'plan-unchanged'
+    sized = True
+    repeat = 3
+
+    def prepare(self) -> None:
+        self.root = self.service(self.size)
+        self.backend()
+        Statikos(root=self.root).deploy()
+
+    def run(self) -> None:
+        Statikos(root=self.root).plan()
+
+
+@register
+class Invalidation(Case):
+    """
+    Coalesce the invalidation paths of every object in a site.
+    """
+    name = 'invalidation'
+    sized = True
+
+    def prepare(self) -> None:
+        site = sites.generate(
+            os.path.join(self.workdir, 'sites', str(self.size)), self.size
+        )
+        self.keys = [key for _, key in walk(site)]
+
+    def run(self) -> None:
+        invalidation.coalesce(invalidation.paths(self.keys))
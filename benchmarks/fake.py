@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Local fake AWS backend.
+
+Requests still go through botocore (parameter validation, serialization,
+checksums, retries and event handlers, including the rate limiter), but are
+answered in-process instead of being signed and sent, so a benchmark measures
+Statikos and botocore rather than the network.
+"""
+
+import bisect
+import hashlib
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from botocore.awsrequest import AWSResponse
+
+from statikos import api
+
+PARAMS = 'statikos_fake_params'
+
+
+def template(change_set: dict) -> str:
+    """
+    Identify the template of a change set.
+
+    Staged templates are stored under content-addressed keys, so their URL
+    identifies them as well as their body would.
+
+    :type change_set: dict
+    :param change_set: CreateChangeSet parameters
+
+    :rtype: str
+    :return: the template body, or its URL
+    """
+    return change_set.get('TemplateBody') or change_set['TemplateURL']
+
+
+class FakeAWS():
+    """
+    In-memory CloudFormation, S3, and CloudFront.
+
+    Stacks are created or updated as soon as a change set is executed, so
+    waiting for a stack costs a single poll.
+    """
+    def __init__(self) -> None:
+        """
+        Create a new `FakeAWS` object.
+
+        :rtype: None
+        :return: None
+        """
+        self.stacks = {}
+        self.change_sets = {}
+        self.buckets = {}
+        self._keys = {}
+        self.invalidations = []
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        """
+        Answer every request of every client created from now on.
+
+        Handlers are registered on the shared sessions, which every client
+        created from them inherits.
+
+        :rtype: None
+        :return: None
+        """
+        api.registry.clear()
+        session = api.registry.session(api.AWS.REGION)
+        session.events.register('before-parameter-build', self._params)
+        session.events.register('before-call', self._call)
+
+    def _params(self, params: dict, context: dict, **kwargs) -> None:
+        """
+        Keep the API parameters of a request for `_call`.
+
+        :rtype: None
+        :return: None
+        """
+        context[PARAMS] = params
+
+    def _call(self, model, context: dict, **kwargs) -> tuple:
+        """
+        Answer a request.
+
+        :rtype: tuple
+        :return: HTTP response and parsed response
+        """
+        with self._lock:
+            self.calls[model.name] = self.calls.get(model.name, 0) + 1
+        try:
+            parsed = getattr(self, model.name)(context[PARAMS])
+            status = 200
+        except KeyError as e:
+            parsed = {'Error': {'Code': 'NotFound', 'Message': str(e)}}
+            status = 400
+        parsed.setdefault('ResponseMetadata', {'HTTPStatusCode': status})
+        return AWSResponse(None, status, {}, None), parsed
+
+    # CloudFormation
+
+    def ValidateTemplate(self, params: dict) -> dict:
+        return {'Parameters': []}
+
+    def DescribeStacks(self, params: dict) -> dict:
+        stack = self.stacks[params['StackName']]
+        return {
+            'Stacks': [{
+                'StackId': stack['StackId'],
+                'StackName': params['StackName'],
+                'StackStatus': stack['StackStatus'],
+                'CreationTime': stack['CreationTime'],
+            }]
+        }
+
+    def CreateChangeSet(self, params: dict) -> dict:
+        change_set_id = f'arn:aws:cloudformation:::changeSet/{uuid.uuid4()}'
+        self.change_sets[change_set_id] = params
+        return {'Id': change_set_id, 'StackId': params['StackName']}
+
+    def DescribeChangeSet(self, params: dict) -> dict:
+        change_set = self.change_sets[params['ChangeSetName']]
+        stack = self.stacks.get(change_set['StackName'])
+        changes = []
+        if stack is None or stack['Template'] != template(change_set):
+            changes.append({
+                'Type': 'Resource',
+                'ResourceChange': {
+                    'Action': 'Add' if stack is None else 'Modify',
+                    'LogicalResourceId': 'S3BucketRoot',
+                    'ResourceType': 'AWS::S3::Bucket',
+                }
+            })
+        return {
+            'Status': 'CREATE_COMPLETE' if changes else 'FAILED',
+            'StatusReason': '' if changes else
+            "The submitted information didn't contain changes.",
+            'Changes': changes,
+        }
+
+    def DeleteChangeSet(self, params: dict) -> dict:
+        del self.change_sets[params['ChangeSetName']]
+        return {}
+
+    def ExecuteChangeSet(self, params: dict) -> dict:
+        change_set = self.change_sets.pop(params['ChangeSetName'])
+        name = change_set['StackName']
+        stack = self.stacks.setdefault(
+            name, {
+                'StackId': f'arn:aws:cloudformation:::stack/{name}',
+                'CreationTime': datetime.now(timezone.utc),
+                'Events': [],
+                'Resources': {
+                    'CloudFrontDistribution': 'E2FAKEDISTRIBUTION'
+                },
+            }
+        )
+        stack['StackStatus'] = 'CREATE_COMPLETE'
+        stack['Template'] = template(change_set)
+        stack['Events'].insert(0, {
+            'EventId': str(uuid.uuid4()),
+            'StackId': stack['StackId'],
+            'StackName': name,
+            'LogicalResourceId': name,
+            'PhysicalResourceId': stack['StackId'],
+            'ResourceType': 'AWS::CloudFormation::Stack',
+            'ResourceStatus': 'CREATE_COMPLETE',
+            'Timestamp': datetime.now(timezone.utc),
+        })
+        return {}
+
+    def DescribeStackEvents(self, params: dict) -> dict:
+        return {'StackEvents': self.stacks[params['StackName']]['Events']}
+
+    def DescribeStackResources(self, params: dict) -> dict:
+        stacks = {s['StackId']: s for s in self.stacks.values()}
+        stacks.update(self.stacks)
+        stack = stacks[params['StackName']]
+        return {
+            'StackResources': [{
+                'LogicalResourceId': logical_id,
+                'PhysicalResourceId': physical_id,
+                'ResourceType': 'AWS::CloudFront::Distribution',
+                'ResourceStatus': 'CREATE_COMPLETE',
+                'Timestamp': stack['CreationTime'],
+            } for logical_id, physical_id in stack['Resources'].items()]
+        }
+
+    def GetTemplate(self, params: dict) -> dict:
+        return {'TemplateBody': self.stacks[params['StackName']]['Template']}
+
+    # S3
+
+    def PutObject(self, params: dict) -> dict:
+        body = params['Body']
+        body.seek(0)
+        md5 = hashlib.md5()
+        for chunk in iter(lambda: body.read(1024 * 1024), b''):
+            md5.update(chunk)
+        etag = md5.hexdigest()
+        with self._lock:
+            bucket = self.buckets.setdefault(params['Bucket'], {})
+            bucket[params['Key']] = (body.tell(), etag)
+            self._keys.pop(params['Bucket'], None)
+        return {'ETag': f'"{etag}"'}
+
+    def ListObjectsV2(self, params: dict) -> dict:
+        bucket = self.buckets.get(params['Bucket'], {})
+        with self._lock:
+            if params['Bucket'] not in self._keys:
+                self._keys[params['Bucket']] = sorted(bucket)
+            keys = self._keys[params['Bucket']]
+        start = params.get('ContinuationToken') or params.get('StartAfter')
+        i = bisect.bisect_right(keys, start) if start else 0
+        page = keys[i:i + params.get('MaxKeys', 1000)]
+        response = {
+            'Contents': [{
+                'Key': k,
+                'Size': bucket[k][0],
+                'ETag': f'"{bucket[k][1]}"'
+            } for k in page],
+            'IsTruncated': i + len(page) < len(keys),
+            'KeyCount': len(page),
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def DeleteObjects(self, params: dict) -> dict:
+        bucket = self.buckets.get(params['Bucket'], {})
+        deleted = []
+        with self._lock:
+            self._keys.pop(params['Bucket'], None)
+            for o in params['Delete']['Objects']:
+                bucket.pop(o['Key'], None)
+                deleted.append({'Key': o['Key']})
+        return {'Deleted': deleted}
+
+    # CloudFront
+
+    def CreateInvalidation(self, params: dict) -> dict:
+        invalidation_id = f'I{len(self.invalidations)}'
+        self.invalidations.append(params['InvalidationBatch'])
+        return {
+            'Invalidation': {
+                'Id': invalidation_id,
+                'Status': 'Completed',
+                'CreateTime': datetime.now(timezone.utc),
+                'InvalidationBatch': params['InvalidationBatch'],
+            }
+        }
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""Benchmark harness."""
+
+import abc
+import json
+import os
+import platform
+import statistics
+import time
+from typing import List
+
+CASES = []
+
+
+def register(cls: type) -> type:
+    """
+    Register a benchmark case.
+
+    :type cls: type
+    :param cls: subclass of `Case`
+
+    :rtype: type
+    :return: the class
+    """
+    CASES.append(cls)
+    return cls
+
+
+class Case(abc.ABC):
+    """
+    A single benchmark.
+
+    `prepare` runs once, `setup` before every repetition, and only `run` is
+    timed. If `run` returns a number, it is taken as the measurement instead
+    (e.g. a time measured in a subprocess).
+
+    Sized cases run once per site size, with `self.size` set.
+    """
+    name = None
+    sized = False
+    repeat = 5
+
+    def __init__(self, workdir: str, size: int = None) -> None:
+        """
+        Create a new `Case` object.
+
+        :type workdir: str
+        :param workdir: path to a scratch directory
+        :type size: int
+        :param size: number of files in the site, for sized cases
+
+        :rtype: None
+        :return: None
+        """
+        self.workdir = workdir
+        self.size = size
+
+    @property
+    def id(self) -> str:
+        """
+        Return the name of the benchmark, with its size.
+
+        :rtype: str
+        :return: name of the benchmark
+        """
+        return f'{self.name}[{self.size}]' if self.sized else self.name
+
+    def prepare(self) -> None:
+        """
+        Prepare the benchmark, once.
+
+        :rtype: None
+        :return: None
+        """
+
+    def setup(self) -> None:
+        """
+        Prepare a single repetition.
+
+        :rtype: None
+        :return: None
+        """
+
+    @abc.abstractmethod
+    def run(self) -> float:
+        """
+        Run a single repetition.
+
+        :rtype: float
+        :return: None, or the time taken in seconds
+        """
+
+    def measure(self, repeat: int = None) -> dict:
+        """
+        Run the benchmark.
+
+        :type repeat: int
+        :param repeat: number of repetitions
+
+        :rtype: dict
+        :return: the fastest and the median time, in seconds
+        """
+        self.prepare()
+        times = []
+        for _ in range(repeat or self.repeat):
+            self.setup()
+            start = time.perf_counter()
+            elapsed = self.run()
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+            times.append(elapsed)
+        return {'min': min(times), 'median': statistics.median(times)}
+
+
+def load_baseline(path: str) -> dict:
+    """
+    Load recorded results.
+
+    :type path: str
+    :param path: path to the baseline
+
+    :rtype: dict
+    :return: a dict of benchmark names to results, empty if there is none
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)['results']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_baseline(path: str, results: dict, baseline: dict) -> None:
+    """
+    Record results, keeping recorded results of benchmarks that did not run.
+
+    :type path: str
+    :param path: path to the baseline
+    :type results: dict
+    :param results: a dict of benchmark names to results
+    :type baseline: dict
+    :param baseline: a dict of benchmark names to recorded results
+
+    :rtype: None
+    :return: None
+    """
+    data = {
+        'machine': f'{platform.system()} {platform.machine()}, '
+        f'{os.cpu_count()} CPUs',
+        'python': platform.python_version(),
+        'results': dict(
+            baseline, **{
+                name: {k: round(v, 6) for k, v in result.items()}
+                for name, result in results.items()
+            }
+        ),
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(
+    name: str, result: dict, baseline: dict, tolerance: float, floor: float
+) -> str:
+    """
+    Compare a result against its baseline.
+
+    Fastest times are compared, as they are the least affected by noise. A
+    benchmark regressed if it is more than `tolerance` slower, and by more
+    than `floor` seconds.
+
+    :type name: str
+    :param name: name of the benchmark
+    :type result: dict
+    :param result: result of the benchmark
+    :type baseline: dict
+    :param baseline: a dict of benchmark names to recorded results
+    :type tolerance: float
+    :param tolerance: allowed slowdown, as a fraction of the baseline
+    :type floor: float
+    :param floor: slowdown in seconds that is always allowed
+
+    :rtype: str
+    :return: `regressed`, `improved`, `ok`, or `new`
+    """
+    if name not in baseline:
+        return 'new'
+    before, after = baseline[name]['min'], result['min']
+    if after > before * (1 + tolerance) and after - before > floor:
+        return 'regressed'
+    if before > after * (1 + tolerance) and before - after > floor:
+        return 'improved'
+    return 'ok'
+
+
+def format_row(name: str, result: dict, baseline: dict, status: str) -> str:
+    """
+    Format a line of the report.
+
+    Example:
+
+    sync[1000]  min 0.412s  median 0.431s  baseline 0.398s  +3.5%  ok
+
+    :rtype: str
+    :return: a line of the report
+    """
+    line = (
+        f'{name:<28} min {result["min"]:9.4f}s  '
+        f'median {result["median"]:9.4f}s'
+    )
+    if name in baseline:
+        before = baseline[name]['min']
+        change = (result['min'] - before) / before * 100 if before else 0.0
+        line += f'  baseline {before:9.4f}s  {change:+6.1f}%'
+    return f'{line}  {status}'
+
+
+def cases(workdir: str, sizes: List[int], only: str = None) -> List[Case]:
+    """
+    Instantiate the registered cases.
+
+    :type workdir: str
+    :param workdir: path to a scratch directory
+    :type sizes: List[int]
+    :param sizes: site sizes to run sized cases at
+    :type only: str
+    :param only: substring of the names of the benchmarks to run
+
+    :rtype: List[Case]
+    :return: cases to run
+    """
+    result = []
+    for cls in CASES:
+        for size in sizes if cls.sized else [None]:
+            case = cls(workdir, size)
+            if not only or only in case.id:
+                result.append(case)
+    return result
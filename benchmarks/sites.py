@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Synthetic site trees."""
+
+import os
+import random
+
+# File types, by share of the site: mostly pages, some assets.
+KINDS = ['html'] * 6 + ['css', 'js', 'json', 'png']
+
+# Files per directory.
+FANOUT = 100
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <title>Page {i}</title>
+  <link rel="stylesheet" href="/assets/{d}/{css}.css">
+  <script src="/assets/{d}/{js}.js"></script>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def generate(directory: str, size: int, seed: int = 0) -> str:
+    """
+    Generate a site tree of `size` files, unless it already exists.
+
+    Contents are deterministic for a given size and seed, so every run (and
+    the recorded baseline) measures the same tree. Files average about 1 KB,
+    in directories of `FANOUT` files.
+
+    :type directory: str
+    :param directory: path to the directory to generate the tree in
+    :type size: int
+    :param size: number of files
+    :type seed: int
+    :param seed: seed of the generator
+
+    :rtype: str
+    :return: path to the tree
+    """
+    marker = f'{directory}.complete'
+    if os.path.exists(marker):
+        return directory
+    rng = random.Random(seed)
+    words = [
+        ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz')
+                for _ in range(rng.randint(2, 10))) for _ in range(1000)
+    ]
+    created = set()
+    for i in range(size):
+        kind = KINDS[i % len(KINDS)]
+        d = i // FANOUT
+        if i == 0:
+            key = 'index.html'
+        elif kind == 'html':
+            key = f'pages/{d}/{i}.html'
+        else:
+            key = f'assets/{d}/{i}.{kind}'
+        path = os.path.join(directory, *key.split('/'))
+        if os.path.dirname(path) not in created:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            created.add(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(_content(rng, words, kind, i, d))
+    with open(marker, 'w'):
+        pass
+    return directory
+
+
+def _content(
+    rng: random.Random, words: list, kind: str, i: int, d: int
+) -> bytes:
+    """
+    Generate the content of a single file.
+
+    :rtype: bytes
+    :return: content of the file
+    """
+    text = ' '.join(rng.choices(words, k=rng.randint(50, 250)))
+    if kind == 'html':
+        return PAGE.format(
+            i=i, d=d, css=d * FANOUT + 6, js=d * FANOUT + 7,
+            body=f'<p>{text}</p>'
+        ).encode()
+    if kind == 'css':
+        return f'/* {text} */\nbody {{ margin: {i % 16}px; }}\n'.encode()
+    if kind == 'js':
+        return f'// {text}\nconsole.log({i});\n'.encode()
+    if kind == 'json':
+        return f'{{"id": {i}, "text": "{text}"}}\n'.encode()
+    return rng.randbytes(rng.randint(256, 2048))
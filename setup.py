@@ -22,6 +22,12 @@ with open('requirements_dev.txt') as requirements_dev_file:
 
 install_requirements = requirements
 
+extras_requirements = {
+    'brotli': ['brotli==1.1.0'],
+    'images': ['Pillow==10.4.0'],
+    'watch': ['watchdog==6.0.0'],
+}
+
 setup_requirements = []
 
 test_requirements = requirements_dev
@@ -45,6 +51,7 @@ setup(
     entry_points={
         'console_scripts': ['statikos=statikos.cli:cli', ],
     },
+    extras_require=extras_requirements,
     install_requires=install_requirements,
     license='MIT License',
     long_description=readme + '\n\n' + history,
@@ -52,6 +59,7 @@ setup(
     keywords='statikos',
     name='statikos',
     packages=find_packages(include=['statikos']),
+    package_data={'statikos': ['data/*.json']},
     setup_requires=setup_requirements,
     test_suite='tests',
     tests_require=test_requirements,
@@ -1,12 +1,130 @@
 # -*- coding: utf-8 -*-
 """AWS API module."""
 
+import json
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Iterator
+
 import boto3
 import botocore
 from botocore import exceptions
+from botocore.config import Config
+
+from . import trace, utils
+from .exceptions import (
+    ChangeSetFailed, InvalidTemplate, StackFailed, UploadNotFound
+)
+
+
+class ClientRegistry():
+    """
+    Process-wide cache of boto3 sessions and low-level service clients.
+
+    Creating a session resolves credentials and loads the botocore data
+    files, and every client owns a connection pool, so one session per
+    (region, profile) and one client per (service, region, profile) are shared
+    by every `AWS` object in the process. Clients are thread-safe once
+    created; creating them is not, hence the lock.
+
+    A client is built with the config of the first caller. If a later caller
+    needs a larger connection pool, a new client is built with it and
+    replaces the old one (callers holding the old client keep working).
+    """
+    def __init__(self) -> None:
+        """
+        Create a new, empty `ClientRegistry` object.
+
+        :rtype: None
+        :return: None
+        """
+        self.sessions = {}
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def session(self, region: str, profile: str = None) -> boto3.Session:
+        """
+        Return the session for a region and profile.
+
+        :type region: str
+        :param region: region associated with the session
+        :type profile: str
+        :param profile: name of the credentials profile
+
+        :rtype: boto3.Session
+        :return: a boto3 session instance
+        """
+        with self._lock:
+            return self._session(region, profile)
+
+    def _session(self, region: str, profile: str) -> boto3.Session:
+        """
+        Return the session for a region and profile (lock held).
+
+        :type region: str
+        :param region: region associated with the session
+        :type profile: str
+        :param profile: name of the credentials profile
+
+        :rtype: boto3.Session
+        :return: a boto3 session instance
+        """
+        key = (region, profile)
+        if key not in self.sessions:
+            session_config = {'region_name': region}
+            if profile:
+                session_config['profile_name'] = profile
+            self.sessions[key] = boto3.Session(**session_config)
+        return self.sessions[key]
+
+    def client(
+        self,
+        service: str,
+        region: str,
+        profile: str = None,
+        config: Config = None
+    ) -> botocore.client.BaseClient:
+        """
+        Return the client for a service, region and profile.
+
+        :type service: str
+        :param service: name of the service
+        :type region: str
+        :param region: region associated with the client
+        :type profile: str
+        :param profile: name of the credentials profile
+        :type config: botocore.config.Config
+        :param config: configuration to create the client with
+
+        :rtype: botocore.client.BaseClient
+        :return: a botocore client instance
+        """
+        config = config or Config()
+        key = (service, region, profile)
+        with self._lock:
+            client, pool = self.clients.get(key, (None, 0))
+            if client is None or pool < config.max_pool_connections:
+                client = self._session(region, profile).client(
+                    service, use_ssl=True, config=config
+                )
+                self.clients[key] = (client, config.max_pool_connections)
+            return client
+
+    def clear(self) -> None:
+        """
+        Forget all sessions and clients.
+
+        :rtype: None
+        :return: None
+        """
+        with self._lock:
+            self.sessions = {}
+            self.clients = {}
+
 
-from . import utils
-from .exceptions import InvalidTemplate
+registry = ClientRegistry()
 
 
 class AWS:
@@ -14,47 +132,128 @@ class AWS:
     Wrapper for the AWS SDK for Python.
 
     The AWS class provides a default configuration for a `boto3.Session` from
-    which a low-level service client can be created.
+    which a low-level service client can be created. Sessions and clients are
+    shared through `registry`.
+
+    Clients use adaptive retries (which also rate limit the client when it is
+    throttled), bounded timeouts, and TCP keepalive, so that long waits on
+    CloudFormation and large uploads to S3 do not hang on dead connections.
+    Any of these may be overridden with `config`.
     """
     SERVICE_NAME = None
     REGION = 'us-east-1'
+    MAX_POOL_CONNECTIONS = 10
+    CONFIG = {
+        'retries': {
+            'mode': 'adaptive',
+            'max_attempts': 10
+        },
+        'connect_timeout': 10,
+        'read_timeout': 60,
+        'tcp_keepalive': True,
+    }
 
-    def __init__(self, region: str = None) -> None:
+    def __init__(
+        self,
+        region: str = None,
+        profile: str = None,
+        limiter=None,
+        max_pool_connections: int = None,
+        config: dict = None,
+        tracer=None
+    ) -> None:
         """
         Create a new `AWS` object.
 
         :type region: str
         :param region: region associated with the client
             A client may only be associated with a single region.
+        :type profile: str
+        :param profile: name of the credentials profile
+        :type limiter: statikos.ratelimit.TokenBucket
+        :param limiter: rate limiter to take a token from before every
+            request the client sends (including retries)
+        :type max_pool_connections: int
+        :param max_pool_connections: maximum number of connections to keep in
+            the connection pool (at least the number of threads that share
+            the client)
+        :type config: dict
+        :param config: `botocore.config.Config` options to override
+        :type tracer: statikos.trace.Tracer
+        :param tracer: tracer to record phases and API calls with
 
         :rtype: None
         :return: None
         """
         self.region = region or self.REGION
+        self.profile = profile
+        self.max_pool_connections = \
+            max_pool_connections or self.MAX_POOL_CONNECTIONS
+        self.config = config or {}
         self.session = self._get_session()
         self.client = self._get_client()
+        if limiter is not None:
+            self.client.meta.events.register(
+                'before-send',
+                self._limit(limiter),
+                unique_id=f'statikos-limiter-{id(limiter)}'
+            )
+        self.tracer = tracer
+        if tracer is not None:
+            tracer.instrument(self.client)
+
+    @staticmethod
+    def _limit(limiter) -> Callable:
+        """
+        Create a `before-send` event handler that waits for a token.
+
+        The handler must return None, or botocore takes its return value as
+        the response to the request.
+
+        :type limiter: statikos.ratelimit.TokenBucket
+        :param limiter: rate limiter
+
+        :rtype: Callable
+        :return: event handler
+        """
+        def handler(**kwargs) -> None:
+            limiter.acquire()
+
+        return handler
 
     def _get_session(self) -> boto3.Session:
         """
-        Create a session.
+        Return the shared session.
 
         :rtype: boto3.Session
         :return: a boto3 session instance
         """
-        session_config = {'region_name': self.region}
-        return boto3.Session(**session_config)
+        return registry.session(self.region, self.profile)
+
+    def _get_config(self) -> Config:
+        """
+        Create the client configuration.
+
+        :rtype: botocore.config.Config
+        :return: a botocore config instance
+        """
+        options = dict(self.CONFIG, **self.config)
+        options['max_pool_connections'] = self.max_pool_connections
+        return Config(**options)
 
     def _get_client(self) -> botocore.client.BaseClient:
         """
-        Create a low-level service client by name.
+        Return the shared low-level service client.
 
         :rtype: botocore.client.BaseClient
         :return: a botocore client instance
         """
-        client_config = {
-            'use_ssl': True,
-        }
-        return self.session.client(self.SERVICE_NAME, **client_config)
+        return registry.client(
+            self.SERVICE_NAME,
+            self.region,
+            profile=self.profile,
+            config=self._get_config()
+        )
 
 
 class CloudFormation(AWS):
@@ -62,6 +261,38 @@ class CloudFormation(AWS):
     Wrapper for a low-level client representing AWS CloudFormation.
     """
     SERVICE_NAME = 'cloudformation'
+    MIN_POLL_DELAY = 0.5
+    MAX_POLL_DELAY = 5
+    MIN_WAIT_DELAY = 2
+    MAX_WAIT_DELAY = 30
+    WAIT_BACKOFF = 1.5
+    SUCCESS_STATUSES = [
+        'CREATE_COMPLETE',
+        'UPDATE_COMPLETE',
+        'DELETE_COMPLETE',
+        'IMPORT_COMPLETE',
+    ]
+    FAILURE_STATUSES = [
+        'CREATE_FAILED',
+        'DELETE_FAILED',
+        'ROLLBACK_COMPLETE',
+        'ROLLBACK_FAILED',
+        'UPDATE_FAILED',
+        'UPDATE_ROLLBACK_COMPLETE',
+        'UPDATE_ROLLBACK_FAILED',
+        'IMPORT_ROLLBACK_COMPLETE',
+        'IMPORT_ROLLBACK_FAILED',
+    ]
+    # Statuses of stacks that must be deployed with a CREATE change set.
+    NEW_STACK_STATUSES = [None, 'REVIEW_IN_PROGRESS']
+    # Maximum size in bytes of a template passed as `TemplateBody`. Larger
+    # templates must be uploaded to S3 and passed as `TemplateURL`.
+    MAX_TEMPLATE_BODY = 51200
+    # Status reasons of change sets that failed because they were empty.
+    NO_CHANGES_REASONS = [
+        "The submitted information didn't contain changes.",
+        'No updates are to be performed.',
+    ]
 
     def __init__(self, *args, **kwargs):
         """
@@ -76,7 +307,11 @@ class CloudFormation(AWS):
         self,
         stack_name: str,
         template_file: str,
-        parameter_overrides: list = []
+        parameter_overrides: list = [],
+        callback: Callable = None,
+        change_set_type: str = None,
+        template_url: str = None,
+        validate: bool = False
     ) -> dict:
         """
         Deploy a CloudFormation stack.
@@ -85,8 +320,16 @@ class CloudFormation(AWS):
         command of the AWS CLI. This command does not have a corresponding
         method in the AWS SDK for Python.
 
-        If you specify an existing stack, the command updates the stack. If you
-        specify a new stack, the command creates it.
+        A change set is created (of type CREATE for a new stack, UPDATE for an
+        existing one, unless `change_set_type` is given) and, once it is
+        ready, executed. The template is passed by `template_url` instead of
+        its body if one is given (see `MAX_TEMPLATE_BODY`). The template is
+        checked with the ValidateTemplate API endpoint only if `validate` is
+        set, since Statikos validates its templates offline (see
+        `statikos.validation`). If the change set contains no changes, it is
+        deleted and the function returns right away. Otherwise, the function
+        waits for the stack operation to complete, passing each new stack
+        event to `callback` (see `wait_for_stack`).
 
         Example `parameter_overrides`:
 
@@ -94,39 +337,295 @@ class CloudFormation(AWS):
           'ParameterKey1=ParameterValue1', 'ParameterKey2=ParameterValue2', ...
         ]
 
+        Returns:
+
+        {
+          'StackName': 'string',
+          'ChangeSetId': 'string',
+          'ChangeSetType': 'CREATE'|'UPDATE',
+          'Executed': True|False,
+          'Changes': [
+            {
+              'Action': 'Add'|'Modify'|'Remove'|...,
+              'LogicalResourceId': 'string',
+              'PhysicalResourceId': 'string',
+              'ResourceType': 'string',
+              'Replacement': 'True'|'False'|'Conditional'
+            },
+          ]
+        }
+
         :type stack_name: str
         :param stack_name: name of the stack
         :type template_file: str
         :param template_file: path to the CloudFormation template
         :type parameter_overrides: list
         :param parameter_overrides: a list of input parameters
+        :type callback: Callable[[dict], None]
+        :param callback: called with each new stack event
+        :type change_set_type: str
+        :param change_set_type: type of the change set (`CREATE` or
+            `UPDATE`), if the status of the stack is already known
+        :type template_url: str
+        :param template_url: URL of a copy of the template in S3
+        :type validate: bool
+        :param validate: whether to validate the template with the
+            ValidateTemplate API endpoint
 
-        :rtype: None
-        :return: None
+        :rtype: dict
+        :return: a dict describing the deployment
         """
-        template_body = str(utils.read_file(template_file))
-        if not self.is_valid_template(template_body):
-            raise InvalidTemplate
+        template_body = None if template_url \
+            else str(utils.read_file(template_file))
+        if validate:
+            with trace.span(self.tracer, 'validate'):
+                if not self.is_valid_template(template_body, template_url):
+                    raise InvalidTemplate
         parameters = []
         for x in parameter_overrides:
             parameters.append({
                 'ParameterKey': x.split('=')[0],
                 'ParameterValue': x.split('=')[1],
             })
-        if not self.stack_exists(stack_name):
-            self.create_stack(
+        with trace.span(self.tracer, 'change set'):
+            if change_set_type is None:
+                status = self.stack_status(stack_name)
+                change_set_type = \
+                    'CREATE' if status in self.NEW_STACK_STATUSES else 'UPDATE'
+            change_set_id = self.create_change_set(
                 stack_name=stack_name,
                 template_body=template_body,
-                parameters=parameters
+                parameters=parameters,
+                change_set_type=change_set_type,
+                template_url=template_url
+            )['Id']
+            changes = self.wait_for_change_set(change_set_id)
+        result = {
+            'StackName': stack_name,
+            'ChangeSetId': change_set_id,
+            'ChangeSetType': change_set_type,
+            'Executed': bool(changes),
+            'Changes': [c['ResourceChange'] for c in changes],
+        }
+        if not changes:
+            self.delete_change_set(change_set_id)
+            return result
+        with trace.span(self.tracer, 'stack wait'):
+            cursor = self.latest_event_id(stack_name)
+            self.execute_change_set(change_set_id)
+            self.wait_for_stack(stack_name, cursor=cursor, callback=callback)
+        return result
+
+    def delete(self, stack_name: str, callback: Callable = None) -> None:
+        """
+        Delete a CloudFormation stack and wait for the deletion to complete.
+
+        Nothing is done if the stack does not exist.
+
+        :type stack_name: str
+        :param stack_name: name of the stack
+        :type callback: Callable[[dict], None]
+        :param callback: called with each new stack event
+
+        :rtype: None
+        :return: None
+        """
+        try:
+            response = self.client.describe_stacks(StackName=stack_name)
+        except exceptions.ClientError:
+            return
+        # Deleted stacks can only be looked up by ID.
+        stack_id = response['Stacks'][0]['StackId']
+        with trace.span(self.tracer, 'stack wait'):
+            cursor = self.latest_event_id(stack_id)
+            self.delete_stack(stack_id)
+            self.wait_for_stack(stack_id, cursor=cursor, callback=callback)
+
+    def latest_event_id(self, stack_name: str) -> str:
+        """
+        Retrieve the ID of the most recent event of a CloudFormation stack.
+
+        :type stack_name: str
+        :param stack_name: name or ID of the stack
+
+        :rtype: str
+        :return: ID of the most recent event, or None if there is none
+        """
+        try:
+            response = self.client.describe_stack_events(StackName=stack_name)
+        except exceptions.ClientError:
+            return None
+        events = response['StackEvents']
+        return events[0]['EventId'] if events else None
+
+    def stack_events(self, stack_name: str, cursor: str = None) -> list:
+        """
+        Retrieve the events of a CloudFormation stack newer than `cursor`.
+
+        DescribeStackEvents returns events newest first, so paging stops as
+        soon as the event at the cursor is reached; a poll with no new events
+        costs a single request.
+
+        :type stack_name: str
+        :param stack_name: name or ID of the stack
+        :type cursor: str
+        :param cursor: ID of the last event seen
+
+        :rtype: list
+        :return: a list of new events, oldest first
+        """
+        events = []
+        kwargs = {'StackName': stack_name}
+        while True:
+            response = self.client.describe_stack_events(**kwargs)
+            for event in response['StackEvents']:
+                if event['EventId'] == cursor:
+                    return events[::-1]
+                events.append(event)
+            if not response.get('NextToken'):
+                return events[::-1]
+            kwargs['NextToken'] = response['NextToken']
+
+    def wait_for_stack(
+        self,
+        stack_name: str,
+        cursor: str = None,
+        callback: Callable = None
+    ) -> dict:
+        """
+        Wait for a stack operation to complete by tailing the stack events.
+
+        Events newer than `cursor` are passed to `callback` as they arrive.
+        Polling starts every `MIN_WAIT_DELAY` seconds and backs off by
+        `WAIT_BACKOFF` up to `MAX_WAIT_DELAY` while nothing happens, resetting
+        whenever new events arrive. Delays are jittered so that many
+        concurrent waiters do not poll in lockstep.
+
+        :type stack_name: str
+        :param stack_name: name or ID of the stack
+        :type cursor: str
+        :param cursor: ID of the last event before the operation started
+        :type callback: Callable[[dict], None]
+        :param callback: called with each new stack event
+
+        :rtype: dict
+        :return: the final event of the stack
+        """
+        failures = []
+        for event in self._poll_events(stack_name, cursor):
+            if callback:
+                callback(event)
+            if self._is_complete(event, failures):
+                return event
+
+    def _poll_events(self, stack_name: str, cursor: str) -> Iterator[dict]:
+        """
+        Yield the events of a stack as they arrive, oldest first.
+
+        :type stack_name: str
+        :param stack_name: name or ID of the stack
+        :type cursor: str
+        :param cursor: ID of the last event seen
+
+        :rtype: Iterator[dict]
+        :return: an endless iterator of stack events
+        """
+        delay = self.MIN_WAIT_DELAY
+        while True:
+            events = self.stack_events(stack_name, cursor=cursor)
+            yield from events
+            if events:
+                cursor = events[-1]['EventId']
+                delay = self.MIN_WAIT_DELAY
+            else:
+                delay = min(delay * self.WAIT_BACKOFF, self.MAX_WAIT_DELAY)
+            time.sleep(delay * random.uniform(0.75, 1.25))
+
+    def _is_complete(self, event: dict, failures: list) -> bool:
+        """
+        Classify a stack event.
+
+        Resource failures are recorded in `failures` (except resources that
+        were cancelled because another one failed), so that a failed stack
+        operation is reported with the resource that caused it.
+
+        :type event: dict
+        :param event: stack event
+        :type failures: list
+        :param failures: failed resource events seen so far
+
+        :rtype: bool
+        :return: whether the stack operation succeeded
+        """
+        status = event['ResourceStatus']
+        reason = event.get('ResourceStatusReason', '')
+        if status.endswith('_FAILED') and 'cancelled' not in reason:
+            failures.append(event)
+        if not self.is_stack_event(event):
+            return False
+        if status in self.FAILURE_STATUSES:
+            failed = (failures or [event])[0]
+            raise StackFailed(
+                stack_name=event['StackName'],
+                status=status,
+                resource=failed['LogicalResourceId'],
+                reason=failed.get('ResourceStatusReason', '')
             )
-        else:
-            self.update_stack(
-                stack_name=stack_name,
-                template_body=template_body,
-                parameters=parameters
+        return status in self.SUCCESS_STATUSES
+
+    @staticmethod
+    def is_stack_event(event: dict) -> bool:
+        """
+        Determine if an event is about the stack itself.
+
+        :type event: dict
+        :param event: stack event
+
+        :rtype: bool
+        :return: whether the event is about the stack itself
+        """
+        return event['ResourceType'] == 'AWS::CloudFormation::Stack' and \
+            event.get('PhysicalResourceId') == event['StackId']
+
+    def wait_for_change_set(self, change_set_id: str) -> list:
+        """
+        Wait for a change set to be created and return its changes.
+
+        The change set is polled with a short initial delay that grows up to
+        `MAX_POLL_DELAY`, as most change sets are ready within seconds.
+
+        :type change_set_id: str
+        :param change_set_id: ARN of the change set
+
+        :rtype: list
+        :return: a list of changes, empty if the change set has no changes
+        """
+        delay = self.MIN_POLL_DELAY
+        while True:
+            response = self.client.describe_change_set(
+                ChangeSetName=change_set_id
+            )
+            status = response['Status']
+            if status == 'CREATE_COMPLETE':
+                break
+            if status == 'FAILED':
+                reason = response.get('StatusReason', '')
+                if any(m in reason for m in self.NO_CHANGES_REASONS):
+                    return []
+                raise ChangeSetFailed(reason=reason)
+            time.sleep(delay)
+            delay = min(delay * 2, self.MAX_POLL_DELAY)
+        changes = response['Changes']
+        while response.get('NextToken'):
+            response = self.client.describe_change_set(
+                ChangeSetName=change_set_id, NextToken=response['NextToken']
             )
+            changes.extend(response['Changes'])
+        return changes
 
-    def is_valid_template(self, template_body: str) -> bool:
+    def is_valid_template(
+        self, template_body: str = None, template_url: str = None
+    ) -> bool:
         """
         Determine if a CloudFormation template is valid.
 
@@ -135,118 +634,167 @@ class CloudFormation(AWS):
 
         :type template_body: str
         :param template_body: body of the CloudFormation template
+        :type template_url: str
+        :param template_url: URL of the template in S3, instead of its body
 
         :rtype: bool
         :return: whether the CloudFormation template is valid
         """
         try:
-            self.validate_template(template_body=template_body)
+            self.validate_template(
+                template_body=template_body, template_url=template_url
+            )
         except exceptions.ValidationError:
             return False
         return True
 
-    def stack_exists(self, stack_name: str) -> bool:
+    def stack_status(self, stack_name: str) -> str:
         """
-        Determine if a CloudFormation stack exists.
-
-        This is a high-level function that uses the DescribeStacks API endpoint
-        to determine if the specified CloudFormation stack exists.
+        Retrieve the status of a CloudFormation stack.
 
         :type stack_name: str
         :param stack_name: name of the stack
 
-        :rtype: bool
-        :return: whether the CloudFormation stack exists
+        :rtype: str
+        :return: status of the stack, or None if the stack does not exist
         """
         try:
-            self.client.describe_stacks(StackName=stack_name)
+            response = self.client.describe_stacks(StackName=stack_name)
         except exceptions.ClientError:
-            return False
-        return True
+            return None
+        return response['Stacks'][0]['StackStatus']
 
-    def create_stack(
-        self, stack_name: str, template_body: str, parameters: list
-    ) -> dict:
+    def describe(self, stack_name: str) -> dict:
         """
-        Create a CloudFormation stack as specified in the template.
+        Describe a CloudFormation stack and the resources in it.
 
-        :type stack_name: str
-        :param stack_name: name of the stack
-        :type template_body: str
-        :param template_body: body of the CloudFormation template
-        :type parameters: list
-        :param parameters: a list of input parameters for the CloudFormation
-            stack
+        This is a high-level function that uses the DescribeStacks and
+        DescribeStackResources API endpoints.
 
-        Example `parameters`:
+        Returns:
 
-        [
-          {
-            'ParameterKey1': 'string',
-            'ParameterValue1': 'string'
+        {
+          'id': 'string',
+          'status': 'string',
+          'outputs': {
+            'OutputKey': 'OutputValue'
           },
-          {
-            'ParameterKey2': 'string',
-            'ParameterValue2': 'string'
+          'resources': {
+            'LogicalResourceId': 'PhysicalResourceId'
           }
-        ]
+        }
 
-        Returns:
+        :type stack_name: str
+        :param stack_name: name of the stack
 
-        {
-          'StackId': 'string'
+        :rtype: dict
+        :return: a dict describing the stack, with an `id` and `status` of
+            None if the stack does not exist
+        """
+        try:
+            response = self.client.describe_stacks(StackName=stack_name)
+        except exceptions.ClientError:
+            return {'id': None, 'status': None, 'outputs': {}, 'resources': {}}
+        stack = response['Stacks'][0]
+        response = self.client.describe_stack_resources(
+            StackName=stack['StackId']
+        )
+        return {
+            'id': stack['StackId'],
+            'status': stack['StackStatus'],
+            'outputs': {
+                o['OutputKey']: o['OutputValue']
+                for o in stack.get('Outputs', [])
+            },
+            'resources': {
+                r['LogicalResourceId']: r.get('PhysicalResourceId')
+                for r in response['StackResources']
+            },
         }
 
+    def get_template(self, stack_name: str) -> dict:
+        """
+        Retrieve the template of a deployed CloudFormation stack.
+
+        :type stack_name: str
+        :param stack_name: name of the stack
+
         :rtype: dict
-        :return: a dict containing the response for the request
+        :return: the template, or None if the stack does not exist
         """
-        return self.client.create_stack(
-            StackName=stack_name,
-            TemplateBody=template_body,
-            Parameters=parameters
-        )
+        try:
+            response = self.client.get_template(StackName=stack_name)
+        except exceptions.ClientError:
+            return None
+        body = response['TemplateBody']
+        # JSON templates are returned parsed, YAML templates as a string.
+        return json.loads(body) if isinstance(body, str) else body
 
-    def update_stack(
-        self, stack_name: str, template_body: str, parameters: list
+    def create_change_set(
+        self,
+        stack_name: str,
+        template_body: str,
+        parameters: list,
+        change_set_type: str = 'UPDATE',
+        template_url: str = None
     ) -> dict:
         """
-        Update a CloudFormation stack as specified in the template.
+        Create a change set for a CloudFormation stack.
 
         :type stack_name: str
         :param stack_name: name of the stack
         :type template_body: str
         :param template_body: body of the CloudFormation template
-        :type parameters: dict
+        :type parameters: list
         :param parameters: a list of input parameters for the stack
-
-        Example `parameters`:
-
-        [
-          {
-            'ParameterKey1': 'string',
-            'ParameterValue1': 'string'
-          },
-          {
-            'ParameterKey2': 'string',
-            'ParameterValue2': 'string'
-          }
-        ]
+        :type change_set_type: str
+        :param change_set_type: `CREATE` for a new stack, `UPDATE` for an
+            existing stack
+        :type template_url: str
+        :param template_url: URL of the template in S3, instead of its body
 
         Returns:
 
         {
+          'Id': 'string',
           'StackId': 'string'
         }
 
         :rtype: dict
         :return: a dict containing the response for the request
         """
-        return self.client.update_stack(
+        return self.client.create_change_set(
             StackName=stack_name,
-            TemplateBody=template_body,
-            Parameters=parameters
+            Parameters=parameters,
+            ChangeSetName=f'statikos-{uuid.uuid4().hex}',
+            ChangeSetType=change_set_type,
+            **self._template(template_body, template_url)
         )
 
+    def execute_change_set(self, change_set_id: str) -> dict:
+        """
+        Execute a change set.
+
+        :type change_set_id: str
+        :param change_set_id: ARN of the change set
+
+        :rtype: dict
+        :return: a dict containing the response for the request
+        """
+        return self.client.execute_change_set(ChangeSetName=change_set_id)
+
+    def delete_change_set(self, change_set_id: str) -> dict:
+        """
+        Delete a change set.
+
+        :type change_set_id: str
+        :param change_set_id: ARN of the change set
+
+        :rtype: dict
+        :return: a dict containing the response for the request
+        """
+        return self.client.delete_change_set(ChangeSetName=change_set_id)
+
     def delete_stack(self, stack_name: str):
         """
         Delete a CloudFormation stack.
@@ -259,14 +807,332 @@ class CloudFormation(AWS):
         """
         return self.client.delete_stack(StackName=stack_name)
 
-    def validate_template(self, template_body: str):
+    def validate_template(
+        self, template_body: str = None, template_url: str = None
+    ):
         """
         Validate a specified CloudFormation template.
 
         :type template_body: str
         :param template_body: body of the CloudFormation template
+        :type template_url: str
+        :param template_url: URL of the template in S3, instead of its body
+
+        :rtype: dict
+        :return: a dict containing the response for the request
+        """
+        return self.client.validate_template(
+            **self._template(template_body, template_url)
+        )
+
+    @staticmethod
+    def _template(template_body: str, template_url: str) -> dict:
+        """
+        Return the parameters that pass a template by body or by URL.
+
+        :type template_body: str
+        :param template_body: body of the CloudFormation template
+        :type template_url: str
+        :param template_url: URL of the template in S3
+
+        :rtype: dict
+        :return: `TemplateURL` if there is a URL, else `TemplateBody`
+        """
+        if template_url:
+            return {'TemplateURL': template_url}
+        return {'TemplateBody': template_body}
+
+
+class S3(AWS):
+    """
+    Wrapper for a low-level client representing Amazon S3.
+
+    botocore clients are thread-safe, so a single `S3` object is meant to be
+    shared by all upload threads. Size the connection pool to match with
+    `max_pool_connections`.
+    """
+    SERVICE_NAME = 's3'
+    MAX_DELETE_KEYS = 1000
+
+    def put_object(
+        self, bucket: str, key: str, body, headers: dict = None
+    ) -> dict:
+        """
+        Add an object to a bucket.
+
+        Example `headers`:
+
+        {
+          'ContentType': 'text/html',
+          'CacheControl': 'max-age=60'
+        }
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type key: str
+        :param key: object key
+        :type body: bytes or file
+        :param body: object data
+        :type headers: dict
+        :param headers: additional PutObject parameters
 
         :rtype: dict
         :return: a dict containing the response for the request
         """
-        return self.client.validate_template(TemplateBody=template_body, )
+        return self.client.put_object(
+            Bucket=bucket, Key=key, Body=body, **(headers or {})
+        )
+
+    def create_multipart_upload(
+        self, bucket: str, key: str, headers: dict = None
+    ) -> str:
+        """
+        Start a multipart upload.
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type key: str
+        :param key: object key
+        :type headers: dict
+        :param headers: additional CreateMultipartUpload parameters (see
+            `put_object`)
+
+        :rtype: str
+        :return: ID of the multipart upload
+        """
+        response = self.client.create_multipart_upload(
+            Bucket=bucket, Key=key, **(headers or {})
+        )
+        return response['UploadId']
+
+    def upload_part(
+        self, bucket: str, key: str, upload_id: str, number: int, body
+    ) -> str:
+        """
+        Upload a part of a multipart upload.
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type key: str
+        :param key: object key
+        :type upload_id: str
+        :param upload_id: ID of the multipart upload
+        :type number: int
+        :param number: part number, from 1 to 10000
+        :type body: bytes or file
+        :param body: part data
+
+        :rtype: str
+        :return: ETag of the part
+        """
+        try:
+            response = self.client.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=number,
+                Body=body
+            )
+        except exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchUpload':
+                raise UploadNotFound(key=key) from e
+            raise
+        return response['ETag'].strip('"')
+
+    def complete_multipart_upload(
+        self, bucket: str, key: str, upload_id: str, parts: dict
+    ) -> str:
+        """
+        Assemble the parts of a multipart upload into an object.
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type key: str
+        :param key: object key
+        :type upload_id: str
+        :param upload_id: ID of the multipart upload
+        :type parts: dict
+        :param parts: ETag of each part, keyed on part number
+
+        :rtype: str
+        :return: ETag of the object
+        """
+        try:
+            response = self.client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    'Parts': [{
+                        'PartNumber': number,
+                        'ETag': f'"{etag}"'
+                    } for number, etag in sorted(parts.items())]
+                }
+            )
+        except exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchUpload':
+                raise UploadNotFound(key=key) from e
+            raise
+        return response['ETag'].strip('"')
+
+    def abort_multipart_upload(
+        self, bucket: str, key: str, upload_id: str
+    ) -> None:
+        """
+        Abandon a multipart upload and free the storage used by its parts.
+
+        Nothing is done if the upload does not exist (e.g. it was completed,
+        aborted, or expired by a lifecycle rule).
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type key: str
+        :param key: object key
+        :type upload_id: str
+        :param upload_id: ID of the multipart upload
+
+        :rtype: None
+        :return: None
+        """
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=upload_id
+            )
+        except exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchUpload':
+                raise
+
+    def object_exists(self, bucket: str, key: str) -> bool:
+        """
+        Determine if an object exists.
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type key: str
+        :param key: object key
+
+        :rtype: bool
+        :return: whether the object exists
+        """
+        try:
+            self.client.head_object(Bucket=bucket, Key=key)
+        except exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def object_url(self, bucket: str, key: str) -> str:
+        """
+        Return the virtual-hosted-style URL of an object.
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type key: str
+        :param key: object key
+
+        :rtype: str
+        :return: URL of the object
+        """
+        return f'https://{bucket}.s3.{self.region}.amazonaws.com/{key}'
+
+    def list_objects(self, bucket: str, prefix: str = '') -> Iterator[dict]:
+        """
+        List all objects in a bucket.
+
+        This is a high-level function that pages through the ListObjectsV2 API
+        endpoint, yielding objects as each page arrives.
+
+        Yields:
+
+        {
+          'Key': 'string',
+          'LastModified': datetime(2015, 1, 1),
+          'ETag': 'string',
+          'Size': 123,
+          'StorageClass': 'STANDARD'
+        }
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type prefix: str
+        :param prefix: limit the response to keys that begin with `prefix`
+
+        :rtype: Iterator[dict]
+        :return: an iterator of objects
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            yield from page.get('Contents', [])
+
+    def delete_objects(self, bucket: str, keys: list) -> None:
+        """
+        Delete objects from a bucket.
+
+        Keys are deleted in batches of 1000, the maximum allowed by the
+        DeleteObjects API endpoint.
+
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type keys: list
+        :param keys: object keys
+
+        :rtype: None
+        :return: None
+        """
+        for i in range(0, len(keys), self.MAX_DELETE_KEYS):
+            objects = [{'Key': k} for k in keys[i:i + self.MAX_DELETE_KEYS]]
+            self.client.delete_objects(
+                Bucket=bucket, Delete={
+                    'Objects': objects,
+                    'Quiet': True
+                }
+            )
+
+
+class CloudFront(AWS):
+    """
+    Wrapper for a low-level client representing Amazon CloudFront.
+    """
+    SERVICE_NAME = 'cloudfront'
+
+    def create_invalidation(self, distribution_id: str, paths: list) -> str:
+        """
+        Invalidate paths in the edge caches of a distribution.
+
+        :type distribution_id: str
+        :param distribution_id: ID of the distribution
+        :type paths: list
+        :param paths: paths to invalidate
+
+        :rtype: str
+        :return: ID of the invalidation
+        """
+        response = self.client.create_invalidation(
+            DistributionId=distribution_id,
+            InvalidationBatch={
+                'Paths': {
+                    'Quantity': len(paths),
+                    'Items': paths
+                },
+                'CallerReference': f'statikos-{uuid.uuid4().hex}'
+            }
+        )
+        return response['Invalidation']['Id']
+
+    def wait_for_invalidation(
+        self, distribution_id: str, invalidation_id: str
+    ) -> None:
+        """
+        Wait for an invalidation to complete.
+
+        :type distribution_id: str
+        :param distribution_id: ID of the distribution
+        :type invalidation_id: str
+        :param invalidation_id: ID of the invalidation
+
+        :rtype: None
+        :return: None
+        """
+        waiter = self.client.get_waiter('invalidation_completed')
+        waiter.wait(DistributionId=distribution_id, Id=invalidation_id)
@@ -1,9 +1,72 @@
 # -*- coding: utf-8 -*-
-"""CLI module."""
+"""
+CLI module.
+
+Commands import `Statikos` (and, transitively, boto3, troposphere, and awacs)
+on demand, so that `statikos --help` and offline commands do not pay for
+modules they never use.
+"""
+
+import contextlib
+from typing import Callable, Iterator
 
 import click
 
-from .statikos import Statikos
+
+def trace_options(command: Callable) -> Callable:
+    """
+    Add the `--trace` and `--stats` options to a command.
+
+    :type command: Callable
+    :param command: command function
+
+    :rtype: Callable
+    :return: command function
+    """
+    command = click.option(
+        '--stats',
+        is_flag=True,
+        help='Print the time taken by each phase and AWS API call.'
+    )(command)
+    command = click.option(
+        '--trace',
+        'trace_file',
+        metavar='FILE',
+        type=click.Path(dir_okay=False, writable=True),
+        help='Write a Chrome trace of each phase and AWS API call to FILE.'
+    )(command)
+    return command
+
+
+@contextlib.contextmanager
+def tracing(trace_file: str, stats: bool) -> Iterator:
+    """
+    Create a tracer if one was asked for, and report on it afterwards.
+
+    The report is written even if the command fails, since a failed deploy is
+    as worth looking into as a slow one.
+
+    :type trace_file: str
+    :param trace_file: file to write a Chrome trace to
+    :type stats: bool
+    :param stats: whether to print a summary
+
+    :rtype: Iterator[statikos.trace.Tracer]
+    :return: a context manager that yields a tracer, or None
+    """
+    if not trace_file and not stats:
+        yield None
+        return
+    from .trace import Tracer
+    tracer = Tracer()
+    try:
+        yield tracer
+    finally:
+        if stats:
+            click.echo(tracer.stats())
+        if trace_file:
+            tracer.save(trace_file)
+            click.echo(f'Trace written to {trace_file}.')
 
 
 @click.group(invoke_without_command=True)
@@ -27,43 +90,324 @@ def cli(ctx: click.core.Context) -> None:
 
 
 @cli.command()
-def create():
+@trace_options
+def create(trace_file: str, stats: bool) -> None:
     """
     Create a Statikos service.
 
     \f
 
+    :type trace_file: str
+    :param trace_file: file to write a Chrome trace to
+    :type stats: bool
+    :param stats: whether to print a summary of the trace
+
     :rtype: None
     :return: None
     """
-    s = Statikos()
-    s.create()
+    from .statikos import Statikos
+    with tracing(trace_file, stats) as tracer:
+        s = Statikos(tracer=tracer)
+        s.create()
 
 
 @cli.command()
-def deploy():
+@click.option(
+    '--force', is_flag=True, help='Deploy the stack even if it is unchanged.'
+)
+@click.option(
+    '--wait/--no-wait',
+    default=None,
+    help='Wait for the CloudFront invalidation to complete.'
+)
+@click.option(
+    '--validate',
+    is_flag=True,
+    help='Also validate the template with the CloudFormation API.'
+)
+@trace_options
+def deploy(
+    force: bool, wait: bool, validate: bool, trace_file: str, stats: bool
+) -> None:
     """
     Deploy a Statikos service.
 
     \f
 
+    :type force: bool
+    :param force: whether to deploy the stack even if it is unchanged
+    :type wait: bool
+    :param wait: whether to wait for the CloudFront invalidation
+    :type validate: bool
+    :param validate: whether to validate the template with the
+        ValidateTemplate API endpoint
+    :type trace_file: str
+    :param trace_file: file to write a Chrome trace to
+    :type stats: bool
+    :param stats: whether to print a summary of the trace
+
     :rtype: None
     :return: None
     """
-    s = Statikos()
-    s.deploy()
+    from .statikos import Statikos
+    with tracing(trace_file, stats) as tracer:
+        s = Statikos(echo=click.echo, tracer=tracer)
+        s.deploy(force=force, wait=wait, validate=validate)
 
 
 @cli.command()
-def remove():
+@click.option('--source', help='Directory of generated static content.')
+@click.option(
+    '--offline',
+    is_flag=True,
+    help='Compare with the template kept by the last deploy.'
+)
+@trace_options
+def plan(source: str, offline: bool, trace_file: str, stats: bool) -> None:
+    """
+    Show what a deploy would change.
+
+    \f
+
+    :type source: str
+    :param source: directory of generated static content
+    :type offline: bool
+    :param offline: whether to compare with the template kept by the last
+        deploy, instead of the deployed template
+    :type trace_file: str
+    :param trace_file: file to write a Chrome trace to
+    :type stats: bool
+    :param stats: whether to print a summary of the trace
+
+    :rtype: None
+    :return: None
+    """
+    from .statikos import Statikos
+    with tracing(trace_file, stats) as tracer:
+        s = Statikos(echo=click.echo, tracer=tracer)
+        s.plan(source=source, offline=offline)
+
+
+@cli.command()
+@click.option('--source', help='Directory of generated static content.')
+@click.option('--workers', type=int, help='Number of concurrent uploads.')
+@click.option(
+    '--refresh', is_flag=True, help='Rebuild the manifest from the bucket.'
+)
+@click.option(
+    '--wait/--no-wait',
+    default=None,
+    help='Wait for the CloudFront invalidation to complete.'
+)
+@trace_options
+def sync(
+    source: str, workers: int, refresh: bool, wait: bool, trace_file: str,
+    stats: bool
+) -> None:
+    """
+    Upload static content to a Statikos service.
+
+    \f
+
+    :type source: str
+    :param source: directory of generated static content
+    :type workers: int
+    :param workers: number of concurrent uploads
+    :type refresh: bool
+    :param refresh: whether to rebuild the manifest from the bucket
+    :type wait: bool
+    :param wait: whether to wait for the CloudFront invalidation
+    :type trace_file: str
+    :param trace_file: file to write a Chrome trace to
+    :type stats: bool
+    :param stats: whether to print a summary of the trace
+
+    :rtype: None
+    :return: None
+    """
+    from .statikos import Statikos
+    with tracing(trace_file, stats) as tracer:
+        s = Statikos(echo=click.echo, tracer=tracer)
+        click.echo(
+            s.sync(
+                source=source, workers=workers, refresh=refresh, wait=wait
+            )
+        )
+
+
+@cli.command()
+@trace_options
+def remove(trace_file: str, stats: bool) -> None:
     """
     Remove a Statikos service.
 
+    \f
+
+    :type trace_file: str
+    :param trace_file: file to write a Chrome trace to
+    :type stats: bool
+    :param stats: whether to print a summary of the trace
+
+    :rtype: None
+    :return: None
+    """
+    from .statikos import Statikos
+    with tracing(trace_file, stats) as tracer:
+        s = Statikos(echo=click.echo, tracer=tracer)
+        s.remove()
+
+
+@cli.command()
+@click.option(
+    '--refresh',
+    is_flag=True,
+    help='Look up the stack even if the cached state is fresh.'
+)
+@trace_options
+def state(refresh: bool, trace_file: str, stats: bool) -> None:
+    """
+    Show the cached state of a Statikos service.
+
+    \f
+
+    :type refresh: bool
+    :param refresh: whether to refresh the cached stack state
+    :type trace_file: str
+    :param trace_file: file to write a Chrome trace to
+    :type stats: bool
+    :param stats: whether to print a summary of the trace
+
     :rtype: None
     :return: None
     """
-    s = Statikos()
-    s.remove()
+    import json
+
+    from .statikos import Statikos
+    with tracing(trace_file, stats) as tracer:
+        s = Statikos(echo=click.echo, tracer=tracer)
+        click.echo(json.dumps(s.state(refresh=refresh), indent=2))
+
+
+@cli.command()
+@click.option('--source', help='Directory of generated static content.')
+@click.option('--host', help='Address to listen on (default: 127.0.0.1).')
+@click.option('--port', type=int, help='Port to listen on (default: 8000).')
+def serve(source: str, host: str, port: int) -> None:
+    """
+    Preview static content locally, as the deployed stack would serve it.
+
+    \f
+
+    :type source: str
+    :param source: directory of generated static content
+    :type host: str
+    :param host: address to listen on
+    :type port: int
+    :param port: port to listen on
+
+    :rtype: None
+    :return: None
+    """
+    from .statikos import Statikos
+    s = Statikos(echo=click.echo)
+    try:
+        s.serve(source=source, host=host, port=port)
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.option('--source', help='Directory of generated static content.')
+@click.option('--workers', type=int, help='Number of concurrent uploads.')
+def watch(source: str, workers: int) -> None:
+    """
+    Upload static content to a Statikos service as it changes.
+
+    \f
+
+    :type source: str
+    :param source: directory of generated static content
+    :type workers: int
+    :param workers: number of concurrent uploads
+
+    :rtype: None
+    :return: None
+    """
+    from .statikos import Statikos
+    s = Statikos(echo=click.echo)
+    try:
+        s.watch(source=source, workers=workers)
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.group()
+def fleet():
+    """
+    Manage many Statikos services at once.
+
+    \f
+
+    :rtype: None
+    :return: None
+    """
+
+
+@fleet.command(name='deploy')
+@click.argument(
+    'directory', type=click.Path(exists=True, file_okay=False), default='.'
+)
+@click.option(
+    '--concurrency', type=int, help='Number of services to deploy at once.'
+)
+@click.option(
+    '--cloudformation-rate',
+    type=float,
+    help='Maximum CloudFormation requests per second.'
+)
+@click.option('--s3-rate', type=float, help='Maximum S3 requests per second.')
+@click.option(
+    '--force', is_flag=True, help='Deploy stacks even if they are unchanged.'
+)
+@click.pass_context
+def fleet_deploy(
+    ctx: click.core.Context, directory: str, concurrency: int,
+    cloudformation_rate: float, s3_rate: float, force: bool
+) -> None:
+    """
+    Deploy every Statikos service in a directory.
+
+    \f
+
+    :type ctx: click.core.Context
+    :param ctx: Click context object
+    :type directory: str
+    :param directory: directory to search for `statikos.yml` files
+    :type concurrency: int
+    :param concurrency: number of services to deploy at once
+    :type cloudformation_rate: float
+    :param cloudformation_rate: maximum CloudFormation requests per second
+    :type s3_rate: float
+    :param s3_rate: maximum S3 requests per second
+    :type force: bool
+    :param force: whether to deploy stacks even if they are unchanged
+
+    :rtype: None
+    :return: None
+    """
+    from .fleet import Fleet
+    rates = {}
+    if cloudformation_rate:
+        rates['cloudformation'] = cloudformation_rate
+    if s3_rate:
+        rates['s3'] = s3_rate
+    f = Fleet(
+        directory, concurrency=concurrency, rates=rates, echo=click.echo
+    )
+    result = f.deploy(force=force)
+    click.echo(result)
+    if result.failed:
+        ctx.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Compression module."""
+
+import gzip
+import os
+import shutil
+from typing import List, Tuple
+
+from .exceptions import InvalidConfig, MissingDependency
+from .hashing import DEFAULT_PART_SIZE, hash_file
+from .stage import CachedStage
+from .sync import LocalFile, content_type
+
+# Extensions of files that are worth compressing.
+COMPRESSIBLE = [
+    '.html', '.htm', '.css', '.js', '.mjs', '.svg', '.json', '.xml', '.txt'
+]
+
+# Encodings, their file extensions, and their maximum levels.
+ENCODINGS = {
+    'gzip': ('.gz', 9),
+    'br': ('.br', 11),
+}
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def compress_file(src: str, dst: str, encoding: str, level: int) -> None:
+    """
+    Compress a file.
+
+    The file is streamed through the compressor, so memory use does not depend
+    on its size. gzip output does not embed a timestamp, so compressing the
+    same content twice gives identical bytes (and an identical ETag).
+
+    :type src: str
+    :param src: path to the file to compress
+    :type dst: str
+    :param dst: path to write the compressed file to
+    :type encoding: str
+    :param encoding: `gzip` or `br`
+    :type level: int
+    :param level: compression level (quality, for brotli)
+
+    :rtype: None
+    :return: None
+    """
+    tmp = f'{dst}.tmp'
+    with open(src, 'rb') as i, open(tmp, 'wb') as o:
+        if encoding == 'gzip':
+            with gzip.GzipFile(
+                filename='', mode='wb', fileobj=o, compresslevel=level, mtime=0
+            ) as z:
+                shutil.copyfileobj(i, z, CHUNK_SIZE)
+        else:
+            import brotli
+            compressor = brotli.Compressor(quality=level)
+            for chunk in iter(lambda: i.read(CHUNK_SIZE), b''):
+                o.write(compressor.process(chunk))
+            o.write(compressor.finish())
+    os.replace(tmp, dst)
+
+
+def _compress_file(args: Tuple[str, str, str, int, int]) -> list:
+    """
+    Compress a file in a worker process and return the digest of the output.
+
+    :type args: Tuple[str, str, str, int, int]
+    :param args: source, destination, encoding, level, and part size
+
+    :rtype: list
+    :return: size, MD5 hex digest, and ETag of the compressed file
+    """
+    src, dst, encoding, level, part_size = args
+    compress_file(src, dst, encoding, level)
+    digest = hash_file(dst, part_size)
+    return [os.path.getsize(dst), digest.md5, digest.etag]
+
+
+class Compress(CachedStage):
+    """
+    Sync stage that replaces compressible files with pre-compressed variants.
+
+    Each compressible file is compressed at the maximum level with gzip, and
+    uploaded in place of the original file with a matching
+    `Content-Encoding`. gzip is the only encoding uploaded in place, since S3
+    and CloudFront serve an object with the same encoding to every client,
+    and every client accepts gzip.
+
+    Further encodings (e.g. `br`) are only produced with `siblings`, under
+    the key of the file with the encoding's extension appended (e.g.
+    `index.html.br`). Neither S3 nor CloudFront negotiate such siblings from
+    `Accept-Encoding`, so they are only used by `statikos serve`, and never
+    uploaded.
+
+    Compressed files are cached by the content hash of the original file in
+    `cache_dir`, so unchanged files are never compressed twice. A file is left
+    alone if it is smaller than `min_size` or if compressing it does not save
+    at least `1 - max_ratio` of its size.
+    """
+    DEFAULT_ENCODINGS = ['gzip']
+    MIN_SIZE = 256
+    MAX_RATIO = 0.95
+
+    def __init__(
+        self,
+        cache_dir: str,
+        encodings: List[str] = None,
+        extensions: List[str] = None,
+        min_size: int = None,
+        max_ratio: float = None,
+        processes: int = None,
+        part_size: int = DEFAULT_PART_SIZE,
+        siblings: bool = False
+    ) -> None:
+        """
+        Create a new `Compress` object.
+
+        :type cache_dir: str
+        :param cache_dir: path to the directory of compressed files
+        :type encodings: List[str]
+        :param encodings: encodings to compress with, starting with `gzip`
+            (`gzip`, `br`)
+        :type extensions: List[str]
+        :param extensions: extensions of files to compress
+        :type min_size: int
+        :param min_size: minimum size of a file to compress
+        :type max_ratio: float
+        :param max_ratio: maximum ratio of compressed to original size
+        :type processes: int
+        :param processes: number of processes to compress files with
+        :type part_size: int
+        :param part_size: size of each part of a multipart upload
+        :type siblings: bool
+        :param siblings: whether to output the encodings after the first as
+            siblings of each file, for `statikos serve`
+
+        :rtype: None
+        :return: None
+        """
+        self.cache_dir = cache_dir
+        self.encodings = encodings or self.DEFAULT_ENCODINGS
+        self.extensions = extensions or COMPRESSIBLE
+        self.min_size = self.MIN_SIZE if min_size is None else min_size
+        self.max_ratio = max_ratio or self.MAX_RATIO
+        self.processes = processes
+        self.part_size = part_size
+        self.siblings = siblings
+        self.saved = 0
+        for encoding in self.encodings:
+            if encoding not in ENCODINGS:
+                raise InvalidConfig(
+                    reason=f'Unknown compression encoding `{encoding}`.'
+                )
+        if self.encodings[0] != 'gzip':
+            raise InvalidConfig(
+                reason='The first compression encoding must be `gzip`, the '
+                'only encoding that can be uploaded in place.'
+            )
+        if 'br' in self.encodings:
+            try:
+                import brotli  # noqa: F401
+            except ImportError:
+                raise MissingDependency(package='brotli', extra='brotli')
+
+    @property
+    def output_encodings(self) -> List[str]:
+        """
+        Return the encodings that compressed files are output with.
+
+        :rtype: List[str]
+        :return: encodings, the in-place encoding first
+        """
+        return self.encodings if self.siblings else self.encodings[:1]
+
+    def _path(self, digest: str, encoding: str) -> str:
+        """
+        Return the path to a compressed file in the cache.
+
+        :type digest: str
+        :param digest: MD5 hex digest of the original file
+        :type encoding: str
+        :param encoding: encoding
+
+        :rtype: str
+        :return: path to the compressed file
+        """
+        extension, level = ENCODINGS[encoding]
+        return os.path.join(self.cache_dir, f'{digest}-{level}{extension}')
+
+    def compressible(self, f: LocalFile) -> bool:
+        """
+        Determine if a file should be compressed.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+
+        :rtype: bool
+        :return: whether the file should be compressed
+        """
+        if f.size < self.min_size or (f.headers or {}).get('ContentEncoding'):
+            return False
+        return os.path.splitext(f.key)[1].lower() in self.extensions
+
+    def __call__(self, files: List[LocalFile]) -> List[LocalFile]:
+        """
+        Replace compressible files with their compressed variants.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+
+        :rtype: List[statikos.sync.LocalFile]
+        :return: local files, with compressed variants
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index = self._load_index()
+        used = {}
+        jobs = []
+        for f in filter(self.compressible, files):
+            for encoding in self.output_encodings:
+                path = self._path(f.hash, encoding)
+                name = os.path.basename(path)
+                if name in used:
+                    continue
+                if name in index and os.path.exists(path):
+                    used[name] = index[name]
+                else:
+                    used[name] = None
+                    jobs.append((f.path, path, encoding,
+                                 ENCODINGS[encoding][1], self.part_size))
+        for job, result in zip(jobs, self._map(_compress_file, jobs)):
+            used[os.path.basename(job[1])] = result
+        self._save_index(used)
+        self._prune(used)
+        return self._variants(files, used)
+
+    def _variants(self, files: List[LocalFile],
+                  index: dict) -> List[LocalFile]:
+        """
+        Substitute compressed variants for files where they pay off.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+        :type index: dict
+        :param index: a dict of cache keys to [size, MD5, ETag]
+
+        :rtype: List[statikos.sync.LocalFile]
+        :return: local files, with compressed variants
+        """
+        self.saved = 0
+        output = []
+        for f in files:
+            if not self.compressible(f):
+                output.append(f)
+                continue
+            for i, encoding in enumerate(self.output_encodings):
+                path = self._path(f.hash, encoding)
+                size, md5, etag = index[os.path.basename(path)]
+                worth = size <= f.size * self.max_ratio
+                if i == 0 and not worth:
+                    output.append(f)
+                    break
+                if not worth:
+                    continue
+                headers = dict(f.headers or {})
+                headers.setdefault('ContentType', content_type(f.key))
+                headers['ContentEncoding'] = encoding
+                key = f.key if i == 0 else f.key + ENCODINGS[encoding][0]
+                output.append(
+                    f._replace(
+                        key=key,
+                        path=path,
+                        size=size,
+                        hash=md5,
+                        etag=etag,
+                        headers=headers
+                    )
+                )
+                if i == 0:
+                    self.saved += f.size - size
+        return output
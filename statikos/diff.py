@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Template diff module."""
+
+from collections import namedtuple
+from typing import List
+
+ResourceChange = namedtuple(
+    'ResourceChange', ['action', 'logical_id', 'resource_type', 'paths']
+)
+
+
+def changed_paths(old: object, new: object, path: str = '') -> List[str]:
+    """
+    Find the paths at which two template values differ.
+
+    Objects are compared key by key, and lists item by item, so a change deep
+    in a property is reported at the property that changed (e.g.
+    `Properties/DistributionConfig/Origins/0/DomainName`) rather than at the
+    resource.
+
+    :type old: object
+    :param old: template value
+    :type new: object
+    :param new: template value
+    :type path: str
+    :param path: path of the values in the template
+
+    :rtype: List[str]
+    :return: paths of the values that differ, in order
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        paths = []
+        for key in sorted(set(old) | set(new)):
+            child = f'{path}/{key}' if path else key
+            if key not in old or key not in new:
+                paths.append(child)
+            else:
+                paths.extend(changed_paths(old[key], new[key], child))
+        return paths
+    if isinstance(old, list) and isinstance(new, list):
+        if len(old) != len(new):
+            return [path]
+        paths = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            paths.extend(
+                changed_paths(a, b, f'{path}/{i}' if path else str(i))
+            )
+        return paths
+    return [] if old == new else [path]
+
+
+def diff_templates(old: dict, new: dict) -> List[ResourceChange]:
+    """
+    Compare the resources of two CloudFormation templates.
+
+    Resources are added, removed, or modified. A modified resource lists the
+    paths of its attributes that changed (see `changed_paths`).
+
+    Example:
+
+    [
+      ResourceChange(
+        action='Modify',
+        logical_id='CloudFrontDistribution',
+        resource_type='AWS::CloudFront::Distribution',
+        paths=['Properties/DistributionConfig/PriceClass']
+      )
+    ]
+
+    :type old: dict
+    :param old: deployed CloudFormation template
+    :type new: dict
+    :param new: generated CloudFormation template
+
+    :rtype: List[ResourceChange]
+    :return: changes, ordered by logical ID
+    """
+    old = (old or {}).get('Resources') or {}
+    new = (new or {}).get('Resources') or {}
+    changes = []
+    for logical_id in sorted(set(old) | set(new)):
+        if logical_id not in old:
+            resource = new[logical_id]
+            changes.append(ResourceChange(
+                'Add', logical_id, resource.get('Type'), []
+            ))
+        elif logical_id not in new:
+            resource = old[logical_id]
+            changes.append(ResourceChange(
+                'Remove', logical_id, resource.get('Type'), []
+            ))
+        else:
+            paths = changed_paths(old[logical_id], new[logical_id])
+            if paths:
+                changes.append(ResourceChange(
+                    'Modify', logical_id, new[logical_id].get('Type'), paths
+                ))
+    return changes
@@ -27,8 +27,81 @@ class ConfigNotFound(StatikosException):
     msg = 'The `statikos.yml` file could not be found.'
 
 
+class InvalidConfig(StatikosException):
+    """
+    Raised when the `statikos.yml` file is invalid.
+    """
+    msg = 'The `statikos.yml` file is invalid: {reason}'
+
+
 class InvalidTemplate(StatikosException):
     """
     Raised when the CloudFormation template is invalid.
     """
     msg = 'The CloudFormation template is invalid.'
+
+
+class TemplateValidationError(InvalidTemplate):
+    """
+    Raised when the CloudFormation template does not pass offline validation.
+    """
+    msg = 'The CloudFormation template is invalid:\n{errors}'
+
+
+class ChangeSetFailed(StatikosException):
+    """
+    Raised when a CloudFormation change set could not be created.
+    """
+    msg = 'The change set could not be created: {reason}'
+
+
+class StackFailed(StatikosException):
+    """
+    Raised when a CloudFormation stack operation failed.
+    """
+    msg = (
+        'Stack `{stack_name}` failed with status {status}. '
+        '{resource}: {reason}'
+    )
+
+
+class SourceNotFound(StatikosException):
+    """
+    Raised when the directory of generated static content could not be found.
+    """
+    msg = 'The source directory `{source}` could not be found.'
+
+
+class SyncFailed(StatikosException):
+    """
+    Raised when one or more files could not be uploaded.
+    """
+    msg = 'Failed to upload {count} file(s) to `{bucket}`.'
+
+
+class MissingDependency(StatikosException):
+    """
+    Raised when an optional dependency is not installed.
+    """
+    msg = (
+        'The `{package}` package is required. '
+        'Install it with `pip install statikos[{extra}]`.'
+    )
+
+
+class UploadNotFound(StatikosException):
+    """
+    Raised when a multipart upload no longer exists.
+    """
+    msg = 'The multipart upload of `{key}` no longer exists.'
+
+
+class TemplateTooLarge(StatikosException):
+    """
+    Raised when the CloudFormation template is too large to deploy directly.
+    """
+    msg = (
+        'The CloudFormation template is {size} bytes, more than the {limit} '
+        'bytes that can be passed directly. Set `staging.bucket` in '
+        '`statikos.yml` to upload it to S3 instead.'
+    )
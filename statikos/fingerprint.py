@@ -0,0 +1,577 @@
+# -*- coding: utf-8 -*-
+"""Fingerprinting module."""
+
+import fnmatch
+import hashlib
+import json
+import os
+import posixpath
+import re
+from typing import Callable, Dict, List, Pattern, Set, Tuple
+from urllib.parse import unquote
+
+from .hashing import DEFAULT_PART_SIZE, hash_file
+from .stage import CachedStage
+from .sync import LocalFile
+
+# Extensions of files that are renamed to content-hashed names.
+FINGERPRINTABLE = [
+    '.css', '.js', '.mjs', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp',
+    '.avif', '.woff', '.woff2', '.ttf', '.otf', '.eot', '.mp4', '.webm'
+]
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+CHUNK_SIZE = 1024 * 1024
+
+# Quoted strings, which may be cut off at the end of a chunk. Strings in
+# scripts do not span lines.
+QUOTED = r'(?:"[^"]*(?:"|\Z)|\'[^\']*(?:\'|\Z))'
+QUOTED_LINE = r'(?:"[^"\n]*(?:"|\Z)|\'[^\'\n]*(?:\'|\Z))'
+
+# Contexts that references to other files appear in: attribute values (e.g.
+# `href="css/site.css"` or `srcset="a.png 1x, b.png 2x"`), `url()`, imports
+# (`@import "a.css"`, `import "./a.js"`, `export * from "./a.js"`,
+# `import("./a.js")`), and `new URL("./worker.js", import.meta.url)`.
+ATTRIBUTE = rf'=\s*(?:{QUOTED}|[^\s"\'=<>`]+)'
+URL = rf'\burl\(\s*(?:{QUOTED}|[^"\')]*(?:\)|\Z))'
+IMPORT = rf'(?:@import|\bimport|\bfrom)\s*\(?\s*{QUOTED_LINE}'
+NEW_URL = rf'\bnew\s+URL\(\s*{QUOTED_LINE}'
+
+# Contexts to look for references in, by extension of the file. Files with
+# other extensions are not rewritten.
+CONTEXTS = {
+    '.html': re.compile('|'.join([ATTRIBUTE, URL, IMPORT, NEW_URL])),
+    '.htm': re.compile('|'.join([ATTRIBUTE, URL, IMPORT, NEW_URL])),
+    '.css': re.compile('|'.join([URL, IMPORT])),
+    '.js': re.compile('|'.join([IMPORT, NEW_URL])),
+    '.mjs': re.compile('|'.join([IMPORT, NEW_URL])),
+}
+
+# Extensions of files whose references to other files are rewritten.
+REWRITABLE = list(CONTEXTS)
+
+# Within a context, a reference is any run of URL characters that follows a
+# delimiter.
+REFERENCE = re.compile(r'(?<=[\s"\'(=,])[^\s"\'()<>,=]+')
+
+# Number of characters held back at the end of a chunk, in case they are the
+# start of a context (e.g. `new URL(`) that continues in the next chunk.
+HOLD = 64
+
+# Maximum size of a context (e.g. an attribute value with no closing quote)
+# carried over to the next chunk before it is processed as it is.
+MAX_CARRY = 64 * 1024
+
+# Digests of fingerprinted files, by key, shared with worker processes.
+_digests = {}
+
+
+def fingerprinted(key: str, digest: str) -> str:
+    """
+    Insert a digest into a file name, before its extension.
+
+    Example:
+
+    css/site.css, 3f2a1b9c0d4e  -> css/site.3f2a1b9c0d4e.css
+
+    :type key: str
+    :param key: object key (or URL path)
+    :type digest: str
+    :param digest: content digest
+
+    :rtype: str
+    :return: fingerprinted key
+    """
+    root, ext = posixpath.splitext(key)
+    return f'{root}.{digest}{ext}'
+
+
+def resolve(url: str, key: str) -> str:
+    """
+    Resolve a reference in a file to the key of the object it refers to.
+
+    :type url: str
+    :param url: reference, without a query string or fragment
+    :type key: str
+    :param key: object key of the file the reference is in
+
+    :rtype: str
+    :return: object key, or None if the reference is not to a local file
+    """
+    if not url or url.startswith('//') or ':' in url:
+        return None
+    url = unquote(url)
+    if url.startswith('/'):
+        return posixpath.normpath(url[1:])
+    return posixpath.normpath(posixpath.join(posixpath.dirname(key), url))
+
+
+def _split(token: str) -> Tuple[str, str]:
+    """
+    Split a reference into its path and its query string and fragment.
+
+    :type token: str
+    :param token: reference
+
+    :rtype: Tuple[str, str]
+    :return: path, and query string and fragment
+    """
+    match = re.search(r'[?#]', token)
+    i = match.start() if match else len(token)
+    return token[:i], token[i:]
+
+
+def _substitute(
+    pattern: Pattern,
+    text: str,
+    replace: Callable[[str], str],
+    final: bool
+) -> Tuple[str, str]:
+    """
+    Apply a function to every reference in the contexts of a chunk of text.
+
+    Unless `final` is set, a context that may continue past the end of the
+    text is left unprocessed, along with the last `HOLD` characters.
+
+    :type pattern: Pattern
+    :param pattern: pattern of the contexts references appear in
+    :type text: str
+    :param text: text
+    :type replace: Callable[[str], str]
+    :param replace: called with every reference; returns its replacement
+    :type final: bool
+    :param final: whether the text is the end of the file
+
+    :rtype: Tuple[str, str]
+    :return: processed text, and text to carry over to the next chunk
+    """
+    output = []
+    position = 0
+    cut = len(text) if final else None
+    for match in pattern.finditer(text):
+        if not final and match.end() == len(text) and \
+                len(text) - match.start() <= MAX_CARRY:
+            cut = match.start()
+            break
+        output.append(text[position:match.start()])
+        output.append(
+            REFERENCE.sub(lambda m: replace(m.group()), match.group())
+        )
+        position = match.end()
+    if cut is None:
+        cut = max(position, len(text) - HOLD)
+    output.append(text[position:cut])
+    return ''.join(output), text[cut:]
+
+
+def _stream(src: str, dst: str, key: str, replace: Callable[[str], str]):
+    """
+    Stream a text file through a function applied to every reference.
+
+    Only references in the contexts for the type of file are seen (see
+    `CONTEXTS`), so a file name in the text of a page is left alone. The file
+    is read in chunks, and a context that may continue in the next chunk is
+    carried over to it, so a reference that spans two chunks is still seen
+    whole.
+
+    :type src: str
+    :param src: path to the file
+    :type dst: str
+    :param dst: path to write the output to, or None to discard it
+    :type key: str
+    :param key: object key of the file
+    :type replace: Callable[[str], str]
+    :param replace: called with every reference; returns its replacement
+
+    :rtype: None
+    :return: None
+    """
+    pattern = CONTEXTS[posixpath.splitext(key)[1].lower()]
+    options = {'encoding': 'utf-8', 'errors': 'surrogateescape', 'newline': ''}
+    tmp = f'{dst}.tmp' if dst else os.devnull
+    with open(src, 'r', **options) as i, open(tmp, 'w', **options) as o:
+        carry = ''
+        for chunk in iter(lambda: i.read(CHUNK_SIZE), ''):
+            text, carry = _substitute(pattern, carry + chunk, replace, False)
+            o.write(text)
+        o.write(_substitute(pattern, carry, replace, True)[0])
+    if dst:
+        os.replace(tmp, dst)
+
+
+def references(src: str, key: str) -> Set[str]:
+    """
+    Find the keys of the local files a file refers to.
+
+    :type src: str
+    :param src: path to the file
+    :type key: str
+    :param key: object key of the file
+
+    :rtype: Set[str]
+    :return: object keys
+    """
+    found = set()
+
+    def collect(token: str) -> str:
+        target = resolve(_split(token)[0], key)
+        if target:
+            found.add(target)
+        return token
+
+    _stream(src, None, key, collect)
+    return found
+
+
+def rewrite_file(
+    src: str, dst: str, key: str, digests: Dict[str, str]
+) -> None:
+    """
+    Rewrite references to fingerprinted files in a text file.
+
+    Only the file name is changed, so absolute and relative references stay
+    absolute and relative, and any query string or fragment is kept.
+
+    :type src: str
+    :param src: path to the file
+    :type dst: str
+    :param dst: path to write the rewritten file to
+    :type key: str
+    :param key: object key of the file
+    :type digests: Dict[str, str]
+    :param digests: digests of fingerprinted files, by key
+
+    :rtype: None
+    :return: None
+    """
+    def replace(token: str) -> str:
+        path, suffix = _split(token)
+        digest = digests.get(resolve(path, key))
+        if digest is None:
+            return token
+        return fingerprinted(path, digest) + suffix
+
+    _stream(src, dst, key, replace)
+
+
+def _references(args: Tuple[str, str]) -> List[str]:
+    """
+    Find the keys of the local files a file refers to in a worker process.
+
+    :type args: Tuple[str, str]
+    :param args: path and object key of the file
+
+    :rtype: List[str]
+    :return: object keys, sorted
+    """
+    return sorted(references(*args))
+
+
+def _init(digests: Dict[str, str]) -> None:
+    """
+    Set the digests of fingerprinted files in a worker process.
+
+    :type digests: Dict[str, str]
+    :param digests: digests of fingerprinted files, by key
+
+    :rtype: None
+    :return: None
+    """
+    global _digests
+    _digests = digests
+
+
+def _rewrite_file(args: Tuple[str, str, str, int]) -> list:
+    """
+    Rewrite a file in a worker process and return the digest of the output.
+
+    :type args: Tuple[str, str, str, int]
+    :param args: source, destination, object key, and part size
+
+    :rtype: list
+    :return: size, MD5 hex digest, and ETag of the rewritten file
+    """
+    src, dst, key, part_size = args
+    rewrite_file(src, dst, key, _digests)
+    digest = hash_file(dst, part_size)
+    return [os.path.getsize(dst), digest.md5, digest.etag]
+
+
+class Fingerprint(CachedStage):
+    """
+    Sync stage that renames static assets to content-hashed names.
+
+    Assets (stylesheets, scripts, images, fonts, ...) are uploaded as e.g.
+    `css/site.3f2a1b9c0d4e.css` with `Cache-Control: public,
+    max-age=31536000, immutable`, so browsers and CloudFront keep them for a
+    year and never revalidate them. A changed asset gets a new name instead.
+
+    References to assets in HTML, CSS and JavaScript files are rewritten to
+    match: attribute values, `url()`, `@import` and module imports (`import`,
+    `export ... from`, `import()` and `new URL()`), but not the text of a page.
+    HTML files are uploaded with a short `Cache-Control` so that new pages
+    (and through them, new assets) are picked up quickly. Stylesheets and
+    scripts are fingerprinted after the files they refer to, so that a changed
+    image or module also changes the name of the file that uses it; files
+    that refer to each other in a cycle keep their names.
+
+    Rewritten files are cached in `cache_dir` by the content hash of the
+    original file and of the names of the files it refers to, so a file is
+    only rewritten again when it or one of those names changed.
+    """
+    HASH_LENGTH = 12
+    HTML_CACHE_CONTROL = 'public, max-age=60'
+
+    def __init__(
+        self,
+        cache_dir: str,
+        extensions: List[str] = None,
+        exclude: List[str] = None,
+        html_cache_control: str = None,
+        processes: int = None,
+        part_size: int = DEFAULT_PART_SIZE
+    ) -> None:
+        """
+        Create a new `Fingerprint` object.
+
+        :type cache_dir: str
+        :param cache_dir: path to the directory of rewritten files
+        :type extensions: List[str]
+        :param extensions: extensions of files to fingerprint
+        :type exclude: List[str]
+        :param exclude: glob patterns of keys not to fingerprint (e.g. files
+            referred to from outside the site)
+        :type html_cache_control: str
+        :param html_cache_control: `Cache-Control` of HTML files
+        :type processes: int
+        :param processes: number of processes to rewrite files with
+        :type part_size: int
+        :param part_size: size of each part of a multipart upload
+
+        :rtype: None
+        :return: None
+        """
+        self.cache_dir = cache_dir
+        self.extensions = extensions or FINGERPRINTABLE
+        self.exclude = exclude or []
+        self.html_cache_control = \
+            html_cache_control or self.HTML_CACHE_CONTROL
+        self.processes = processes
+        self.part_size = part_size
+        self.renamed = 0
+
+    @property
+    def references_file(self) -> str:
+        """
+        Return the path to the index of references between files.
+
+        :rtype: str
+        :return: path to the index
+        """
+        return os.path.join(self.cache_dir, 'references.json')
+
+    def fingerprintable(self, f: LocalFile) -> bool:
+        """
+        Determine if a file should be renamed to a content-hashed name.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+
+        :rtype: bool
+        :return: whether the file should be fingerprinted
+        """
+        if os.path.splitext(f.key)[1].lower() not in self.extensions:
+            return False
+        return not any(fnmatch.fnmatch(f.key, p) for p in self.exclude)
+
+    @staticmethod
+    def rewritable(f: LocalFile) -> bool:
+        """
+        Determine if a file may refer to other files.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+
+        :rtype: bool
+        :return: whether references in the file should be rewritten
+        """
+        return os.path.splitext(f.key)[1].lower() in REWRITABLE
+
+    def __call__(self, files: List[LocalFile]) -> List[LocalFile]:
+        """
+        Fingerprint assets and rewrite references to them.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+
+        :rtype: List[statikos.sync.LocalFile]
+        :return: local files, renamed and rewritten
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index = self._load_index()
+        used = {}
+        digests = {}
+        rewritten = {}
+        refs = self._references([f for f in files if self.rewritable(f)])
+        # Assets that do not refer to other files are named by their content.
+        pending = {}
+        for f in files:
+            if self.fingerprintable(f) and self.rewritable(f):
+                pending[f.key] = f
+            elif self.fingerprintable(f):
+                digests[f.key] = f.hash[:self.HASH_LENGTH]
+        # Stylesheets and scripts are named by their rewritten content, so
+        # they must wait for every stylesheet or script they refer to.
+        waiting = {key: refs[key] & set(pending) - {key} for key in pending}
+        while True:
+            ready = [pending[k] for k, keys in waiting.items() if not keys]
+            if not ready:
+                break
+            rewritten.update(
+                self._rewrite(ready, digests, refs, index, used)
+            )
+            for f in ready:
+                digests[f.key] = rewritten[f.key][1][:self.HASH_LENGTH]
+                del waiting[f.key]
+            for keys in waiting.values():
+                keys.difference_update(f.key for f in ready)
+        # Everything else that may refer to assets is rewritten last.
+        rest = [
+            f for f in files if self.rewritable(f) and f.key not in rewritten
+        ]
+        rewritten.update(self._rewrite(rest, digests, refs, index, used))
+        self._save_index(used)
+        self._prune(used, keep=[self.references_file])
+        return self._output(files, digests, rewritten)
+
+    def _references(self, files: List[LocalFile]) -> Dict[str, Set[str]]:
+        """
+        Find the files that files refer to, reusing cached results.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files that may refer to other files
+
+        :rtype: Dict[str, Set[str]]
+        :return: a dict of keys to the keys of the files they refer to
+        """
+        index = self._load_index(self.references_file)
+        used = {}
+        jobs = []
+        for f in files:
+            name = f'{f.hash} {f.key}'
+            if name in index:
+                used[name] = index[name]
+            else:
+                jobs.append((name, f.path, f.key))
+        results = self._map(_references, [job[1:] for job in jobs])
+        for job, result in zip(jobs, results):
+            used[job[0]] = result
+        self._save_index(used, self.references_file)
+        return {f.key: set(used[f'{f.hash} {f.key}']) for f in files}
+
+    def _version(
+        self, f: LocalFile, digests: Dict[str, str], refs: Set[str]
+    ) -> str:
+        """
+        Return the version of the rewritten output of a file.
+
+        The version only depends on the names of the files that the file
+        refers to, so a changed asset only changes the files that use it.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+        :type digests: Dict[str, str]
+        :param digests: digests of fingerprinted files, by key
+        :type refs: Set[str]
+        :param refs: keys of the files the file refers to
+
+        :rtype: str
+        :return: version
+        """
+        names = [[key, digests[key]] for key in sorted(refs) if key in digests]
+        data = json.dumps([f.key, names]).encode()
+        return hashlib.sha256(data).hexdigest()[:16]
+
+    def _rewrite(
+        self,
+        files: List[LocalFile],
+        digests: Dict[str, str],
+        refs: Dict[str, Set[str]],
+        index: dict,
+        used: dict
+    ) -> dict:
+        """
+        Rewrite files, reusing cached output.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+        :type digests: Dict[str, str]
+        :param digests: digests of fingerprinted files, by key
+        :type refs: Dict[str, Set[str]]
+        :param refs: keys of the files each file refers to, by key
+        :type index: dict
+        :param index: cached output, by cache key
+        :type used: dict
+        :param used: cached output used by this run, by cache key
+
+        :rtype: dict
+        :return: a dict of keys to [size, MD5, ETag, path] of the output
+        """
+        jobs = []
+        paths = {}
+        for f in files:
+            ext = os.path.splitext(f.key)[1].lower()
+            version = self._version(f, digests, refs[f.key])
+            name = f'{f.hash}-{version}{ext}'
+            path = os.path.join(self.cache_dir, name)
+            paths[f.key] = (name, path)
+            if name in used:
+                continue
+            if name in index and os.path.exists(path):
+                used[name] = index[name]
+            else:
+                used[name] = None
+                jobs.append((f.path, path, f.key, self.part_size))
+        results = self._map(
+            _rewrite_file, jobs, initializer=_init, initargs=(digests, )
+        )
+        for job, result in zip(jobs, results):
+            used[os.path.basename(job[1])] = result
+        return {
+            key: used[name] + [path]
+            for key, (name, path) in paths.items()
+        }
+
+    def _output(
+        self, files: List[LocalFile], digests: Dict[str, str],
+        rewritten: dict
+    ) -> List[LocalFile]:
+        """
+        Rename and substitute rewritten files, and set their caching headers.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+        :type digests: Dict[str, str]
+        :param digests: digests of fingerprinted files, by key
+        :type rewritten: dict
+        :param rewritten: a dict of keys to [size, MD5, ETag, path]
+
+        :rtype: List[statikos.sync.LocalFile]
+        :return: local files, renamed and rewritten
+        """
+        self.renamed = 0
+        output = []
+        for f in files:
+            if f.key in rewritten:
+                size, md5, etag, path = rewritten[f.key]
+                f = f._replace(path=path, size=size, hash=md5, etag=etag)
+            headers = dict(f.headers or {})
+            if f.key in digests:
+                headers['CacheControl'] = IMMUTABLE
+                f = f._replace(key=fingerprinted(f.key, digests[f.key]))
+                self.renamed += 1
+            elif os.path.splitext(f.key)[1].lower() in ('.html', '.htm'):
+                headers['CacheControl'] = self.html_cache_control
+            output.append(f._replace(headers=headers or f.headers))
+        return output
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Fleet module."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from .ratelimit import TokenBucket
+from .statikos import Statikos
+from .sync import Sync
+
+
+def find_sites(directory: str) -> List[str]:
+    """
+    Find the Statikos services in a directory.
+
+    A service is a directory that contains a `statikos.yml` file. Services
+    are not nested, so the walk does not descend into a service (or into
+    hidden directories), which keeps it clear of large build directories.
+
+    :type directory: str
+    :param directory: path to the directory to search
+
+    :rtype: List[str]
+    :return: sorted paths to the services
+    """
+    sites = []
+    for root, dirs, files in os.walk(directory):
+        if Statikos.STATIKOS_YML in files:
+            sites.append(root)
+            dirs[:] = []
+        else:
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+    return sorted(sites)
+
+
+class SiteResult():
+    """
+    Outcome of deploying a single service in a fleet.
+    """
+    def __init__(
+        self, name: str, elapsed: float, error: Exception = None
+    ) -> None:
+        """
+        Create a new `SiteResult` object.
+
+        :type name: str
+        :param name: name of the service (its path relative to the fleet)
+        :type elapsed: float
+        :param elapsed: seconds taken
+        :type error: Exception
+        :param error: exception raised by the deploy, if any
+
+        :rtype: None
+        :return: None
+        """
+        self.name = name
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """
+        Return whether the deploy succeeded.
+
+        :rtype: bool
+        :return: whether the deploy succeeded
+        """
+        return self.error is None
+
+
+class FleetResult():
+    """
+    Summary of a fleet deploy.
+    """
+    def __init__(self) -> None:
+        """
+        Create a new `FleetResult` object.
+
+        :rtype: None
+        :return: None
+        """
+        self.sites = []
+        self.elapsed = 0.0
+
+    @property
+    def failed(self) -> List[SiteResult]:
+        """
+        Return the results of services that failed to deploy.
+
+        :rtype: List[SiteResult]
+        :return: results of services that failed to deploy
+        """
+        return [s for s in self.sites if not s.ok]
+
+    def __str__(self) -> str:
+        """
+        Return a per-service summary, slowest first.
+
+        Example:
+
+        site-b  failed    3.2s  The change set could not be created: ...
+        site-a  deployed  2.1s
+        2 site(s) in 3.4s: 1 deployed, 1 failed
+
+        :rtype: str
+        :return: summary
+        """
+        sites = sorted(self.sites, key=lambda s: -s.elapsed)
+        width = max([len(s.name) for s in sites] + [0])
+        lines = []
+        for s in sites:
+            status = 'deployed' if s.ok else 'failed'
+            line = f'{s.name:<{width}}  {status:<8}  {s.elapsed:.1f}s'
+            if not s.ok:
+                line += f'  {s.error}'
+            lines.append(line)
+        failed = len(self.failed)
+        lines.append(
+            f'{len(self.sites)} site(s) in {self.elapsed:.1f}s: '
+            f'{len(self.sites) - failed} deployed, {failed} failed'
+        )
+        return '\n'.join(lines)
+
+
+class Fleet():
+    """
+    Set of Statikos services deployed together.
+
+    Services are deployed in a pool of `concurrency` threads. Every service
+    shares one token bucket per AWS service, so the fleet as a whole stays
+    under the account's API rate limits however many services run at once.
+    The default rates are well below the default CloudFormation and S3
+    request quotas.
+
+    Services also share AWS clients (see `statikos.api.ClientRegistry`), so
+    their connection pools are sized for the whole fleet: one connection per
+    service for CloudFormation and CloudFront, and one per upload worker of
+    every service for S3.
+    """
+    DEFAULT_CONCURRENCY = 4
+    DEFAULT_RATES = {
+        'cloudformation': 4,
+        's3': 1000,
+    }
+
+    def __init__(
+        self,
+        directory: str,
+        concurrency: int = None,
+        rates: dict = None,
+        echo: Callable = None
+    ) -> None:
+        """
+        Create a new `Fleet` object.
+
+        :type directory: str
+        :param directory: path to the directory of services
+        :type concurrency: int
+        :param concurrency: number of services to deploy at once
+        :type rates: dict
+        :param rates: requests per second, by AWS service name
+        :type echo: Callable
+        :param echo: callable to report progress with
+
+        :rtype: None
+        :return: None
+        """
+        self.directory = directory
+        self.concurrency = concurrency or self.DEFAULT_CONCURRENCY
+        rates = dict(self.DEFAULT_RATES, **(rates or {}))
+        self.limiters = {k: TokenBucket(v) for k, v in rates.items()}
+        self.max_pool_connections = {
+            'cloudformation': self.concurrency,
+            'cloudfront': self.concurrency,
+            's3': self.concurrency * Sync.DEFAULT_WORKERS,
+        }
+        self.echo = echo
+        self.sites = find_sites(directory)
+
+    def name(self, site: str) -> str:
+        """
+        Return the name of a service.
+
+        :type site: str
+        :param site: path to the service
+
+        :rtype: str
+        :return: path to the service relative to the fleet
+        """
+        return os.path.relpath(site, self.directory)
+
+    def _echo(self, site: str) -> Callable:
+        """
+        Create an `echo` callable that prefixes messages with a service name.
+
+        :type site: str
+        :param site: path to the service
+
+        :rtype: Callable
+        :return: echo callable, or None
+        """
+        if not self.echo:
+            return None
+        name = self.name(site)
+        return lambda message: self.echo(f'[{name}] {message}')
+
+    def deploy(self, force: bool = False) -> FleetResult:
+        """
+        Deploy every service in the fleet.
+
+        A failure in one service does not stop the others; it is recorded in
+        the result instead.
+
+        :type force: bool
+        :param force: whether to deploy stacks even if they are unchanged
+
+        :rtype: FleetResult
+        :return: a summary of the deploy
+        """
+        result = FleetResult()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            result.sites = list(
+                executor.map(
+                    lambda site: self._deploy(site, force), self.sites
+                )
+            )
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def _deploy(self, site: str, force: bool) -> SiteResult:
+        """
+        Deploy a single service.
+
+        :type site: str
+        :param site: path to the service
+        :type force: bool
+        :param force: whether to deploy the stack even if it is unchanged
+
+        :rtype: SiteResult
+        :return: the outcome of the deploy
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            s = Statikos(
+                root=site,
+                echo=self._echo(site),
+                limiters=self.limiters,
+                max_pool_connections=self.max_pool_connections
+            )
+            s.deploy(force=force)
+        except Exception as e:
+            error = e
+        return SiteResult(
+            self.name(site), time.perf_counter() - start, error
+        )
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""Hashing module."""
+
+import hashlib
+import mmap
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from . import utils
+
+# Part size and threshold used by the AWS CLI and s3transfer for multipart
+# uploads. Objects uploaded in parts have an ETag of the form `<md5>-<parts>`.
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# Below this many bytes to hash, a process pool costs more than it saves.
+MIN_PARALLEL_BYTES = 64 * 1024 * 1024
+
+# Files modified this recently may be modified again within the resolution of
+# the file system clock without changing their mtime, so they are not cached.
+RACY_NS = 2 * 10**9
+
+Digest = namedtuple('Digest', ['md5', 'etag'])
+
+
+def hash_file(path: str, part_size: int = DEFAULT_PART_SIZE) -> Digest:
+    """
+    Compute the MD5 hex digest and expected S3 ETag of a file.
+
+    The file is read through a memory map in a single pass. Files larger than
+    `part_size` are assumed to be uploaded in parts of `part_size` bytes, in
+    which case the ETag is the MD5 of the concatenated MD5s of the parts,
+    followed by the number of parts.
+
+    Example:
+
+    index.html (1 KB)  -> Digest(md5='d41d8cd9...', etag='d41d8cd9...')
+    video.mp4 (90 MB)  -> Digest(md5='9e107d9d...', etag='4a1f0f3c...-12')
+
+    :type path: str
+    :param path: path to the file
+    :type part_size: int
+    :param part_size: size of each part of a multipart upload
+
+    :rtype: Digest
+    :return: MD5 hex digest and ETag
+    """
+    md5 = hashlib.md5()
+    parts = []
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                for offset in range(0, size, part_size):
+                    part = view[offset:offset + part_size]
+                    md5.update(part)
+                    if size > part_size:
+                        parts.append(hashlib.md5(part).digest())
+                    part.release()
+                view.release()
+    if not parts:
+        return Digest(md5.hexdigest(), md5.hexdigest())
+    etag = hashlib.md5(b''.join(parts)).hexdigest()
+    return Digest(md5.hexdigest(), f'{etag}-{len(parts)}')
+
+
+def _hash_file(args: Tuple[str, int]) -> Digest:
+    """
+    Unpack arguments for `hash_file` in a worker process.
+
+    :type args: Tuple[str, int]
+    :param args: path to the file and part size
+
+    :rtype: Digest
+    :return: MD5 hex digest and ETag
+    """
+    return hash_file(*args)
+
+
+class HashCache():
+    """
+    Persistent cache of file digests.
+
+    Digests are keyed on path and validated against the inode, size and
+    modification time (in nanoseconds) of the file, so a file is only read
+    again when it has changed. Misses are hashed across a pool of processes.
+
+    Example:
+
+    {
+      "version": 1,
+      "part_size": 8388608,
+      "entries": {
+        "build/index.html": [
+          1234567, 1024, 1571000000000000000,
+          "d41d8cd98f00b204e9800998ecf8427e",
+          "d41d8cd98f00b204e9800998ecf8427e"
+        ]
+      }
+    }
+    """
+    VERSION = 1
+
+    def __init__(
+        self, filename: str, part_size: int = DEFAULT_PART_SIZE
+    ) -> None:
+        """
+        Create a new, empty `HashCache` object.
+
+        :type filename: str
+        :param filename: path to the cache
+        :type part_size: int
+        :param part_size: size of each part of a multipart upload
+
+        :rtype: None
+        :return: None
+        """
+        self.filename = filename
+        self.part_size = part_size
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        # Whether the entries differ from the saved cache.
+        self.dirty = True
+
+    @classmethod
+    def load(
+        cls, filename: str, part_size: int = DEFAULT_PART_SIZE
+    ) -> 'HashCache':
+        """
+        Load a cache.
+
+        A cache that does not exist, cannot be read, or was written with a
+        different part size is discarded.
+
+        :type filename: str
+        :param filename: path to the cache
+        :type part_size: int
+        :param part_size: size of each part of a multipart upload
+
+        :rtype: HashCache
+        :return: a cache instance
+        """
+        cache = cls(filename, part_size)
+        try:
+            data = utils.read_json_file(filename)
+        except (OSError, ValueError):
+            return cache
+        if isinstance(data, dict) and \
+                data.get('version') == cls.VERSION and \
+                data.get('part_size') == part_size:
+            cache.entries = data.get('entries', {})
+            cache.dirty = False
+        return cache
+
+    def save(self) -> None:
+        """
+        Save the cache.
+
+        :rtype: None
+        :return: None
+        """
+        utils.mkdir(os.path.dirname(self.filename) or '.')
+        data = {
+            'version': self.VERSION,
+            'part_size': self.part_size,
+            'entries': self.entries,
+        }
+        tmp = f'{self.filename}.tmp'
+        utils.write_json_file(data, tmp, compact=True)
+        os.replace(tmp, self.filename)
+        self.dirty = False
+
+    def get(self, path: str, st: os.stat_result) -> Digest:
+        """
+        Look up the digest of a file.
+
+        :type path: str
+        :param path: path to the file
+        :type st: os.stat_result
+        :param st: result of `os.stat` for the file
+
+        :rtype: Digest
+        :return: MD5 hex digest and ETag, or None if not cached
+        """
+        entry = self.entries.get(path)
+        if entry is None or \
+                entry[:3] != [st.st_ino, st.st_size, st.st_mtime_ns]:
+            return None
+        return Digest(entry[3], entry[4])
+
+    def set(self, path: str, st: os.stat_result, digest: Digest) -> None:
+        """
+        Cache the digest of a file.
+
+        :type path: str
+        :param path: path to the file
+        :type st: os.stat_result
+        :param st: result of `os.stat` for the file
+        :type digest: Digest
+        :param digest: MD5 hex digest and ETag
+
+        :rtype: None
+        :return: None
+        """
+        self.entries[path] = [
+            st.st_ino, st.st_size, st.st_mtime_ns, digest.md5, digest.etag
+        ]
+        self.dirty = True
+
+    def hash_files(
+        self,
+        files: List[Tuple[str, os.stat_result]],
+        processes: int = None
+    ) -> List[Digest]:
+        """
+        Compute the digests of many files.
+
+        Cached digests are reused. The remaining files are hashed in a pool of
+        `processes` processes (default: one per CPU), unless there is too
+        little to hash for a pool to pay off. Entries for files not in `files`
+        are dropped, so the cache does not grow without bound.
+
+        :type files: List[Tuple[str, os.stat_result]]
+        :param files: paths to the files and their `os.stat` results
+        :type processes: int
+        :param processes: number of processes
+
+        :rtype: List[Digest]
+        :return: digests, in the same order as `files`
+        """
+        now = time.time_ns()
+        entries, self.entries = self.entries, {}
+        digests = [None] * len(files)
+        misses = []
+        kept = self.entries
+        # Same check as `get`, inlined: this loop runs once per file.
+        for i, (path, st) in enumerate(files):
+            entry = entries.get(path)
+            if entry is not None:
+                kept[path] = entry
+                if entry[:3] == [st.st_ino, st.st_size, st.st_mtime_ns]:
+                    digests[i] = Digest(entry[3], entry[4])
+                    continue
+            misses.append(i)
+        self.hits += len(files) - len(misses)
+        self.misses += len(misses)
+        if misses or len(self.entries) != len(entries):
+            self.dirty = True
+        args = [(files[i][0], self.part_size) for i in misses]
+        size = sum(files[i][1].st_size for i in misses)
+        if len(misses) > 1 and size >= MIN_PARALLEL_BYTES:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                chunksize = max(
+                    1, len(args) // (4 * (processes or os.cpu_count() or 1))
+                )
+                results = list(
+                    executor.map(_hash_file, args, chunksize=chunksize)
+                )
+        else:
+            results = [_hash_file(a) for a in args]
+        for i, digest in zip(misses, results):
+            path, st = files[i]
+            digests[i] = digest
+            if now - st.st_mtime_ns > RACY_NS:
+                self.set(path, st, digest)
+            else:
+                self.entries.pop(path, None)
+        return digests
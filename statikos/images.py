@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""Image optimization module."""
+
+import hashlib
+import json
+import os
+from typing import TYPE_CHECKING, List, Set
+
+from .exceptions import MissingDependency
+from .hashing import DEFAULT_PART_SIZE, hash_file
+from .stage import CachedStage
+from .sync import LocalFile
+
+if TYPE_CHECKING:  # pragma: no cover
+    from PIL import Image  # noqa: F401
+
+# Extensions of images that are re-encoded, and their Pillow formats.
+FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+}
+
+# Version of the encoding settings below, part of every cache key, so that
+# changing them invalidates the cache.
+VERSION = 1
+
+
+def _encode(
+    image: 'Image.Image', dst: str, fmt: str, quality: int, icc_profile: bytes
+) -> None:
+    """
+    Encode an image without its metadata.
+
+    Only the ICC profile is kept, since it is needed to show the right
+    colors. EXIF, XMP, and text chunks are dropped.
+
+    :type image: PIL.Image.Image
+    :param image: image
+    :type dst: str
+    :param dst: path to write the image to
+    :type fmt: str
+    :param fmt: `JPEG`, `PNG`, or `WEBP`
+    :type quality: int
+    :param quality: quality of lossy formats
+    :type icc_profile: bytes
+    :param icc_profile: ICC profile of the image, or None
+
+    :rtype: None
+    :return: None
+    """
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if fmt == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        options.update(quality=quality, optimize=True, progressive=True)
+    elif fmt == 'PNG':
+        options.update(optimize=True)
+    else:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGBA' if 'A' in image.getbands() or
+                'transparency' in image.info else 'RGB'
+            )
+        options.update(quality=quality, method=6)
+    tmp = f'{dst}.tmp'
+    image.save(tmp, fmt, **options)
+    os.replace(tmp, dst)
+
+
+def optimize_image(
+    src: str,
+    dst: str,
+    fmt: str,
+    widths: List[int],
+    max_width: int,
+    quality: int,
+    webp_quality: int,
+    part_size: int = DEFAULT_PART_SIZE
+) -> list:
+    """
+    Re-encode an image into its optimized variants.
+
+    The image is rotated according to its EXIF orientation and scaled down to
+    at most `max_width`, then re-encoded in its own format and, if
+    `webp_quality` is set, as WebP. A responsive variant is made for each of
+    `widths` narrower than that, in the same formats. Images are never scaled
+    up. Animated images and images that cannot be decoded have no variants.
+
+    Variants are written to `dst` followed by their suffix (`''` for the
+    full-width image, `-{width}w` for responsive variants) and extension.
+
+    :type src: str
+    :param src: path to the image
+    :type dst: str
+    :param dst: path prefix of the variants
+    :type fmt: str
+    :param fmt: Pillow format of the image (`JPEG`, `PNG`)
+    :type widths: List[int]
+    :param widths: widths of responsive variants
+    :type max_width: int
+    :param max_width: maximum width of the full-width image
+    :type quality: int
+    :param quality: JPEG quality
+    :type webp_quality: int
+    :param webp_quality: WebP quality, or None for no WebP variants
+    :type part_size: int
+    :param part_size: size of each part of a multipart upload
+
+    :rtype: list
+    :return: [suffix, extension, size, MD5 hex digest, ETag] of each variant
+    """
+    from PIL import Image, ImageOps
+    try:
+        with Image.open(src) as image:
+            if getattr(image, 'is_animated', False):
+                return []
+            icc_profile = image.info.get('icc_profile')
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return []
+    width, height = image.size
+    sizes = [('', min(width, max_width))]
+    sizes += [(f'-{w}w', w) for w in sorted(set(widths)) if w < sizes[0][1]]
+    formats = [(fmt, '.jpg' if fmt == 'JPEG' else '.png', quality)]
+    if webp_quality:
+        formats.append(('WEBP', '.webp', webp_quality))
+    variants = []
+    for suffix, w in sizes:
+        resized = image if w == width else image.resize(
+            (w, max(1, round(height * w / width))), Image.LANCZOS
+        )
+        for fmt, extension, q in formats:
+            path = f'{dst}{suffix}{extension}'
+            _encode(resized, path, fmt, q, icc_profile)
+            digest = hash_file(path, part_size)
+            variants.append([
+                suffix, extension, os.path.getsize(path), digest.md5,
+                digest.etag
+            ])
+    return variants
+
+
+def _optimize_image(args: tuple) -> list:
+    """
+    Re-encode an image in a worker process (see `optimize_image`).
+
+    :type args: tuple
+    :param args: arguments of `optimize_image`
+
+    :rtype: list
+    :return: [suffix, extension, size, MD5 hex digest, ETag] of each variant
+    """
+    return optimize_image(*args)
+
+
+class Images(CachedStage):
+    """
+    Sync stage that replaces JPEG and PNG images with optimized variants.
+
+    Each image is re-encoded without its metadata, scaled down to at most
+    `max_width`, and uploaded in place of the original if that makes it
+    smaller. Responsive variants, at each of `widths` narrower than the
+    image, are uploaded alongside it with the width in the key (e.g.
+    `img/photo-480w.jpg`), and so is a WebP variant of each (e.g.
+    `img/photo.webp`, `img/photo-480w.webp`), to be referred to from `srcset`
+    and `<picture>` elements. A variant whose key is already taken by a
+    source file is not uploaded.
+
+    Images are re-encoded in a process pool, one image per task. Variants are
+    cached in `cache_dir` by the content hash of the original image and the
+    settings, so unchanged images are never re-encoded.
+    """
+    WIDTHS = [480, 960, 1440]
+    MAX_WIDTH = 2560
+    QUALITY = 82
+    WEBP_QUALITY = 80
+
+    def __init__(
+        self,
+        cache_dir: str,
+        widths: List[int] = None,
+        max_width: int = None,
+        quality: int = None,
+        webp: bool = True,
+        webp_quality: int = None,
+        extensions: List[str] = None,
+        processes: int = None,
+        part_size: int = DEFAULT_PART_SIZE
+    ) -> None:
+        """
+        Create a new `Images` object.
+
+        :type cache_dir: str
+        :param cache_dir: path to the directory of optimized images
+        :type widths: List[int]
+        :param widths: widths of responsive variants
+        :type max_width: int
+        :param max_width: maximum width of an image
+        :type quality: int
+        :param quality: JPEG quality (1-95)
+        :type webp: bool
+        :param webp: whether to make WebP variants
+        :type webp_quality: int
+        :param webp_quality: WebP quality (1-100)
+        :type extensions: List[str]
+        :param extensions: extensions of images to optimize
+        :type processes: int
+        :param processes: number of processes to re-encode images with
+        :type part_size: int
+        :param part_size: size of each part of a multipart upload
+
+        :rtype: None
+        :return: None
+        """
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            raise MissingDependency(package='Pillow', extra='images')
+        self.cache_dir = cache_dir
+        self.widths = self.WIDTHS if widths is None else widths
+        self.max_width = max_width or self.MAX_WIDTH
+        self.quality = quality or self.QUALITY
+        self.webp_quality = (webp_quality or self.WEBP_QUALITY) \
+            if webp else None
+        self.extensions = [
+            e for e in (extensions or FORMATS) if e.lower() in FORMATS
+        ]
+        self.processes = processes
+        self.part_size = part_size
+        self.saved = 0
+        self.settings_key = hashlib.sha256(json.dumps([
+            VERSION, sorted(self.widths), self.max_width, self.quality,
+            self.webp_quality
+        ]).encode()).hexdigest()[:12]
+
+    def _cache_key(self, f: LocalFile) -> str:
+        """
+        Return the cache key of an image.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+
+        :rtype: str
+        :return: cache key
+        """
+        return f'{f.hash}-{self.settings_key}'
+
+    def _cached(self, name: str, variants: list) -> bool:
+        """
+        Determine if every variant of an image is in the cache.
+
+        :type name: str
+        :param name: cache key of the image
+        :type variants: list
+        :param variants: variants of the image, from the index
+
+        :rtype: bool
+        :return: whether the variants are cached
+        """
+        return all(
+            os.path.exists(os.path.join(self.cache_dir, f'{name}{s}{e}'))
+            for s, e, *_ in variants
+        )
+
+    def optimizable(self, f: LocalFile) -> bool:
+        """
+        Determine if a file should be optimized.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+
+        :rtype: bool
+        :return: whether the file should be optimized
+        """
+        if (f.headers or {}).get('ContentEncoding'):
+            return False
+        return os.path.splitext(f.key)[1].lower() in self.extensions
+
+    def __call__(self, files: List[LocalFile]) -> List[LocalFile]:
+        """
+        Replace images with their optimized variants.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+
+        :rtype: List[statikos.sync.LocalFile]
+        :return: local files, with optimized variants
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index = self._load_index()
+        used = {}
+        jobs = []
+        for f in filter(self.optimizable, files):
+            name = self._cache_key(f)
+            if name in used:
+                continue
+            if name in index and self._cached(name, index[name]):
+                used[name] = index[name]
+                continue
+            used[name] = None
+            jobs.append((
+                f.path,
+                os.path.join(self.cache_dir, name),
+                FORMATS[os.path.splitext(f.key)[1].lower()],
+                self.widths,
+                self.max_width,
+                self.quality,
+                self.webp_quality,
+                self.part_size
+            ))
+        for job, result in zip(jobs, self._map(_optimize_image, jobs)):
+            used[os.path.basename(job[1])] = result
+        self._save_index(used)
+        self._prune(used)
+        return self._variants(files, used)
+
+    def _cached_files(self, index: dict) -> Set[str]:
+        """
+        Return the names of the cached variants that an index refers to.
+
+        :type index: dict
+        :param index: a dict of cache keys to lists of variants
+
+        :rtype: Set[str]
+        :return: file names
+        """
+        return {
+            f'{name}{s}{e}'
+            for name, variants in index.items()
+            for s, e, *_ in variants
+        }
+
+    def _variants(self, files: List[LocalFile],
+                  index: dict) -> List[LocalFile]:
+        """
+        Substitute optimized variants for images.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+        :type index: dict
+        :param index: a dict of cache keys to lists of variants
+
+        :rtype: List[statikos.sync.LocalFile]
+        :return: local files, with optimized variants
+        """
+        self.saved = 0
+        keys = {f.key for f in files}
+        output = []
+        for f in files:
+            if not self.optimizable(f):
+                output.append(f)
+                continue
+            name = self._cache_key(f)
+            root, extension = os.path.splitext(f.key)
+            variants = []
+            for suffix, ext, size, md5, etag in index[name]:
+                path = os.path.join(self.cache_dir, f'{name}{suffix}{ext}')
+                variant = f._replace(
+                    path=path, size=size, hash=md5, etag=etag
+                )
+                if ext == '.webp':
+                    headers = {
+                        k: v for k, v in (f.headers or {}).items()
+                        if k != 'ContentType'
+                    }
+                    variant = variant._replace(
+                        key=f'{root}{suffix}{ext}', headers=headers or None
+                    )
+                elif suffix:
+                    variant = variant._replace(
+                        key=f'{root}{suffix}{extension}'
+                    )
+                elif size < f.size:
+                    # The re-encoded image replaces the original only if it
+                    # is smaller.
+                    self.saved += f.size - size
+                    f = variant
+                    continue
+                else:
+                    continue
+                if variant.key not in keys:
+                    keys.add(variant.key)
+                    variants.append(variant)
+            output.append(f)
+            output.extend(variants)
+        return output
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""CloudFront invalidation module."""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List
+from urllib.parse import quote
+
+# Invalidation paths free of charge per month.
+MAX_PATHS = 1000
+
+# Wildcard paths that may be in progress at once.
+MAX_WILDCARDS = 15
+
+INDEX_DOCUMENT = 'index.html'
+
+
+def paths(keys: Iterable[str], index: str = INDEX_DOCUMENT) -> List[str]:
+    """
+    Map object keys to the paths they are served at.
+
+    Every key is served at `/<key>`. Directory index pages are also served at
+    the directory itself, so `blog/index.html` maps to `/blog/index.html` and
+    `/blog/`, and the root `index.html` to `/index.html` and `/`. Keys are
+    URL-encoded, so a `*` in a key is not taken for a wildcard.
+
+    :type keys: Iterable[str]
+    :param keys: object keys
+    :type index: str
+    :param index: name of the directory index document
+
+    :rtype: List[str]
+    :return: sorted, unique paths
+    """
+    result = set()
+    for key in keys:
+        result.add('/' + quote(key))
+        if key == index:
+            result.add('/')
+        elif key.endswith('/' + index):
+            result.add('/' + quote(key[:-len(index)]))
+    return sorted(result)
+
+
+def _parts(path: str) -> List[str]:
+    """
+    Split a path into its components.
+
+    Example:
+
+    /blog/post.html  -> ['blog', 'post.html']
+    /blog/           -> ['blog', '']
+    /blog/*          -> ['blog', '*']
+
+    :type path: str
+    :param path: invalidation path
+
+    :rtype: List[str]
+    :return: path components
+    """
+    return path[1:].split('/')
+
+
+def _group(paths: Iterable[str], depth: int) -> Dict[str, List[str]]:
+    """
+    Group paths by their directory at a depth.
+
+    Example (depth=1):
+
+    /blog/a.html, /blog/2020/b.html, /index.html
+    -> {'/blog/': ['/blog/a.html', '/blog/2020/b.html']}
+
+    :type paths: Iterable[str]
+    :param paths: invalidation paths
+    :type depth: int
+    :param depth: number of directories in the prefix
+
+    :rtype: Dict[str, List[str]]
+    :return: a dict of directories to the paths under them
+    """
+    groups = defaultdict(list)
+    for p in paths:
+        parts = _parts(p)
+        if len(parts) > depth:
+            groups['/' + '/'.join(parts[:depth]) + '/'].append(p)
+    return groups
+
+
+def coalesce(
+    paths: Iterable[str],
+    max_paths: int = MAX_PATHS,
+    max_wildcards: int = MAX_WILDCARDS
+) -> List[str]:
+    """
+    Collapse paths into wildcards until there are few enough of them.
+
+    Directories are collapsed deepest first, and within a level the
+    directory that saves the most paths goes first, so that as little of the
+    cache as possible is purged. As a last resort, everything is collapsed
+    into `/*`.
+
+    Example (max_paths=3):
+
+    /index.html, /blog/a.html, /blog/b.html, /blog/c.html
+    -> /blog/*, /index.html
+
+    :type paths: Iterable[str]
+    :param paths: invalidation paths
+    :type max_paths: int
+    :param max_paths: maximum number of paths
+    :type max_wildcards: int
+    :param max_wildcards: maximum number of wildcard paths
+
+    :rtype: List[str]
+    :return: sorted invalidation paths
+    """
+    result = set(paths)
+
+    def wildcards(members: Iterable[str]) -> int:
+        return sum(1 for p in members if p.endswith('*'))
+
+    def excess() -> bool:
+        return len(result) > max_paths or wildcards(result) > max_wildcards
+
+    depth = max([len(_parts(p)) - 1 for p in result] + [0])
+    while excess() and depth > 0:
+        groups = _group(result, depth)
+        order, ordered_by = [], None
+        while excess() and groups:
+            # Save paths while there are too many of them, then wildcards.
+            count = len if len(result) > max_paths else wildcards
+            if count is not ordered_by:
+                # Largest group last, for `pop`.
+                order = sorted(
+                    groups,
+                    key=lambda d: (-count(groups[d]), d),
+                    reverse=True
+                )
+                ordered_by = count
+            directory = order.pop()
+            members = groups.pop(directory)
+            if count(members) < 2:
+                break
+            result.difference_update(members)
+            result.add(directory + '*')
+        depth -= 1
+    if excess():
+        return ['/*']
+    return sorted(result)
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""Journal module."""
+
+import json
+import os
+import threading
+from typing import List, Tuple
+
+from . import utils
+
+
+def _line(record: dict) -> bytes:
+    """
+    Serialize a journal record.
+
+    :type record: dict
+    :param record: journal record
+
+    :rtype: bytes
+    :return: one line of JSON
+    """
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class Journal():
+    """
+    Append-only record of the progress of a sync.
+
+    Every completed upload, every multipart upload started, and every part
+    uploaded is appended to the journal as it happens, one JSON object per
+    line, so a sync that is killed part way through (before the manifest is
+    saved) can pick up where it stopped: completed uploads are replayed into
+    the manifest, and multipart uploads resume from the first missing part.
+
+    Example:
+
+    {"version": 1, "bucket": "example-root"}
+    {"op": "done", "key": "index.html", "size": 1024, "hash": "d41d...", ...}
+    {"op": "begin", "key": "video.mp4", "hash": "9e10...", "upload_id": ...}
+    {"op": "part", "key": "video.mp4", "number": 1, "etag": "4a1f..."}
+    {"op": "abort", "key": "video.mp4"}
+
+    Records are flushed to the operating system as they are written. A torn
+    record at the end of the journal (from a process killed mid-write) is
+    discarded.
+    """
+    VERSION = 1
+
+    def __init__(self, filename: str, bucket: str) -> None:
+        """
+        Create a new, empty `Journal` object.
+
+        :type filename: str
+        :param filename: path to the journal, or None to keep it in memory
+        :type bucket: str
+        :param bucket: name of the bucket the journal describes
+
+        :rtype: None
+        :return: None
+        """
+        self.filename = filename
+        self.bucket = bucket
+        # Key -> {'size': int, 'hash': str, 'etag': str}
+        self.completed = {}
+        # Key -> {'hash': str, 'upload_id': str, 'headers': dict,
+        #         'parts': {number: etag}}
+        self.uploads = {}
+        self._file = None
+        self._length = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, filename: str, bucket: str) -> 'Journal':
+        """
+        Load a journal.
+
+        A journal that does not exist, cannot be read, was written by a
+        different version of Statikos, or describes a different bucket is
+        discarded.
+
+        :type filename: str
+        :param filename: path to the journal
+        :type bucket: str
+        :param bucket: name of the bucket the journal describes
+
+        :rtype: Journal
+        :return: a journal instance
+        """
+        journal = cls(filename, bucket)
+        try:
+            with open(filename, 'rb') as f:
+                records, length = cls._parse(f.readlines())
+        except OSError:
+            return journal
+        if not records or \
+                records[0].get('version') != cls.VERSION or \
+                records[0].get('bucket') != bucket:
+            return journal
+        for record in records[1:]:
+            journal._apply(record)
+        journal._length = length
+        return journal
+
+    @staticmethod
+    def _parse(lines: List[bytes]) -> Tuple[List[dict], int]:
+        """
+        Parse the lines of a journal, up to the first torn or invalid line.
+
+        A line that was only partly written (e.g. when the process was
+        killed) and everything after it are ignored.
+
+        :type lines: List[bytes]
+        :param lines: lines of the journal
+
+        :rtype: Tuple[List[dict], int]
+        :return: records, and the length in bytes of the lines they came from
+        """
+        records, length = [], 0
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b'\n') or not isinstance(record, dict):
+                break
+            records.append(record)
+            length += len(line)
+        return records, length
+
+    def _apply(self, record: dict) -> None:
+        """
+        Apply a record to the in-memory state of the journal.
+
+        :type record: dict
+        :param record: journal record
+
+        :rtype: None
+        :return: None
+        """
+        op, key = record.get('op'), record.get('key')
+        if op == 'done':
+            self.completed[key] = {
+                'size': record['size'],
+                'hash': record['hash'],
+                'etag': record['etag'],
+                'headers': record.get('headers'),
+            }
+            self.uploads.pop(key, None)
+        elif op == 'begin':
+            self.uploads[key] = {
+                'hash': record['hash'],
+                'upload_id': record['upload_id'],
+                'headers': record.get('headers') or {},
+                'parts': {},
+            }
+        elif op == 'part' and key in self.uploads:
+            self.uploads[key]['parts'][record['number']] = record['etag']
+        elif op == 'abort':
+            self.uploads.pop(key, None)
+
+    def _append(self, record: dict) -> None:
+        """
+        Apply a record and append it to the journal.
+
+        :type record: dict
+        :param record: journal record
+
+        :rtype: None
+        :return: None
+        """
+        with self._lock:
+            self._apply(record)
+            if self.filename is None:
+                return
+            if self._file is None:
+                self._open()
+            self._write(_line(record))
+
+    def _open(self) -> None:
+        """
+        Open the journal for appending (lock held).
+
+        A torn record at the end of the journal is cut off first, and a new
+        journal starts with a header.
+
+        :rtype: None
+        :return: None
+        """
+        utils.mkdir(os.path.dirname(self.filename) or '.')
+        if self._length:
+            os.truncate(self.filename, self._length)
+            self._file = open(self.filename, 'ab')
+        else:
+            self._file = open(self.filename, 'wb')
+            self._write(
+                _line({'version': self.VERSION, 'bucket': self.bucket})
+            )
+
+    def _write(self, data: bytes) -> None:
+        """
+        Write to the journal and flush it (lock held).
+
+        :type data: bytes
+        :param data: data to write
+
+        :rtype: None
+        :return: None
+        """
+        self._file.write(data)
+        self._file.flush()
+        self._length += len(data)
+
+    def complete(
+        self, key: str, size: int, digest: str, etag: str,
+        headers: str = None
+    ) -> None:
+        """
+        Record an uploaded object.
+
+        :type key: str
+        :param key: object key
+        :type size: int
+        :param size: size of the uploaded file
+        :type digest: str
+        :param digest: MD5 hex digest of the uploaded file
+        :type etag: str
+        :param etag: ETag returned by S3
+        :type headers: str
+        :param headers: digest of the parameters the object was uploaded with
+
+        :rtype: None
+        :return: None
+        """
+        self._append({
+            'op': 'done',
+            'key': key,
+            'size': size,
+            'hash': digest,
+            'etag': etag,
+            'headers': headers,
+        })
+
+    def begin(
+        self, key: str, digest: str, upload_id: str, headers: dict = None
+    ) -> dict:
+        """
+        Record the start of a multipart upload.
+
+        :type key: str
+        :param key: object key
+        :type digest: str
+        :param digest: MD5 hex digest of the file being uploaded
+        :type upload_id: str
+        :param upload_id: ID of the multipart upload
+        :type headers: dict
+        :param headers: parameters the upload was created with
+
+        :rtype: dict
+        :return: the multipart upload, as kept in `uploads`
+        """
+        self._append({
+            'op': 'begin',
+            'key': key,
+            'hash': digest,
+            'upload_id': upload_id,
+            'headers': headers or {},
+        })
+        return self.uploads[key]
+
+    def part(self, key: str, number: int, etag: str) -> None:
+        """
+        Record an uploaded part of a multipart upload.
+
+        :type key: str
+        :param key: object key
+        :type number: int
+        :param number: part number
+        :type etag: str
+        :param etag: ETag of the part
+
+        :rtype: None
+        :return: None
+        """
+        self._append({
+            'op': 'part',
+            'key': key,
+            'number': number,
+            'etag': etag,
+        })
+
+    def abort(self, key: str) -> None:
+        """
+        Record that a multipart upload was abandoned.
+
+        :type key: str
+        :param key: object key
+
+        :rtype: None
+        :return: None
+        """
+        self._append({'op': 'abort', 'key': key})
+
+    def compact(self) -> None:
+        """
+        Forget completed uploads, once they are recorded in the manifest.
+
+        Multipart uploads still in progress are rewritten to a new journal,
+        which is moved into place. If there are none, the journal is removed.
+
+        :rtype: None
+        :return: None
+        """
+        with self._lock:
+            self.completed = {}
+            self._close()
+            if self.filename is None:
+                return
+            if not self.uploads:
+                if os.path.exists(self.filename):
+                    os.remove(self.filename)
+                self._length = 0
+                return
+            lines = [{'version': self.VERSION, 'bucket': self.bucket}]
+            for key, upload in self.uploads.items():
+                lines.append({
+                    'op': 'begin',
+                    'key': key,
+                    'hash': upload['hash'],
+                    'upload_id': upload['upload_id'],
+                    'headers': upload['headers'],
+                })
+                for number, etag in sorted(upload['parts'].items()):
+                    lines.append({
+                        'op': 'part',
+                        'key': key,
+                        'number': number,
+                        'etag': etag,
+                    })
+            data = b''.join(_line(line) for line in lines)
+            tmp = f'{self.filename}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.filename)
+            self._length = len(data)
+
+    def close(self) -> None:
+        """
+        Close the journal.
+
+        :rtype: None
+        :return: None
+        """
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        """
+        Close the journal (lock held).
+
+        :rtype: None
+        :return: None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
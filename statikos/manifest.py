@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""Manifest module."""
+
+import hashlib
+import json
+import os
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from . import utils
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .api import S3  # noqa: F401
+    from .sync import LocalFile  # noqa: F401
+
+
+def headers_digest(headers: dict) -> str:
+    """
+    Return a digest of the parameters an object is uploaded with.
+
+    :type headers: dict
+    :param headers: PutObject parameters (e.g. `ContentType`)
+
+    :rtype: str
+    :return: SHA-256 hex digest, shortened
+    """
+    data = json.dumps(headers, sort_keys=True).encode()
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class Plan():
+    """
+    Set of changes needed to bring a bucket in line with local content.
+    """
+    def __init__(self) -> None:
+        """
+        Create a new `Plan` object.
+
+        :rtype: None
+        :return: None
+        """
+        self.upload = []
+        self.delete = []
+        self.skip = []
+
+    def __str__(self) -> str:
+        """
+        Return a one-line summary.
+
+        :rtype: str
+        :return: summary
+        """
+        return (
+            f'{len(self.upload)} to upload, {len(self.delete)} to delete, '
+            f'{len(self.skip)} unchanged'
+        )
+
+
+class Manifest():
+    """
+    Local record of the objects in a bucket.
+
+    The manifest maps each object key to the size and content hash of the file
+    it was uploaded from, the ETag S3 returned for it, and a digest of the
+    parameters it was uploaded with (`Cache-Control`, `Content-Encoding`,
+    ...). Comparing local files against the manifest gives an
+    upload/delete/skip plan without a single request to S3.
+
+    Example:
+
+    {
+      "version": 1,
+      "bucket": "example-root",
+      "entries": {
+        "index.html": {
+          "size": 1024,
+          "hash": "d41d8cd98f00b204e9800998ecf8427e",
+          "etag": "d41d8cd98f00b204e9800998ecf8427e",
+          "headers": "3f2a1b9c0d4e5f60"
+        }
+      }
+    }
+
+    Entries rebuilt from a bucket listing have no `hash`; the ETag is compared
+    against the ETag S3 would compute for the local file instead (see
+    `statikos.hashing.hash_file`). A listing does not include the parameters
+    of objects either, so those of rebuilt entries are not compared until
+    the objects are uploaded again.
+    """
+    VERSION = 1
+
+    def __init__(self, filename: str, bucket: str) -> None:
+        """
+        Create a new, empty `Manifest` object.
+
+        :type filename: str
+        :param filename: path to the manifest
+        :type bucket: str
+        :param bucket: name of the bucket the manifest describes
+
+        :rtype: None
+        :return: None
+        """
+        self.filename = filename
+        self.bucket = bucket
+        self.entries = {}
+        self.stale = True
+
+    @classmethod
+    def load(cls, filename: str, bucket: str) -> 'Manifest':
+        """
+        Load a manifest.
+
+        The manifest is marked stale if it does not exist, cannot be read, was
+        written by a different version of Statikos, or describes a different
+        bucket.
+
+        :type filename: str
+        :param filename: path to the manifest
+        :type bucket: str
+        :param bucket: name of the bucket the manifest describes
+
+        :rtype: Manifest
+        :return: a manifest instance
+        """
+        manifest = cls(filename, bucket)
+        try:
+            data = utils.read_json_file(filename)
+        except (OSError, ValueError):
+            return manifest
+        if not isinstance(data, dict) or \
+                data.get('version') != cls.VERSION or \
+                data.get('bucket') != bucket:
+            return manifest
+        manifest.entries = data.get('entries', {})
+        manifest.stale = False
+        return manifest
+
+    def save(self) -> None:
+        """
+        Save the manifest.
+
+        The manifest is written to a temporary file first and then moved into
+        place, so an interrupted write never leaves a corrupt manifest behind.
+
+        :rtype: None
+        :return: None
+        """
+        utils.mkdir(os.path.dirname(self.filename) or '.')
+        data = {
+            'version': self.VERSION,
+            'bucket': self.bucket,
+            'entries': self.entries,
+        }
+        tmp = f'{self.filename}.tmp'
+        utils.write_json_file(data, tmp, compact=True)
+        os.replace(tmp, self.filename)
+        self.stale = False
+
+    def rebuild(self, s3: 'S3') -> None:
+        """
+        Rebuild the manifest from a single listing of the bucket.
+
+        :type s3: statikos.api.S3
+        :param s3: S3 client
+
+        :rtype: None
+        :return: None
+        """
+        self.entries = {}
+        for obj in s3.list_objects(self.bucket):
+            self.entries[obj['Key']] = {
+                'size': obj['Size'],
+                'hash': None,
+                'etag': obj['ETag'].strip('"'),
+                'headers': None,
+            }
+        self.stale = False
+
+    def unchanged(
+        self,
+        key: str,
+        size: int,
+        digest: str,
+        etag: str = None,
+        headers: str = None
+    ) -> bool:
+        """
+        Determine if a local file matches the uploaded object.
+
+        :type key: str
+        :param key: object key
+        :type size: int
+        :param size: size of the local file
+        :type digest: str
+        :param digest: MD5 hex digest of the local file
+        :type etag: str
+        :param etag: ETag S3 would report for the local file
+        :type headers: str
+        :param headers: digest of the parameters the file would be uploaded
+            with (see `headers_digest`), or None not to compare them
+
+        :rtype: bool
+        :return: whether the local file matches the uploaded object
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry['size'] != size:
+            return False
+        if headers is not None and \
+                entry.get('headers') not in (None, headers):
+            return False
+        if entry['hash'] is not None:
+            return digest == entry['hash']
+        return entry['etag'] in (digest, etag)
+
+    def plan(
+        self,
+        files: Iterable,
+        delete: bool = True,
+        headers: Callable[['LocalFile'], dict] = None
+    ) -> Plan:
+        """
+        Compare local files against the manifest.
+
+        :type files: Iterable[statikos.sync.LocalFile]
+        :param files: local files
+        :type delete: bool
+        :param delete: whether to delete objects with no local file
+        :type headers: Callable[[statikos.sync.LocalFile], dict]
+        :param headers: returns the parameters a file is uploaded with, so
+            that a file whose parameters changed is uploaded again (default:
+            parameters are not compared)
+
+        :rtype: Plan
+        :return: a plan
+        """
+        plan = Plan()
+        keys = set()
+        unchanged = self.unchanged
+        upload, skip = plan.upload.append, plan.skip.append
+        for f in files:
+            keys.add(f.key)
+            digest = headers_digest(headers(f)) if headers else None
+            if unchanged(f.key, f.size, f.hash, f.etag, digest):
+                skip(f)
+            else:
+                upload(f)
+        if delete:
+            plan.delete = sorted(k for k in self.entries if k not in keys)
+        return plan
+
+    def update(
+        self, key: str, size: int, digest: str, etag: str,
+        headers: str = None
+    ) -> None:
+        """
+        Record an uploaded object.
+
+        :type key: str
+        :param key: object key
+        :type size: int
+        :param size: size of the uploaded file
+        :type digest: str
+        :param digest: MD5 hex digest of the uploaded file
+        :type etag: str
+        :param etag: ETag returned by S3
+        :type headers: str
+        :param headers: digest of the parameters the object was uploaded with
+
+        :rtype: None
+        :return: None
+        """
+        self.entries[key] = {
+            'size': size, 'hash': digest, 'etag': etag, 'headers': headers
+        }
+
+    def remove(self, key: str) -> None:
+        """
+        Forget a deleted object.
+
+        :type key: str
+        :param key: object key
+
+        :rtype: None
+        :return: None
+        """
+        self.entries.pop(key, None)
@@ -0,0 +1,826 @@
+# -*- coding: utf-8 -*-
+"""
+Minification module.
+
+Files are minified as streams: a minifier is fed the text of a file in
+chunks and returns the minified text of every token it has seen in full,
+holding back the last (possibly incomplete) token until the next chunk. The
+built-in minifiers only remove comments and whitespace, and only where that
+cannot change the meaning of the file.
+"""
+
+import abc
+import hashlib
+import importlib
+import os
+import re
+from typing import List, Tuple, Union
+
+from .exceptions import InvalidConfig
+from .hashing import DEFAULT_PART_SIZE, hash_file
+from .stage import CachedStage
+from .sync import LocalFile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class Minifier(abc.ABC):
+    """
+    Base class of streaming minifiers.
+
+    A minifier is fed the text of a file in chunks, and then closed.
+    """
+    VERSION = 1
+
+    @abc.abstractmethod
+    def feed(self, text: str) -> str:
+        """
+        Minify the next chunk of a file.
+
+        :type text: str
+        :param text: next chunk of the file
+
+        :rtype: str
+        :return: minified text, so far
+        """
+
+    @abc.abstractmethod
+    def close(self) -> str:
+        """
+        Minify the rest of a file.
+
+        :rtype: str
+        :return: the rest of the minified text
+        """
+
+
+class TokenMinifier(Minifier):
+    r"""
+    Base class of minifiers that minify one token at a time.
+
+    Subclasses define `TOKEN`, a regular expression that matches one token
+    at a time, and `_token`, which returns the minified text of a token.
+    Patterns of tokens that may span chunks (comments, strings) must also
+    match when they are cut off by the end of the text (`\Z`), so that they
+    are held back rather than misread.
+    """
+    TOKEN = None
+
+    def __init__(self) -> None:
+        """
+        Create a new `TokenMinifier` object.
+
+        :rtype: None
+        :return: None
+        """
+        self._buffer = ''
+
+    def feed(self, text: str) -> str:
+        """
+        Minify the next chunk of a file.
+
+        :type text: str
+        :param text: next chunk of the file
+
+        :rtype: str
+        :return: minified text, so far
+        """
+        self._buffer += text
+        return self._run(final=False)
+
+    def close(self) -> str:
+        """
+        Minify the rest of a file.
+
+        :rtype: str
+        :return: the rest of the minified text
+        """
+        return self._run(final=True) + self._flush()
+
+    def _match(self, buffer: str, pos: int, final: bool) -> Tuple[str, str]:
+        """
+        Match the next token.
+
+        :type buffer: str
+        :param buffer: text not minified yet
+        :type pos: int
+        :param pos: position of the next token in `buffer`
+        :type final: bool
+        :param final: whether `buffer` runs to the end of the file
+
+        :rtype: Tuple[str, str]
+        :return: kind and text of the token, or None if there is none
+        """
+        m = self.TOKEN.match(buffer, pos)
+        return (m.lastgroup, m.group()) if m else None
+
+    def _run(self, final: bool) -> str:
+        """
+        Minify the tokens in the buffer.
+
+        Unless `final` is set, the last token is held back, since the next
+        chunk may continue it.
+
+        :type final: bool
+        :param final: whether the buffer runs to the end of the file
+
+        :rtype: str
+        :return: minified text
+        """
+        buffer, pos, out = self._buffer, 0, []
+        n = len(buffer)
+        while pos < n:
+            token = self._match(buffer, pos, final)
+            if token is None or pos + len(token[1]) == n:
+                if not final:
+                    break
+                if token is None:
+                    token = ('other', buffer[pos:])
+            out.append(self._token(*token))
+            pos += len(token[1])
+        self._buffer = buffer[pos:]
+        return ''.join(out)
+
+    @abc.abstractmethod
+    def _token(self, kind: str, text: str) -> str:
+        """
+        Minify a token.
+
+        :type kind: str
+        :param kind: kind of the token (the name of the group that matched)
+        :type text: str
+        :param text: text of the token
+
+        :rtype: str
+        :return: minified text
+        """
+
+    def _flush(self) -> str:
+        """
+        Return any text held back at the end of the file.
+
+        :rtype: str
+        :return: text
+        """
+        return ''
+
+
+class HTMLMinifier(TokenMinifier):
+    """
+    HTML minifier.
+
+    Comments are removed, except conditional comments and comments that
+    start with `<!--!`. Runs of whitespace are collapsed into one space, in
+    text and between attributes. The contents of `<pre>`, `<textarea>`,
+    `<script>`, and `<style>` are left alone.
+    """
+    TOKEN = re.compile(
+        r'''
+        (?P<comment><!--.*?(?:-->|\Z))
+        |(?P<raw><(?P<name>pre|textarea|script|style)\b
+            (?:[^>"']|"[^"]*"|'[^']*')*>.*?(?:</(?P=name)\s*>|\Z))
+        |(?P<tag></?[A-Za-z!?]
+            (?:[^>"']|"[^"]*(?:"|\Z)|'[^']*(?:'|\Z))*(?:>|\Z))
+        |(?P<space>\s+)
+        |(?P<text>[^<\s]+|<)
+        ''',
+        re.S | re.I | re.X
+    )
+    # Conditional comments, and comments marked to be kept.
+    KEEP = ('<!--[', '<!--<!', '<!--!')
+    TAG_SPACE = re.compile(r'''("[^"]*"|'[^']*')|\s+''')
+    TAG_END = re.compile(r'\s+(/?>)\Z')
+
+    def __init__(self) -> None:
+        """
+        Create a new `HTMLMinifier` object.
+
+        :rtype: None
+        :return: None
+        """
+        super(HTMLMinifier, self).__init__()
+        self._space = False
+        self._started = False
+
+    def _token(self, kind: str, text: str) -> str:
+        """
+        Minify a token.
+
+        :type kind: str
+        :param kind: kind of the token
+        :type text: str
+        :param text: text of the token
+
+        :rtype: str
+        :return: minified text
+        """
+        if kind == 'space':
+            self._space = self._started
+            return ''
+        if kind == 'comment' and not text.startswith(self.KEEP):
+            return ''
+        if kind == 'tag':
+            text = self.TAG_SPACE.sub(lambda m: m.group(1) or ' ', text)
+            text = self.TAG_END.sub(r'\1', text)
+        out = ' ' + text if self._space else text
+        self._space = False
+        self._started = True
+        return out
+
+
+class CSSMinifier(TokenMinifier):
+    """
+    CSS minifier.
+
+    Comments are removed, except those that start with `/*!`. Runs of
+    whitespace are collapsed into one space, which is removed next to
+    punctuation that does not need it (but kept before `:` and `(`, where it
+    can be significant, e.g. `a :hover`, `and (...)`). A `;` before `}` is
+    removed.
+    """
+    TOKEN = re.compile(
+        r'''
+        (?P<comment>/\*.*?(?:\*/|\Z))
+        |(?P<string>"(?:[^"\\\n]|\\.)*(?:"|\\?\Z)|'(?:[^'\\\n]|\\.)*(?:'|\\?\Z))
+        |(?P<space>\s+)
+        |(?P<punct>[{};,:>()])
+        |(?P<other>[^\s"'/{};,:>()]+|.)
+        ''',
+        re.S | re.X
+    )
+    # Whitespace can be removed after and before these characters.
+    AFTER = set('{};,:>(')
+    BEFORE = set('{};,>)')
+
+    def __init__(self) -> None:
+        """
+        Create a new `CSSMinifier` object.
+
+        :rtype: None
+        :return: None
+        """
+        super(CSSMinifier, self).__init__()
+        self._last = ''
+        self._space = False
+        self._semicolon = False
+
+    def _token(self, kind: str, text: str) -> str:
+        """
+        Minify a token.
+
+        :type kind: str
+        :param kind: kind of the token
+        :type text: str
+        :param text: text of the token
+
+        :rtype: str
+        :return: minified text
+        """
+        if kind == 'space':
+            self._space = True
+            return ''
+        if kind == 'comment' and not text.startswith('/*!'):
+            return ''
+        out = self._separator(text)
+        if text == ';':
+            self._semicolon = True
+            return out
+        # Comments separate tokens, so no whitespace is needed after one.
+        self._last = '' if kind == 'comment' else text[-1]
+        return out + text
+
+    def _separator(self, text: str) -> str:
+        """
+        Return the `;` and whitespace held back before a token.
+
+        :type text: str
+        :param text: text of the token
+
+        :rtype: str
+        :return: text to write before the token
+        """
+        out = ''
+        if self._semicolon:
+            self._semicolon = False
+            if text != '}':
+                out = ';'
+                self._last = ';'
+        if self._space:
+            self._space = False
+            if self._last and self._last not in self.AFTER and \
+                    text[0] not in self.BEFORE:
+                out += ' '
+        return out
+
+    def _flush(self) -> str:
+        """
+        Return a `;` held back at the end of the file.
+
+        :rtype: str
+        :return: text
+        """
+        return ';' if self._semicolon else ''
+
+
+class JSMinifier(TokenMinifier):
+    """
+    JavaScript minifier.
+
+    Comments are removed, except those that start with `/*!`. Indentation
+    and blank lines are removed, and runs of whitespace are collapsed into
+    one space, which is removed next to punctuation that does not need it.
+    Line breaks are kept, since automatic semicolon insertion depends on
+    them, unless they follow or precede punctuation that makes them
+    meaningless (e.g. `,` or `{` at the end of a line). Strings, template
+    literals, and regular expression literals are left alone.
+    """
+    TOKEN = re.compile(
+        r'''
+        (?P<newline>[^\S\n]*\n\s*)
+        |(?P<space>[^\S\n]+)
+        |(?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+        |(?P<string>"(?:[^"\\\n]|\\.)*(?:"|\\?\Z)|'(?:[^'\\\n]|\\.)*(?:'|\\?\Z))
+        |(?P<template>`)
+        |(?P<slash>/)
+        |(?P<punct>[{}()\[\];,:=])
+        |(?P<word>[\w$.]+)
+        |(?P<other>.)
+        ''',
+        re.S | re.X
+    )
+    TEMPLATE = re.compile(r'(?:[^`\\$]|\\.|\$(?!\{))*(?:`|\$\{)', re.S)
+    REGEX = re.compile(
+        r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*'
+    )
+    # Whitespace can be removed next to these characters.
+    PUNCT = set('{}()[];,:=')
+    # Line breaks can be removed after and before these characters.
+    NEWLINE_AFTER = set('{([,;:=')
+    NEWLINE_BEFORE = set('})],;:=')
+    # A `/` after these characters (or keywords) starts a regular expression,
+    # not a division.
+    REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+    REGEX_KEYWORDS = {
+        'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete',
+        'void', 'throw', 'case', 'do', 'else', 'yield', 'await'
+    }
+
+    def __init__(self) -> None:
+        """
+        Create a new `JSMinifier` object.
+
+        :rtype: None
+        :return: None
+        """
+        super(JSMinifier, self).__init__()
+        self._last = ''
+        self._gap = ''
+        # Last significant token, to tell regular expressions from
+        # divisions.
+        self._prev = ''
+        # Whether the next token continues a template literal.
+        self._template = False
+        # `{` (or `${`, in a template literal) that are not closed yet.
+        self._braces = []
+
+    def _regex_allowed(self) -> bool:
+        """
+        Determine if a `/` starts a regular expression literal.
+
+        :rtype: bool
+        :return: whether a regular expression may follow
+        """
+        prev = self._prev
+        if not prev:
+            return True
+        if prev in self.REGEX_KEYWORDS:
+            return True
+        return prev[-1] in self.REGEX_AFTER or prev[-1] == '}'
+
+    def _match(self, buffer: str, pos: int, final: bool) -> Tuple[str, str]:
+        """
+        Match the next token, in code or in a template literal.
+
+        :type buffer: str
+        :param buffer: text not minified yet
+        :type pos: int
+        :param pos: position of the next token in `buffer`
+        :type final: bool
+        :param final: whether `buffer` runs to the end of the file
+
+        :rtype: Tuple[str, str]
+        :return: kind and text of the token, or None if there is none
+        """
+        if self._template:
+            m = self.TEMPLATE.match(buffer, pos)
+            return ('template', m.group()) if m else None
+        token = super(JSMinifier, self)._match(buffer, pos, final)
+        if token[0] == 'slash' and self._regex_allowed():
+            m = self.REGEX.match(buffer, pos)
+            if m:
+                return 'regex', m.group()
+            if not final and '\n' not in buffer[pos:]:
+                return None
+        return token
+
+    def _token(self, kind: str, text: str) -> str:
+        """
+        Minify a token.
+
+        :type kind: str
+        :param kind: kind of the token
+        :type text: str
+        :param text: text of the token
+
+        :rtype: str
+        :return: minified text
+        """
+        if kind == 'newline' or kind == 'space' or \
+                (kind == 'comment' and not text.startswith('/*!')):
+            self._skip(kind, text)
+            return ''
+        if kind == 'template' and self._template:
+            return self._template_rest(text)
+        out = self._separator(text)
+        if kind == 'template':
+            self._template = True
+        elif text == '{':
+            self._braces.append('{')
+        elif text == '}' and self._braces:
+            self._template = self._braces.pop() == '${'
+        self._prev = text
+        self._last = text[-1]
+        return out + text
+
+    def _skip(self, kind: str, text: str) -> None:
+        """
+        Remove whitespace or a comment, and remember the gap it leaves.
+
+        :type kind: str
+        :param kind: kind of the token
+        :type text: str
+        :param text: text of the token
+
+        :rtype: None
+        :return: None
+        """
+        if kind == 'newline' or (kind == 'comment' and '\n' in text):
+            self._gap = '\n'
+        elif not self._gap:
+            self._gap = ' '
+
+    def _template_rest(self, text: str) -> str:
+        """
+        Minify the rest of a template literal, up to its end or the next `${`.
+
+        :type text: str
+        :param text: text of the token
+
+        :rtype: str
+        :return: minified text
+        """
+        self._template = False
+        if text.endswith('${'):
+            self._braces.append('${')
+            self._prev = '{'
+        else:
+            self._prev = '`'
+        self._last = text[-1]
+        return text
+
+    def _separator(self, text: str) -> str:
+        """
+        Return the whitespace to keep before a token, if any.
+
+        :type text: str
+        :param text: text of the token
+
+        :rtype: str
+        :return: a line break, a space, or nothing
+        """
+        gap, self._gap = self._gap, ''
+        if not gap or not self._last:
+            return ''
+        c, t = self._last, text[0]
+        if gap == '\n':
+            if c in self.NEWLINE_AFTER or t in self.NEWLINE_BEFORE:
+                return ''
+            return '\n'
+        return '' if c in self.PUNCT or t in self.PUNCT else ' '
+
+
+class Pipeline(Minifier):
+    """
+    Minifier that feeds the output of each minifier into the next.
+    """
+
+    def __init__(self, minifiers: List[Minifier]) -> None:
+        """
+        Create a new `Pipeline` object.
+
+        :type minifiers: List[Minifier]
+        :param minifiers: minifiers, in order
+
+        :rtype: None
+        :return: None
+        """
+        super(Pipeline, self).__init__()
+        self.minifiers = minifiers
+
+    def feed(self, text: str) -> str:
+        """
+        Minify the next chunk of a file.
+
+        :type text: str
+        :param text: next chunk of the file
+
+        :rtype: str
+        :return: minified text, so far
+        """
+        for minifier in self.minifiers:
+            text = minifier.feed(text)
+        return text
+
+    def close(self) -> str:
+        """
+        Minify the rest of a file.
+
+        :rtype: str
+        :return: the rest of the minified text
+        """
+        text = ''
+        for minifier in self.minifiers:
+            text = minifier.feed(text) + minifier.close()
+        return text
+
+
+# Built-in minifiers, by name.
+MINIFIERS = {
+    'html': HTMLMinifier,
+    'css': CSSMinifier,
+    'js': JSMinifier,
+}
+
+# Minifiers of each extension, unless `statikos.yml` says otherwise.
+TRANSFORMS = {
+    '.html': 'html',
+    '.htm': 'html',
+    '.css': 'css',
+    '.js': 'js',
+    '.mjs': 'js',
+}
+
+
+def load_minifier(name: str) -> type:
+    """
+    Load a minifier class.
+
+    A minifier is either built in (`html`, `css`, `js`), or named by the
+    module and the attribute it is defined in (e.g.
+    `example.minifiers:SVGMinifier`). Any class whose instances have the
+    `feed` and `close` methods of `Minifier` can be used.
+
+    :type name: str
+    :param name: name of the minifier
+
+    :rtype: type
+    :return: minifier class
+    """
+    if name in MINIFIERS:
+        return MINIFIERS[name]
+    module, _, attribute = name.partition(':')
+    try:
+        return getattr(importlib.import_module(module), attribute)
+    except (ImportError, AttributeError, ValueError):
+        raise InvalidConfig(reason=f'minifier `{name}` could not be loaded.')
+
+
+def create_minifier(names: List[str]) -> Minifier:
+    """
+    Create a minifier, or a pipeline of minifiers.
+
+    :type names: List[str]
+    :param names: names of the minifiers, in order
+
+    :rtype: Minifier
+    :return: a minifier
+    """
+    minifiers = [load_minifier(name)() for name in names]
+    return minifiers[0] if len(minifiers) == 1 else Pipeline(minifiers)
+
+
+def minify_file(src: str, dst: str, names: List[str]) -> bool:
+    """
+    Minify a file.
+
+    The file is read, minified, and written in chunks, so memory use does not
+    depend on its size. Files that are not UTF-8 are not minified.
+
+    :type src: str
+    :param src: path to the file to minify
+    :type dst: str
+    :param dst: path to write the minified file to
+    :type names: List[str]
+    :param names: names of the minifiers to apply, in order
+
+    :rtype: bool
+    :return: whether the file was minified
+    """
+    minifier = create_minifier(names)
+    tmp = f'{dst}.tmp'
+    try:
+        with open(src, encoding='utf-8', newline='') as i, \
+                open(tmp, 'w', encoding='utf-8', newline='') as o:
+            for chunk in iter(lambda: i.read(CHUNK_SIZE), ''):
+                o.write(minifier.feed(chunk))
+            o.write(minifier.close())
+    except UnicodeDecodeError:
+        os.remove(tmp)
+        return False
+    os.replace(tmp, dst)
+    return True
+
+
+def _minify_file(args: Tuple[str, str, List[str], int]) -> list:
+    """
+    Minify a file in a worker process and return the digest of the output.
+
+    :type args: Tuple[str, str, List[str], int]
+    :param args: source, destination, minifiers, and part size
+
+    :rtype: list
+    :return: size, MD5 hex digest, and ETag of the minified file, or None if
+        the file was not minified
+    """
+    src, dst, names, part_size = args
+    if not minify_file(src, dst, names):
+        return None
+    digest = hash_file(dst, part_size)
+    return [os.path.getsize(dst), digest.md5, digest.etag]
+
+
+class Minify(CachedStage):
+    """
+    Sync stage that minifies HTML, CSS, and JavaScript files.
+
+    Each extension is mapped to a list of minifiers (see `load_minifier`)
+    that are applied in order, so the built-in minifiers can be replaced or
+    followed by others. Files are minified in a process pool, and the
+    minified files are cached in `cache_dir` by the content hash of the
+    original file and the minifiers, so unchanged files are never minified
+    twice. A minified file is only used if it is smaller.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        transforms: dict = None,
+        processes: int = None,
+        part_size: int = DEFAULT_PART_SIZE
+    ) -> None:
+        """
+        Create a new `Minify` object.
+
+        :type cache_dir: str
+        :param cache_dir: path to the directory of minified files
+        :type transforms: dict
+        :param transforms: a dict of extensions to names of minifiers (or
+            lists of them), merged into `TRANSFORMS`; None disables an
+            extension
+        :type processes: int
+        :param processes: number of processes to minify files with
+        :type part_size: int
+        :param part_size: size of each part of a multipart upload
+
+        :rtype: None
+        :return: None
+        """
+        self.cache_dir = cache_dir
+        self.transforms = {}
+        for extension, names in dict(TRANSFORMS, **(transforms or {})).items():
+            if not names:
+                continue
+            if isinstance(names, str):
+                names = [names]
+            self.transforms[extension.lower()] = (
+                list(names), self._transform_key(names)
+            )
+        self.processes = processes
+        self.part_size = part_size
+        self.saved = 0
+
+    @staticmethod
+    def _transform_key(names: List[str]) -> str:
+        """
+        Return the cache key of a list of minifiers.
+
+        The key covers the `VERSION` of each minifier, so that changing a
+        minifier invalidates the files it minified.
+
+        :type names: List[str]
+        :param names: names of the minifiers
+
+        :rtype: str
+        :return: cache key
+        """
+        versions = [
+            f'{name}@{getattr(load_minifier(name), "VERSION", "")}'
+            for name in names
+        ]
+        return hashlib.sha256(
+            ','.join(versions).encode()
+        ).hexdigest()[:12]
+
+    def _transform(self, f: LocalFile) -> Union[Tuple[List[str], str], None]:
+        """
+        Return the minifiers of a file.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+
+        :rtype: Tuple[List[str], str]
+        :return: names of the minifiers and their cache key, or None if the
+            file is not minified
+        """
+        if (f.headers or {}).get('ContentEncoding'):
+            return None
+        return self.transforms.get(os.path.splitext(f.key)[1].lower())
+
+    def _path(self, f: LocalFile) -> str:
+        """
+        Return the path to a minified file in the cache.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+
+        :rtype: str
+        :return: path to the minified file
+        """
+        extension = os.path.splitext(f.key)[1].lower()
+        key = self._transform(f)[1]
+        return os.path.join(self.cache_dir, f'{f.hash}-{key}{extension}')
+
+    def __call__(self, files: List[LocalFile]) -> List[LocalFile]:
+        """
+        Replace files with their minified versions.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+
+        :rtype: List[statikos.sync.LocalFile]
+        :return: local files, with minified versions
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index = self._load_index()
+        used = {}
+        jobs = []
+        for f in files:
+            transform = self._transform(f)
+            if transform is None:
+                continue
+            path = self._path(f)
+            name = os.path.basename(path)
+            if name in used:
+                continue
+            if name in index and \
+                    (index[name] is None or os.path.exists(path)):
+                used[name] = index[name]
+            else:
+                used[name] = None
+                jobs.append((f.path, path, transform[0], self.part_size))
+        for job, result in zip(jobs, self._map(_minify_file, jobs)):
+            used[os.path.basename(job[1])] = result
+        self._save_index(used)
+        self._prune(used)
+        return self._minified(files, used)
+
+    def _minified(self, files: List[LocalFile],
+                  index: dict) -> List[LocalFile]:
+        """
+        Substitute minified files where they are smaller.
+
+        :type files: List[statikos.sync.LocalFile]
+        :param files: local files
+        :type index: dict
+        :param index: a dict of cache keys to [size, MD5, ETag] (or None)
+
+        :rtype: List[statikos.sync.LocalFile]
+        :return: local files, with minified versions
+        """
+        self.saved = 0
+        output = []
+        for f in files:
+            if self._transform(f) is None:
+                output.append(f)
+                continue
+            path = self._path(f)
+            entry = index[os.path.basename(path)]
+            if entry is None or entry[0] >= f.size:
+                output.append(f)
+                continue
+            size, md5, etag = entry
+            output.append(
+                f._replace(path=path, size=size, hash=md5, etag=etag)
+            )
+            self.saved += f.size - size
+        return output
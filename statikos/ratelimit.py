@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Rate limiting module."""
+
+import threading
+import time
+
+
+class TokenBucket():
+    """
+    Thread-safe token bucket.
+
+    Tokens are added at `rate` per second, up to `capacity`. Each request
+    takes one token; a request that finds the bucket empty reserves a token
+    from the future and sleeps until it is due, so callers are served in the
+    order they arrive and the long-run rate never exceeds `rate`.
+
+    A single bucket is meant to be shared by every client that counts against
+    the same account limit (e.g. all CloudFormation clients in a fleet
+    deploy).
+    """
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        """
+        Create a new, full `TokenBucket` object.
+
+        :type rate: float
+        :param rate: tokens added per second
+        :type capacity: float
+        :param capacity: maximum number of tokens (default: `rate`)
+
+        :rtype: None
+        :return: None
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting until one is available.
+
+        :rtype: float
+        :return: seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+        return wait
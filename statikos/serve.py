@@ -0,0 +1,580 @@
+# -*- coding: utf-8 -*-
+"""Local preview server module."""
+
+import asyncio
+import re
+from email.utils import formatdate
+from http import HTTPStatus
+from typing import Callable, List, Tuple
+from urllib.parse import unquote, urlsplit
+
+from .compress import ENCODINGS
+from .invalidation import INDEX_DOCUMENT
+from .sync import LocalFile, content_type
+
+ERROR_DOCUMENT = '404.html'
+
+IDENTITY = 'identity'
+
+# Encodings in order of preference, when the client accepts them equally.
+PREFERENCE = ['br', 'gzip', IDENTITY]
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+# Open file limit to raise to when there is no hard limit.
+MAX_OPEN_FILES = 65536
+
+
+def to_header(name: str) -> str:
+    """
+    Convert the name of an S3 object parameter to an HTTP header name.
+
+    Example:
+
+    >>> to_header('CacheControl')
+    'Cache-Control'
+
+    :type name: str
+    :param name: name of the parameter
+
+    :rtype: str
+    :return: name of the header
+    """
+    return re.sub(r'(?<=[a-z])(?=[A-Z])', '-', name)
+
+
+def routes(files: List[LocalFile], variants: List[LocalFile] = None) -> dict:
+    """
+    Map object keys to the files served for them, by content encoding.
+
+    `files` are the files as they would be uploaded without compression, and
+    `variants` the output of the compression stage (see
+    `statikos.compress.Compress`). Every compressed variant is served for its
+    original key to clients that accept its encoding, including siblings
+    (e.g. `index.html.br`), which are never uploaded and so are not served
+    under their own key.
+
+    :type files: List[statikos.sync.LocalFile]
+    :param files: uncompressed local files
+    :type variants: List[statikos.sync.LocalFile]
+    :param variants: local files, with compressed variants
+
+    :rtype: dict
+    :return: a dict of keys to dicts of encodings to local files
+    """
+    table = {f.key: {IDENTITY: f} for f in files}
+    for f in variants or []:
+        encoding = (f.headers or {}).get('ContentEncoding')
+        if not encoding or table.get(f.key, {}).get(IDENTITY) == f:
+            continue
+        key = f.key
+        extension = ENCODINGS.get(encoding, ('', ))[0]
+        if extension and key.endswith(extension) and \
+                key[:-len(extension)] in table:
+            key = key[:-len(extension)]
+        table.setdefault(key, {})[encoding] = f
+    return table
+
+
+def negotiate(accept_encoding: str, available: List[str]) -> str:
+    """
+    Choose a content encoding from an `Accept-Encoding` header.
+
+    The encoding with the highest quality value wins; ties go to the smallest
+    encoding (`br`, then `gzip`, then `identity`). An encoding with a quality
+    value of zero is never chosen, except for `identity` as a last resort.
+
+    Example:
+
+    >>> negotiate('gzip, br;q=0.5', ['identity', 'gzip', 'br'])
+    'gzip'
+
+    :type accept_encoding: str
+    :param accept_encoding: value of the `Accept-Encoding` header
+    :type available: List[str]
+    :param available: available encodings
+
+    :rtype: str
+    :return: an encoding
+    """
+    quality = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        quality[coding.strip().lower()] = q
+    default = quality.get('*', 0.0)
+    quality.setdefault(IDENTITY, max(default, 0.001))
+    best, best_q = IDENTITY, 0.0
+    for encoding in PREFERENCE:
+        q = quality.get(encoding, default)
+        if encoding in available and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Response():
+    """
+    Precomputed response for a single file.
+    """
+    def __init__(self, f: LocalFile, vary: bool) -> None:
+        """
+        Create a new `Response` object.
+
+        The headers are the ones the object would be uploaded with (see
+        `statikos.sync.Sync`), and are encoded once, up front.
+
+        :type f: statikos.sync.LocalFile
+        :param f: local file
+        :type vary: bool
+        :param vary: whether the response varies by `Accept-Encoding`
+
+        :rtype: None
+        :return: None
+        """
+        headers = {'ContentType': content_type(f.key)}
+        headers.update(f.headers or {})
+        lines = [
+            f'{to_header(k)}: {v}' for k, v in sorted(headers.items())
+            if isinstance(v, str)
+        ]
+        lines.append(f'ETag: "{f.etag}"')
+        if vary:
+            lines.append('Vary: Accept-Encoding')
+        self.path = f.path
+        self.size = f.size
+        self.etag = f'"{f.etag}"'
+        self.headers = ''.join(f'{line}\r\n' for line in lines).encode()
+        # Headers that a 304 response must repeat.
+        self.validators = ''.join(
+            f'{line}\r\n' for line in lines
+            if line.startswith(('Cache-Control', 'ETag', 'Vary'))
+        ).encode()
+
+
+class Server():
+    """
+    Local preview server that behaves like the deployed stack.
+
+    The server answers the way CloudFront and the S3 website endpoint would:
+    `index.html` is served for `/` and for every directory, a directory
+    without its trailing slash is redirected, and a missing object is
+    answered with `/404.html` and status 404. Every file is served with the
+    headers it would be uploaded with, including `Cache-Control` and
+    `Content-Encoding` from the sync stages, and with its S3 ETag, so
+    conditional requests get a 304. Compressed variants are negotiated from
+    the `Accept-Encoding` header.
+
+    The server is a single asyncio event loop. File bodies are sent with
+    `sendfile`, straight from the page cache to the socket, and connections
+    are kept alive, so thousands of concurrent clients cost one coroutine
+    each.
+    """
+    IDLE_TIMEOUT = 15
+    BACKLOG = 4096
+    MAX_HEADER_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        routes: dict,
+        index: str = INDEX_DOCUMENT,
+        error: str = ERROR_DOCUMENT,
+        idle_timeout: float = None
+    ) -> None:
+        """
+        Create a new `Server` object.
+
+        :type routes: dict
+        :param routes: a dict of keys to dicts of encodings to local files
+            (see `routes`)
+        :type index: str
+        :param index: name of the directory index document
+        :type error: str
+        :param error: key of the error document
+        :type idle_timeout: float
+        :param idle_timeout: seconds to keep an idle connection open
+
+        :rtype: None
+        :return: None
+        """
+        self.routes = {
+            key: {
+                encoding: Response(f, vary=len(variants) > 1)
+                for encoding, f in variants.items()
+            }
+            for key, variants in routes.items()
+        }
+        self.index = index
+        self.error = error
+        self.idle_timeout = idle_timeout or self.IDLE_TIMEOUT
+
+    def resolve(self, path: str) -> Tuple[int, str]:
+        """
+        Resolve a request path to a status and an object key.
+
+        :type path: str
+        :param path: URL path of the request
+
+        :rtype: Tuple[int, str]
+        :return: status, and the key to serve (or, for a redirect, the
+            location to redirect to)
+        """
+        key = unquote(path).lstrip('/')
+        if not key or key.endswith('/'):
+            key += self.index
+        if key in self.routes:
+            return HTTPStatus.OK, key
+        if f'{key}/{self.index}' in self.routes:
+            return HTTPStatus.FOUND, f'{path}/'
+        return HTTPStatus.NOT_FOUND, self.error
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Serve requests on a connection until it is closed or goes idle.
+
+        :type reader: asyncio.StreamReader
+        :param reader: connection reader
+        :type writer: asyncio.StreamWriter
+        :param writer: connection writer
+
+        :rtype: None
+        :return: None
+        """
+        try:
+            keep_alive = True
+            while keep_alive:
+                head = await asyncio.wait_for(
+                    reader.readuntil(b'\r\n\r\n'), self.idle_timeout
+                )
+                keep_alive = await self._respond(head, reader, writer)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(
+        self,
+        head: bytes,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> bool:
+        """
+        Answer a single request.
+
+        :type head: bytes
+        :param head: request line and headers
+        :type reader: asyncio.StreamReader
+        :param reader: connection reader
+        :type writer: asyncio.StreamWriter
+        :param writer: connection writer
+
+        :rtype: bool
+        :return: whether to keep the connection alive
+        """
+        try:
+            method, target, version, headers = self._parse(head)
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            self._write(writer, HTTPStatus.BAD_REQUEST, keep_alive=False)
+            return False
+        if length:
+            await reader.readexactly(length)
+        keep_alive = self._keep_alive(version, headers)
+        if method not in ('GET', 'HEAD'):
+            self._write(
+                writer,
+                HTTPStatus.METHOD_NOT_ALLOWED,
+                b'Allow: GET, HEAD\r\n',
+                keep_alive=keep_alive,
+                body=method != 'HEAD'
+            )
+            return keep_alive
+        status, key = self.resolve(urlsplit(target).path)
+        if status == HTTPStatus.FOUND:
+            self._redirect(writer, key, keep_alive, method == 'GET')
+        elif key not in self.routes:
+            self._write(
+                writer, status, keep_alive=keep_alive, body=method == 'GET'
+            )
+        else:
+            await self._send(
+                writer, status, self.routes[key], headers, keep_alive,
+                method == 'GET'
+            )
+        return keep_alive
+
+    @staticmethod
+    def _parse(head: bytes) -> Tuple[str, str, str, dict]:
+        """
+        Parse the request line and headers of a request.
+
+        Raises `ValueError` if the request line is malformed.
+
+        :type head: bytes
+        :param head: request line and headers
+
+        :rtype: Tuple[str, str, str, dict]
+        :return: method, target, HTTP version, and a dict of lowercase header
+            names to values
+        """
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, version = lines[0].split(' ')
+        headers = {}
+        for line in filter(None, lines[1:]):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    @staticmethod
+    def _keep_alive(version: str, headers: dict) -> bool:
+        """
+        Determine if the client wants the connection kept alive.
+
+        :type version: str
+        :param version: HTTP version of the request
+        :type headers: dict
+        :param headers: request headers
+
+        :rtype: bool
+        :return: whether to keep the connection alive
+        """
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            return connection != 'close'
+        return connection == 'keep-alive'
+
+    def _redirect(
+        self,
+        writer: asyncio.StreamWriter,
+        location: str,
+        keep_alive: bool,
+        body: bool
+    ) -> None:
+        """
+        Redirect a request for a directory to the directory with a slash.
+
+        :type writer: asyncio.StreamWriter
+        :param writer: connection writer
+        :type location: str
+        :param location: location to redirect to
+        :type keep_alive: bool
+        :param keep_alive: whether to keep the connection alive
+        :type body: bool
+        :param body: whether to send the body (`False` for a HEAD request)
+
+        :rtype: None
+        :return: None
+        """
+        self._write(
+            writer,
+            HTTPStatus.FOUND,
+            f'Location: {location}\r\n'.encode('latin-1'),
+            keep_alive=keep_alive,
+            body=body
+        )
+
+    @staticmethod
+    def _not_modified(response: Response, headers: dict) -> bool:
+        """
+        Determine if the client already has the current version of a file.
+
+        :type response: Response
+        :param response: response for the file
+        :type headers: dict
+        :param headers: request headers
+
+        :rtype: bool
+        :return: whether `If-None-Match` matches the ETag of the file
+        """
+        return headers.get('if-none-match') in (response.etag, '*')
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        variants: dict,
+        headers: dict,
+        keep_alive: bool,
+        body: bool
+    ) -> None:
+        """
+        Send a file, in the encoding the client prefers.
+
+        :type writer: asyncio.StreamWriter
+        :param writer: connection writer
+        :type status: http.HTTPStatus
+        :param status: response status
+        :type variants: dict
+        :param variants: a dict of encodings to responses
+        :type headers: dict
+        :param headers: request headers
+        :type keep_alive: bool
+        :param keep_alive: whether to keep the connection alive
+        :type body: bool
+        :param body: whether to send the body (`False` for a HEAD request)
+
+        :rtype: None
+        :return: None
+        """
+        response = variants[negotiate(
+            headers.get('accept-encoding'), variants
+        )]
+        if status == HTTPStatus.OK and self._not_modified(response, headers):
+            self._write(
+                writer,
+                HTTPStatus.NOT_MODIFIED,
+                response.validators,
+                keep_alive=keep_alive
+            )
+            return
+        writer.write(self._head(status, keep_alive) + response.headers +
+                     b'Content-Length: %d\r\n\r\n' % response.size)
+        await writer.drain()
+        if body and response.size:
+            with open(response.path, 'rb') as f:
+                await asyncio.get_running_loop().sendfile(
+                    writer.transport, f
+                )
+
+    def _head(self, status: HTTPStatus, keep_alive: bool) -> bytes:
+        """
+        Encode the status line and the headers common to every response.
+
+        :type status: http.HTTPStatus
+        :param status: response status
+        :type keep_alive: bool
+        :param keep_alive: whether to keep the connection alive
+
+        :rtype: bytes
+        :return: status line and headers
+        """
+        return (
+            f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            f'Date: {formatdate(usegmt=True)}\r\n'
+            'Server: statikos\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+        ).encode('latin-1')
+
+    def _write(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        headers: bytes = b'',
+        keep_alive: bool = True,
+        body: bool = True
+    ) -> None:
+        """
+        Write a response with a short plain text body (none, for a 304).
+
+        :type writer: asyncio.StreamWriter
+        :param writer: connection writer
+        :type status: http.HTTPStatus
+        :param status: response status
+        :type headers: bytes
+        :param headers: additional headers
+        :type keep_alive: bool
+        :param keep_alive: whether to keep the connection alive
+        :type body: bool
+        :param body: whether to send the body (`False` for a HEAD request)
+
+        :rtype: None
+        :return: None
+        """
+        head = self._head(status, keep_alive) + headers
+        if status == HTTPStatus.NOT_MODIFIED:
+            writer.write(head + b'\r\n')
+            return
+        text = status.phrase.encode()
+        writer.write(
+            head + b'Content-Type: text/plain\r\n' +
+            b'Content-Length: %d\r\n\r\n' % len(text) + (text if body else b'')
+        )
+
+    async def start(
+        self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+    ) -> asyncio.AbstractServer:
+        """
+        Start listening for connections.
+
+        :type host: str
+        :param host: address to listen on
+        :type port: int
+        :param port: port to listen on (`0` for any free port)
+
+        :rtype: asyncio.AbstractServer
+        :return: the listening server
+        """
+        _raise_open_file_limit()
+        return await asyncio.start_server(
+            self.handle,
+            host,
+            port,
+            backlog=self.BACKLOG,
+            limit=self.MAX_HEADER_SIZE
+        )
+
+    async def serve_forever(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        callback: Callable[[str], None] = None
+    ) -> None:
+        """
+        Serve requests until cancelled.
+
+        :type host: str
+        :param host: address to listen on
+        :type port: int
+        :param port: port to listen on (`0` for any free port)
+        :type callback: Callable[[str], None]
+        :param callback: called with the URL of the server once it listens
+
+        :rtype: None
+        :return: None
+        """
+        server = await self.start(host, port)
+        async with server:
+            if callback:
+                address, port = server.sockets[0].getsockname()[:2]
+                callback(f'http://{address}:{port}/')
+            await server.serve_forever()
+
+
+def _raise_open_file_limit() -> None:
+    """
+    Raise the soft limit on open files to the hard limit.
+
+    Every connection holds a socket, and every response briefly holds a
+    file, so the default soft limit (often 1024) caps the number of
+    concurrent connections well below what the server can handle.
+
+    :rtype: None
+    :return: None
+    """
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY:
+        hard = MAX_OPEN_FILES
+    if soft != resource.RLIM_INFINITY and soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
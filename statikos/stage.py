@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Sync stage module."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Set
+
+from . import utils
+
+
+class CachedStage():
+    """
+    Base class of sync stages that cache their output in `cache_dir`.
+
+    Output files are named by cache keys, and `index.json` maps each key to
+    what the stage recorded about its output (None for a file that was not
+    kept). After each run, the index only holds the keys that were used, and
+    the files it no longer refers to are removed.
+
+    Subclasses set `cache_dir` and `processes`.
+    """
+    cache_dir = None
+    processes = None
+
+    @property
+    def index_file(self) -> str:
+        """
+        Return the path to the index of cached files.
+
+        :rtype: str
+        :return: path to the index
+        """
+        return os.path.join(self.cache_dir, 'index.json')
+
+    def _load_index(self, path: str = None) -> dict:
+        """
+        Load an index of cached files.
+
+        :type path: str
+        :param path: path to the index (default: `index_file`)
+
+        :rtype: dict
+        :return: a dict of cache keys to entries
+        """
+        try:
+            return utils.read_json_file(path or self.index_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: dict, path: str = None) -> None:
+        """
+        Save an index of cached files.
+
+        The index is written to a temporary file first, so that an interrupted
+        run never leaves a truncated index behind.
+
+        :type index: dict
+        :param index: a dict of cache keys to entries
+        :type path: str
+        :param path: path to the index (default: `index_file`)
+
+        :rtype: None
+        :return: None
+        """
+        path = path or self.index_file
+        tmp = f'{path}.tmp'
+        utils.write_json_file(index, tmp, compact=True)
+        os.replace(tmp, path)
+
+    def _cached_files(self, index: dict) -> Set[str]:
+        """
+        Return the names of the files in `cache_dir` that an index refers to.
+
+        :type index: dict
+        :param index: a dict of cache keys to entries
+
+        :rtype: Set[str]
+        :return: file names
+        """
+        return {name for name, entry in index.items() if entry is not None}
+
+    def _prune(self, index: dict, keep: List[str] = None) -> None:
+        """
+        Remove cached files that are no longer used.
+
+        :type index: dict
+        :param index: a dict of cache keys to entries
+        :type keep: List[str]
+        :param keep: paths to other files to keep (besides `index_file`)
+
+        :rtype: None
+        :return: None
+        """
+        names = self._cached_files(index)
+        keep = {self.index_file, *(keep or [])}
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name not in names and entry.path not in keep:
+                    os.remove(entry.path)
+
+    def _map(
+        self,
+        worker: Callable,
+        jobs: list,
+        initializer: Callable = None,
+        initargs: tuple = ()
+    ) -> list:
+        """
+        Run jobs in a process pool, or inline if there is only one.
+
+        :type worker: Callable
+        :param worker: module-level function to run each job with
+        :type jobs: list
+        :param jobs: arguments of each call to `worker`
+        :type initializer: Callable
+        :param initializer: function to set up each process with
+        :type initargs: tuple
+        :param initargs: arguments of `initializer`
+
+        :rtype: list
+        :return: results, in the order of `jobs`
+        """
+        if len(jobs) > 1:
+            with ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=initializer,
+                initargs=initargs
+            ) as executor:
+                return list(executor.map(worker, jobs))
+        if initializer is not None:
+            initializer(*initargs)
+        return [worker(job) for job in jobs]
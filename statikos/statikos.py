@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 """Main module."""
 
+import contextlib
+import hashlib
+import json
 import os
+import tempfile
+import time
+from typing import TYPE_CHECKING, List, Tuple
 
-from . import utils
-from .api import CloudFormation
+from . import __version__, trace, utils
 from .exceptions import ConfigNotFound
-from .template import create_template
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .api import CloudFormation, CloudFront  # noqa: F401
+    from .diff import ResourceChange  # noqa: F401
+    from .manifest import Plan  # noqa: F401
+    from .sync import Sync, SyncResult  # noqa: F401
 
 
 class Statikos():
@@ -19,6 +29,15 @@ class Statikos():
     STATIKOS_DIR = '.statikos'
     STATIKOS_YML = 'statikos.yml'
     CLOUDFORMATION_JSON = os.path.join(STATIKOS_DIR, 'cloudformation.json')
+    DEPLOYED_JSON = os.path.join(STATIKOS_DIR, 'deployed.json')
+    MANIFEST_JSON = os.path.join(STATIKOS_DIR, 'manifest.json')
+    HASHES_JSON = os.path.join(STATIKOS_DIR, 'hashes.json')
+    JOURNAL_JSONL = os.path.join(STATIKOS_DIR, 'journal.jsonl')
+    CACHE_DIR = os.path.join(STATIKOS_DIR, 'cache')
+    STATE_JSON = os.path.join(STATIKOS_DIR, 'state.json')
+    SOURCE = 'build'
+    STAGING_PREFIX = 'statikos/'
+    STATE_TTL = 3600
 
     def __init__(self, *args: list, **kwargs: dict) -> None:
         """
@@ -27,10 +46,132 @@ class Statikos():
         :rtype: None
         :return: None
         """
+        self._cfn = None
+        self._cloudfront = None
+        self.echo = None
+        self.root = ''
+        self.limiters = {}
+        self.max_pool_connections = {}
+        self.tracer = None
         self.__dict__.update(**kwargs)
-        self.cfn = CloudFormation()
         self.config = self._get_config()
 
+    @property
+    def cfn(self) -> 'CloudFormation':
+        """
+        Return the CloudFormation client.
+
+        The client (and boto3) is only imported and created on first access,
+        so that commands that never talk to AWS do not pay for it.
+
+        :rtype: statikos.api.CloudFormation
+        :return: a CloudFormation instance
+        """
+        if self._cfn is None:
+            from .api import CloudFormation
+            self._cfn = CloudFormation(**self._aws('cloudformation'))
+        return self._cfn
+
+    @property
+    def cloudfront(self) -> 'CloudFront':
+        """
+        Return the CloudFront client.
+
+        :rtype: statikos.api.CloudFront
+        :return: a CloudFront instance
+        """
+        if self._cloudfront is None:
+            from .api import CloudFront
+            self._cloudfront = CloudFront(**self._aws('cloudfront'))
+        return self._cloudfront
+
+    @property
+    def bucket_name(self) -> str:
+        """
+        Return the name of the bucket that serves the static content.
+
+        This is the `S3BucketRoot` bucket in the CloudFormation template.
+
+        :rtype: str
+        :return: name of the bucket
+        """
+        return f"{self.config['stack_name']}-root"
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Return the fingerprint of the infrastructure.
+
+        The CloudFormation template is fully determined by `statikos.yml` and
+        the version of Statikos that generates it, so a hash of the two
+        identifies the template without generating it.
+
+        :rtype: str
+        :return: SHA-256 hex digest
+        """
+        sha256 = hashlib.sha256(__version__.encode())
+        config = utils.read_file(self._path(self.STATIKOS_YML))
+        sha256.update(config.encode())
+        return sha256.hexdigest()
+
+    def _path(self, *paths: str) -> str:
+        """
+        Return a path relative to the root directory of the service.
+
+        :type paths: str
+        :param paths: path components
+
+        :rtype: str
+        :return: path
+        """
+        return os.path.join(self.root, *paths)
+
+    def _echo(self, message: str) -> None:
+        """
+        Report progress through the `echo` callable, if one was given.
+
+        :type message: str
+        :param message: message to report
+
+        :rtype: None
+        :return: None
+        """
+        if self.echo:
+            self.echo(message)
+
+    def _aws(self, service: str, max_pool_connections: int = None) -> dict:
+        """
+        Return keyword arguments for a `statikos.api.AWS` object.
+
+        These come from the `aws` section of `statikos.yml`. Any options
+        other than `profile` and `max_pool_connections` are passed through as
+        `botocore.config.Config` options. The connection pool is the largest
+        of the configured size, `max_pool_connections`, and the size set for
+        the service on this object (e.g. by a fleet whose services share
+        clients).
+
+        :type service: str
+        :param service: name of the AWS service
+        :type max_pool_connections: int
+        :param max_pool_connections: number of threads that use the client
+
+        :rtype: dict
+        :return: keyword arguments
+        """
+        settings = dict(self.config.get('aws') or {})
+        pools = [
+            settings.pop('max_pool_connections', None),
+            max_pool_connections,
+            self.max_pool_connections.get(service),
+        ]
+        return {
+            'profile': settings.pop('profile', None),
+            'limiter': self.limiters.get(service),
+            'max_pool_connections': max(filter(None, pools), default=None),
+            'config': settings,
+            'tracer': self.tracer,
+        }
+
     def _get_config(self) -> dict:
         """
         Retrieve contents of `statikos.yml`.
@@ -39,7 +180,7 @@ class Statikos():
         :return: contents of `statikos.yml`
         """
         try:
-            return utils.read_yaml_file(self.STATIKOS_YML)
+            return utils.read_yaml_file(self._path(self.STATIKOS_YML))
         except FileNotFoundError:
             raise ConfigNotFound
 
@@ -55,33 +196,364 @@ class Statikos():
         :rtype: None
         :return: None
         """
-        utils.mkdir(self.STATIKOS_DIR)
-        utils.touch(self.CLOUDFORMATION_JSON)
+        utils.mkdir(self._path(self.STATIKOS_DIR))
+        utils.touch(self._path(self.CLOUDFORMATION_JSON))
+
+    def _get_state(self) -> dict:
+        """
+        Retrieve contents of `.statikos/state.json`.
+
+        :rtype: dict
+        :return: contents of `.statikos/state.json`, or an empty dict
+        """
+        try:
+            return utils.read_json_file(self._path(self.STATE_JSON))
+        except (OSError, ValueError):
+            return {}
+
+    def _set_state(self, **kwargs: dict) -> None:
+        """
+        Update `.statikos/state.json`.
+
+        :rtype: None
+        :return: None
+        """
+        state = self._get_state()
+        state.update(**kwargs)
+        utils.mkdir(self._path(self.STATIKOS_DIR))
+        utils.write_json_file(
+            state, self._path(self.STATE_JSON), sort_keys=True
+        )
+
+    def stack_state(self, refresh: bool = False) -> dict:
+        """
+        Return the state of the CloudFormation stack.
+
+        The status, outputs, and physical resource IDs of the stack are cached
+        in `.statikos/state.json`, so that they are not looked up again by
+        every command. The cache is refreshed (one DescribeStacks and one
+        DescribeStackResources call) if it is older than the `ttl` in the
+        `state` section of `statikos.yml`, describes another stack, or
+        `refresh` is set. Commands that change the stack invalidate it.
+
+        Example:
+
+        {
+          "name": "example",
+          "id": "arn:aws:cloudformation:us-east-1:123456789012:stack/...",
+          "status": "UPDATE_COMPLETE",
+          "outputs": {},
+          "resources": {
+            "CloudFrontDistribution": "E2QWRUHAPOMQZL",
+            "S3BucketRoot": "example-root",
+            ...
+          },
+          "refreshed": 1571000000.0
+        }
+
+        :type refresh: bool
+        :param refresh: whether to refresh the cache even if it is fresh
+
+        :rtype: dict
+        :return: the state of the stack
+        """
+        stack_name = self.config['stack_name']
+        settings = self.config.get('state') or {}
+        ttl = settings.get('ttl', self.STATE_TTL)
+        stack = self._get_state().get('stack')
+        if not refresh and stack and stack.get('name') == stack_name and \
+                time.time() - stack.get('refreshed', 0) < ttl:
+            return stack
+        with trace.span(self.tracer, 'state'):
+            stack = self.cfn.describe(stack_name)
+        stack.update(name=stack_name, refreshed=time.time())
+        self._set_state(stack=stack)
+        return stack
+
+    def state(self, refresh: bool = False) -> dict:
+        """
+        Return the local state of the service, with fresh stack state.
+
+        :type refresh: bool
+        :param refresh: whether to refresh the stack state even if it is fresh
+
+        :rtype: dict
+        :return: contents of `.statikos/state.json`
+        """
+        self.stack_state(refresh=refresh)
+        return self._get_state()
+
+    def _source(self) -> str:
+        """
+        Return the directory of generated static content.
+
+        :rtype: str
+        :return: path to the directory
+        """
+        settings = self.config.get('sync') or {}
+        return self._path(settings.get('source', self.SOURCE))
+
+    def is_deployed(self) -> bool:
+        """
+        Determine if the current infrastructure is already deployed.
+
+        The fingerprint recorded in `.statikos/state.json` by the last deploy
+        is compared against the current fingerprint. If there is no record,
+        the fingerprint embedded in the deployed template is used instead
+        (one GetTemplate call), and recorded for next time.
+
+        :rtype: bool
+        :return: whether the current infrastructure is already deployed
+        """
+        fingerprint = self.fingerprint
+        state = self._get_state()
+        if 'fingerprint' in state:
+            return state['fingerprint'] == fingerprint
+        body = self.cfn.get_template(self.config['stack_name']) or {}
+        metadata = body.get('Metadata', {}).get('Statikos', {})
+        if metadata.get('Fingerprint') != fingerprint:
+            return False
+        self._set_state(fingerprint=fingerprint)
+        return True
 
     def create(self) -> None:
         """
         Create the CloudFormation template and parameters file.
 
+        The template is written as compact, canonical JSON (sorted keys, no
+        insignificant whitespace), so the same configuration always gives the
+        same file and as much of the template as possible fits under the
+        limit on template bodies (see `stage_template`). It carries the
+        fingerprint of the configuration in its metadata.
+
         :rtype: None
         :return: None
         """
-        self._configure()
-        template = create_template(parameters=self.config)
-        utils.write_json_file(template.to_dict(), self.CLOUDFORMATION_JSON)
+        with trace.span(self.tracer, 'create'):
+            self._configure()
+            template = self._template()
+            with trace.span(self.tracer, 'write'):
+                utils.write_json_file(
+                    template,
+                    self._path(self.CLOUDFORMATION_JSON),
+                    compact=True,
+                    sort_keys=True
+                )
+
+    def _template(self) -> dict:
+        """
+        Generate the CloudFormation template.
 
-    def deploy(self) -> None:
+        :rtype: dict
+        :return: the CloudFormation template
+        """
+        with trace.span(self.tracer, 'template'):
+            from .template import create_template
+            template = create_template(parameters=self.config).to_dict()
+        template['Metadata'] = {
+            'Statikos': {
+                'Fingerprint': self.fingerprint,
+                'Version': __version__,
+            }
+        }
+        return template
+
+    def deploy(
+        self, force: bool = False, wait: bool = None, validate: bool = False
+    ) -> None:
         """
-        Deploy the CloudFormation stack.
+        Deploy the CloudFormation stack and the static content.
+
+        The infrastructure phase is skipped entirely if the current
+        infrastructure is already deployed (see `is_deployed`), so a deploy in
+        which only content changed makes no CloudFormation calls. Otherwise,
+        the template is validated offline (see `validate_template`), and
+        whether the stack exists is taken from the cached stack state (see
+        `stack_state`), which is invalidated if the stack changes. The content
+        phase runs if the source directory exists.
+
+        :type force: bool
+        :param force: whether to deploy the stack even if it is unchanged
+        :type wait: bool
+        :param wait: whether to wait for the CloudFront invalidation
+        :type validate: bool
+        :param validate: whether to also validate the template with the
+            ValidateTemplate API endpoint
 
         :rtype: None
         :return: None
         """
-        self.create()
         stack_name = self.config['stack_name']
-        self.cfn.deploy(
-            stack_name=stack_name, template_file=self.CLOUDFORMATION_JSON
+        with trace.span(self.tracer, 'deploy'):
+            with trace.span(self.tracer, 'check'):
+                deployed = not force and self.is_deployed()
+            if not deployed:
+                self.create()
+                template_file = self._path(self.CLOUDFORMATION_JSON)
+                template_body = utils.read_file(template_file).encode()
+                template_hash = hashlib.sha256(template_body).hexdigest()
+                self.validate_template(template_body, template_hash)
+                template_url = self.stage_template(template_body)
+                status = self.stack_state()['status']
+                with trace.span(self.tracer, 'stack'):
+                    try:
+                        result = self.cfn.deploy(
+                            stack_name=stack_name,
+                            template_file=template_file,
+                            callback=self._echo_event,
+                            change_set_type='CREATE' if status
+                            in self.cfn.NEW_STACK_STATUSES else 'UPDATE',
+                            template_url=template_url,
+                            validate=validate
+                        )
+                    except Exception:
+                        self._set_state(stack=None)
+                        raise
+                state = {
+                    'fingerprint': self.fingerprint,
+                    'template_hash': template_hash,
+                }
+                if result['Executed']:
+                    state['stack'] = None
+                self._set_state(**state)
+                # Keep the deployed template, for `plan` to compare against.
+                utils.write_file(
+                    template_body.decode(), self._path(self.DEPLOYED_JSON)
+                )
+                self._echo_changes(result)
+            else:
+                self._echo(f'Stack `{stack_name}` is up to date.')
+            if os.path.isdir(self._source()):
+                self._echo(str(self.sync(wait=wait)))
+
+    def validate_template(
+        self, template_body: bytes, template_hash: str = None
+    ) -> None:
+        """
+        Validate the CloudFormation template offline.
+
+        The template is checked against the resource specification bundled
+        with Statikos (see `statikos.validation`), instead of with the
+        ValidateTemplate API endpoint. A template that passes is recorded in
+        `.statikos/state.json` by its hash (and the version of the resource
+        specification), so it is not checked again.
+
+        :type template_body: bytes
+        :param template_body: body of the CloudFormation template
+        :type template_hash: str
+        :param template_hash: SHA-256 hex digest of the template body
+
+        :rtype: None
+        :return: None
+        """
+        from . import validation
+        template_hash = template_hash or \
+            hashlib.sha256(template_body).hexdigest()
+        validated = {
+            'spec': validation.spec_version(),
+            'template_hash': template_hash,
+        }
+        if self._get_state().get('validated') == validated:
+            return
+        with trace.span(self.tracer, 'validate'):
+            errors = validation.validate(
+                json.loads(template_body), size=len(template_body)
+            )
+        if errors:
+            from .exceptions import TemplateValidationError
+            raise TemplateValidationError(
+                errors='\n'.join(f'  {e}' for e in errors)
+            )
+        self._set_state(validated=validated)
+
+    def stage_template(self, template_body: bytes) -> str:
+        """
+        Upload the CloudFormation template to S3 if it is too large to inline.
+
+        Templates up to `CloudFormation.MAX_TEMPLATE_BODY` bytes are passed
+        as the body of the request, and nothing is uploaded. Larger templates
+        are uploaded to the `bucket` in the `staging` section of
+        `statikos.yml`, under a key derived from their content (e.g.
+        `statikos/3f2a...9c0d.json`), so a template that was uploaded before
+        is not uploaded again.
+
+        :type template_body: bytes
+        :param template_body: body of the CloudFormation template
+
+        :rtype: str
+        :return: URL of the template in S3, or None if it was not uploaded
+        """
+        size = len(template_body)
+        if size <= self.cfn.MAX_TEMPLATE_BODY:
+            return None
+        settings = self.config.get('staging') or {}
+        bucket = settings.get('bucket')
+        if not bucket:
+            from .exceptions import TemplateTooLarge
+            raise TemplateTooLarge(
+                size=size, limit=self.cfn.MAX_TEMPLATE_BODY
+            )
+        from .api import S3
+        key = settings.get('prefix', self.STAGING_PREFIX) + \
+            f'{hashlib.sha256(template_body).hexdigest()}.json'
+        s3 = S3(**self._aws('s3'))
+        with trace.span(self.tracer, 'stage', bytes=size):
+            if not s3.object_exists(bucket, key):
+                s3.put_object(
+                    bucket,
+                    key,
+                    template_body,
+                    headers={'ContentType': 'application/json'}
+                )
+        return s3.object_url(bucket, key)
+
+    def _echo_event(self, event: dict) -> None:
+        """
+        Report a stack event.
+
+        Example:
+
+        12:00:01 CREATE_IN_PROGRESS  AWS::S3::Bucket  S3BucketRoot
+
+        :type event: dict
+        :param event: stack event
+
+        :rtype: None
+        :return: None
+        """
+        reason = event.get('ResourceStatusReason')
+        self._echo(
+            f"{event['Timestamp']:%H:%M:%S} {event['ResourceStatus']:<20}"
+            f" {event['ResourceType']}  {event['LogicalResourceId']}"
+            + (f'  {reason}' if reason else '')
         )
 
+    def _echo_changes(self, result: dict) -> None:
+        """
+        Report the resources changed by a deployment.
+
+        :type result: dict
+        :param result: result of `statikos.api.CloudFormation.deploy`
+
+        :rtype: None
+        :return: None
+        """
+        if not result['Executed']:
+            self._echo(f"Stack `{result['StackName']}` is up to date.")
+            return
+        changes = result['Changes']
+        self._echo(
+            f"Deployed stack `{result['StackName']}` "
+            f'({len(changes)} change(s)):'
+        )
+        for c in changes:
+            replacement = ' (replacement)' \
+                if c.get('Replacement') == 'True' else ''
+            self._echo(
+                f"  {c['Action']} {c['LogicalResourceId']} "
+                f"({c['ResourceType']}){replacement}"
+            )
+
     def remove(self) -> None:
         """
         Remove the CloudFormation stack.
@@ -90,4 +562,474 @@ class Statikos():
         :return: None
         """
         stack_name = self.config['stack_name']
-        self.cfn.delete(stack_name=stack_name)
+        with trace.span(self.tracer, 'remove'):
+            try:
+                self.cfn.delete(
+                    stack_name=stack_name, callback=self._echo_event
+                )
+            finally:
+                self._set_state(fingerprint=None, stack=None)
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._path(self.DEPLOYED_JSON))
+
+    def plan(
+        self, source: str = None, offline: bool = False
+    ) -> Tuple[List['ResourceChange'], 'Plan']:
+        """
+        Report what `deploy` would change, without changing anything.
+
+        The infrastructure (see `plan_stack`) and the static content (see
+        `plan_content`) are compared with what is deployed. An unchanged
+        service makes no AWS API calls at all, and a changed template costs
+        a single GetTemplate call (none if `offline` is set).
+
+        :type source: str
+        :param source: path to the directory of generated static content
+        :type offline: bool
+        :param offline: whether to compare the template with the copy kept
+            by the last deploy, instead of the deployed template
+
+        :rtype: Tuple[List[statikos.diff.ResourceChange], Plan]
+        :return: changes to the stack (or None if the deployed template is
+            unknown), and a plan of the content (or None if there is no
+            content)
+        """
+        with trace.span(self.tracer, 'plan'):
+            changes = self.plan_stack(offline=offline)
+            plan = self.plan_content(source=source)
+        self._echo_plan(changes, plan)
+        return changes, plan
+
+    def plan_stack(self, offline: bool = False) -> List['ResourceChange']:
+        """
+        Compare the CloudFormation template with the deployed template.
+
+        If the fingerprint recorded by the last deploy is current (see
+        `is_deployed`), the stack is unchanged and the template is not even
+        generated. Otherwise, the template is generated in memory and
+        compared with the deployed template (one GetTemplate call) or, if
+        `offline` is set, with the copy of it kept in `.statikos/deployed.json`
+        by the last deploy.
+
+        :type offline: bool
+        :param offline: whether to compare with the copy kept by the last
+            deploy
+
+        :rtype: List[statikos.diff.ResourceChange]
+        :return: changes, or None if the deployed template is unknown
+        """
+        from .diff import diff_templates
+        if self._get_state().get('fingerprint') == self.fingerprint:
+            return []
+        if offline:
+            try:
+                deployed = utils.read_json_file(
+                    self._path(self.DEPLOYED_JSON)
+                )
+            except (OSError, ValueError):
+                return None
+        else:
+            deployed = self.cfn.get_template(self.config['stack_name'])
+        return diff_templates(deployed, self._template())
+
+    def plan_content(self, source: str = None) -> 'Plan':
+        """
+        Compare the static content with the manifest of the root bucket.
+
+        The content is scanned and passed through the sync stages as `sync`
+        would (see `statikos.sync.Sync.plan`), so unchanged files are not read
+        again, but nothing is uploaded or deleted, and no request is made to
+        S3. If the manifest is missing or stale, the bucket is assumed to be
+        empty.
+
+        Planning has no side effects: the stages and the hash cache work on a
+        temporary mirror of `.statikos/cache` (see `utils.link_tree`), so the
+        caches are read but never written to or pruned. Output that was not
+        cached is produced in the mirror, and deleted with it.
+
+        :type source: str
+        :param source: path to the directory of generated static content
+
+        :rtype: statikos.manifest.Plan
+        :return: a plan (whose files to upload no longer exist locally), or
+            None if the source directory does not exist
+        """
+        from .hashing import HashCache
+        from .journal import Journal
+        from .manifest import Manifest
+        from .sync import Sync
+        settings = self.config.get('sync') or {}
+        source = source or self._source()
+        if not os.path.isdir(source):
+            return None
+        manifest = Manifest.load(
+            self._path(self.MANIFEST_JSON), self.bucket_name
+        )
+        if manifest.stale:
+            self._echo(
+                'The manifest is missing or stale, so the bucket is assumed '
+                'to be empty (run `statikos sync --refresh` to rebuild it).'
+            )
+        hash_cache = HashCache.load(self._path(self.HASHES_JSON))
+        with tempfile.TemporaryDirectory() as scratch:
+            cache_dir = os.path.join(scratch, 'cache')
+            utils.link_tree(self._path(self.CACHE_DIR), cache_dir)
+            hash_cache.filename = os.path.join(scratch, 'hashes.json')
+            return Sync(
+                None,
+                self.bucket_name,
+                source,
+                manifest,
+                hash_cache,
+                processes=settings.get('processes'),
+                delete=settings.get('delete', True),
+                stages=self._sync_stages(
+                    processes=settings.get('processes'), cache_dir=cache_dir
+                ),
+                tracer=self.tracer,
+                journal=Journal.load(
+                    self._path(self.JOURNAL_JSONL), self.bucket_name
+                )
+            ).plan()
+
+    def _echo_plan(
+        self, changes: List['ResourceChange'], plan: 'Plan'
+    ) -> None:
+        """
+        Report the changes found by `plan`.
+
+        Example:
+
+        Stack `example`: 1 change(s):
+          Modify CloudFrontDistribution (AWS::CloudFront::Distribution)
+            Properties/DistributionConfig/PriceClass
+        Content: 1 to upload, 1 to delete, 98 unchanged
+          + index.html
+          - old.html
+
+        :type changes: List[statikos.diff.ResourceChange]
+        :param changes: changes to the stack
+        :type plan: statikos.manifest.Plan
+        :param plan: plan of the content
+
+        :rtype: None
+        :return: None
+        """
+        stack_name = self.config['stack_name']
+        if changes is None:
+            self._echo(
+                f'Stack `{stack_name}`: the deployed template is unknown.'
+            )
+        elif not changes:
+            self._echo(f'Stack `{stack_name}` is up to date.')
+        else:
+            self._echo(f'Stack `{stack_name}`: {len(changes)} change(s):')
+            for c in changes:
+                self._echo(f'  {c.action} {c.logical_id} ({c.resource_type})')
+                for path in c.paths:
+                    self._echo(f'    {path}')
+        if plan is None:
+            self._echo('Content: the source directory does not exist.')
+            return
+        self._echo(f'Content: {plan}')
+        for f in plan.upload:
+            self._echo(f'  + {f.key}')
+        for key in plan.delete:
+            self._echo(f'  - {key}')
+
+    def sync(
+        self,
+        source: str = None,
+        workers: int = None,
+        refresh: bool = False,
+        wait: bool = None
+    ) -> 'SyncResult':
+        """
+        Upload new and changed static content to the root bucket.
+
+        What changed is determined from `.statikos/manifest.json`. If the
+        manifest is missing or stale, or `refresh` is set, it is rebuilt from
+        a listing of the bucket first. An interrupted sync is resumed from
+        `.statikos/journal.jsonl`. Objects that were overwritten or
+        deleted are then invalidated in the CloudFront distribution (see
+        `invalidate`), unless invalidation is disabled in `statikos.yml`.
+
+        `source` and `workers` default to the `sync` section of
+        `statikos.yml`, and `wait` to the `invalidation` section.
+
+        :type source: str
+        :param source: path to the directory of generated static content
+        :type workers: int
+        :param workers: number of concurrent uploads
+        :type refresh: bool
+        :param refresh: whether to rebuild the manifest from the bucket
+        :type wait: bool
+        :param wait: whether to wait for the invalidation to complete
+
+        :rtype: statikos.sync.SyncResult
+        :return: a summary of the sync
+        """
+        s = self._sync(source=source, workers=workers, refresh=refresh)
+        with trace.span(self.tracer, 'sync'):
+            result = s.run()
+            invalidation = self.config.get('invalidation') or {}
+            if result.changed and invalidation.get('enabled', True):
+                if wait is None:
+                    wait = invalidation.get('wait', False)
+                with trace.span(self.tracer, 'invalidate'):
+                    result.invalidated = self.invalidate(
+                        result.changed, wait=wait
+                    )
+        return result
+
+    def _sync(
+        self,
+        source: str = None,
+        workers: int = None,
+        refresh: bool = False
+    ) -> 'Sync':
+        """
+        Build a sync of static content to the root bucket.
+
+        :type source: str
+        :param source: path to the directory of generated static content
+        :type workers: int
+        :param workers: number of concurrent uploads
+        :type refresh: bool
+        :param refresh: whether to rebuild the manifest from the bucket
+
+        :rtype: statikos.sync.Sync
+        :return: a sync
+        """
+        from .api import S3
+        from .hashing import HashCache
+        from .journal import Journal
+        from .manifest import Manifest
+        from .sync import Sync
+        settings = self.config.get('sync') or {}
+        workers = workers or settings.get('workers', Sync.DEFAULT_WORKERS)
+        manifest = Manifest.load(
+            self._path(self.MANIFEST_JSON), self.bucket_name
+        )
+        if refresh:
+            manifest.stale = True
+        return Sync(
+            S3(**self._aws('s3', max_pool_connections=workers)),
+            self.bucket_name,
+            source or self._source(),
+            manifest,
+            HashCache.load(self._path(self.HASHES_JSON)),
+            workers=workers,
+            processes=settings.get('processes'),
+            delete=settings.get('delete', True),
+            stages=self._sync_stages(processes=settings.get('processes')),
+            tracer=self.tracer,
+            journal=Journal.load(
+                self._path(self.JOURNAL_JSONL), self.bucket_name
+            )
+        )
+
+    def watch(self, source: str = None, workers: int = None) -> None:
+        """
+        Upload static content to the root bucket as it changes.
+
+        The content is synced once (see `sync`), then the directory is
+        watched and each burst of changes is synced as it settles, without
+        scanning the whole directory again (see `statikos.watch.Watcher`).
+        Overwritten and deleted objects are invalidated in batches, unless
+        invalidation is disabled in `statikos.yml`. Watches until interrupted.
+
+        `source` and `workers` default to the `sync` section of
+        `statikos.yml`.
+
+        :type source: str
+        :param source: path to the directory of generated static content
+        :type workers: int
+        :param workers: number of concurrent uploads
+
+        :rtype: None
+        :return: None
+        """
+        from .watch import Watcher
+        settings = self.config.get('watch') or {}
+        invalidation = self.config.get('invalidation') or {}
+        s = self._sync(source=source, workers=workers)
+        watcher = Watcher(
+            s,
+            debounce=settings.get('debounce'),
+            max_delay=settings.get('max_delay'),
+            invalidate=self.invalidate
+            if invalidation.get('enabled', True) else None,
+            invalidation_interval=settings.get('invalidation_interval'),
+            echo=self._echo
+        )
+        self._echo(f'Watching {s.source} for changes...')
+        watcher.run()
+
+    def invalidate(self, keys: list, wait: bool = False) -> list:
+        """
+        Invalidate objects in the CloudFront distribution.
+
+        The smallest set of paths that covers the objects is invalidated, with
+        directories collapsed into wildcards if there would be more than
+        `max_paths` paths (see `statikos.invalidation.coalesce`). The ID of
+        the distribution comes from the cached stack state (see
+        `stack_state`).
+
+        :type keys: list
+        :param keys: object keys
+        :type wait: bool
+        :param wait: whether to wait for the invalidation to complete
+
+        :rtype: list
+        :return: invalidated paths
+        """
+        from . import invalidation
+        settings = self.config.get('invalidation') or {}
+        distribution_id = \
+            self.stack_state()['resources'].get('CloudFrontDistribution')
+        if not distribution_id:
+            return []
+        paths = invalidation.coalesce(
+            invalidation.paths(keys),
+            max_paths=settings.get('max_paths', invalidation.MAX_PATHS)
+        )
+        invalidation_id = self.cloudfront.create_invalidation(
+            distribution_id, paths
+        )
+        if wait:
+            self._echo(f'Waiting for invalidation `{invalidation_id}`...')
+            self.cloudfront.wait_for_invalidation(
+                distribution_id, invalidation_id
+            )
+        return paths
+
+    def serve(
+        self, source: str = None, host: str = None, port: int = None
+    ) -> None:
+        """
+        Serve static content locally, the way the deployed stack would.
+
+        Files go through the same sync stages as `sync`, so they are served
+        with the names, headers, and compressed variants they would be
+        uploaded with (see `statikos.serve.Server`). Serves until interrupted.
+
+        :type source: str
+        :param source: path to the directory of generated static content
+        :type host: str
+        :param host: address to listen on
+        :type port: int
+        :param port: port to listen on
+
+        :rtype: None
+        :return: None
+        """
+        import asyncio
+
+        from . import serve
+        from .exceptions import SourceNotFound
+        from .hashing import HashCache
+        from .sync import scan
+        settings = self.config.get('sync') or {}
+        source = source or self._source()
+        if not os.path.isdir(source):
+            raise SourceNotFound(source=source)
+        files = scan(
+            source,
+            HashCache.load(self._path(self.HASHES_JSON)),
+            processes=settings.get('processes')
+        )
+        stages = self._sync_stages(
+            processes=settings.get('processes'), siblings=True
+        )
+        # Compression is always the last stage. Its input is kept, so that
+        # clients that do not accept its encodings can be served as well.
+        compress = stages.pop() if 'compression' in self.config else None
+        for stage in stages:
+            files = stage(files)
+        server = serve.Server(
+            serve.routes(files, compress(files) if compress else None)
+        )
+        asyncio.run(
+            server.serve_forever(
+                host or serve.DEFAULT_HOST,
+                serve.DEFAULT_PORT if port is None else port,
+                callback=lambda url: self._echo(f'Serving {source} at {url}')
+            )
+        )
+
+    def _sync_stages(
+        self,
+        processes: int = None,
+        siblings: bool = False,
+        cache_dir: str = None
+    ) -> list:
+        """
+        Build the sync stages enabled in `statikos.yml`.
+
+        :type processes: int
+        :param processes: number of processes each stage may use
+        :type siblings: bool
+        :param siblings: whether to compress with every encoding, for
+            `serve`, rather than only with the encoding uploaded in place
+        :type cache_dir: str
+        :param cache_dir: path to the directory of the stages' caches
+            (default: `.statikos/cache`)
+
+        :rtype: list
+        :return: a list of sync stages
+        """
+        cache_dir = cache_dir or self._path(self.CACHE_DIR)
+        stages = []
+        if 'images' in self.config:
+            from .images import Images
+            settings = self.config['images'] or {}
+            stages.append(
+                Images(
+                    os.path.join(cache_dir, 'images'),
+                    widths=settings.get('widths'),
+                    max_width=settings.get('max_width'),
+                    quality=settings.get('quality'),
+                    webp=settings.get('webp', True),
+                    webp_quality=settings.get('webp_quality'),
+                    extensions=settings.get('extensions'),
+                    processes=processes
+                )
+            )
+        if 'minify' in self.config:
+            from .minify import Minify
+            settings = self.config['minify'] or {}
+            stages.append(
+                Minify(
+                    os.path.join(cache_dir, 'minified'),
+                    transforms=settings.get('transforms'),
+                    processes=processes
+                )
+            )
+        if 'fingerprint' in self.config:
+            from .fingerprint import Fingerprint
+            settings = self.config['fingerprint'] or {}
+            stages.append(
+                Fingerprint(
+                    os.path.join(cache_dir, 'fingerprinted'),
+                    extensions=settings.get('extensions'),
+                    exclude=settings.get('exclude'),
+                    html_cache_control=settings.get('html_cache_control'),
+                    processes=processes
+                )
+            )
+        if 'compression' in self.config:
+            from .compress import Compress
+            settings = self.config['compression'] or {}
+            stages.append(
+                Compress(
+                    os.path.join(cache_dir, 'compressed'),
+                    encodings=settings.get('encodings'),
+                    extensions=settings.get('extensions'),
+                    min_size=settings.get('min_size'),
+                    max_ratio=settings.get('max_ratio'),
+                    processes=processes,
+                    siblings=siblings
+                )
+            )
+        return stages
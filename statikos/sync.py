@@ -0,0 +1,845 @@
+# -*- coding: utf-8 -*-
+"""Sync module."""
+
+import mimetypes
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Iterator, List, Tuple
+
+from . import trace
+from .exceptions import SourceNotFound, SyncFailed, UploadNotFound
+from .hashing import HashCache
+from .journal import Journal
+from .manifest import Manifest, Plan, headers_digest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .api import S3  # noqa: F401
+    from .trace import Tracer  # noqa: F401
+
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+
+LocalFile = namedtuple(
+    'LocalFile', ['key', 'path', 'size', 'hash', 'etag', 'headers']
+)
+LocalFile.__new__.__defaults__ = (None, )
+
+
+def walk(source: str) -> Iterator[Tuple[str, str]]:
+    """
+    Walk a directory of generated static content.
+
+    Files are yielded as they are found, so that uploads can start before the
+    whole tree has been scanned. Object keys always use forward slashes.
+
+    :type source: str
+    :param source: path to the directory
+
+    :rtype: Iterator[Tuple[str, str]]
+    :return: an iterator of (path, key) tuples
+    """
+    # Keys are built up from the names of the directories on the way down,
+    # rather than with `os.path.relpath`, which dominates the walk of a large
+    # tree.
+    stack = [(source, '')]
+    while stack:
+        directory, prefix = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=True):
+                    stack.append((entry.path, f'{prefix}{entry.name}/'))
+                elif entry.is_file(follow_symlinks=True):
+                    yield entry.path, prefix + entry.name
+
+
+def scan(
+    source: str, hash_cache: HashCache, processes: int = None
+) -> List[LocalFile]:
+    """
+    Find and hash every file under a directory.
+
+    Digests come from the hash cache where possible; everything else is
+    hashed across a pool of processes. The hash cache is only written back if
+    it changed.
+
+    :type source: str
+    :param source: path to the directory
+    :type hash_cache: statikos.hashing.HashCache
+    :param hash_cache: cache of file digests
+    :type processes: int
+    :param processes: number of processes to hash files with
+
+    :rtype: List[LocalFile]
+    :return: a list of local files
+    """
+    found = [(path, key, os.stat(path)) for path, key in walk(source)]
+    digests = hash_cache.hash_files(
+        [(path, st) for path, _, st in found], processes=processes
+    )
+    if hash_cache.dirty:
+        hash_cache.save()
+    return [
+        LocalFile(key, path, st.st_size, digest.md5, digest.etag)
+        for (path, key, st), digest in zip(found, digests)
+    ]
+
+
+def parts(size: int, part_size: int) -> List[Tuple[int, int, int]]:
+    """
+    Split a file into the parts of a multipart upload.
+
+    Example:
+
+    >>> parts(10, 4)
+    [(1, 0, 4), (2, 4, 4), (3, 8, 2)]
+
+    :type size: int
+    :param size: size of the file
+    :type part_size: int
+    :param part_size: size of each part (the last part may be smaller)
+
+    :rtype: List[Tuple[int, int, int]]
+    :return: a list of (part number, offset, length) tuples
+    """
+    return [(i + 1, offset, min(part_size, size - offset))
+            for i, offset in enumerate(range(0, size, part_size))]
+
+
+def content_type(path: str) -> str:
+    """
+    Guess the Content-Type of a file from its extension.
+
+    :type path: str
+    :param path: path to the file
+
+    :rtype: str
+    :return: a MIME type
+    """
+    return mimetypes.guess_type(path)[0] or DEFAULT_CONTENT_TYPE
+
+
+def format_bytes(n: float) -> str:
+    """
+    Format a number of bytes for humans.
+
+    Example:
+
+    >>> format_bytes(1536)
+    '1.5 KB'
+
+    :type n: float
+    :param n: number of bytes
+
+    :rtype: str
+    :return: formatted number of bytes
+    """
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(n) < 1024:
+            break
+        n /= 1024
+    else:
+        unit = 'TB'
+    return f'{n:.1f} {unit}' if unit != 'B' else f'{int(n)} B'
+
+
+class FileChunk():
+    """
+    Read-only, seekable view of a range of bytes in a file.
+
+    The body of each part of a multipart upload is a `FileChunk`, so parts
+    are streamed from disk rather than read into memory, and botocore can
+    seek back to the start of a part to retry it.
+    """
+    def __init__(self, path: str, offset: int, length: int) -> None:
+        """
+        Create a new `FileChunk` object.
+
+        :type path: str
+        :param path: path to the file
+        :type offset: int
+        :param offset: offset of the first byte in the file
+        :type length: int
+        :param length: number of bytes
+
+        :rtype: None
+        :return: None
+        """
+        self.offset = offset
+        self.length = length
+        self._file = open(path, 'rb')
+        self._file.seek(offset)
+        self._position = 0
+
+    def __len__(self) -> int:
+        """
+        Return the number of bytes in the chunk.
+
+        :rtype: int
+        :return: number of bytes
+        """
+        return self.length
+
+    def __enter__(self) -> 'FileChunk':
+        """
+        Enter a `with` block.
+
+        :rtype: FileChunk
+        :return: the chunk
+        """
+        return self
+
+    def __exit__(self, *args) -> None:
+        """
+        Close the chunk on leaving a `with` block.
+
+        :rtype: None
+        :return: None
+        """
+        self.close()
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read up to `size` bytes, or to the end of the chunk.
+
+        :type size: int
+        :param size: maximum number of bytes to read
+
+        :rtype: bytes
+        :return: data
+        """
+        remaining = self.length - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """
+        Move to a position in the chunk.
+
+        :type offset: int
+        :param offset: position, relative to `whence`
+        :type whence: int
+        :param whence: `os.SEEK_SET`, `os.SEEK_CUR`, or `os.SEEK_END`
+
+        :rtype: int
+        :return: new position
+        """
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.length
+        self._position = max(0, min(offset, self.length))
+        self._file.seek(self.offset + self._position)
+        return self._position
+
+    def tell(self) -> int:
+        """
+        Return the position in the chunk.
+
+        :rtype: int
+        :return: position
+        """
+        return self._position
+
+    def close(self) -> None:
+        """
+        Close the underlying file.
+
+        :rtype: None
+        :return: None
+        """
+        self._file.close()
+
+
+class MultipartUpload():
+    """
+    Progress of a multipart upload during a sync.
+    """
+    def __init__(self, f: LocalFile, upload: dict, remaining: int) -> None:
+        """
+        Create a new `MultipartUpload` object.
+
+        :type f: LocalFile
+        :param f: local file
+        :type upload: dict
+        :param upload: the upload, as kept in `Journal.uploads`
+        :type remaining: int
+        :param remaining: number of parts still to upload
+
+        :rtype: None
+        :return: None
+        """
+        self.file = f
+        self.upload_id = upload['upload_id']
+        self.parts = upload['parts']
+        self.remaining = remaining
+        self.error = None
+
+
+class SyncResult():
+    """
+    Summary of a sync.
+    """
+    def __init__(self) -> None:
+        """
+        Create a new `SyncResult` object.
+
+        :rtype: None
+        :return: None
+        """
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.deleted = 0
+        self.elapsed = 0.0
+        # Bytes saved by the sync stages (e.g. by optimizing images), over
+        # all files, not only the uploaded ones.
+        self.saved = 0
+        # Keys of objects that were overwritten or deleted, and so may be
+        # stale in a CDN cache.
+        self.changed = []
+        self.invalidated = []
+
+    @property
+    def files_per_second(self) -> float:
+        """
+        Return the upload rate in files per second.
+
+        :rtype: float
+        :return: files per second
+        """
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """
+        Return the upload rate in bytes per second.
+
+        :rtype: float
+        :return: bytes per second
+        """
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        """
+        Return a one-line summary.
+
+        :rtype: str
+        :return: summary
+        """
+        summary = (
+            f'Uploaded {self.files} file(s) ({format_bytes(self.bytes)}) '
+            f'in {self.elapsed:.1f}s '
+            f'({self.files_per_second:.1f} files/s, '
+            f'{format_bytes(self.bytes_per_second)}/s), '
+            f'skipped {self.skipped} unchanged, deleted {self.deleted}'
+        )
+        if self.saved:
+            summary += f', saved {format_bytes(self.saved)}'
+        if self.invalidated:
+            summary += f', invalidated {len(self.invalidated)} path(s)'
+        return summary
+
+
+class Sync():
+    """
+    Upload a directory of generated static content to an S3 bucket.
+
+    Local files are compared against a manifest of the bucket (see
+    `statikos.manifest.Manifest`), so only new and changed files are uploaded
+    and only objects with no local file are deleted. No request is made per
+    object to find out what changed.
+
+    Files are uploaded by a bounded pool of threads that share one S3 client.
+    At most `2 * workers` uploads are queued at any time, so memory use does
+    not grow with the size of the site.
+
+    Files larger than the part size of the hash cache are uploaded in parts,
+    which are spread across the same pool of threads, so that their ETags
+    match the ETags computed when hashing (see `statikos.hashing.hash_file`).
+
+    Progress is kept in a journal (see `statikos.journal.Journal`). If a sync
+    is interrupted, the next one replays the uploads that completed into the
+    manifest, resumes multipart uploads from the parts that are missing, and
+    aborts multipart uploads of files that have since changed or gone away.
+    """
+    DEFAULT_WORKERS = 32
+
+    def __init__(
+        self,
+        s3: 'S3',
+        bucket: str,
+        source: str,
+        manifest: Manifest,
+        hash_cache: HashCache,
+        workers: int = None,
+        processes: int = None,
+        delete: bool = True,
+        stages: List[Callable[[List[LocalFile]], List[LocalFile]]] = None,
+        callback: Callable[[str, int], None] = None,
+        tracer: 'Tracer' = None,
+        journal: Journal = None
+    ) -> None:
+        """
+        Create a new `Sync` object.
+
+        :type s3: statikos.api.S3
+        :param s3: S3 client shared by all upload threads
+        :type bucket: str
+        :param bucket: name of the bucket
+        :type source: str
+        :param source: path to the directory of generated static content
+        :type manifest: statikos.manifest.Manifest
+        :param manifest: manifest of the bucket
+        :type hash_cache: statikos.hashing.HashCache
+        :param hash_cache: cache of file digests
+        :type workers: int
+        :param workers: number of concurrent uploads
+        :type processes: int
+        :param processes: number of processes to hash files with
+        :type delete: bool
+        :param delete: whether to delete objects with no local file
+        :type stages: List[Callable[[List[LocalFile]], List[LocalFile]]]
+        :param stages: callables applied in order to the scanned files before
+            they are compared against the manifest (e.g. compression)
+        :type callback: Callable[[str, int], None]
+        :param callback: called with the key and size of each uploaded file
+        :type tracer: statikos.trace.Tracer
+        :param tracer: tracer to record phases with
+        :type journal: statikos.journal.Journal
+        :param journal: journal of the progress of the sync (default: kept in
+            memory only)
+
+        :rtype: None
+        :return: None
+        """
+        self.s3 = s3
+        self.bucket = bucket
+        self.source = source
+        self.manifest = manifest
+        self.hash_cache = hash_cache
+        self.workers = workers or self.DEFAULT_WORKERS
+        self.processes = processes
+        self.delete = delete
+        self.stages = stages or []
+        self.callback = callback
+        self.tracer = tracer
+        self.journal = journal or Journal(None, bucket)
+        self.part_size = hash_cache.part_size
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+        self._errors = []
+
+    def scan(self) -> List[LocalFile]:
+        """
+        Find and hash every file under the source directory.
+
+        :rtype: List[LocalFile]
+        :return: a list of local files
+        """
+        return scan(self.source, self.hash_cache, processes=self.processes)
+
+    def plan(
+        self, result: SyncResult = None, files: List[LocalFile] = None
+    ) -> Plan:
+        """
+        Compare the source directory against the manifest.
+
+        Uploads that completed in an interrupted sync are replayed into the
+        manifest from the journal first, and the files are passed through the
+        stages. Nothing is uploaded or deleted, and the manifest is not saved.
+
+        :type result: SyncResult
+        :param result: summary to record the bytes saved by the stages in
+        :type files: List[LocalFile]
+        :param files: every file under the source directory (default: scanned
+            from the source directory)
+
+        :rtype: statikos.manifest.Plan
+        :return: a plan
+        """
+        if not os.path.isdir(self.source):
+            raise SourceNotFound(source=self.source)
+        for key, entry in self.journal.completed.items():
+            self.manifest.update(
+                key, entry['size'], entry['hash'], entry['etag'],
+                entry.get('headers')
+            )
+        if files is None:
+            with trace.span(self.tracer, 'scan'):
+                files = self.scan()
+        for stage in self.stages:
+            with trace.span(self.tracer, type(stage).__name__.lower()):
+                files = stage(files)
+            if result is not None:
+                result.saved += getattr(stage, 'saved', 0)
+        return self.manifest.plan(
+            files, delete=self.delete, headers=self._headers
+        )
+
+    def run(
+        self, files: List[LocalFile] = None, result: SyncResult = None
+    ) -> SyncResult:
+        """
+        Bring the bucket in line with the source directory.
+
+        If the manifest is stale, it is rebuilt from a listing of the bucket
+        first. The manifest is saved even if some uploads fail, so that the
+        next run does not repeat the uploads that succeeded. Once it is saved,
+        the journal is compacted down to the multipart uploads that did not
+        complete. If any upload fails, nothing is deleted, since the pages
+        that failed to upload may still refer to the objects to delete.
+
+        :type files: List[LocalFile]
+        :param files: every file under the source directory (default: scanned
+            from the source directory)
+        :type result: SyncResult
+        :param result: summary to fill in, which is kept up to date even if
+            the sync fails (default: a new summary)
+
+        :rtype: SyncResult
+        :return: a summary of the sync
+        """
+        if not os.path.isdir(self.source):
+            raise SourceNotFound(source=self.source)
+        if result is None:
+            result = SyncResult()
+        self._errors = []
+        start = time.perf_counter()
+        if self.manifest.stale:
+            with trace.span(self.tracer, 'manifest'):
+                self.manifest.rebuild(self.s3)
+        plan = self.plan(result, files)
+        result.changed = []
+        self._upload_all(plan.upload, result)
+        if not self._errors:
+            self._delete(plan.delete)
+            result.changed.extend(plan.delete)
+            result.deleted = len(plan.delete)
+        result.changed.sort()
+        result.skipped = len(plan.skip)
+        self.manifest.save()
+        self.journal.compact()
+        result.elapsed = time.perf_counter() - start
+        if self._errors:
+            raise SyncFailed(
+                count=len(self._errors), bucket=self.bucket
+            ) from self._errors[0]
+        return result
+
+    def _upload_all(self, files: List[LocalFile], result: SyncResult) -> None:
+        """
+        Upload files, and wait for every upload to finish.
+
+        Multipart uploads that cannot be resumed are aborted first. Failed
+        uploads are recorded in `_errors` rather than raised.
+
+        :type files: List[LocalFile]
+        :param files: local files to upload
+        :type result: SyncResult
+        :param result: summary to fill in
+
+        :rtype: None
+        :return: None
+        """
+        self._abort_stale(files)
+        with trace.span(self.tracer, 'upload', files=len(files)), \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for f in files:
+                if f.size > self.part_size:
+                    self._upload_parts(executor, f, result)
+                    continue
+                self._slots.acquire()
+                future = executor.submit(self._upload, f)
+                future.add_done_callback(
+                    lambda future, f=f: self._done(future, f, result)
+                )
+
+    def _delete(self, keys: List[str]) -> None:
+        """
+        Delete objects, once every upload has finished.
+
+        New pages are uploaded before the objects they no longer refer to are
+        deleted, so visitors never see a page that refers to a missing
+        object.
+
+        :type keys: List[str]
+        :param keys: keys of the objects to delete
+
+        :rtype: None
+        :return: None
+        """
+        if not keys:
+            return
+        with trace.span(self.tracer, 'delete', files=len(keys)):
+            self.s3.delete_objects(self.bucket, keys)
+        for key in keys:
+            self.manifest.remove(key)
+
+    def _headers(self, f: LocalFile) -> dict:
+        """
+        Return the parameters to upload a file with.
+
+        :type f: LocalFile
+        :param f: local file
+
+        :rtype: dict
+        :return: PutObject parameters
+        """
+        headers = {'ContentType': content_type(f.key)}
+        headers.update(f.headers or {})
+        return headers
+
+    def _upload(self, f: LocalFile) -> str:
+        """
+        Upload a single file.
+
+        :type f: LocalFile
+        :param f: local file
+
+        :rtype: str
+        :return: ETag of the uploaded object
+        """
+        with open(f.path, 'rb') as body:
+            response = self.s3.put_object(
+                self.bucket, f.key, body, headers=self._headers(f)
+            )
+        return response['ETag'].strip('"')
+
+    def _abort_stale(self, files: List[LocalFile]) -> None:
+        """
+        Abort journaled multipart uploads that cannot be resumed.
+
+        An upload can be resumed if its file is still to be uploaded in parts
+        and has the same content and parameters as when the upload started.
+
+        :type files: List[LocalFile]
+        :param files: local files to upload
+
+        :rtype: None
+        :return: None
+        """
+        files = {f.key: f for f in files}
+        for key, upload in list(self.journal.uploads.items()):
+            f = files.get(key)
+            if f is not None and f.size > self.part_size and \
+                    f.hash == upload['hash'] and \
+                    self._headers(f) == upload['headers']:
+                continue
+            self.s3.abort_multipart_upload(
+                self.bucket, key, upload['upload_id']
+            )
+            self.journal.abort(key)
+
+    def _upload_parts(
+        self, executor: ThreadPoolExecutor, f: LocalFile, result: SyncResult
+    ) -> None:
+        """
+        Queue the missing parts of a multipart upload.
+
+        The upload is started if there is none in the journal to resume. It
+        is completed by whichever thread uploads its last part.
+
+        :type executor: concurrent.futures.ThreadPoolExecutor
+        :param executor: pool of upload threads
+        :type f: LocalFile
+        :param f: local file
+        :type result: SyncResult
+        :param result: summary of the sync
+
+        :rtype: None
+        :return: None
+        """
+        upload = self.journal.uploads.get(f.key)
+        if upload is None:
+            headers = self._headers(f)
+            try:
+                upload_id = self.s3.create_multipart_upload(
+                    self.bucket, f.key, headers=headers
+                )
+            except Exception as error:
+                self._finish(f, None, error, result)
+                return
+            upload = self.journal.begin(f.key, f.hash, upload_id, headers)
+        missing = [
+            p for p in parts(f.size, self.part_size)
+            if p[0] not in upload['parts']
+        ]
+        multipart = MultipartUpload(f, upload, len(missing))
+        if not missing:
+            self._complete(multipart, result)
+            return
+        for number, offset, length in missing:
+            self._slots.acquire()
+            future = executor.submit(
+                self._upload_part, multipart, number, offset, length
+            )
+            future.add_done_callback(
+                lambda future, number=number:
+                self._part_done(future, multipart, number, result)
+            )
+
+    def _upload_part(
+        self, multipart: MultipartUpload, number: int, offset: int, length: int
+    ) -> str:
+        """
+        Upload a single part of a file.
+
+        :type multipart: MultipartUpload
+        :param multipart: multipart upload
+        :type number: int
+        :param number: part number
+        :type offset: int
+        :param offset: offset of the part in the file
+        :type length: int
+        :param length: size of the part
+
+        :rtype: str
+        :return: ETag of the part
+        """
+        f = multipart.file
+        with FileChunk(f.path, offset, length) as body:
+            return self.s3.upload_part(
+                self.bucket, f.key, multipart.upload_id, number, body
+            )
+
+    def _part_done(
+        self,
+        future,
+        multipart: MultipartUpload,
+        number: int,
+        result: SyncResult
+    ) -> None:
+        """
+        Record the outcome of a part upload and free its slot.
+
+        :type future: concurrent.futures.Future
+        :param future: future of the part upload
+        :type multipart: MultipartUpload
+        :param multipart: multipart upload
+        :type number: int
+        :param number: part number
+        :type result: SyncResult
+        :param result: summary of the sync
+
+        :rtype: None
+        :return: None
+        """
+        self._slots.release()
+        error = future.exception()
+        with self._lock:
+            if error is None:
+                self.journal.part(multipart.file.key, number, future.result())
+            elif multipart.error is None:
+                multipart.error = error
+            multipart.remaining -= 1
+            if multipart.remaining:
+                return
+        if multipart.error is not None:
+            self._failed(multipart, multipart.error, result)
+        else:
+            self._complete(multipart, result)
+
+    def _complete(
+        self, multipart: MultipartUpload, result: SyncResult
+    ) -> None:
+        """
+        Assemble the parts of a multipart upload into an object.
+
+        :type multipart: MultipartUpload
+        :param multipart: multipart upload
+        :type result: SyncResult
+        :param result: summary of the sync
+
+        :rtype: None
+        :return: None
+        """
+        f = multipart.file
+        try:
+            etag = self.s3.complete_multipart_upload(
+                self.bucket, f.key, multipart.upload_id, multipart.parts
+            )
+        except Exception as error:
+            self._failed(multipart, error, result)
+        else:
+            self._finish(f, etag, None, result)
+
+    def _failed(
+        self, multipart: MultipartUpload, error: Exception, result: SyncResult
+    ) -> None:
+        """
+        Record a failed multipart upload.
+
+        The upload is left in the journal to be resumed by the next sync,
+        unless it no longer exists, in which case the next sync starts over.
+
+        :type multipart: MultipartUpload
+        :param multipart: multipart upload
+        :type error: Exception
+        :param error: error that failed the upload
+        :type result: SyncResult
+        :param result: summary of the sync
+
+        :rtype: None
+        :return: None
+        """
+        if isinstance(error, UploadNotFound):
+            self.journal.abort(multipart.file.key)
+        self._finish(multipart.file, None, error, result)
+
+    def _done(self, future, f: LocalFile, result: SyncResult) -> None:
+        """
+        Record the outcome of an upload and free its slot.
+
+        :type future: concurrent.futures.Future
+        :param future: future of the upload
+        :type f: LocalFile
+        :param f: local file
+        :type result: SyncResult
+        :param result: summary of the sync
+
+        :rtype: None
+        :return: None
+        """
+        self._slots.release()
+        error = future.exception()
+        self._finish(
+            f, future.result() if error is None else None, error, result
+        )
+
+    def _finish(
+        self, f: LocalFile, etag: str, error: Exception, result: SyncResult
+    ) -> None:
+        """
+        Record the outcome of an upload.
+
+        :type f: LocalFile
+        :param f: local file
+        :type etag: str
+        :param etag: ETag of the uploaded object
+        :type error: Exception
+        :param error: error that failed the upload, or None
+        :type result: SyncResult
+        :param result: summary of the sync
+
+        :rtype: None
+        :return: None
+        """
+        with self._lock:
+            if error is not None:
+                self._errors.append(error)
+                return
+            if f.key in self.manifest.entries:
+                # An overwritten object, which may be cached.
+                result.changed.append(f.key)
+            headers = headers_digest(self._headers(f))
+            self.manifest.update(f.key, f.size, f.hash, etag, headers)
+            self.journal.complete(f.key, f.size, f.hash, etag, headers)
+            result.files += 1
+            result.bytes += f.size
+        if self.callback:
+            self.callback(f.key, f.size)
@@ -1,17 +1,341 @@
-from awacs.aws import Action, Allow, PolicyDocument, Principal, Statement
+import json
+
+from awacs.aws import (
+    Action, Allow, Condition, PolicyDocument, Principal, Statement,
+    StringEquals
+)
 from awacs.s3 import ARN as S3_ARN
-from troposphere import GetAtt, Ref, Template
+from troposphere import GetAtt, Ref, Sub, Template
 from troposphere.certificatemanager import Certificate
 from troposphere.cloudfront import (
-    Cookies, CustomErrorResponse, CustomOriginConfig, DefaultCacheBehavior,
-    Distribution, DistributionConfig, ForwardedValues, Logging, Origin,
-    ViewerCertificate
+    CacheBehavior, CacheCookiesConfig, CacheHeadersConfig, CachePolicy,
+    CachePolicyConfig, CacheQueryStringsConfig, CustomErrorResponse,
+    CustomOriginConfig, DefaultCacheBehavior, Distribution, DistributionConfig,
+    Function, FunctionAssociation, FunctionConfig, Logging, Origin,
+    OriginAccessControl, OriginAccessControlConfig, OriginShield,
+    ParametersInCacheKeyAndForwardedToOrigin, S3OriginConfig, ViewerCertificate
 )
 from troposphere.route53 import AliasTarget, RecordSet, RecordSetGroup
 from troposphere.s3 import (
-    Bucket, BucketPolicy, LoggingConfiguration, WebsiteConfiguration
+    Bucket, BucketPolicy, LoggingConfiguration, PublicAccessBlockConfiguration,
+    WebsiteConfiguration
 )
 
+from .exceptions import InvalidConfig
+
+MIN_TTL = 0
+DEFAULT_TTL = 86400
+MAX_TTL = 31536000
+
+# Hosted zone ID of every CloudFront distribution, for alias records.
+CLOUDFRONT_HOSTED_ZONE_ID = 'Z2FDTNDATAQYW2'
+
+# Edge settings without a `performance` section: a public bucket behind a
+# custom origin.
+EDGE = {
+    'origin': 'custom',
+    'origin_shield': None,
+    'http_version': 'http2',
+    'price_class': 'PriceClass_All',
+    'keepalive_timeout': 5,
+    'read_timeout': 30,
+}
+
+# Edge settings with a `performance` section, unless it overrides them.
+PERFORMANCE = {
+    'origin': 's3',
+    'origin_shield': None,
+    'http_version': 'http2and3',
+    'price_class': 'PriceClass_All',
+    'keepalive_timeout': 60,
+    'read_timeout': 60,
+    'directories': [],
+}
+
+ORIGINS = ['s3', 'custom']
+
+# CloudFront Function that does for the S3 REST origin what the website
+# endpoint does: serve `index.html` for a directory, and redirect a directory
+# without its trailing slash, keeping the query string. Only extensionless keys
+# under one of the `performance.directories` prefixes (`DIRECTORIES`, filled in
+# by `index_function_code`) are redirected; others are fetched as they are.
+INDEX_FUNCTION = """\
+function isDirectory(uri) {
+  if (uri.split('/').pop().indexOf('.') !== -1) {
+    return false;
+  }
+  for (var i = 0; i < DIRECTORIES.length; i++) {
+    if (uri === DIRECTORIES[i] || uri.startsWith(DIRECTORIES[i] + '/')) {
+      return true;
+    }
+  }
+  return false;
+}
+
+function querystring(params) {
+  var parts = [];
+  for (var name in params) {
+    var param = params[name];
+    if (param.multiValue) {
+      param.multiValue.forEach(function (value) {
+        parts.push(name + '=' + value.value);
+      });
+    } else if (param.value === '') {
+      parts.push(name);
+    } else {
+      parts.push(name + '=' + param.value);
+    }
+  }
+  return parts.length ? '?' + parts.join('&') : '';
+}
+
+function handler(event) {
+  var request = event.request;
+  var uri = request.uri;
+  if (uri.endsWith('/')) {
+    request.uri = uri + 'index.html';
+  } else if (isDirectory(uri)) {
+    var location = uri + '/' + querystring(request.querystring);
+    return {
+      statusCode: 302,
+      statusDescription: 'Found',
+      headers: {location: {value: location}}
+    };
+  }
+  return request;
+}
+"""
+
+
+def index_function_code(directories: list) -> str:
+    """
+    Build the code of the CloudFront Function that serves directories.
+
+    :type directories: list
+    :param directories: path prefixes whose extensionless keys are directories
+        (`/` for every key)
+
+    :rtype: str
+    :return: function code
+    """
+    prefixes = ['/' + directory.strip('/') for directory in directories]
+    prefixes = [prefix.rstrip('/') for prefix in prefixes]
+    return f'var DIRECTORIES = {json.dumps(prefixes)};\n\n' + INDEX_FUNCTION
+
+
+def edge_settings(parameters: dict) -> dict:
+    """
+    Resolve the edge settings of the CloudFront distribution.
+
+    Without a `performance` section in `statikos.yml`, the distribution is
+    set up as it always was (see `EDGE`). With one, the optimized profile
+    (see `PERFORMANCE`) is used, with any settings the section overrides.
+
+    :type parameters: dict
+    :param parameters: contents of `statikos.yml`
+
+    :rtype: dict
+    :return: edge settings
+    """
+    if 'performance' not in parameters:
+        return dict(EDGE)
+    performance = parameters['performance'] or {}
+    settings = dict(PERFORMANCE, **performance)
+    if settings['origin'] not in ORIGINS:
+        raise InvalidConfig(
+            reason=f'performance.origin must be one of: {", ".join(ORIGINS)}.'
+        )
+    if settings['origin'] == 's3' and 'keepalive_timeout' in performance:
+        raise InvalidConfig(
+            reason='performance.keepalive_timeout only applies to the custom '
+                   'origin.'
+        )
+    if not isinstance(settings['directories'], list) or not all(
+        isinstance(directory, str) for directory in settings['directories']
+    ):
+        raise InvalidConfig(
+            reason='performance.directories must be a list of paths.'
+        )
+    return settings
+
+
+def create_cache_policy(title: str, name: str, settings: dict) -> CachePolicy:
+    """
+    Create a CloudFront cache policy.
+
+    The cache key holds only what `settings` allows: no query strings, headers
+    or cookies by default, so that e.g. `?utm_source=...` does not split the
+    cache. The normalized `Accept-Encoding` header is included if the
+    behavior compresses objects.
+
+    :type title: str
+    :param title: logical ID of the cache policy
+    :type name: str
+    :param name: name of the cache policy (unique in the account)
+    :type settings: dict
+    :param settings: cache behavior settings from `statikos.yml`
+
+    :rtype: troposphere.cloudfront.CachePolicy
+    :return: a troposphere cache policy instance
+    """
+    query_strings = settings.get('query_strings') or []
+    headers = settings.get('headers') or []
+    cookies = settings.get('cookies') or []
+    compress = settings.get('compress', True)
+    cookies_config = CacheCookiesConfig(CookieBehavior='none')
+    if cookies:
+        cookies_config = CacheCookiesConfig(
+            CookieBehavior='whitelist', Cookies=cookies
+        )
+    headers_config = CacheHeadersConfig(HeaderBehavior='none')
+    if headers:
+        headers_config = CacheHeadersConfig(
+            HeaderBehavior='whitelist', Headers=headers
+        )
+    query_strings_config = CacheQueryStringsConfig(QueryStringBehavior='none')
+    if query_strings:
+        query_strings_config = CacheQueryStringsConfig(
+            QueryStringBehavior='whitelist', QueryStrings=query_strings
+        )
+    return CachePolicy(
+        title,
+        CachePolicyConfig=CachePolicyConfig(
+            Name=name,
+            MinTTL=settings.get('min_ttl', MIN_TTL),
+            DefaultTTL=settings.get('default_ttl', DEFAULT_TTL),
+            MaxTTL=settings.get('max_ttl', MAX_TTL),
+            ParametersInCacheKeyAndForwardedToOrigin=(
+                ParametersInCacheKeyAndForwardedToOrigin(
+                    CookiesConfig=cookies_config,
+                    EnableAcceptEncodingBrotli=compress,
+                    EnableAcceptEncodingGzip=compress,
+                    HeadersConfig=headers_config,
+                    QueryStringsConfig=query_strings_config
+                )
+            )
+        )
+    )
+
+
+def create_cache_behaviors(
+    parameters: dict, target_origin_id: str, function_associations: list = None
+) -> tuple:
+    """
+    Create the cache behaviors of the CloudFront distribution.
+
+    Each behavior gets its own cache policy. The default behavior is
+    configured by `default_cache_behavior`, and path-pattern behaviors by
+    `cache_behaviors`, in order of precedence.
+
+    :type parameters: dict
+    :param parameters: contents of `statikos.yml`
+    :type target_origin_id: str
+    :param target_origin_id: ID of the origin to route requests to
+    :type function_associations: list
+    :param function_associations: CloudFront Functions to associate with
+        every behavior
+
+    :rtype: tuple
+    :return: cache policies, the default cache behavior, and the cache
+        behaviors
+    """
+    stack_name = parameters['stack_name']
+    settings = parameters.get('default_cache_behavior') or {}
+    policy = create_cache_policy(
+        'CloudFrontCachePolicyDefault', f'{stack_name}-default', settings
+    )
+    policies = [policy]
+    optional = {'FunctionAssociations': function_associations} \
+        if function_associations else {}
+    default = DefaultCacheBehavior(
+        AllowedMethods=['GET', 'HEAD'],
+        CachedMethods=['GET', 'HEAD'],
+        CachePolicyId=Ref(policy),
+        Compress=settings.get('compress', True),
+        TargetOriginId=target_origin_id,
+        ViewerProtocolPolicy='redirect-to-https',
+        **optional
+    )
+    behaviors = []
+    for i, settings in enumerate(parameters.get('cache_behaviors') or []):
+        if not settings.get('path_pattern'):
+            raise InvalidConfig(
+                reason=f'cache_behaviors[{i}] has no path_pattern.'
+            )
+        policy = create_cache_policy(
+            f'CloudFrontCachePolicy{i}', f'{stack_name}-{i}', settings
+        )
+        policies.append(policy)
+        behaviors.append(
+            CacheBehavior(
+                AllowedMethods=['GET', 'HEAD'],
+                CachedMethods=['GET', 'HEAD'],
+                CachePolicyId=Ref(policy),
+                Compress=settings.get('compress', True),
+                PathPattern=settings['path_pattern'],
+                TargetOriginId=target_origin_id,
+                ViewerProtocolPolicy='redirect-to-https',
+                **optional
+            )
+        )
+    return policies, default, behaviors
+
+
+def create_origin(
+    settings: dict, origin_id: str, s3_bucket_root: Bucket,
+    origin_access_control: OriginAccessControl = None
+) -> Origin:
+    """
+    Create the origin of the CloudFront distribution.
+
+    The `s3` origin is the REST endpoint of the bucket, in the region of the
+    bucket, signed with origin access control. The `custom` origin is the
+    public bucket, fetched over HTTPS like any other server.
+
+    :type settings: dict
+    :param settings: edge settings (see `edge_settings`)
+    :type origin_id: str
+    :param origin_id: ID of the origin
+    :type s3_bucket_root: troposphere.s3.Bucket
+    :param s3_bucket_root: bucket of the static content
+    :type origin_access_control: troposphere.cloudfront.OriginAccessControl
+    :param origin_access_control: origin access control of the `s3` origin
+
+    :rtype: troposphere.cloudfront.Origin
+    :return: a troposphere origin instance
+    """
+    optional = {}
+    if settings['origin_shield']:
+        optional['OriginShield'] = OriginShield(
+            Enabled=True, OriginShieldRegion=settings['origin_shield']
+        )
+    if settings['origin'] == 's3':
+        return Origin(
+            DomainName=GetAtt(s3_bucket_root, 'RegionalDomainName'),
+            Id=origin_id,
+            OriginAccessControlId=GetAtt(origin_access_control, 'Id'),
+            S3OriginConfig=S3OriginConfig(
+                OriginAccessIdentity='',
+                OriginReadTimeout=settings['read_timeout']
+            ),
+            **optional
+        )
+    return Origin(
+        CustomOriginConfig=CustomOriginConfig(
+            HTTPPort=80,
+            HTTPSPort=443,
+            OriginKeepaliveTimeout=settings['keepalive_timeout'],
+            OriginProtocolPolicy='https-only',
+            OriginReadTimeout=settings['read_timeout'],
+            OriginSSLProtocols=[
+                'TLSv1', 'TLSv1.1', 'TLSv1.2'
+            ]
+        ),
+        DomainName=GetAtt(s3_bucket_root, 'DomainName'),
+        Id=origin_id,
+        **optional
+    )
+
 
 def create_template(parameters: dict) -> Template:
     """
@@ -23,8 +347,11 @@ def create_template(parameters: dict) -> Template:
     :rtype: troposphere.Template
     :return: a troposphere template instance
     """
+    settings = edge_settings(parameters)
+    s3_origin = settings['origin'] == 's3'
+
     t = Template()
-    t.add_version('2010-09-09')
+    t.set_version('2010-09-09')
     t.set_description('Static website generated with Statikos')
 
     s3_bucket_logs = \
@@ -35,36 +362,66 @@ def create_template(parameters: dict) -> Template:
             BucketName=f"{parameters['stack_name']}-logs"
         )
 
+    # The REST origin reads the bucket through origin access control, so the
+    # bucket is private. The custom origin needs it to be public.
+    access = {
+        'PublicAccessBlockConfiguration': PublicAccessBlockConfiguration(
+            BlockPublicAcls=True,
+            BlockPublicPolicy=True,
+            IgnorePublicAcls=True,
+            RestrictPublicBuckets=True
+        )
+    } if s3_origin else {
+        'AccessControl': 'PublicRead',
+        'WebsiteConfiguration': WebsiteConfiguration(
+            ErrorDocument='404.html',
+            IndexDocument='index.html'
+        ),
+    }
     s3_bucket_root = \
         Bucket(
             'S3BucketRoot',
             DeletionPolicy='Delete',
-            AccessControl='PublicRead',
             BucketName=f"{parameters['stack_name']}-root",
             LoggingConfiguration=LoggingConfiguration(
                 DestinationBucketName=Ref(s3_bucket_logs),
                 LogFilePrefix='/cdn',
             ),
-            WebsiteConfiguration=WebsiteConfiguration(
-                ErrorDocument='404.html',
-                IndexDocument='index.html'
-            )
+            **access
         )
 
+    if s3_origin:
+        # Listing the bucket lets S3 answer 404 (instead of 403) for a
+        # missing object, so that CloudFront serves the error document.
+        statement = Statement(
+            Effect=Allow,
+            Action=[Action('s3', 'GetObject'), Action('s3', 'ListBucket')],
+            Principal=Principal('Service', 'cloudfront.amazonaws.com'),
+            Resource=[
+                S3_ARN(f"{parameters['stack_name']}-root"),
+                S3_ARN(f"{parameters['stack_name']}-root/*"),
+            ],
+            Condition=Condition(StringEquals({
+                'AWS:SourceArn': Sub(
+                    'arn:${AWS::Partition}:cloudfront::${AWS::AccountId}:'
+                    'distribution/${CloudFrontDistribution}'
+                )
+            }))
+        )
+    else:
+        statement = Statement(
+            Effect=Allow,
+            Action=[Action('s3', 'GetObject')],
+            Principal=Principal('*'),
+            Resource=S3_ARN(f"{parameters['stack_name']}-root/*")
+        )
     s3_bucket_policy = \
         BucketPolicy(
             'S3BucketPolicy',
             Bucket=Ref(s3_bucket_root),
             PolicyDocument=PolicyDocument(
                 Version='2012-10-17',
-                Statement=[
-                    Statement(
-                      Effect=Allow,
-                      Action=[Action('s3', 'GetObject')],
-                      Principal=Principal('*'),
-                      Resource=S3_ARN(f"{parameters['stack_name']}-root/*")
-                    )
-                ]
+                Statement=[statement]
             )
         )
 
@@ -75,6 +432,48 @@ def create_template(parameters: dict) -> Template:
             ValidationMethod='DNS'
         )
 
+    origin_access_control = None
+    index_function = None
+    function_associations = None
+    if s3_origin:
+        origin_access_control = \
+            OriginAccessControl(
+                'CloudFrontOriginAccessControl',
+                OriginAccessControlConfig=OriginAccessControlConfig(
+                    Name=f"{parameters['stack_name']}-root",
+                    OriginAccessControlOriginType='s3',
+                    SigningBehavior='always',
+                    SigningProtocol='sigv4'
+                )
+            )
+        index_function = \
+            Function(
+                'CloudFrontFunctionIndex',
+                AutoPublish=True,
+                FunctionCode=index_function_code(settings['directories']),
+                FunctionConfig=FunctionConfig(
+                    Comment='Serve index.html for directories',
+                    Runtime='cloudfront-js-2.0'
+                ),
+                Name=f"{parameters['stack_name']}-index"
+            )
+        function_associations = [
+            FunctionAssociation(
+                EventType='viewer-request',
+                FunctionARN=GetAtt(
+                    index_function, 'FunctionMetadata.FunctionARN'
+                )
+            )
+        ]
+
+    target_origin_id = f"S3-{parameters['stack_name']}-root"
+    cache_policies, default_cache_behavior, cache_behaviors = \
+        create_cache_behaviors(
+            parameters, target_origin_id, function_associations
+        )
+    # Leave `CacheBehaviors` out of the template unless there are any.
+    optional = {'CacheBehaviors': cache_behaviors} if cache_behaviors else {}
+
     cloudfront_distribution = \
         Distribution(
             'CloudFrontDistribution',
@@ -87,23 +486,10 @@ def create_template(parameters: dict) -> Template:
                         ResponseCode=404,
                         ResponsePagePath='/404.html'
                     )],
-                DefaultCacheBehavior=DefaultCacheBehavior(
-                    AllowedMethods=['GET', 'HEAD'],
-                    CachedMethods=['GET', 'HEAD'],
-                    Compress=True,
-                    DefaultTTL=86400,
-                    ForwardedValues=ForwardedValues(
-                        Cookies=Cookies(Forward='none'),
-                        QueryString=True
-                    ),
-                    MaxTTL=31536000,
-                    SmoothStreaming=False,
-                    TargetOriginId=f"S3-{parameters['stack_name']}-root",
-                    ViewerProtocolPolicy='redirect-to-https',
-                ),
+                DefaultCacheBehavior=default_cache_behavior,
                 DefaultRootObject='index.html',
                 Enabled=True,
-                HttpVersion='http2',
+                HttpVersion=settings['http_version'],
                 IPV6Enabled=True,
                 Logging=Logging(
                   Bucket=GetAtt(s3_bucket_logs, 'DomainName'),
@@ -111,52 +497,44 @@ def create_template(parameters: dict) -> Template:
                   Prefix='cdn/',
                 ),
                 Origins=[
-                    Origin(
-                        CustomOriginConfig=CustomOriginConfig(
-                            HTTPPort=80,
-                            HTTPSPort=443,
-                            OriginKeepaliveTimeout=5,
-                            OriginProtocolPolicy='https-only',
-                            OriginReadTimeout=30,
-                            OriginSSLProtocols=[
-                                'TLSv1', 'TLSv1.1', 'TLSv1.2'
-                            ]
-                        ),
-                        DomainName=GetAtt(s3_bucket_root, 'DomainName'),
-                        Id=f"S3-{parameters['stack_name']}-root",
-                    )],
-                PriceClass='PriceClass_All',
+                    create_origin(
+                        settings,
+                        target_origin_id,
+                        s3_bucket_root,
+                        origin_access_control
+                    )
+                ],
+                PriceClass=settings['price_class'],
                 ViewerCertificate=ViewerCertificate(
                     AcmCertificateArn=Ref(acm_certificate),
                     MinimumProtocolVersion='TLSv1.1_2016',
                     SslSupportMethod='sni-only'
-                )
+                ),
+                **optional
             )
         )
 
+    # The distribution is reachable over IPv4 and IPv6, so each name gets an
+    # A and an AAAA alias record.
     route53_record_set_group = \
         RecordSetGroup(
             'Route53RecordSetGroup',
             HostedZoneName=f"{parameters['domain_name']}.",
             RecordSets=[
                 RecordSet(
-                    Name=parameters['domain_name'],
-                    Type='A',
+                    Name=name,
+                    Type=record_type,
                     AliasTarget=AliasTarget(
                       DNSName=GetAtt(cloudfront_distribution, 'DomainName'),
                       EvaluateTargetHealth=False,
-                      HostedZoneId='Z2FDTNDATAQYW2'
-                    )
-                ),
-                RecordSet(
-                    Name=f"www.{parameters['domain_name']}",
-                    Type='A',
-                    AliasTarget=AliasTarget(
-                      DNSName=GetAtt(cloudfront_distribution, 'DomainName'),
-                      EvaluateTargetHealth=False,
-                      HostedZoneId='Z2FDTNDATAQYW2'
+                      HostedZoneId=CLOUDFRONT_HOSTED_ZONE_ID
                     )
                 )
+                for name in [
+                    parameters['domain_name'],
+                    f"www.{parameters['domain_name']}"
+                ]
+                for record_type in ['A', 'AAAA']
             ]
         )
 
@@ -164,6 +542,11 @@ def create_template(parameters: dict) -> Template:
     t.add_resource(s3_bucket_root)
     t.add_resource(s3_bucket_policy)
     t.add_resource(acm_certificate)
+    if s3_origin:
+        t.add_resource(origin_access_control)
+        t.add_resource(index_function)
+    for cache_policy in cache_policies:
+        t.add_resource(cache_policy)
     t.add_resource(cloudfront_distribution)
     t.add_resource(route53_record_set_group)
     return t
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Tracing module."""
+
+import contextlib
+import os
+import threading
+import time
+from typing import ContextManager, Iterator
+
+from . import utils
+
+# Keys under which a call's state is kept in the botocore request context.
+START = 'statikos_trace_start'
+ATTEMPTS = 'statikos_trace_attempts'
+
+
+def span(tracer: 'Tracer', name: str, **args: dict) -> ContextManager:
+    """
+    Time a block with `tracer`, if there is one.
+
+    Example:
+
+    with trace.span(self.tracer, 'scan'):
+        ...
+
+    :type tracer: Tracer
+    :param tracer: tracer, or None
+    :type name: str
+    :param name: name of the span
+
+    :rtype: ContextManager
+    :return: a context manager
+    """
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.span(name, **args)
+
+
+class Tracer():
+    """
+    Record how long each phase of a command and each AWS API call takes.
+
+    Phases are recorded with `span`. API calls are recorded by hooking the
+    event system of every client the tracer instruments (see `instrument`):
+    a call is timed from parameter validation to the parsed response, so it
+    includes serialization, retries, and any time spent waiting on a rate
+    limiter, and every HTTP attempt is counted.
+
+    Spans are kept per thread, so concurrent uploads show up as parallel
+    lanes in a trace viewer (see `to_chrome`).
+    """
+    def __init__(self) -> None:
+        """
+        Create a new `Tracer` object.
+
+        :rtype: None
+        :return: None
+        """
+        self.spans = []
+        self.start = time.perf_counter()
+        self._threads = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(
+        self, name: str, category: str = 'phase', **args: dict
+    ) -> Iterator[None]:
+        """
+        Time a block.
+
+        :type name: str
+        :param name: name of the span
+        :type category: str
+        :param category: category of the span
+        :type args: dict
+        :param args: details to record with the span
+
+        :rtype: Iterator[None]
+        :return: a context manager
+        """
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            self.add(name, category, start, time.perf_counter(), args, depth)
+
+    def add(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        end: float,
+        args: dict = None,
+        depth: int = None
+    ) -> None:
+        """
+        Record a span.
+
+        :type name: str
+        :param name: name of the span
+        :type category: str
+        :param category: category of the span (`phase` or `aws`)
+        :type start: float
+        :param start: start time (`time.perf_counter`)
+        :type end: float
+        :param end: end time (`time.perf_counter`)
+        :type args: dict
+        :param args: details of the span
+        :type depth: int
+        :param depth: nesting depth of the span in its thread
+
+        :rtype: None
+        :return: None
+        """
+        thread = threading.current_thread()
+        if depth is None:
+            depth = getattr(self._local, 'depth', 0)
+        with self._lock:
+            tid = self._threads.setdefault(
+                thread.ident, (len(self._threads) + 1, thread.name)
+            )[0]
+            self.spans.append({
+                'name': name,
+                'category': category,
+                'start': start,
+                'end': end,
+                'tid': tid,
+                'depth': depth,
+                'args': args or {},
+            })
+
+    def instrument(self, client) -> None:
+        """
+        Record every API call a botocore client makes.
+
+        A client is only instrumented once, however many times this is
+        called. Handlers return None, so they never affect a request.
+
+        :type client: botocore.client.BaseClient
+        :param client: client to instrument
+
+        :rtype: None
+        :return: None
+        """
+        events = client.meta.events
+        for event, handler in [
+            ('before-parameter-build', self._before_call),
+            ('response-received', self._response_received),
+            ('after-call', self._after_call),
+            ('after-call-error', self._after_call_error),
+        ]:
+            events.register(
+                event,
+                handler,
+                unique_id=f'statikos-tracer-{id(self)}-{event}'
+            )
+
+    def _before_call(self, context: dict, **kwargs: dict) -> None:
+        """
+        Mark the start of an API call.
+
+        :rtype: None
+        :return: None
+        """
+        context[START] = time.perf_counter()
+        context[ATTEMPTS] = 0
+
+    def _response_received(self, context: dict, **kwargs: dict) -> None:
+        """
+        Count an HTTP attempt.
+
+        :rtype: None
+        :return: None
+        """
+        context[ATTEMPTS] = context.get(ATTEMPTS, 0) + 1
+
+    def _after_call(
+        self, parsed: dict, model, context: dict, **kwargs: dict
+    ) -> None:
+        """
+        Record an API call that got a response.
+
+        :rtype: None
+        :return: None
+        """
+        error = (parsed or {}).get('Error', {}).get('Code')
+        self._call(model, context, error)
+
+    def _after_call_error(
+        self, exception: Exception, model, context: dict, **kwargs: dict
+    ) -> None:
+        """
+        Record an API call that failed without a response.
+
+        :rtype: None
+        :return: None
+        """
+        self._call(model, context, type(exception).__name__)
+
+    def _call(self, model, context: dict, error: str = None) -> None:
+        """
+        Record an API call.
+
+        :type model: botocore.model.OperationModel
+        :param model: operation model
+        :type context: dict
+        :param context: request context
+        :type error: str
+        :param error: error code, if the call failed
+
+        :rtype: None
+        :return: None
+        """
+        if START not in context:
+            return
+        args = {'attempts': context.get(ATTEMPTS, 0)}
+        if error:
+            args['error'] = error
+        self.add(
+            f'{model.service_model.service_name}.{model.name}',
+            'aws',
+            context.pop(START),
+            time.perf_counter(),
+            args
+        )
+
+    def to_chrome(self) -> dict:
+        """
+        Export the spans in the Chrome trace event format.
+
+        The result can be opened in `chrome://tracing` or Perfetto.
+
+        :rtype: dict
+        :return: a trace
+        """
+        pid = os.getpid()
+        events = [{
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': pid,
+            'tid': tid,
+            'args': {'name': name},
+        } for tid, name in sorted(self._threads.values())]
+        for s in sorted(self.spans, key=lambda s: s['start']):
+            events.append({
+                'name': s['name'],
+                'cat': s['category'],
+                'ph': 'X',
+                'ts': round((s['start'] - self.start) * 1e6, 3),
+                'dur': round((s['end'] - s['start']) * 1e6, 3),
+                'pid': pid,
+                'tid': s['tid'],
+                'args': s['args'],
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, filename: str) -> None:
+        """
+        Write the trace to a file (see `to_chrome`).
+
+        :type filename: str
+        :param filename: name of file
+
+        :rtype: None
+        :return: None
+        """
+        utils.write_json_file(self.to_chrome(), filename, compact=True)
+
+    def stats(self) -> str:
+        """
+        Summarize the phases and API calls.
+
+        Phases are listed in the order they started, indented by nesting;
+        API calls are listed by total time, largest first.
+
+        Example:
+
+        Phase                            Count     Total       Max
+        deploy                               1    84.21s    84.21s
+          create                             1     0.05s     0.05s
+        ...
+        AWS call                         Count  Attempts  Errors     Total
+        cloudformation.DescribeStackEvents  31        32       0     5.32s
+        ...
+
+        :rtype: str
+        :return: summary
+        """
+        phases, calls = {}, {}
+        for s in sorted(self.spans, key=lambda s: s['start']):
+            elapsed = s['end'] - s['start']
+            if s['category'] == 'aws':
+                c = calls.setdefault(s['name'], [0, 0, 0, 0.0])
+                c[0] += 1
+                c[1] += s['args'].get('attempts', 0)
+                c[2] += 'error' in s['args']
+                c[3] += elapsed
+            else:
+                p = phases.setdefault(s['name'], [s['depth'], 0, 0.0, 0.0])
+                p[1] += 1
+                p[2] += elapsed
+                p[3] = max(p[3], elapsed)
+        lines = [f'{"Phase":<36}{"Count":>6}{"Total":>10}{"Max":>10}']
+        for name, (depth, count, total, longest) in phases.items():
+            label = '  ' * depth + name
+            lines.append(
+                f'{label:<36}{count:>6}{total:>9.2f}s{longest:>9.2f}s'
+            )
+        lines.append(
+            f'{"AWS call":<36}{"Count":>6}{"Attempts":>10}{"Errors":>8}'
+            f'{"Total":>10}'
+        )
+        for name, (count, attempts, errors, total) in sorted(
+                calls.items(), key=lambda c: -c[1][3]):
+            lines.append(
+                f'{name:<36}{count:>6}{attempts:>10}{errors:>8}'
+                f'{total:>9.2f}s'
+            )
+        return '\n'.join(lines)
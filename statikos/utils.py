@@ -47,6 +47,33 @@ def mkdir(path: str) -> None:
         pass
 
 
+def link_tree(src: str, dst: str) -> None:
+    """
+    Mirror a directory with symbolic links to its files.
+
+    A file written to the mirror through a temporary file and `os.replace`
+    replaces the link, not the file it points to, so the mirror can be
+    written to without changing the original. Temporary (`.tmp`) files are
+    not linked, since they are written to in place.
+
+    :type src: str
+    :param src: path to the directory to mirror
+    :type dst: str
+    :param dst: path to the mirror
+
+    :rtype: None
+    :return: None
+    """
+    for root, _, files in os.walk(src):
+        target = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            if not name.endswith('.tmp'):
+                os.symlink(
+                    os.path.join(root, name), os.path.join(target, name)
+                )
+
+
 def read_file(filename: str) -> str:
     """
     Read a file.
@@ -107,7 +134,12 @@ def read_json_file(filename: str) -> dict:
         return json.load(f)
 
 
-def write_json_file(data: dict, filename: str) -> None:
+def write_json_file(
+    data: dict,
+    filename: str,
+    compact: bool = False,
+    sort_keys: bool = False
+) -> None:
     """
     Write a JSON file.
 
@@ -123,16 +155,28 @@ def write_json_file(data: dict, filename: str) -> None:
       }
     }
 
+    If `compact` is set, insignificant whitespace is omitted:
+
+    {"a":1,"b":{"c":3,"d":4}}
+
     :type data: dict
     :param data: data to write
     :type filename: str
     :param filename: name of file
+    :type compact: bool
+    :param compact: whether to omit insignificant whitespace
+    :type sort_keys: bool
+    :param sort_keys: whether to sort keys, so that equal data always gives
+        the same file
 
     :rtype: None
     :return: None
     """
     with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+        if compact:
+            json.dump(data, f, separators=(',', ':'), sort_keys=sort_keys)
+        else:
+            json.dump(data, f, indent=2, sort_keys=sort_keys)
 
 
 def read_yaml_file(filename: str) -> dict:
@@ -0,0 +1,505 @@
+# -*- coding: utf-8 -*-
+"""
+Validation module.
+
+CloudFormation templates are validated offline, against the subset of the
+CloudFormation resource specification bundled in
+`data/cloudformation-spec.json`. The subset covers the resource types that
+Statikos generates, in the same format as the full specification
+(https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/cfn-resource-specification.html),
+and is versioned by its `ResourceSpecificationVersion`.
+"""
+
+import functools
+import json
+import os
+import re
+from typing import Iterator, List, Tuple
+
+SPEC_JSON = os.path.join(
+    os.path.dirname(__file__), 'data', 'cloudformation-spec.json'
+)
+
+# Limits of a CloudFormation template (see
+# https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/cloudformation-limits.html).
+MAX_TEMPLATE_SIZE = 1024 * 1024
+MAX_RESOURCES = 500
+MAX_PARAMETERS = 200
+MAX_OUTPUTS = 200
+MAX_LOGICAL_ID = 255
+
+LOGICAL_ID = re.compile(r'\A[A-Za-z0-9]+\Z')
+
+PSEUDO_PARAMETERS = {
+    'AWS::AccountId', 'AWS::NoValue', 'AWS::NotificationARNs',
+    'AWS::Partition', 'AWS::Region', 'AWS::StackId', 'AWS::StackName',
+    'AWS::URLSuffix'
+}
+
+# `${Name}` or `${Name.Attribute}` in `Fn::Sub`, but not `${!Literal}`.
+SUB_VARIABLE = re.compile(r'\$\{([^!}][^}]*)\}')
+
+
+@functools.lru_cache(maxsize=None)
+def load_spec() -> dict:
+    """
+    Load the bundled CloudFormation resource specification.
+
+    :rtype: dict
+    :return: CloudFormation resource specification
+    """
+    with open(SPEC_JSON, 'rb') as f:
+        return json.load(f)
+
+
+def spec_version() -> str:
+    """
+    Return the version of the bundled CloudFormation resource specification.
+
+    :rtype: str
+    :return: version of the resource specification
+    """
+    return load_spec()['ResourceSpecificationVersion']
+
+
+def is_intrinsic(value: object) -> bool:
+    """
+    Determine if a value is an intrinsic function.
+
+    The result of an intrinsic function is only known to CloudFormation.
+
+    :type value: object
+    :param value: template value
+
+    :rtype: bool
+    :return: whether the value is an intrinsic function
+    """
+    if not isinstance(value, dict) or len(value) != 1:
+        return False
+    key = next(iter(value))
+    return key == 'Ref' or key == 'Condition' or key.startswith('Fn::')
+
+
+def _ref_references(
+    arg: object, path: str
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Find the references in the argument of a `Ref`.
+
+    :type arg: object
+    :param arg: argument of the function
+    :type path: str
+    :param path: path of the argument in the template
+
+    :rtype: Iterator[Tuple[str, str, str]]
+    :return: references in the argument
+    """
+    if isinstance(arg, str):
+        yield path, arg, None
+    else:
+        yield from references(arg, path)
+
+
+def _get_att_references(
+    arg: object, path: str
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Find the references in the argument of a `Fn::GetAtt`.
+
+    :type arg: object
+    :param arg: argument of the function
+    :type path: str
+    :param path: path of the argument in the template
+
+    :rtype: Iterator[Tuple[str, str, str]]
+    :return: references in the argument
+    """
+    if isinstance(arg, str) and '.' in arg:
+        arg = arg.split('.', 1)
+    if not isinstance(arg, list) or len(arg) != 2 or \
+            not isinstance(arg[0], str):
+        yield from references(arg, path)
+    elif isinstance(arg[1], str):
+        yield path, arg[0], arg[1]
+    else:
+        yield from references(arg[1], f'{path}/1')
+
+
+def _sub_references(
+    arg: object, path: str
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Find the references in the argument of a `Fn::Sub`.
+
+    Variables of the string that are not given a value by the function refer
+    to a parameter or resource (or, with a dot, a resource attribute).
+
+    :type arg: object
+    :param arg: argument of the function
+    :type path: str
+    :param path: path of the argument in the template
+
+    :rtype: Iterator[Tuple[str, str, str]]
+    :return: references in the argument
+    """
+    string, variables = arg, {}
+    if isinstance(arg, list) and len(arg) == 2:
+        string, variables = arg
+        yield from references(variables, f'{path}/1')
+    if not isinstance(string, str) or not isinstance(variables, dict):
+        return
+    for name in SUB_VARIABLE.findall(string):
+        name = name.strip()
+        if name not in variables:
+            target, _, attribute = name.partition('.')
+            yield path, target, attribute or None
+
+
+# Functions that find the references in the argument of an intrinsic
+# function, by name of the function.
+INTRINSIC_REFERENCES = {
+    'Ref': _ref_references,
+    'Fn::GetAtt': _get_att_references,
+    'Fn::Sub': _sub_references,
+}
+
+
+def references(value: object, path: str) -> Iterator[Tuple[str, str, str]]:
+    """
+    Find the `Ref`, `Fn::GetAtt`, and `Fn::Sub` references in a value.
+
+    Yields (path, logical ID, attribute) tuples. The attribute is None for
+    a `Ref`.
+
+    :type value: object
+    :param value: template value
+    :type path: str
+    :param path: path of the value in the template
+
+    :rtype: Iterator[Tuple[str, str, str]]
+    :return: references in the value
+    """
+    if isinstance(value, list):
+        items = enumerate(value)
+    elif not isinstance(value, dict):
+        return
+    elif is_intrinsic(value) and next(iter(value)) in INTRINSIC_REFERENCES:
+        key, arg = next(iter(value.items()))
+        yield from INTRINSIC_REFERENCES[key](arg, f'{path}/{key}')
+        return
+    else:
+        items = value.items()
+    for key, item in items:
+        yield from references(item, f'{path}/{key}')
+
+
+def property_type(spec: dict, resource_type: str, name: str) -> dict:
+    """
+    Look up a property type in the resource specification.
+
+    Property types are specific to a resource type (e.g.
+    `AWS::CloudFront::Distribution.Origin`), except for a few shared ones
+    (e.g. `Tag`).
+
+    :type spec: dict
+    :param spec: CloudFormation resource specification
+    :type resource_type: str
+    :param resource_type: resource type the property belongs to
+    :type name: str
+    :param name: name of the property type
+
+    :rtype: dict
+    :return: the property type, or None if it is not in the specification
+    """
+    types = spec['PropertyTypes']
+    return types.get(f'{resource_type}.{name}') or types.get(name)
+
+
+def _items(kind: str, value: object) -> list:
+    """
+    Return the items of a property value, by the type of the property.
+
+    :type kind: str
+    :param kind: type of the property (`List`, `Map`, or a property type)
+    :type value: object
+    :param value: property value
+
+    :rtype: list
+    :return: (index or key, item) tuples; the index is None if the value is
+        not a list or map
+    """
+    if kind == 'List':
+        return list(enumerate(value)) if isinstance(value, list) else []
+    if kind == 'Map':
+        return list(value.items()) if isinstance(value, dict) else []
+    return [(None, value)]
+
+
+def _check_nested(
+    spec: dict, resource_type: str, prop: dict, value: object, path: str,
+    errors: List[str]
+) -> None:
+    """
+    Check a property value whose type is a property type.
+
+    :type spec: dict
+    :param spec: CloudFormation resource specification
+    :type resource_type: str
+    :param resource_type: resource type the property belongs to
+    :type prop: dict
+    :param prop: property, from the resource specification
+    :type value: object
+    :param value: property value, from the template
+    :type path: str
+    :param path: path of the value in the template
+    :type errors: List[str]
+    :param errors: list to append errors to
+
+    :rtype: None
+    :return: None
+    """
+    kind = prop.get('Type')
+    if not kind:
+        return
+    name = prop.get('ItemType') if kind in ('List', 'Map') else kind
+    nested = property_type(spec, resource_type, name)
+    if nested is None or 'Properties' not in nested:
+        return
+    for key, item in _items(kind, value):
+        check_properties(
+            spec,
+            resource_type,
+            item,
+            nested['Properties'],
+            path if key is None else f'{path}/{key}',
+            errors
+        )
+
+
+def check_properties(
+    spec: dict, resource_type: str, properties: object, schema: dict,
+    path: str, errors: List[str]
+) -> None:
+    """
+    Check the properties of a resource or property against the specification.
+
+    Required properties must be present, and every property must be known.
+    Properties whose value is the result of an intrinsic function are not
+    checked.
+
+    :type spec: dict
+    :param spec: CloudFormation resource specification
+    :type resource_type: str
+    :param resource_type: resource type the properties belong to
+    :type properties: object
+    :param properties: properties, from the template
+    :type schema: dict
+    :param schema: properties, from the resource specification
+    :type path: str
+    :param path: path of the properties in the template
+    :type errors: List[str]
+    :param errors: list to append errors to
+
+    :rtype: None
+    :return: None
+    """
+    if is_intrinsic(properties):
+        return
+    if not isinstance(properties, dict):
+        errors.append(f'{path}: expected an object')
+        return
+    for name, prop in schema.items():
+        if prop.get('Required') and name not in properties:
+            errors.append(f'{path}: missing required property `{name}`')
+    for name, value in properties.items():
+        if name not in schema:
+            errors.append(f'{path}/{name}: unknown property')
+            continue
+        _check_nested(
+            spec, resource_type, schema[name], value, f'{path}/{name}',
+            errors
+        )
+
+
+def _check_section(
+    template: dict, section: str, limit: int, errors: List[str]
+) -> dict:
+    """
+    Check the number of entries of a section and their logical IDs.
+
+    :type template: dict
+    :param template: CloudFormation template
+    :type section: str
+    :param section: name of the section (e.g. `Parameters`)
+    :type limit: int
+    :param limit: maximum number of entries
+    :type errors: List[str]
+    :param errors: list to append errors to
+
+    :rtype: dict
+    :return: the section, or an empty dict if it is missing or invalid
+    """
+    value = template.get(section) or {}
+    if not isinstance(value, dict):
+        errors.append(f'{section}: expected an object')
+        return {}
+    if len(value) > limit:
+        errors.append(f'{section}: {len(value)} exceeds the limit of {limit}')
+    for name in value:
+        if len(name) > MAX_LOGICAL_ID or not LOGICAL_ID.match(name):
+            errors.append(f'{section}/{name}: invalid logical ID')
+    return value
+
+
+def _check_resource(
+    name: str, resource: object, resources: dict, errors: List[str]
+) -> None:
+    """
+    Check the type, properties, and dependencies of a resource.
+
+    :type name: str
+    :param name: logical ID of the resource
+    :type resource: object
+    :param resource: resource, from the template
+    :type resources: dict
+    :param resources: every resource in the template
+    :type errors: List[str]
+    :param errors: list to append errors to
+
+    :rtype: None
+    :return: None
+    """
+    path = f'Resources/{name}'
+    if not isinstance(resource, dict):
+        errors.append(f'{path}: expected an object')
+        return
+    depends_on = resource.get('DependsOn') or []
+    if isinstance(depends_on, str):
+        depends_on = [depends_on]
+    for target in depends_on:
+        if target not in resources:
+            errors.append(f'{path}/DependsOn: unknown resource `{target}`')
+    spec = load_spec()
+    resource_type = resource.get('Type')
+    if resource_type in spec['ResourceTypes']:
+        check_properties(
+            spec,
+            resource_type,
+            resource.get('Properties', {}),
+            spec['ResourceTypes'][resource_type]['Properties'],
+            f'{path}/Properties',
+            errors
+        )
+    elif not isinstance(resource_type, str):
+        errors.append(f'{path}: missing resource type')
+    elif not resource_type.startswith('Custom::') and \
+            resource_type != 'AWS::CloudFormation::CustomResource':
+        errors.append(f'{path}: unknown resource type `{resource_type}`')
+
+
+def _check_attribute(
+    path: str, target: str, attribute: str, resources: dict,
+    errors: List[str]
+) -> None:
+    """
+    Check that a resource has an attribute that is referred to.
+
+    :type path: str
+    :param path: path of the reference in the template
+    :type target: str
+    :param target: logical ID of the resource
+    :type attribute: str
+    :param attribute: name of the attribute
+    :type resources: dict
+    :param resources: every resource in the template
+    :type errors: List[str]
+    :param errors: list to append errors to
+
+    :rtype: None
+    :return: None
+    """
+    resource = resources.get(target)
+    if not isinstance(resource, dict):
+        errors.append(f'{path}: `{target}` is not a resource')
+        return
+    types = load_spec()['ResourceTypes']
+    resource_type = resource.get('Type')
+    if resource_type in types and \
+            attribute not in types[resource_type]['Attributes']:
+        errors.append(
+            f'{path}: `{resource_type}` has no attribute `{attribute}`'
+        )
+
+
+def _check_references(sections: dict, errors: List[str]) -> None:
+    """
+    Check the targets of the references in resources and outputs.
+
+    :type sections: dict
+    :param sections: `Resources`, `Parameters`, and `Outputs` sections
+    :type errors: List[str]
+    :param errors: list to append errors to
+
+    :rtype: None
+    :return: None
+    """
+    resources = sections['Resources']
+    targets = set(resources) | set(sections['Parameters']) | PSEUDO_PARAMETERS
+    for section in ['Resources', 'Outputs']:
+        for path, target, attribute in \
+                references(sections[section], section):
+            if target not in targets:
+                errors.append(f'{path}: unknown reference `{target}`')
+            elif attribute is not None:
+                _check_attribute(path, target, attribute, resources, errors)
+
+
+def validate(template: dict, size: int = None) -> List[str]:
+    """
+    Validate a CloudFormation template against the bundled specification.
+
+    The following are checked:
+
+    * size limits: the size of the template, and the number of resources,
+      parameters, and outputs
+    * logical IDs
+    * resource types
+    * required and unknown properties, including those of property types
+    * `Ref`, `Fn::GetAtt`, `Fn::Sub`, and `DependsOn` targets, and `GetAtt`
+      attributes
+
+    Resource types that are not in the bundled specification (other than
+    custom resources) are reported as errors, as are references to them.
+
+    :type template: dict
+    :param template: CloudFormation template
+    :type size: int
+    :param size: size of the template body, in bytes
+
+    :rtype: List[str]
+    :return: errors found, or an empty list if the template is valid
+    """
+    errors = []
+    if size is not None and size > MAX_TEMPLATE_SIZE:
+        errors.append(
+            f'Template: {size} bytes exceeds the limit of '
+            f'{MAX_TEMPLATE_SIZE} bytes'
+        )
+    if not isinstance(template, dict):
+        errors.append('Template: expected an object')
+        return errors
+    sections = {
+        section: _check_section(template, section, limit, errors)
+        for section, limit in [
+            ('Resources', MAX_RESOURCES),
+            ('Parameters', MAX_PARAMETERS),
+            ('Outputs', MAX_OUTPUTS),
+        ]
+    }
+    resources = sections['Resources']
+    if not resources:
+        errors.append('Resources: at least one resource is required')
+    for name, resource in resources.items():
+        _check_resource(name, resource, resources, errors)
+    _check_references(sections, errors)
+    return errors
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""Watch module."""
+
+import os
+import threading
+import time
+from typing import Callable, List, Set, Tuple
+
+from .exceptions import MissingDependency, SourceNotFound
+from .hashing import HashCache
+from .sync import LocalFile, Sync, SyncResult, walk
+
+DEFAULT_DEBOUNCE = 0.5
+DEFAULT_MAX_DELAY = 5.0
+DEFAULT_INVALIDATION_INTERVAL = 10.0
+
+# Events that do not change the content of a file.
+IGNORED_EVENTS = ('opened', 'closed_no_write')
+
+
+class Watcher():
+    """
+    Keep a bucket in line with a directory of static content as it changes.
+
+    The directory is scanned once, when the watcher starts. After that, the
+    files under it are kept in memory and only the paths named by filesystem
+    events (inotify on Linux) are stat'ed and hashed again. A static site
+    generator rebuild touches many files in quick succession, so events are
+    collected until none has arrived for `debounce` seconds (or for at most
+    `max_delay` seconds), and the whole burst is synced at once.
+
+    Each burst goes through `Sync.run`, so it passes through the same stages
+    and is compared against the same manifest as `statikos sync`: only the
+    files that actually changed are uploaded, and removed files are deleted.
+    Objects that were overwritten or deleted are invalidated at most once
+    every `invalidation_interval` seconds, in a single batch.
+    """
+    def __init__(
+        self,
+        sync: Sync,
+        debounce: float = None,
+        max_delay: float = None,
+        invalidate: Callable[[List[str]], List[str]] = None,
+        invalidation_interval: float = None,
+        echo: Callable[[str], None] = None
+    ) -> None:
+        """
+        Create a new `Watcher` object.
+
+        :type sync: statikos.sync.Sync
+        :param sync: sync of the directory to watch
+        :type debounce: float
+        :param debounce: seconds without events after which a burst of
+            changes is synced
+        :type max_delay: float
+        :param max_delay: maximum seconds between the first event of a burst
+            and its sync
+        :type invalidate: Callable[[List[str]], List[str]]
+        :param invalidate: called with the keys of overwritten and deleted
+            objects, returns the invalidated paths (default: no invalidation)
+        :type invalidation_interval: float
+        :param invalidation_interval: minimum seconds between invalidations
+        :type echo: Callable[[str], None]
+        :param echo: called with progress messages
+
+        :rtype: None
+        :return: None
+        """
+        try:
+            import watchdog  # noqa: F401
+        except ImportError:
+            raise MissingDependency(package='watchdog', extra='watch')
+        self.sync = sync
+        self.source = sync.source
+        self.debounce = DEFAULT_DEBOUNCE if debounce is None else debounce
+        self.max_delay = max_delay or DEFAULT_MAX_DELAY
+        self.invalidate = invalidate
+        self.invalidation_interval = DEFAULT_INVALIDATION_INTERVAL \
+            if invalidation_interval is None else invalidation_interval
+        self.echo = echo
+        # Every file under the source directory, by key, before the stages.
+        self.files = {}
+        # Keys of objects to invalidate in the next batch.
+        self.changed = set()
+        self._pending = set()
+        self._first = None
+        self._last = None
+        self._next_invalidation = 0.0
+        self._stopped = False
+        self._cond = threading.Condition()
+
+    def _echo(self, message: str) -> None:
+        """
+        Report progress.
+
+        :type message: str
+        :param message: message
+
+        :rtype: None
+        :return: None
+        """
+        if self.echo:
+            self.echo(message)
+
+    def dispatch(self, event) -> None:
+        """
+        Record a filesystem event.
+
+        Called by the watchdog observer thread. Directory modifications are
+        ignored, since the files in the directory have events of their own.
+
+        :type event: watchdog.events.FileSystemEvent
+        :param event: filesystem event
+
+        :rtype: None
+        :return: None
+        """
+        if event.event_type in IGNORED_EVENTS or \
+                (event.is_directory and event.event_type == 'modified'):
+            return
+        paths = [event.src_path]
+        if getattr(event, 'dest_path', ''):
+            paths.append(event.dest_path)
+        self.notify(paths)
+
+    def notify(self, paths: List[str]) -> None:
+        """
+        Mark paths as changed.
+
+        :type paths: List[str]
+        :param paths: paths of changed files or directories
+
+        :rtype: None
+        :return: None
+        """
+        now = time.monotonic()
+        with self._cond:
+            if not self._pending:
+                self._first = now
+            self._last = now
+            self._pending.update(paths)
+            self._cond.notify()
+
+    def stop(self) -> None:
+        """
+        Stop watching.
+
+        :rtype: None
+        :return: None
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def wait(self, timeout: float = None) -> Set[str]:
+        """
+        Wait for a burst of changes to settle.
+
+        :type timeout: float
+        :param timeout: maximum seconds to wait for the first change
+
+        :rtype: Set[str]
+        :return: changed paths (empty if there was no change before the
+            timeout), or None if the watcher was stopped
+        """
+        with self._cond:
+            while not self._pending and not self._stopped:
+                if not self._cond.wait(timeout):
+                    return set()
+            while not self._stopped:
+                delay = min(
+                    self._last + self.debounce, self._first + self.max_delay
+                ) - time.monotonic()
+                if delay <= 0:
+                    break
+                self._cond.wait(delay)
+            if self._stopped:
+                return None
+            paths, self._pending = self._pending, set()
+            return paths
+
+    def update(self, paths: Set[str]) -> None:
+        """
+        Bring the files in memory in line with changed paths.
+
+        A path that is a directory (e.g. one moved into place by a generator)
+        is walked, and a path that no longer exists removes every file at or
+        under it. Only the files found are stat'ed and hashed.
+
+        :type paths: Set[str]
+        :param paths: changed paths
+
+        :rtype: None
+        :return: None
+        """
+        found, removed = self._classify(paths)
+        self._remove(removed)
+        stats = []
+        for path, key in found:
+            try:
+                stats.append((path, key, os.stat(path)))
+            except FileNotFoundError:
+                self.files.pop(key, None)
+        # A cache of its own, since `HashCache.hash_files` drops the entries
+        # of every file it is not given.
+        digests = HashCache(None, self.sync.part_size).hash_files(
+            [(path, st) for path, _, st in stats],
+            processes=self.sync.processes
+        )
+        for (path, key, st), digest in zip(stats, digests):
+            self.files[key] = LocalFile(
+                key, path, st.st_size, digest.md5, digest.etag
+            )
+
+    def _classify(
+        self, paths: Set[str]
+    ) -> Tuple[List[Tuple[str, str]], Set[str]]:
+        """
+        Sort changed paths into files that exist and keys that are gone.
+
+        Paths outside of the source directory, and the directory itself, are
+        ignored. A directory is walked.
+
+        :type paths: Set[str]
+        :param paths: changed paths
+
+        :rtype: Tuple[List[Tuple[str, str]], Set[str]]
+        :return: (path, key) tuples of existing files, and keys of removed
+            files or directories
+        """
+        found = []
+        removed = set()
+        for path in paths:
+            key = os.path.relpath(path, self.source).replace(os.sep, '/')
+            if key in ('.', '..') or key.startswith('../'):
+                continue
+            if os.path.isdir(path):
+                found.extend((p, f'{key}/{k}') for p, k in walk(path))
+            elif os.path.isfile(path):
+                found.append((path, key))
+            else:
+                removed.add(key)
+        return found, removed
+
+    def _remove(self, removed: Set[str]) -> None:
+        """
+        Forget the files at or under removed keys.
+
+        :type removed: Set[str]
+        :param removed: keys of removed files or directories
+
+        :rtype: None
+        :return: None
+        """
+        prefixes = tuple(f'{key}/' for key in removed)
+        for key in [
+            k for k in self.files if k in removed or k.startswith(prefixes)
+        ]:
+            del self.files[key]
+
+    def flush(self, paths: Set[str] = None) -> SyncResult:
+        """
+        Sync changed paths.
+
+        Every file still goes through the stages (which cache their output),
+        since a stage may depend on other files than the one that changed
+        (e.g. fingerprinting rewrites the pages that refer to an asset).
+
+        :type paths: Set[str]
+        :param paths: changed paths (default: none, e.g. for the first sync)
+
+        :rtype: statikos.sync.SyncResult
+        :return: a summary of the sync
+        """
+        if paths:
+            self.update(paths)
+        result = SyncResult()
+        try:
+            self.sync.run(list(self.files.values()), result)
+        finally:
+            self.changed.update(result.changed)
+        return result
+
+    def flush_invalidations(self, force: bool = False) -> List[str]:
+        """
+        Invalidate the objects changed since the last invalidation.
+
+        :type force: bool
+        :param force: whether to invalidate before the interval has passed
+
+        :rtype: List[str]
+        :return: invalidated paths
+        """
+        if self.invalidate is None or not self.changed:
+            return []
+        now = time.monotonic()
+        if not force and now < self._next_invalidation:
+            return []
+        keys = sorted(self.changed)
+        self.changed.clear()
+        self._next_invalidation = now + self.invalidation_interval
+        try:
+            paths = self.invalidate(keys)
+        except Exception:
+            self.changed.update(keys)
+            raise
+        self._echo(f'Invalidated {len(paths)} path(s)')
+        return paths
+
+    def _timeout(self) -> float:
+        """
+        Return the seconds until the next invalidation is due.
+
+        :rtype: float
+        :return: seconds, or None if there is nothing to invalidate
+        """
+        if self.invalidate is None or not self.changed:
+            return None
+        return max(0.0, self._next_invalidation - time.monotonic())
+
+    def run(self) -> None:
+        """
+        Sync the source directory, then watch it until stopped.
+
+        Errors are reported and do not stop the watcher: files that failed
+        to upload are still changed, so they are retried with the next burst.
+        Objects that are still to be invalidated are invalidated on the way
+        out.
+
+        :rtype: None
+        :return: None
+        """
+        from watchdog.observers import Observer
+        if not os.path.isdir(self.source):
+            raise SourceNotFound(source=self.source)
+        observer = Observer()
+        # Start watching before the first scan, so that no change is missed.
+        observer.schedule(self, self.source, recursive=True)
+        observer.start()
+        try:
+            self.files = {f.key: f for f in self.sync.scan()}
+            self._step(self.flush)
+            while True:
+                self._step(self.flush_invalidations)
+                paths = self.wait(self._timeout())
+                if paths is None:
+                    break
+                if paths:
+                    self._step(self.flush, paths)
+        finally:
+            observer.stop()
+            observer.join()
+            self._step(self.flush_invalidations, True)
+
+    def _step(self, function: Callable, *args: list) -> None:
+        """
+        Call a step of the watch loop, and report its outcome.
+
+        :type function: Callable
+        :param function: `flush` or `flush_invalidations`
+        :type args: list
+        :param args: arguments
+
+        :rtype: None
+        :return: None
+        """
+        try:
+            result = function(*args)
+        except Exception as e:
+            self._echo(f'Error: {e}')
+            return
+        if isinstance(result, SyncResult):
+            self._echo(str(result))
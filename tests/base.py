@@ -5,7 +5,7 @@ import unittest
 from unittest.mock import Mock, patch
 
 from statikos import api
-from statikos.api import AWS
+from statikos.api import AWS, ClientRegistry
 
 
 class BaseTestCase(unittest.TestCase):
@@ -18,6 +18,7 @@ class AWSBaseTestCase(BaseTestCase):
     def setUp(self):
         super(AWSBaseTestCase, self).setUp()
         self.region = 'region'
+        patch.object(api, 'registry', ClientRegistry()).start()
         self.session = Mock()
         self.mock_session = patch.object(api.boto3, 'Session').start()
         self.mock_session.return_value = self.session
@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 """Tests for the `api` module."""
 
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, call, patch
 
 from botocore import exceptions
+from botocore.config import Config
 
-from statikos import utils
-from statikos.api import CloudFormation
-from statikos.exceptions import InvalidTemplate
+from statikos import api, utils
+from statikos.api import (
+    AWS, S3, ClientRegistry, CloudFormation, CloudFront
+)
+from statikos.exceptions import (
+    ChangeSetFailed, InvalidTemplate, StackFailed, UploadNotFound
+)
 
-from .base import AWSBaseTestCase
+from .base import AWSBaseTestCase, BaseTestCase
 
 
 class AWSTestCase(AWSBaseTestCase):
@@ -17,12 +22,119 @@ class AWSTestCase(AWSBaseTestCase):
         super(AWSTestCase, self).setUp()
 
     def test_get_session(self):
-        self.aws._get_session()
-        self.mock_session.assert_called_with(region_name='region')
+        self.assertEqual(self.session, self.aws._get_session())
+        self.mock_session.assert_called_once_with(region_name='region')
+
+    def test_get_session_profile(self):
+        AWS(region=self.region, profile='profile')
+        self.mock_session.assert_called_with(
+            region_name='region', profile_name='profile'
+        )
 
     def test_get_client(self):
-        self.aws._get_client()
-        self.session.client.assert_called_with(None, use_ssl=True)
+        self.assertEqual(self.session.client.return_value, self.aws.client)
+        args, kwargs = self.session.client.call_args
+        self.assertEqual((None, ), args)
+        self.assertTrue(kwargs['use_ssl'])
+        config = kwargs['config']
+        self.assertEqual(
+            {'mode': 'adaptive', 'max_attempts': 10}, config.retries
+        )
+        self.assertEqual(10, config.connect_timeout)
+        self.assertEqual(60, config.read_timeout)
+        self.assertTrue(config.tcp_keepalive)
+        self.assertEqual(AWS.MAX_POOL_CONNECTIONS, config.max_pool_connections)
+
+    def test_get_config(self):
+        aws = AWS(
+            region=self.region,
+            max_pool_connections=32,
+            config={'read_timeout': 5}
+        )
+        config = aws._get_config()
+        self.assertEqual(5, config.read_timeout)
+        self.assertEqual(10, config.connect_timeout)
+        self.assertEqual(32, config.max_pool_connections)
+
+    def test_shared_client(self):
+        aws = AWS(region=self.region)
+        self.assertIs(self.aws.client, aws.client)
+        self.assertIs(self.aws.session, aws.session)
+        self.mock_session.assert_called_once()
+        self.session.client.assert_called_once()
+        AWS(region='other')
+        self.assertEqual(2, self.mock_session.call_count)
+
+    def test_limiter_shared_client(self):
+        limiter = Mock()
+        AWS(region=self.region, limiter=limiter)
+        AWS(region=self.region, limiter=limiter)
+        calls = self.session.client.return_value.meta.events.register
+        self.assertEqual(2, calls.call_count)
+        unique_ids = {c[1]['unique_id'] for c in calls.call_args_list}
+        self.assertEqual({f'statikos-limiter-{id(limiter)}'}, unique_ids)
+
+    def test_limiter(self):
+        limiter = Mock()
+        aws = api.AWS(region=self.region, limiter=limiter)
+        aws.client.meta.events.register.assert_called_once()
+        event, handler = aws.client.meta.events.register.call_args[0]
+        self.assertEqual('before-send', event)
+        self.assertIsNone(handler(request=Mock()))
+        limiter.acquire.assert_called_once_with()
+
+    def test_tracer(self):
+        tracer = Mock()
+        aws = api.AWS(region=self.region, tracer=tracer)
+        self.assertIs(tracer, aws.tracer)
+        tracer.instrument.assert_called_once_with(aws.client)
+
+
+class ClientRegistryTestCase(BaseTestCase):
+    def setUp(self):
+        super(ClientRegistryTestCase, self).setUp()
+        self.mock_session = patch.object(api.boto3, 'Session').start()
+        self.mock_session.side_effect = lambda **kwargs: Mock(
+            client=Mock(side_effect=lambda *args, **kwargs: Mock())
+        )
+        self.registry = ClientRegistry()
+
+    def test_session(self):
+        session = self.registry.session('region')
+        self.assertIs(session, self.registry.session('region'))
+        self.assertIsNot(session, self.registry.session('region', 'profile'))
+        self.assertEqual(2, self.mock_session.call_count)
+
+    def test_client(self):
+        client = self.registry.client('s3', 'region')
+        self.assertIs(client, self.registry.client('s3', 'region'))
+        self.assertIsNot(
+            client, self.registry.client('cloudformation', 'region')
+        )
+        self.assertIsNot(
+            client, self.registry.client('s3', 'region', profile='profile')
+        )
+
+    def test_client_grows_pool(self):
+        client = self.registry.client(
+            's3', 'region', config=Config(max_pool_connections=32)
+        )
+        self.assertIs(
+            client,
+            self.registry.client(
+                's3', 'region', config=Config(max_pool_connections=8)
+            )
+        )
+        larger = self.registry.client(
+            's3', 'region', config=Config(max_pool_connections=64)
+        )
+        self.assertIsNot(client, larger)
+        self.assertIs(larger, self.registry.client('s3', 'region'))
+
+    def test_clear(self):
+        client = self.registry.client('s3', 'region')
+        self.registry.clear()
+        self.assertIsNot(client, self.registry.client('s3', 'region'))
 
 
 class CloudFormationTestCase(AWSBaseTestCase):
@@ -39,15 +151,6 @@ class CloudFormationTestCase(AWSBaseTestCase):
         )
         self.mock_is_valid_template = self.patch_is_valid_template.start()
 
-        self.patch_stack_exists = patch.object(CloudFormation, 'stack_exists')
-        self.mock_stack_exists = self.patch_stack_exists.start()
-
-        self.patch_create_stack = patch.object(CloudFormation, 'create_stack')
-        self.mock_create_stack = self.patch_create_stack.start()
-
-        self.patch_update_stack = patch.object(CloudFormation, 'update_stack')
-        self.mock_update_stack = self.patch_update_stack.start()
-
         self.patch_delete_stack = patch.object(CloudFormation, 'delete_stack')
         self.mock_delete_stack = self.patch_delete_stack.start()
 
@@ -56,14 +159,95 @@ class CloudFormationTestCase(AWSBaseTestCase):
         )
         self.mock_validate_template = self.patch_validate_template.start()
 
+        self.client_error = exceptions.ClientError(
+            error_response={'Error': {
+                'Code': 'Code',
+                'Message': 'Message'
+            }},
+            operation_name='Operation'
+        )
+
+        self.patch_stack_status = patch.object(
+            CloudFormation, 'stack_status', return_value='CREATE_COMPLETE'
+        )
+        self.mock_stack_status = self.patch_stack_status.start()
+
+        self.patch_create_change_set = patch.object(
+            CloudFormation, 'create_change_set', return_value={'Id': 'id'}
+        )
+        self.mock_create_change_set = self.patch_create_change_set.start()
+
+        self.change = {
+            'Action': 'Modify',
+            'LogicalResourceId': 'CloudFrontDistribution',
+            'ResourceType': 'AWS::CloudFront::Distribution',
+            'Replacement': 'False'
+        }
+        self.patch_wait_for_change_set = patch.object(
+            CloudFormation,
+            'wait_for_change_set',
+            return_value=[{
+                'Type': 'Resource',
+                'ResourceChange': self.change
+            }]
+        )
+        self.mock_wait_for_change_set = self.patch_wait_for_change_set.start()
+
+        self.patch_execute_change_set = patch.object(
+            CloudFormation, 'execute_change_set'
+        )
+        self.mock_execute_change_set = self.patch_execute_change_set.start()
+
+        self.patch_delete_change_set = patch.object(
+            CloudFormation, 'delete_change_set'
+        )
+        self.mock_delete_change_set = self.patch_delete_change_set.start()
+
+        self.patch_latest_event_id = patch.object(
+            CloudFormation, 'latest_event_id', return_value='cursor'
+        )
+        self.mock_latest_event_id = self.patch_latest_event_id.start()
+
+        self.patch_wait_for_stack = patch.object(
+            CloudFormation, 'wait_for_stack'
+        )
+        self.mock_wait_for_stack = self.patch_wait_for_stack.start()
+
+        self.mock_sleep = patch.object(api.time, 'sleep').start()
+
+    def event(
+        self,
+        event_id,
+        status='CREATE_IN_PROGRESS',
+        resource='stack_name',
+        reason=None
+    ):
+        event = {
+            'EventId': event_id,
+            'StackId': 'stack_id',
+            'StackName': 'stack_name',
+            'LogicalResourceId': resource,
+            'PhysicalResourceId': 'stack_id',
+            'ResourceType': 'AWS::CloudFormation::Stack',
+            'ResourceStatus': status,
+        }
+        if resource != 'stack_name':
+            event['PhysicalResourceId'] = resource
+            event['ResourceType'] = 'AWS::S3::Bucket'
+        if reason:
+            event['ResourceStatusReason'] = reason
+        return event
+
     def test_deploy_stack_does_not_exist(self):
         parameter_overrides = [
             'ParameterKey1=ParameterValue1', 'ParameterKey2=ParameterValue2'
         ]
-        self.mock_stack_exists.return_value = False
-        self.cfn.deploy('stack_name', 'path/to/template', parameter_overrides)
-        self.mock_stack_exists.assert_called_once_with('stack_name')
-        self.mock_create_stack.assert_called_with(
+        self.mock_stack_status.return_value = None
+        result = self.cfn.deploy(
+            'stack_name', 'path/to/template', parameter_overrides
+        )
+        self.mock_stack_status.assert_called_once_with('stack_name')
+        self.mock_create_change_set.assert_called_with(
             stack_name='stack_name',
             template_body='{}',
             parameters=[{
@@ -72,30 +256,81 @@ class CloudFormationTestCase(AWSBaseTestCase):
             }, {
                 'ParameterKey': 'ParameterKey2',
                 'ParameterValue': 'ParameterValue2',
-            }]
+            }],
+            change_set_type='CREATE',
+            template_url=None
+        )
+        self.mock_is_valid_template.assert_not_called()
+        self.mock_wait_for_change_set.assert_called_once_with('id')
+        self.mock_latest_event_id.assert_called_once_with('stack_name')
+        self.mock_execute_change_set.assert_called_once_with('id')
+        self.mock_wait_for_stack.assert_called_once_with(
+            'stack_name', cursor='cursor', callback=None
         )
+        self.assertEqual({
+            'StackName': 'stack_name',
+            'ChangeSetId': 'id',
+            'ChangeSetType': 'CREATE',
+            'Executed': True,
+            'Changes': [self.change],
+        }, result)
+
+    def test_deploy_change_set_type(self):
+        self.cfn.deploy(
+            'stack_name', 'path/to/template', change_set_type='CREATE'
+        )
+        self.mock_stack_status.assert_not_called()
+        kwargs = self.mock_create_change_set.call_args[1]
+        self.assertEqual('CREATE', kwargs['change_set_type'])
+
+    def test_deploy_stack_review_in_progress(self):
+        self.mock_stack_status.return_value = 'REVIEW_IN_PROGRESS'
+        self.cfn.deploy('stack_name', 'path/to/template')
+        kwargs = self.mock_create_change_set.call_args[1]
+        self.assertEqual('CREATE', kwargs['change_set_type'])
 
     def test_deploy_stack_exists(self):
-        parameter_overrides = [
-            'ParameterKey1=ParameterValue1', 'ParameterKey2=ParameterValue2'
-        ]
-        self.cfn.deploy('stack_name', 'path/to/template', parameter_overrides)
-        self.mock_update_stack.assert_called_with(
-            stack_name='stack_name',
-            template_body='{}',
-            parameters=[{
-                'ParameterKey': 'ParameterKey1',
-                'ParameterValue': 'ParameterValue1',
-            }, {
-                'ParameterKey': 'ParameterKey2',
-                'ParameterValue': 'ParameterValue2',
-            }]
+        result = self.cfn.deploy('stack_name', 'path/to/template')
+        kwargs = self.mock_create_change_set.call_args[1]
+        self.assertEqual('UPDATE', kwargs['change_set_type'])
+        self.mock_execute_change_set.assert_called_once_with('id')
+        self.mock_wait_for_stack.assert_called_once()
+        self.assertTrue(result['Executed'])
+
+    def test_deploy_template_url(self):
+        self.cfn.deploy(
+            'stack_name',
+            'path/to/template',
+            template_url='https://url',
+            validate=True
         )
+        self.mock_read_file.assert_not_called()
+        self.mock_is_valid_template.assert_called_once_with(
+            None, 'https://url'
+        )
+        kwargs = self.mock_create_change_set.call_args[1]
+        self.assertIsNone(kwargs['template_body'])
+        self.assertEqual('https://url', kwargs['template_url'])
+
+    def test_deploy_no_changes(self):
+        self.mock_wait_for_change_set.return_value = []
+        result = self.cfn.deploy('stack_name', 'path/to/template')
+        self.mock_delete_change_set.assert_called_once_with('id')
+        self.mock_execute_change_set.assert_not_called()
+        self.mock_wait_for_stack.assert_not_called()
+        self.assertFalse(result['Executed'])
+        self.assertEqual([], result['Changes'])
+
+    def test_deploy_validate(self):
+        self.cfn.deploy('stack_name', 'path/to/template', validate=True)
+        self.mock_is_valid_template.assert_called_once_with('{}', None)
 
     def test_deploy_stack_invalid_template(self):
         self.mock_is_valid_template.return_value = False
         with self.assertRaises(InvalidTemplate):
-            self.cfn.deploy('stack_name', 'path/to/template', [])
+            self.cfn.deploy(
+                'stack_name', 'path/to/template', [], validate=True
+            )
 
     def test_is_valid_template_true(self):
         self.patch_is_valid_template.stop()
@@ -107,12 +342,214 @@ class CloudFormationTestCase(AWSBaseTestCase):
             exceptions.ValidationError(value='', param='', type_name='')
         self.assertFalse(self.cfn.is_valid_template(''))
 
-    def test_stack_exists_true(self):
-        self.patch_stack_exists.stop()
-        self.assertTrue(self.cfn.stack_exists('stack_name'))
+    def test_wait_for_change_set(self):
+        self.patch_wait_for_change_set.stop()
+        self.cfn.client.describe_change_set.side_effect = [
+            {'Status': 'CREATE_PENDING'},
+            {'Status': 'CREATE_IN_PROGRESS'},
+            {'Status': 'CREATE_COMPLETE', 'Changes': [1], 'NextToken': 't'},
+            {'Status': 'CREATE_COMPLETE', 'Changes': [2]},
+        ]
+        self.assertEqual([1, 2], self.cfn.wait_for_change_set('id'))
+        self.cfn.client.describe_change_set.assert_called_with(
+            ChangeSetName='id', NextToken='t'
+        )
+        self.mock_sleep.assert_has_calls([call(0.5), call(1.0)])
+
+    def test_wait_for_change_set_no_changes(self):
+        self.patch_wait_for_change_set.stop()
+        self.cfn.client.describe_change_set.return_value = {
+            'Status': 'FAILED',
+            'StatusReason': "The submitted information didn't contain "
+            'changes. Submit different information to create a change set.'
+        }
+        self.assertEqual([], self.cfn.wait_for_change_set('id'))
+
+    def test_wait_for_change_set_failed(self):
+        self.patch_wait_for_change_set.stop()
+        self.cfn.client.describe_change_set.return_value = {
+            'Status': 'FAILED',
+            'StatusReason': 'Reason'
+        }
+        with self.assertRaises(ChangeSetFailed) as e:
+            self.cfn.wait_for_change_set('id')
+        self.assertIn('Reason', e.exception.msg)
+
+    def test_delete(self):
+        self.cfn.client.describe_stacks.return_value = {
+            'Stacks': [{'StackId': 'stack_id'}]
+        }
+        callback = Mock()
+        self.cfn.delete('stack_name', callback=callback)
+        self.mock_latest_event_id.assert_called_once_with('stack_id')
+        self.mock_delete_stack.assert_called_once_with('stack_id')
+        self.mock_wait_for_stack.assert_called_once_with(
+            'stack_id', cursor='cursor', callback=callback
+        )
+
+    def test_delete_stack_does_not_exist(self):
+        self.cfn.client.describe_stacks.side_effect = self.client_error
+        self.cfn.delete('stack_name')
+        self.mock_delete_stack.assert_not_called()
+
+    def test_latest_event_id(self):
+        self.patch_latest_event_id.stop()
+        self.cfn.client.describe_stack_events.return_value = {
+            'StackEvents': [self.event('2'), self.event('1')]
+        }
+        self.assertEqual('2', self.cfn.latest_event_id('stack_name'))
+        self.cfn.client.describe_stack_events.return_value = {
+            'StackEvents': []
+        }
+        self.assertIsNone(self.cfn.latest_event_id('stack_name'))
+        self.cfn.client.describe_stack_events.side_effect = self.client_error
+        self.assertIsNone(self.cfn.latest_event_id('stack_name'))
+
+    def test_stack_events(self):
+        self.cfn.client.describe_stack_events.side_effect = [
+            {
+                'StackEvents': [self.event('4'), self.event('3')],
+                'NextToken': 't'
+            },
+            {
+                'StackEvents': [self.event('2'), self.event('1')],
+                'NextToken': 't2'
+            },
+        ]
+        events = self.cfn.stack_events('stack_name', cursor='2')
+        self.assertEqual(['3', '4'], [e['EventId'] for e in events])
+        self.cfn.client.describe_stack_events.assert_called_with(
+            StackName='stack_name', NextToken='t'
+        )
+
+    def test_stack_events_no_cursor(self):
+        self.cfn.client.describe_stack_events.return_value = {
+            'StackEvents': [self.event('2'), self.event('1')]
+        }
+        events = self.cfn.stack_events('stack_name')
+        self.assertEqual(['1', '2'], [e['EventId'] for e in events])
+
+    def test_wait_for_stack(self):
+        self.patch_wait_for_stack.stop()
+        patch.object(api.random, 'uniform', return_value=1).start()
+        mock_stack_events = patch.object(
+            CloudFormation, 'stack_events'
+        ).start()
+        bucket = self.event('1', 'CREATE_IN_PROGRESS', 'S3BucketRoot')
+        stack = self.event('2', 'CREATE_COMPLETE')
+        mock_stack_events.side_effect = [[], [], [bucket], [], [stack]]
+        callback = Mock()
+        result = self.cfn.wait_for_stack(
+            'stack_name', cursor='0', callback=callback
+        )
+        self.assertEqual(stack, result)
+        callback.assert_has_calls([call(bucket), call(stack)])
+        mock_stack_events.assert_has_calls([
+            call('stack_name', cursor='0'),
+            call('stack_name', cursor='0'),
+            call('stack_name', cursor='0'),
+            call('stack_name', cursor='1'),
+            call('stack_name', cursor='1'),
+        ])
+        self.mock_sleep.assert_has_calls(
+            [call(3.0), call(4.5), call(2), call(3.0)]
+        )
 
-    def test_stack_exists_false(self):
-        self.patch_stack_exists.stop()
+    def test_wait_for_stack_backoff_limit(self):
+        self.patch_wait_for_stack.stop()
+        patch.object(api.random, 'uniform', return_value=1).start()
+        mock_stack_events = patch.object(
+            CloudFormation, 'stack_events'
+        ).start()
+        stack = self.event('2', 'UPDATE_COMPLETE')
+        mock_stack_events.side_effect = [[]] * 10 + [[stack]]
+        self.cfn.wait_for_stack('stack_name')
+        self.assertEqual(call(30), self.mock_sleep.call_args)
+
+    def test_wait_for_stack_failed(self):
+        self.patch_wait_for_stack.stop()
+        mock_stack_events = patch.object(
+            CloudFormation, 'stack_events'
+        ).start()
+        mock_stack_events.return_value = [
+            self.event(
+                '1', 'CREATE_FAILED', 'CertificateManagerCertificate',
+                'Invalid domain'
+            ),
+            self.event(
+                '2', 'CREATE_FAILED', 'S3BucketRoot',
+                'Resource creation cancelled'
+            ),
+            self.event('3', 'ROLLBACK_COMPLETE'),
+        ]
+        with self.assertRaises(StackFailed) as e:
+            self.cfn.wait_for_stack('stack_name')
+        self.assertEqual(
+            'Stack `stack_name` failed with status ROLLBACK_COMPLETE. '
+            'CertificateManagerCertificate: Invalid domain', e.exception.msg
+        )
+
+    def test_wait_for_stack_failed_without_reason(self):
+        self.patch_wait_for_stack.stop()
+        mock_stack_events = patch.object(
+            CloudFormation, 'stack_events'
+        ).start()
+        mock_stack_events.return_value = [self.event('1', 'DELETE_FAILED')]
+        with self.assertRaises(StackFailed) as e:
+            self.cfn.wait_for_stack('stack_name')
+        self.assertIn('stack_name: ', e.exception.msg)
+
+    def test_is_stack_event(self):
+        self.assertTrue(CloudFormation.is_stack_event(self.event('1')))
+        self.assertFalse(
+            CloudFormation.is_stack_event(self.event('1', resource='Bucket'))
+        )
+
+    def test_describe(self):
+        self.cfn.client.describe_stacks.return_value = {
+            'Stacks': [{
+                'StackId': 'stack_id',
+                'StackStatus': 'CREATE_COMPLETE',
+                'Outputs': [{'OutputKey': 'Key', 'OutputValue': 'Value'}]
+            }]
+        }
+        self.cfn.client.describe_stack_resources.return_value = {
+            'StackResources': [{
+                'LogicalResourceId': 'CloudFrontDistribution',
+                'PhysicalResourceId': 'E2QWRUHAPOMQZL'
+            }, {
+                'LogicalResourceId': 'S3BucketRoot'
+            }]
+        }
+        self.assertEqual({
+            'id': 'stack_id',
+            'status': 'CREATE_COMPLETE',
+            'outputs': {'Key': 'Value'},
+            'resources': {
+                'CloudFrontDistribution': 'E2QWRUHAPOMQZL',
+                'S3BucketRoot': None
+            }
+        }, self.cfn.describe('stack_name'))
+        self.cfn.client.describe_stacks.assert_called_with(
+            StackName='stack_name'
+        )
+        self.cfn.client.describe_stack_resources.assert_called_with(
+            StackName='stack_id'
+        )
+        self.cfn.client.describe_stacks.side_effect = self.client_error
+        self.assertEqual({
+            'id': None,
+            'status': None,
+            'outputs': {},
+            'resources': {}
+        }, self.cfn.describe('stack_name'))
+
+    def test_stack_status(self):
+        self.patch_stack_status.stop()
+        self.cfn.client.describe_stacks.return_value = {
+            'Stacks': [{'StackStatus': 'CREATE_COMPLETE'}]
+        }
+        self.assertEqual('CREATE_COMPLETE', self.cfn.stack_status('stack'))
         self.cfn.client.describe_stacks.side_effect = \
             exceptions.ClientError(
                 error_response={'Error': {
@@ -121,22 +558,62 @@ class CloudFormationTestCase(AWSBaseTestCase):
                 }},
                 operation_name='Operation'
             )
-        self.assertFalse(self.cfn.stack_exists('stack_name'))
+        self.assertIsNone(self.cfn.stack_status('stack'))
 
-    def test_create_stack(self):
-        self.patch_create_stack.stop()
-        self.cfn.create_stack('stack_name', '{}', [])
-        self.cfn.client.create_stack.assert_called_with(
-            StackName='stack_name', TemplateBody='{}', Parameters=[]
+    def test_create_change_set(self):
+        self.patch_create_change_set.stop()
+        self.cfn.create_change_set('stack_name', '{}', [], 'CREATE')
+        kwargs = self.cfn.client.create_change_set.call_args[1]
+        self.assertTrue(kwargs.pop('ChangeSetName').startswith('statikos-'))
+        self.assertEqual({
+            'StackName': 'stack_name',
+            'TemplateBody': '{}',
+            'Parameters': [],
+            'ChangeSetType': 'CREATE'
+        }, kwargs)
+        self.cfn.create_change_set(
+            'stack_name', None, [], template_url='https://url'
         )
+        kwargs = self.cfn.client.create_change_set.call_args[1]
+        self.assertEqual('https://url', kwargs['TemplateURL'])
+        self.assertNotIn('TemplateBody', kwargs)
 
-    def test_update_stack(self):
-        self.patch_update_stack.stop()
-        self.cfn.update_stack('stack_name', '{}', [])
-        self.cfn.client.update_stack.assert_called_with(
-            StackName='stack_name', TemplateBody='{}', Parameters=[]
+    def test_execute_change_set(self):
+        self.patch_execute_change_set.stop()
+        self.cfn.execute_change_set('id')
+        self.cfn.client.execute_change_set.assert_called_with(
+            ChangeSetName='id'
         )
 
+    def test_delete_change_set(self):
+        self.patch_delete_change_set.stop()
+        self.cfn.delete_change_set('id')
+        self.cfn.client.delete_change_set.assert_called_with(
+            ChangeSetName='id'
+        )
+
+    def test_get_template(self):
+        self.cfn.client.get_template.return_value = {
+            'TemplateBody': {'Resources': {}}
+        }
+        self.assertEqual({'Resources': {}}, self.cfn.get_template('stack'))
+        self.cfn.client.get_template.assert_called_with(StackName='stack')
+        self.cfn.client.get_template.return_value = {
+            'TemplateBody': '{"Resources": {}}'
+        }
+        self.assertEqual({'Resources': {}}, self.cfn.get_template('stack'))
+
+    def test_get_template_stack_does_not_exist(self):
+        self.cfn.client.get_template.side_effect = \
+            exceptions.ClientError(
+                error_response={'Error': {
+                    'Code': 'Code',
+                    'Message': 'Message'
+                }},
+                operation_name='Operation'
+            )
+        self.assertIsNone(self.cfn.get_template('stack'))
+
     def test_delete_stack(self):
         self.patch_delete_stack.stop()
         self.cfn.delete_stack('stack_name')
@@ -148,3 +625,194 @@ class CloudFormationTestCase(AWSBaseTestCase):
         self.cfn.client.validate_template.assert_called_with(
             TemplateBody='{}',
         )
+        self.cfn.validate_template(template_url='https://url')
+        self.cfn.client.validate_template.assert_called_with(
+            TemplateURL='https://url'
+        )
+
+
+class S3TestCase(AWSBaseTestCase):
+    def setUp(self):
+        super(S3TestCase, self).setUp()
+        self.s3 = S3(max_pool_connections=64)
+
+    def test_init(self):
+        self.assertEqual(64, self.s3.max_pool_connections)
+        self.assertEqual(
+            S3.MAX_POOL_CONNECTIONS, S3(region='other').max_pool_connections
+        )
+
+    def test_get_client(self):
+        args, kwargs = self.session.client.call_args
+        self.assertEqual(('s3', ), args)
+        self.assertTrue(kwargs['use_ssl'])
+        self.assertEqual(64, kwargs['config'].max_pool_connections)
+
+    def test_put_object(self):
+        self.s3.client = Mock()
+        self.s3.put_object(
+            'bucket', 'key', b'body', headers={'ContentType': 'text/html'}
+        )
+        self.s3.client.put_object.assert_called_with(
+            Bucket='bucket', Key='key', Body=b'body', ContentType='text/html'
+        )
+        self.s3.put_object('bucket', 'key', b'body')
+        self.s3.client.put_object.assert_called_with(
+            Bucket='bucket', Key='key', Body=b'body'
+        )
+
+    def test_list_objects(self):
+        self.s3.client = Mock()
+        paginator = self.s3.client.get_paginator.return_value
+        paginator.paginate.return_value = [
+            {'Contents': [{'Key': 'a'}, {'Key': 'b'}]},
+            {'Contents': [{'Key': 'c'}]},
+            {},
+        ]
+        result = list(self.s3.list_objects('bucket'))
+        self.s3.client.get_paginator.assert_called_with('list_objects_v2')
+        paginator.paginate.assert_called_with(Bucket='bucket', Prefix='')
+        self.assertEqual([{'Key': 'a'}, {'Key': 'b'}, {'Key': 'c'}], result)
+
+    def test_object_exists(self):
+        self.s3.client = Mock()
+        self.assertTrue(self.s3.object_exists('bucket', 'key'))
+        self.s3.client.head_object.assert_called_with(
+            Bucket='bucket', Key='key'
+        )
+        error = self.no_such_upload()
+        error.response['Error']['Code'] = '404'
+        self.s3.client.head_object.side_effect = error
+        self.assertFalse(self.s3.object_exists('bucket', 'key'))
+        error.response['Error']['Code'] = '403'
+        with self.assertRaises(exceptions.ClientError):
+            self.s3.object_exists('bucket', 'key')
+
+    def test_object_url(self):
+        self.assertEqual(
+            'https://bucket.s3.us-east-1.amazonaws.com/a/b.json',
+            self.s3.object_url('bucket', 'a/b.json')
+        )
+
+    def no_such_upload(self):
+        return exceptions.ClientError(
+            error_response={'Error': {
+                'Code': 'NoSuchUpload',
+                'Message': 'Message'
+            }},
+            operation_name='Operation'
+        )
+
+    def test_create_multipart_upload(self):
+        self.s3.client = Mock()
+        self.s3.client.create_multipart_upload.return_value = {
+            'UploadId': 'upload'
+        }
+        result = self.s3.create_multipart_upload(
+            'bucket', 'key', headers={'ContentType': 'video/mp4'}
+        )
+        self.assertEqual('upload', result)
+        self.s3.client.create_multipart_upload.assert_called_with(
+            Bucket='bucket', Key='key', ContentType='video/mp4'
+        )
+
+    def test_upload_part(self):
+        self.s3.client = Mock()
+        self.s3.client.upload_part.return_value = {'ETag': '"etag"'}
+        result = self.s3.upload_part('bucket', 'key', 'upload', 2, b'body')
+        self.assertEqual('etag', result)
+        self.s3.client.upload_part.assert_called_with(
+            Bucket='bucket',
+            Key='key',
+            UploadId='upload',
+            PartNumber=2,
+            Body=b'body'
+        )
+        self.s3.client.upload_part.side_effect = self.no_such_upload()
+        with self.assertRaises(UploadNotFound):
+            self.s3.upload_part('bucket', 'key', 'upload', 2, b'body')
+        self.s3.client.upload_part.side_effect = RuntimeError
+        with self.assertRaises(RuntimeError):
+            self.s3.upload_part('bucket', 'key', 'upload', 2, b'body')
+
+    def test_complete_multipart_upload(self):
+        self.s3.client = Mock()
+        self.s3.client.complete_multipart_upload.return_value = {
+            'ETag': '"etag-2"'
+        }
+        result = self.s3.complete_multipart_upload(
+            'bucket', 'key', 'upload', {2: 'b', 1: 'a'}
+        )
+        self.assertEqual('etag-2', result)
+        self.s3.client.complete_multipart_upload.assert_called_with(
+            Bucket='bucket',
+            Key='key',
+            UploadId='upload',
+            MultipartUpload={
+                'Parts': [
+                    {'PartNumber': 1, 'ETag': '"a"'},
+                    {'PartNumber': 2, 'ETag': '"b"'},
+                ]
+            }
+        )
+        self.s3.client.complete_multipart_upload.side_effect = \
+            self.no_such_upload()
+        with self.assertRaises(UploadNotFound):
+            self.s3.complete_multipart_upload('bucket', 'key', 'upload', {})
+        self.s3.client.complete_multipart_upload.side_effect = RuntimeError
+        with self.assertRaises(RuntimeError):
+            self.s3.complete_multipart_upload('bucket', 'key', 'upload', {})
+
+    def test_abort_multipart_upload(self):
+        self.s3.client = Mock()
+        self.s3.abort_multipart_upload('bucket', 'key', 'upload')
+        self.s3.client.abort_multipart_upload.assert_called_with(
+            Bucket='bucket', Key='key', UploadId='upload'
+        )
+        self.s3.client.abort_multipart_upload.side_effect = \
+            self.no_such_upload()
+        self.s3.abort_multipart_upload('bucket', 'key', 'upload')
+        error = self.no_such_upload()
+        error.response['Error']['Code'] = 'AccessDenied'
+        self.s3.client.abort_multipart_upload.side_effect = error
+        with self.assertRaises(exceptions.ClientError):
+            self.s3.abort_multipart_upload('bucket', 'key', 'upload')
+
+    def test_delete_objects(self):
+        self.s3.client = Mock()
+        keys = [str(i) for i in range(1001)]
+        self.s3.delete_objects('bucket', keys)
+        self.assertEqual(2, self.s3.client.delete_objects.call_count)
+        last = self.s3.client.delete_objects.call_args[1]
+        self.assertEqual('bucket', last['Bucket'])
+        self.assertEqual([{'Key': '1000'}], last['Delete']['Objects'])
+
+
+class CloudFrontTestCase(AWSBaseTestCase):
+    def setUp(self):
+        super(CloudFrontTestCase, self).setUp()
+        self.cf = CloudFront()
+
+    def test_create_invalidation(self):
+        self.cf.client.create_invalidation.return_value = {
+            'Invalidation': {'Id': 'invalidation_id'}
+        }
+        result = self.cf.create_invalidation('distribution_id', ['/a', '/b'])
+        self.assertEqual('invalidation_id', result)
+        kwargs = self.cf.client.create_invalidation.call_args[1]
+        self.assertEqual('distribution_id', kwargs['DistributionId'])
+        batch = kwargs['InvalidationBatch']
+        self.assertEqual({
+            'Quantity': 2,
+            'Items': ['/a', '/b']
+        }, batch['Paths'])
+        self.assertTrue(batch['CallerReference'].startswith('statikos-'))
+
+    def test_wait_for_invalidation(self):
+        self.cf.wait_for_invalidation('distribution_id', 'invalidation_id')
+        self.cf.client.get_waiter.assert_called_once_with(
+            'invalidation_completed'
+        )
+        self.cf.client.get_waiter.return_value.wait.assert_called_once_with(
+            DistributionId='distribution_id', Id='invalidation_id'
+        )
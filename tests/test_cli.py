@@ -1,13 +1,56 @@
 # -*- coding: utf-8 -*-
 """Tests for the `cli` module."""
 
+import json
+import os
+import subprocess
+import sys
+import tempfile
 from unittest.mock import Mock, patch
 
+import click
 from click.testing import CliRunner
 
 from statikos.cli import cli
 
-from .base import AWSBaseTestCase
+from .base import AWSBaseTestCase, BaseTestCase
+
+# Budget (in seconds) for `import statikos.cli` in a fresh interpreter.
+IMPORT_TIME_BUDGET = float(os.environ.get('STATIKOS_IMPORT_BUDGET', '0.2'))
+
+# Modules that must not be imported until a command needs them.
+HEAVY_MODULES = ['boto3', 'botocore', 'troposphere', 'awacs']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+t = time.perf_counter()
+import statikos.cli
+elapsed = time.perf_counter() - t
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+CREATE_SCRIPT = """
+import json, sys
+from statikos.cli import cli
+try:
+    cli(['create'])
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)))
+"""
+
+PLAN_SCRIPT = """
+import json, sys
+from statikos.statikos import Statikos
+s = Statikos()
+s._set_state(fingerprint=s.fingerprint)
+from statikos.cli import cli
+try:
+    cli(['plan'])
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)))
+"""
 
 
 class CliTestCase(AWSBaseTestCase):
@@ -15,7 +58,7 @@ class CliTestCase(AWSBaseTestCase):
         super(CliTestCase, self).setUp()
         self.runner = CliRunner()
         self.statikos = Mock()
-        self.mock_statikos = patch('statikos.cli.Statikos').start()
+        self.mock_statikos = patch('statikos.statikos.Statikos').start()
         self.mock_statikos.return_value = self.statikos
 
     def test_cli_version(self):
@@ -35,15 +78,200 @@ class CliTestCase(AWSBaseTestCase):
         self.assertIs(None, result.exception)
         self.assertEqual(0, result.exit_code)
         self.statikos.create.assert_called_once()
+        self.mock_statikos.assert_called_once_with(tracer=None)
+
+    def test_cli_deploy_trace(self):
+        def deploy(**kwargs):
+            tracer = self.mock_statikos.call_args[1]['tracer']
+            with tracer.span('deploy'):
+                pass
+
+        self.statikos.deploy.side_effect = deploy
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_file = os.path.join(tmp, 'trace.json')
+            result = self.runner.invoke(
+                cli, ['deploy', '--trace', trace_file, '--stats']
+            )
+            self.assertIs(None, result.exception)
+            with open(trace_file) as f:
+                trace = json.load(f)
+        self.assertEqual(
+            ['deploy'],
+            [e['name'] for e in trace['traceEvents'] if e['ph'] == 'X']
+        )
+        self.assertIn('Phase', result.output)
+        self.assertIn(f'Trace written to {trace_file}.', result.output)
+
+    def test_cli_remove_trace_on_failure(self):
+        self.statikos.remove.side_effect = Exception('failed')
+        result = self.runner.invoke(cli, ['remove', '--stats'])
+        self.assertEqual(1, result.exit_code)
+        self.assertIn('AWS call', result.output)
 
     def test_cli_deploy(self):
         result = self.runner.invoke(cli, ['deploy'])
         self.assertIs(None, result.exception)
         self.assertEqual(0, result.exit_code)
-        self.statikos.deploy.assert_called_once()
+        self.statikos.deploy.assert_called_once_with(
+            force=False, wait=None, validate=False
+        )
+        self.mock_statikos.assert_called_once_with(
+            echo=click.echo, tracer=None
+        )
+
+    def test_cli_deploy_force(self):
+        result = self.runner.invoke(
+            cli, ['deploy', '--force', '--wait', '--validate']
+        )
+        self.assertIs(None, result.exception)
+        self.statikos.deploy.assert_called_once_with(
+            force=True, wait=True, validate=True
+        )
+
+    def test_cli_plan(self):
+        result = self.runner.invoke(
+            cli, ['plan', '--source', 'public', '--offline']
+        )
+        self.assertIs(None, result.exception)
+        self.assertEqual(0, result.exit_code)
+        self.statikos.plan.assert_called_once_with(
+            source='public', offline=True
+        )
+        self.mock_statikos.assert_called_once_with(
+            echo=click.echo, tracer=None
+        )
+
+    def test_cli_sync(self):
+        self.statikos.sync.return_value = 'Uploaded 0 file(s)'
+        result = self.runner.invoke(
+            cli, ['sync', '--source', 'public', '--workers', '8']
+        )
+        self.assertIs(None, result.exception)
+        self.assertEqual(0, result.exit_code)
+        self.statikos.sync.assert_called_once_with(
+            source='public', workers=8, refresh=False, wait=None
+        )
+        self.mock_statikos.assert_called_once_with(
+            echo=click.echo, tracer=None
+        )
+        self.assertIn('Uploaded 0 file(s)', result.output)
 
     def test_cli_remove(self):
         result = self.runner.invoke(cli, ['remove'])
         self.assertIs(None, result.exception)
         self.assertEqual(0, result.exit_code)
         self.statikos.remove.assert_called_once()
+        self.mock_statikos.assert_called_once_with(
+            echo=click.echo, tracer=None
+        )
+
+    def test_cli_state(self):
+        self.statikos.state.return_value = {'fingerprint': 'abc'}
+        result = self.runner.invoke(cli, ['state', '--refresh'])
+        self.assertIs(None, result.exception)
+        self.assertEqual(0, result.exit_code)
+        self.statikos.state.assert_called_once_with(refresh=True)
+        self.assertEqual({'fingerprint': 'abc'}, json.loads(result.output))
+
+    def test_cli_serve(self):
+        result = self.runner.invoke(
+            cli, ['serve', '--source', 'public', '--port', '0']
+        )
+        self.assertIs(None, result.exception)
+        self.assertEqual(0, result.exit_code)
+        self.statikos.serve.assert_called_once_with(
+            source='public', host=None, port=0
+        )
+        self.statikos.serve.side_effect = KeyboardInterrupt
+        result = self.runner.invoke(cli, ['serve'])
+        self.assertEqual(0, result.exit_code)
+
+    def test_cli_watch(self):
+        result = self.runner.invoke(
+            cli, ['watch', '--source', 'public', '--workers', '8']
+        )
+        self.assertIs(None, result.exception)
+        self.assertEqual(0, result.exit_code)
+        self.statikos.watch.assert_called_once_with(
+            source='public', workers=8
+        )
+        self.statikos.watch.side_effect = KeyboardInterrupt
+        result = self.runner.invoke(cli, ['watch'])
+        self.assertEqual(0, result.exit_code)
+
+    def test_cli_fleet_deploy(self):
+        mock_fleet = patch('statikos.fleet.Fleet').start()
+        mock_fleet.return_value.deploy.return_value.failed = []
+        with tempfile.TemporaryDirectory() as sites:
+            result = self.runner.invoke(
+                cli, [
+                    'fleet', 'deploy', sites, '--concurrency', '8',
+                    '--cloudformation-rate', '2', '--force'
+                ]
+            )
+        self.assertIs(None, result.exception)
+        self.assertEqual(0, result.exit_code)
+        mock_fleet.assert_called_once_with(
+            sites,
+            concurrency=8,
+            rates={'cloudformation': 2.0},
+            echo=click.echo
+        )
+        mock_fleet.return_value.deploy.assert_called_once_with(force=True)
+
+    def test_cli_fleet_deploy_failed(self):
+        mock_fleet = patch('statikos.fleet.Fleet').start()
+        mock_fleet.return_value.deploy.return_value.failed = [Mock()]
+        result = self.runner.invoke(cli, ['fleet', 'deploy', '--s3-rate', '5'])
+        self.assertEqual(1, result.exit_code)
+        mock_fleet.assert_called_once_with(
+            '.', concurrency=None, rates={'s3': 5.0}, echo=click.echo
+        )
+
+
+class CliImportTestCase(BaseTestCase):
+    def setUp(self):
+        super(CliImportTestCase, self).setUp()
+        self.root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run_python(self, script, cwd=None):
+        env = dict(os.environ, PYTHONPATH=self.root)
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=cwd,
+                                         env=env)
+        return json.loads(output.decode().splitlines()[-1])
+
+    def test_import_does_not_load_heavy_modules(self):
+        result = self.run_python(IMPORT_SCRIPT)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, result['modules'])
+
+    def test_import_time_budget(self):
+        # Take the best of several runs to smooth out noise.
+        elapsed = min(
+            self.run_python(IMPORT_SCRIPT)['elapsed'] for _ in range(3)
+        )
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET)
+
+    def test_create_does_not_load_boto3(self):
+        with tempfile.TemporaryDirectory() as cwd:
+            with open(os.path.join(cwd, 'statikos.yml'), 'w') as f:
+                f.write('stack_name: example\ndomain_name: example.com\n')
+            modules = self.run_python(CREATE_SCRIPT, cwd=cwd)
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(cwd, '.statikos', 'cloudformation.json')
+                )
+            )
+        self.assertIn('troposphere', modules)
+        self.assertNotIn('boto3', modules)
+        self.assertNotIn('botocore', modules)
+
+    def test_plan_unchanged_does_not_load_boto3(self):
+        with tempfile.TemporaryDirectory() as cwd:
+            with open(os.path.join(cwd, 'statikos.yml'), 'w') as f:
+                f.write('stack_name: example\ndomain_name: example.com\n')
+            os.mkdir(os.path.join(cwd, 'build'))
+            modules = self.run_python(PLAN_SCRIPT, cwd=cwd)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, modules)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `compress` module."""
+
+import gzip
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import brotli
+
+from statikos import compress, stage, utils
+from statikos.compress import Compress
+from statikos.exceptions import InvalidConfig, MissingDependency
+from statikos.hashing import hash_file
+from statikos.sync import LocalFile
+
+from .base import BaseTestCase
+
+HTML = b'<html><body>' + b'<p>Hello, world!</p>' * 100 + b'</body></html>'
+
+
+class CompressFileTestCase(BaseTestCase):
+    def setUp(self):
+        super(CompressFileTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(self.tmp.name, 'index.html')
+        self.dst = os.path.join(self.tmp.name, 'index.html.z')
+        with open(self.src, 'wb') as f:
+            f.write(HTML)
+
+    def test_compress_file_gzip(self):
+        compress.compress_file(self.src, self.dst, 'gzip', 9)
+        with open(self.dst, 'rb') as f:
+            data = f.read()
+        self.assertEqual(HTML, gzip.decompress(data))
+        compress.compress_file(self.src, self.dst, 'gzip', 9)
+        with open(self.dst, 'rb') as f:
+            self.assertEqual(data, f.read())
+
+    def test_compress_file_brotli(self):
+        compress.compress_file(self.src, self.dst, 'br', 11)
+        with open(self.dst, 'rb') as f:
+            self.assertEqual(HTML, brotli.decompress(f.read()))
+
+
+class CompressTestCase(BaseTestCase):
+    def setUp(self):
+        super(CompressTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = os.path.join(self.tmp.name, 'cache', 'compressed')
+        self.files = [
+            self.local_file('index.html', HTML),
+            self.local_file('small.css', b'body {}'),
+            self.local_file('image.png', HTML),
+            self.local_file('random.js', os.urandom(1024)),
+        ]
+        self.mock_compress_file = patch.object(
+            compress, '_compress_file', wraps=compress._compress_file
+        ).start()
+        # Mocks cannot be sent to worker processes.
+        self.patch_executor = patch.object(
+            stage, 'ProcessPoolExecutor', ThreadPoolExecutor
+        )
+        self.patch_executor.start()
+
+    def local_file(self, key, data):
+        path = os.path.join(self.tmp.name, key)
+        with open(path, 'wb') as f:
+            f.write(data)
+        digest = hash_file(path)
+        return LocalFile(key, path, len(data), digest.md5, digest.etag)
+
+    def test_init_missing_brotli(self):
+        with patch.dict('sys.modules', {'brotli': None}):
+            with self.assertRaises(MissingDependency):
+                Compress(self.cache_dir, encodings=['gzip', 'br'])
+
+    def test_init_invalid_encodings(self):
+        for encodings in [['br'], ['br', 'gzip'], ['gzip', 'zstd']]:
+            with self.assertRaises(InvalidConfig):
+                Compress(self.cache_dir, encodings=encodings)
+
+    def test_compressible(self):
+        c = Compress(self.cache_dir)
+        self.assertEqual(
+            [True, False, False, True], [c.compressible(f) for f in self.files]
+        )
+        f = self.files[0]._replace(headers={'ContentEncoding': 'gzip'})
+        self.assertFalse(c.compressible(f))
+
+    def test_call(self):
+        c = Compress(self.cache_dir, encodings=['gzip', 'br'])
+        output = c(self.files)
+        self.assertEqual(
+            ['index.html', 'small.css', 'image.png', 'random.js'],
+            [f.key for f in output]
+        )
+        self.assertEqual(
+            {'ContentType': 'text/html', 'ContentEncoding': 'gzip'},
+            output[0].headers
+        )
+        # Only the in-place encoding is compressed.
+        self.assertEqual(2, self.mock_compress_file.call_count)
+
+    def test_call_siblings(self):
+        c = Compress(self.cache_dir, encodings=['gzip', 'br'], siblings=True)
+        output = c(self.files)
+        self.assertEqual(
+            ['index.html', 'index.html.br', 'small.css', 'image.png',
+             'random.js'], [f.key for f in output]
+        )
+        index, br = output[0], output[1]
+        self.assertEqual(
+            {'ContentType': 'text/html', 'ContentEncoding': 'gzip'},
+            index.headers
+        )
+        self.assertEqual(
+            {'ContentType': 'text/html', 'ContentEncoding': 'br'}, br.headers
+        )
+        with open(index.path, 'rb') as f:
+            self.assertEqual(HTML, gzip.decompress(f.read()))
+        self.assertEqual(hash_file(index.path).md5, index.hash)
+        self.assertEqual(os.path.getsize(index.path), index.size)
+        self.assertEqual(len(HTML) - index.size, c.saved)
+        # Incompressible files are left alone.
+        self.assertEqual(self.files[3], output[4])
+
+    def test_call_cached(self):
+        Compress(self.cache_dir)(self.files)
+        self.assertEqual(2, self.mock_compress_file.call_count)
+        output = Compress(self.cache_dir)(self.files)
+        self.assertEqual(2, self.mock_compress_file.call_count)
+        self.assertEqual('gzip', output[0].headers['ContentEncoding'])
+
+    def test_call_prunes(self):
+        c = Compress(self.cache_dir)
+        c(self.files)
+        c(self.files[2:])
+        self.assertEqual(
+            sorted(['index.json', f'{self.files[3].hash}-9.gz']),
+            sorted(os.listdir(self.cache_dir))
+        )
+
+    def test_call_corrupt_index(self):
+        os.makedirs(self.cache_dir)
+        utils.write_file('{', os.path.join(self.cache_dir, 'index.json'))
+        output = Compress(self.cache_dir)(self.files[:1])
+        self.assertEqual('gzip', output[0].headers['ContentEncoding'])
+
+    def test_call_parallel(self):
+        patch.stopall()
+        output = Compress(
+            self.cache_dir, encodings=['gzip', 'br'], siblings=True
+        )(self.files[:1])
+        self.assertEqual(2, len(output))
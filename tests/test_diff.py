@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `diff` module."""
+
+from statikos import diff
+from statikos.diff import ResourceChange
+
+from .base import BaseTestCase
+
+
+class DiffTestCase(BaseTestCase):
+    def setUp(self):
+        super(DiffTestCase, self).setUp()
+        self.old = {
+            'Resources': {
+                'Bucket': {
+                    'Type': 'AWS::S3::Bucket',
+                    'Properties': {'BucketName': 'example-root'}
+                },
+                'Distribution': {
+                    'Type': 'AWS::CloudFront::Distribution',
+                    'Properties': {
+                        'DistributionConfig': {
+                            'Aliases': ['example.com'],
+                            'Origins': [{'Id': 'S3', 'DomainName': 'a'}],
+                            'PriceClass': 'PriceClass_100'
+                        }
+                    }
+                },
+                'Logs': {'Type': 'AWS::S3::Bucket'},
+            },
+            'Metadata': {'Statikos': {'Fingerprint': 'old'}},
+        }
+
+    def test_changed_paths(self):
+        self.assertEqual([], diff.changed_paths({'a': [1]}, {'a': [1]}))
+        self.assertEqual(
+            ['a/0/b', 'c', 'd'],
+            diff.changed_paths(
+                {'a': [{'b': 1}], 'c': 1}, {'a': [{'b': 2}], 'c': 2, 'd': 3}
+            )
+        )
+        self.assertEqual(['a'], diff.changed_paths({'a': [1]}, {'a': [1, 2]}))
+        self.assertEqual(['1'], diff.changed_paths([1, 2], [1, 3]))
+        self.assertEqual([''], diff.changed_paths({}, []))
+
+    def test_diff_templates_unchanged(self):
+        new = dict(self.old, Metadata={'Statikos': {'Fingerprint': 'new'}})
+        self.assertEqual([], diff.diff_templates(self.old, new))
+
+    def test_diff_templates(self):
+        new = {'Resources': dict(self.old['Resources'])}
+        del new['Resources']['Logs']
+        new['Resources']['Function'] = {'Type': 'AWS::CloudFront::Function'}
+        new['Resources']['Distribution'] = {
+            'Type': 'AWS::CloudFront::Distribution',
+            'Properties': {
+                'DistributionConfig': {
+                    'Aliases': ['example.com', 'www.example.com'],
+                    'Origins': [{'Id': 'S3', 'DomainName': 'b'}],
+                    'PriceClass': 'PriceClass_100'
+                }
+            }
+        }
+        self.assertEqual([
+            ResourceChange(
+                'Modify', 'Distribution', 'AWS::CloudFront::Distribution', [
+                    'Properties/DistributionConfig/Aliases',
+                    'Properties/DistributionConfig/Origins/0/DomainName',
+                ]
+            ),
+            ResourceChange(
+                'Add', 'Function', 'AWS::CloudFront::Function', []
+            ),
+            ResourceChange('Remove', 'Logs', 'AWS::S3::Bucket', []),
+        ], diff.diff_templates(self.old, new))
+
+    def test_diff_templates_not_deployed(self):
+        self.assertEqual(
+            ['Add', 'Add', 'Add'],
+            [c.action for c in diff.diff_templates(None, self.old)]
+        )
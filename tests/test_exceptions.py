@@ -2,7 +2,9 @@
 """Tests for the `exceptions` module."""
 
 from statikos.exceptions import (
-    ConfigNotFound, InvalidTemplate, StatikosException
+    ChangeSetFailed, ConfigNotFound, InvalidConfig, InvalidTemplate,
+    MissingDependency, SourceNotFound, StackFailed, StatikosException,
+    SyncFailed, TemplateTooLarge, TemplateValidationError, UploadNotFound
 )
 
 from .base import BaseTestCase
@@ -33,3 +35,108 @@ class InvalidTemplateTestCase(BaseTestCase):
     def test_init(self):
         e = InvalidTemplate()
         self.assertEqual('The CloudFormation template is invalid.', e.msg)
+
+
+class TemplateValidationErrorTestCase(BaseTestCase):
+    def setUp(self):
+        super(TemplateValidationErrorTestCase, self).setUp()
+
+    def test_init(self):
+        e = TemplateValidationError(errors='  Resources: error')
+        self.assertEqual(
+            'The CloudFormation template is invalid:\n  Resources: error',
+            e.msg
+        )
+        self.assertIsInstance(e, InvalidTemplate)
+
+
+class SourceNotFoundTestCase(BaseTestCase):
+    def setUp(self):
+        super(SourceNotFoundTestCase, self).setUp()
+
+    def test_init(self):
+        e = SourceNotFound(source='build')
+        self.assertEqual(
+            'The source directory `build` could not be found.', e.msg
+        )
+
+
+class SyncFailedTestCase(BaseTestCase):
+    def setUp(self):
+        super(SyncFailedTestCase, self).setUp()
+
+    def test_init(self):
+        e = SyncFailed(count=2, bucket='bucket')
+        self.assertEqual('Failed to upload 2 file(s) to `bucket`.', e.msg)
+
+
+class MissingDependencyTestCase(BaseTestCase):
+    def setUp(self):
+        super(MissingDependencyTestCase, self).setUp()
+
+    def test_init(self):
+        e = MissingDependency(package='brotli', extra='brotli')
+        self.assertEqual(
+            'The `brotli` package is required. '
+            'Install it with `pip install statikos[brotli]`.', e.msg
+        )
+
+
+class ChangeSetFailedTestCase(BaseTestCase):
+    def setUp(self):
+        super(ChangeSetFailedTestCase, self).setUp()
+
+    def test_init(self):
+        e = ChangeSetFailed(reason='Reason')
+        self.assertEqual('The change set could not be created: Reason', e.msg)
+
+
+class StackFailedTestCase(BaseTestCase):
+    def setUp(self):
+        super(StackFailedTestCase, self).setUp()
+
+    def test_init(self):
+        e = StackFailed(
+            stack_name='stack',
+            status='ROLLBACK_COMPLETE',
+            resource='S3BucketRoot',
+            reason='Reason'
+        )
+        self.assertEqual(
+            'Stack `stack` failed with status ROLLBACK_COMPLETE. '
+            'S3BucketRoot: Reason', e.msg
+        )
+
+
+class InvalidConfigTestCase(BaseTestCase):
+    def setUp(self):
+        super(InvalidConfigTestCase, self).setUp()
+
+    def test_init(self):
+        e = InvalidConfig(reason='Reason.')
+        self.assertEqual('The `statikos.yml` file is invalid: Reason.', e.msg)
+
+
+class UploadNotFoundTestCase(BaseTestCase):
+    def setUp(self):
+        super(UploadNotFoundTestCase, self).setUp()
+
+    def test_init(self):
+        e = UploadNotFound(key='video.mp4')
+        self.assertEqual(
+            'The multipart upload of `video.mp4` no longer exists.', e.msg
+        )
+
+
+class TemplateTooLargeTestCase(BaseTestCase):
+    def setUp(self):
+        super(TemplateTooLargeTestCase, self).setUp()
+
+    def test_init(self):
+        e = TemplateTooLarge(size=60000, limit=51200)
+        self.assertTrue(
+            e.msg.startswith(
+                'The CloudFormation template is 60000 bytes, more than the '
+                '51200 bytes'
+            )
+        )
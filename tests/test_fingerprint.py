@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `fingerprint` module."""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from statikos import fingerprint, stage
+from statikos.fingerprint import IMMUTABLE, Fingerprint
+from statikos.hashing import hash_file
+from statikos.sync import LocalFile
+
+from .base import BaseTestCase
+
+SITE_CSS = b'@import "base.css";\nbody { background: url(../img/bg.png?v=1); }'
+BASE_CSS = b'h1 { font: url("/fonts/f.woff2"); }'
+INDEX_HTML = (
+    b'<link href="/css/site.css" rel=stylesheet>'
+    b'<img srcset="img/bg.png 1x, /img/bg.png#x 2x">'
+    b'<a href="https://example.com/css/site.css">'
+    b'<link rel=icon href=favicon.png>'
+)
+APP_JS = (
+    b"import { f } from './util.js';\n"
+    b"const w = new Worker(new URL('./worker.js', import.meta.url));\n"
+    b"import('/js/util.js');\n"
+)
+
+
+class FingerprintFunctionsTestCase(BaseTestCase):
+    def setUp(self):
+        super(FingerprintFunctionsTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(self.tmp.name, 'index.html')
+        self.dst = os.path.join(self.tmp.name, 'out.html')
+
+    def write(self, data):
+        with open(self.src, 'wb') as f:
+            f.write(data)
+
+    def read(self):
+        with open(self.dst, 'rb') as f:
+            return f.read()
+
+    def test_fingerprinted(self):
+        self.assertEqual(
+            'css/site.abc.css',
+            fingerprint.fingerprinted('css/site.css', 'abc')
+        )
+        self.assertEqual(
+            'LICENSE.abc', fingerprint.fingerprinted('LICENSE', 'abc')
+        )
+
+    def test_resolve(self):
+        self.assertEqual('img/a.png', fingerprint.resolve('/img/a.png', 'x'))
+        self.assertEqual(
+            'img/a.png', fingerprint.resolve('../img/a.png', 'css/site.css')
+        )
+        self.assertEqual(
+            'css/a b.png', fingerprint.resolve('a%20b.png', 'css/site.css')
+        )
+        self.assertIsNone(fingerprint.resolve('https://a.com/a.png', 'x'))
+        self.assertIsNone(fingerprint.resolve('//a.com/a.png', 'x'))
+        self.assertIsNone(fingerprint.resolve('data:image/png', 'x'))
+        self.assertIsNone(fingerprint.resolve('', 'x'))
+
+    def test_references(self):
+        self.write(SITE_CSS)
+        self.assertTrue({'css/base.css', 'img/bg.png'}
+                        <= fingerprint.references(self.src, 'css/site.css'))
+
+    def test_rewrite_file(self):
+        self.write(INDEX_HTML)
+        fingerprint.rewrite_file(
+            self.src, self.dst, 'index.html', {
+                'css/site.css': 'a1',
+                'img/bg.png': 'b2'
+            }
+        )
+        self.assertEqual(
+            b'<link href="/css/site.a1.css" rel=stylesheet>'
+            b'<img srcset="img/bg.b2.png 1x, /img/bg.b2.png#x 2x">'
+            b'<a href="https://example.com/css/site.css">'
+            b'<link rel=icon href=favicon.png>', self.read()
+        )
+
+    def test_rewrite_file_chunks(self):
+        # Small enough for every reference to span two chunks.
+        patch.object(fingerprint, 'CHUNK_SIZE', 16).start()
+        self.write(INDEX_HTML)
+        fingerprint.rewrite_file(
+            self.src, self.dst, 'index.html', {'css/site.css': 'a1'}
+        )
+        self.assertEqual(
+            INDEX_HTML.replace(b'"/css/site.css"', b'"/css/site.a1.css"'),
+            self.read()
+        )
+
+    def test_rewrite_file_no_delimiter(self):
+        patch.object(fingerprint, 'CHUNK_SIZE', 4).start()
+        self.write(b'x' * 20 + b' a.png')
+        fingerprint.rewrite_file(self.src, self.dst, 'index.html', {})
+        self.assertEqual(b'x' * 20 + b' a.png', self.read())
+
+    def test_rewrite_file_contexts(self):
+        self.write(
+            b'<p>See /css/site.css or css/site.css, url(x.css).</p>'
+            b'<style>@import "/css/site.css";</style>'
+            b'<script type=module>import "./css/site.css"</script>'
+        )
+        fingerprint.rewrite_file(
+            self.src, self.dst, 'index.html', {'css/site.css': 'a1'}
+        )
+        self.assertEqual(
+            b'<p>See /css/site.css or css/site.css, url(x.css).</p>'
+            b'<style>@import "/css/site.a1.css";</style>'
+            b'<script type=module>import "./css/site.a1.css"</script>',
+            self.read()
+        )
+
+    def test_rewrite_file_js(self):
+        self.write(APP_JS + b'const s = "util.js"; // from util.js\n')
+        fingerprint.rewrite_file(
+            self.src, self.dst, 'js/app.js', {
+                'js/util.js': 'a1',
+                'js/worker.js': 'b2'
+            }
+        )
+        self.assertEqual(
+            b"import { f } from './util.a1.js';\n"
+            b"const w = new Worker(new URL('./worker.b2.js', "
+            b"import.meta.url));\n"
+            b"import('/js/util.a1.js');\n"
+            b'const s = "util.js"; // from util.js\n', self.read()
+        )
+
+    def test_rewrite_file_binary_safe(self):
+        data = b'<p>\xff\xfe</p>\r\n<img src="a.png">'
+        self.write(data)
+        fingerprint.rewrite_file(
+            self.src, self.dst, 'index.html', {'a.png': 'c3'}
+        )
+        self.assertEqual(data.replace(b'a.png', b'a.c3.png'), self.read())
+
+
+class FingerprintTestCase(BaseTestCase):
+    def setUp(self):
+        super(FingerprintTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = os.path.join(self.tmp.name, 'cache', 'fingerprinted')
+        self.files = [
+            self.local_file('index.html', INDEX_HTML),
+            self.local_file('css/site.css', SITE_CSS),
+            self.local_file('css/base.css', BASE_CSS),
+            self.local_file('img/bg.png', b'PNG'),
+            self.local_file('fonts/f.woff2', b'WOFF'),
+            self.local_file('favicon.png', b'ICON'),
+            self.local_file('robots.txt', b'User-agent: *'),
+        ]
+        patch.object(
+            stage, 'ProcessPoolExecutor', ThreadPoolExecutor
+        ).start()
+
+    def local_file(self, key, data):
+        path = os.path.join(self.tmp.name, 'build', *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        digest = hash_file(path)
+        return LocalFile(key, path, len(data), digest.md5, digest.etag)
+
+    def run_stage(self, **kwargs):
+        stage = Fingerprint(self.cache_dir, exclude=['favicon.*'], **kwargs)
+        return stage, {f.key: f for f in stage(self.files)}
+
+    def read(self, f):
+        with open(f.path, 'rb') as o:
+            return o.read()
+
+    def test_call(self):
+        stage, output = self.run_stage()
+        png = self.files[3].hash[:12]
+        woff = self.files[4].hash[:12]
+        self.assertIn(f'img/bg.{png}.png', output)
+        self.assertIn(f'fonts/f.{woff}.woff2', output)
+        base = [k for k in output if k.startswith('css/base.')][0]
+        site = [k for k in output if k.startswith('css/site.')][0]
+        self.assertEqual(
+            f'h1 {{ font: url("/fonts/f.{woff}.woff2"); }}'.encode(),
+            self.read(output[base])
+        )
+        site_css = self.read(output[site])
+        self.assertIn(base[4:].encode(), site_css)
+        self.assertIn(f'bg.{png}.png?v=1'.encode(), site_css)
+        # Stylesheets are named by their rewritten content.
+        self.assertEqual(
+            hash_file(output[site].path).md5[:12], site.split('.')[1]
+        )
+        html = output['index.html']
+        self.assertIn(f'href="/{site}"'.encode(), self.read(html))
+        self.assertEqual({'CacheControl': 'public, max-age=60'}, html.headers)
+        self.assertEqual(
+            {'CacheControl': IMMUTABLE}, output[f'img/bg.{png}.png'].headers
+        )
+        self.assertIsNone(output['favicon.png'].headers)
+        self.assertIsNone(output['robots.txt'].headers)
+        self.assertEqual(4, stage.renamed)
+        self.assertEqual(7, len(output))
+
+    def test_call_cached(self):
+        _, first = self.run_stage()
+        mock_rewrite = patch.object(
+            fingerprint, '_rewrite_file', side_effect=fingerprint._rewrite_file
+        ).start()
+        _, second = self.run_stage()
+        mock_rewrite.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_call_asset_changed(self):
+        _, first = self.run_stage()
+        self.files[4] = self.local_file('fonts/f.woff2', b'WOFF2')
+        _, second = self.run_stage()
+        changed = set(second) - set(first)
+        self.assertEqual(3, len(changed))
+        self.assertTrue(all(k.startswith(('css/', 'fonts/')) for k in changed))
+        self.assertNotEqual(
+            first['index.html'].hash, second['index.html'].hash
+        )
+        self.assertEqual(5, len(os.listdir(self.cache_dir)))
+
+    def test_call_asset_changed_unrelated(self):
+        self.files.append(
+            self.local_file('about.html', b'<img src="img/bg.png">')
+        )
+        self.run_stage()
+        mock_rewrite = patch.object(
+            fingerprint, '_rewrite_file', side_effect=fingerprint._rewrite_file
+        ).start()
+        self.files[4] = self.local_file('fonts/f.woff2', b'WOFF2')
+        self.run_stage()
+        self.assertEqual(
+            ['css/base.css', 'css/site.css', 'index.html'],
+            sorted(c[0][0][2] for c in mock_rewrite.call_args_list)
+        )
+
+    def test_call_modules(self):
+        self.files = [
+            self.local_file('index.html', b'<script src="js/app.js">'),
+            self.local_file('js/app.js', APP_JS),
+            self.local_file('js/util.js', b'export const f = 1;'),
+            self.local_file('js/worker.js', b'import "./util.js";'),
+        ]
+        _, first = self.run_stage()
+        util = [k for k in first if k.startswith('js/util.')][0]
+        app = [k for k in first if k.startswith('js/app.')][0]
+        worker = [k for k in first if k.startswith('js/worker.')][0]
+        self.assertNotEqual('js/app.js', app)
+        self.assertIn(f"from './{util[3:]}'".encode(), self.read(first[app]))
+        self.assertIn(f"'./{worker[3:]}'".encode(), self.read(first[app]))
+        self.assertIn(f'"./{util[3:]}"'.encode(), self.read(first[worker]))
+        self.assertIn(f'"{app}"'.encode(), self.read(first['index.html']))
+        # A changed module changes the names of the modules that import it.
+        self.files[2] = self.local_file('js/util.js', b'export const f = 2;')
+        _, second = self.run_stage()
+        self.assertEqual(
+            {'js/app', 'js/util', 'js/worker'},
+            {k.split('.')[0] for k in set(second) - set(first)}
+        )
+
+    def test_call_cycle(self):
+        self.files = [
+            self.local_file('a.css', b'@import "b.css";'),
+            self.local_file('b.css', b'@import "a.css"; url(c.png)'),
+            self.local_file('c.png', b'PNG'),
+        ]
+        _, output = self.run_stage()
+        self.assertEqual({'a.css', 'b.css'}, {k for k in output if 'css' in k})
+        self.assertIsNone(output['a.css'].headers)
+        self.assertIn(b'url(c.', self.read(output['b.css']))
+
+    def test_call_html_cache_control(self):
+        _, output = self.run_stage(html_cache_control='no-cache')
+        self.assertEqual(
+            'no-cache', output['index.html'].headers['CacheControl']
+        )
+
+    def test_call_keeps_headers(self):
+        self.files[3] = self.files[3]._replace(headers={'ContentType': 'x'})
+        _, output = self.run_stage()
+        png = self.files[3].hash[:12]
+        self.assertEqual({
+            'ContentType': 'x',
+            'CacheControl': IMMUTABLE
+        }, output[f'img/bg.{png}.png'].headers)
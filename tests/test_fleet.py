@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `fleet` module."""
+
+import os
+import tempfile
+from unittest.mock import Mock, patch
+
+from statikos import fleet
+from statikos.exceptions import ConfigNotFound
+from statikos.fleet import Fleet, FleetResult, SiteResult
+from statikos.sync import Sync
+
+from .base import BaseTestCase
+
+
+def make_site(root, name):
+    path = os.path.join(root, *name.split('/'))
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'statikos.yml'), 'w') as f:
+        f.write(f'stack_name: {name.replace("/", "-")}\n')
+    return path
+
+
+class FindSitesTestCase(BaseTestCase):
+    def setUp(self):
+        super(FindSitesTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+
+    def test_find_sites(self):
+        a = make_site(self.root, 'a')
+        b = make_site(self.root, 'group/b')
+        make_site(self.root, 'a/nested')
+        make_site(self.root, '.hidden')
+        os.makedirs(os.path.join(self.root, 'empty'))
+        self.assertEqual([a, b], fleet.find_sites(self.root))
+
+    def test_find_sites_root(self):
+        make_site(self.root, 'a')
+        with open(os.path.join(self.root, 'statikos.yml'), 'w') as f:
+            f.write('stack_name: root\n')
+        self.assertEqual([self.root], fleet.find_sites(self.root))
+
+
+class FleetResultTestCase(BaseTestCase):
+    def setUp(self):
+        super(FleetResultTestCase, self).setUp()
+
+    def test_str(self):
+        result = FleetResult()
+        result.sites = [
+            SiteResult('site-a', 2.1),
+            SiteResult('site-bb', 3.2, ConfigNotFound()),
+        ]
+        result.elapsed = 3.4
+        self.assertEqual([result.sites[1]], result.failed)
+        self.assertEqual(
+            'site-bb  failed    3.2s  The `statikos.yml` file could not be '
+            'found.\n'
+            'site-a   deployed  2.1s\n'
+            '2 site(s) in 3.4s: 1 deployed, 1 failed', str(result)
+        )
+
+    def test_str_empty(self):
+        self.assertEqual(
+            '0 site(s) in 0.0s: 0 deployed, 0 failed', str(FleetResult())
+        )
+
+
+class FleetTestCase(BaseTestCase):
+    def setUp(self):
+        super(FleetTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        self.a = make_site(self.root, 'a')
+        self.b = make_site(self.root, 'b')
+        self.mock_statikos = patch.object(fleet, 'Statikos').start()
+        self.mock_statikos.STATIKOS_YML = 'statikos.yml'
+
+    def test_init(self):
+        f = Fleet(self.root, rates={'s3': 10})
+        self.assertEqual(Fleet.DEFAULT_CONCURRENCY, f.concurrency)
+        self.assertEqual([self.a, self.b], f.sites)
+        self.assertEqual(4, f.limiters['cloudformation'].rate)
+        self.assertEqual(10, f.limiters['s3'].rate)
+        self.assertEqual({
+            'cloudformation': 4,
+            'cloudfront': 4,
+            's3': 4 * Sync.DEFAULT_WORKERS,
+        }, f.max_pool_connections)
+
+    def test_deploy(self):
+        echo = Mock()
+        f = Fleet(self.root, concurrency=2, echo=echo)
+        result = f.deploy(force=True)
+        self.assertEqual(['a', 'b'], [s.name for s in result.sites])
+        self.assertEqual([], result.failed)
+        self.assertEqual(2, self.mock_statikos.call_count)
+        for c in self.mock_statikos.call_args_list:
+            self.assertIs(f.limiters, c[1]['limiters'])
+            self.assertIs(
+                f.max_pool_connections, c[1]['max_pool_connections']
+            )
+        self.mock_statikos.return_value.deploy.assert_called_with(force=True)
+        roots = sorted(c[1]['root'] for c in self.mock_statikos.call_args_list)
+        self.assertEqual([self.a, self.b], roots)
+
+    def test_deploy_echo(self):
+        echo = Mock()
+        f = Fleet(self.root, echo=echo)
+        f._echo(self.a)('Stack `a` is up to date.')
+        echo.assert_called_once_with('[a] Stack `a` is up to date.')
+        self.assertIsNone(Fleet(self.root)._echo(self.a))
+
+    def test_deploy_failed(self):
+        error = ConfigNotFound()
+        self.mock_statikos.return_value.deploy.side_effect = [None, error]
+        result = Fleet(self.root, concurrency=1).deploy()
+        self.assertEqual([result.sites[1]], result.failed)
+        self.assertIs(error, result.sites[1].error)
+        self.assertTrue(result.sites[0].ok)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `hashing` module."""
+
+import hashlib
+import os
+import tempfile
+from unittest.mock import patch
+
+from statikos import hashing, utils
+from statikos.hashing import Digest, HashCache
+
+from .base import BaseTestCase
+
+
+class HashFileTestCase(BaseTestCase):
+    def setUp(self):
+        super(HashFileTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'file')
+
+    def write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    def test_hash_file_empty(self):
+        self.write(b'')
+        md5 = hashlib.md5(b'').hexdigest()
+        self.assertEqual(Digest(md5, md5), hashing.hash_file(self.path))
+
+    def test_hash_file_single_part(self):
+        self.write(b'data')
+        md5 = hashlib.md5(b'data').hexdigest()
+        self.assertEqual(
+            Digest(md5, md5), hashing.hash_file(self.path, part_size=4)
+        )
+
+    def test_hash_file_multipart(self):
+        self.write(b'abcdefghij')
+        parts = [b'abcd', b'efgh', b'ij']
+        etag = hashlib.md5(
+            b''.join(hashlib.md5(p).digest() for p in parts)
+        ).hexdigest()
+        self.assertEqual(
+            Digest(hashlib.md5(b'abcdefghij').hexdigest(), f'{etag}-3'),
+            hashing.hash_file(self.path, part_size=4)
+        )
+
+
+class HashCacheTestCase(BaseTestCase):
+    def setUp(self):
+        super(HashCacheTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.filename = \
+            os.path.join(self.tmp.name, '.statikos', 'hashes.json')
+        self.cache = HashCache(self.filename)
+        self.files = []
+        for name in ['a', 'b']:
+            path = os.path.join(self.tmp.name, name)
+            with open(path, 'wb') as f:
+                f.write(name.encode())
+            # Backdate the files so they are not considered racy.
+            os.utime(path, ns=(0, 10**9))
+            self.files.append((path, os.stat(path)))
+        self.patch_hash_file = patch.object(
+            hashing, '_hash_file', wraps=hashing._hash_file
+        )
+        self.mock_hash_file = self.patch_hash_file.start()
+
+    def test_hash_files(self):
+        digests = self.cache.hash_files(self.files)
+        self.assertEqual(hashlib.md5(b'a').hexdigest(), digests[0].md5)
+        self.assertEqual(hashlib.md5(b'b').hexdigest(), digests[1].md5)
+        self.assertEqual(2, self.cache.misses)
+        self.assertEqual(digests, self.cache.hash_files(self.files))
+        self.assertEqual(2, self.cache.hits)
+        self.assertEqual(2, self.mock_hash_file.call_count)
+
+    def test_hash_files_changed(self):
+        self.cache.hash_files(self.files)
+        path = self.files[0][0]
+        with open(path, 'wb') as f:
+            f.write(b'changed')
+        os.utime(path, ns=(0, 2 * 10**9))
+        self.files[0] = (path, os.stat(path))
+        digests = self.cache.hash_files(self.files)
+        self.assertEqual(hashlib.md5(b'changed').hexdigest(), digests[0].md5)
+        self.assertEqual(1, self.cache.hits)
+
+    def test_hash_files_racy(self):
+        path = self.files[0][0]
+        os.utime(path)
+        self.files[0] = (path, os.stat(path))
+        self.cache.entries[path] = ['stale']
+        self.cache.hash_files(self.files)
+        self.assertNotIn(path, self.cache.entries)
+
+    def test_hash_files_prunes(self):
+        self.cache.hash_files(self.files)
+        self.cache.hash_files(self.files[:1])
+        self.assertEqual([self.files[0][0]], list(self.cache.entries))
+
+    def test_hash_files_parallel(self):
+        # Mocks cannot be sent to worker processes.
+        self.patch_hash_file.stop()
+        patch.object(hashing, 'MIN_PARALLEL_BYTES', 0).start()
+        digests = self.cache.hash_files(self.files, processes=2)
+        self.assertEqual(hashlib.md5(b'b').hexdigest(), digests[1].md5)
+
+    def test_get(self):
+        path, st = self.files[0]
+        self.assertIsNone(self.cache.get(path, st))
+        self.cache.set(path, st, Digest('md5', 'etag'))
+        self.assertEqual(Digest('md5', 'etag'), self.cache.get(path, st))
+        self.assertIsNone(self.cache.get(path, self.files[1][1]))
+
+    def test_save_and_load(self):
+        self.cache.hash_files(self.files)
+        self.cache.save()
+        cache = HashCache.load(self.filename)
+        self.assertEqual(self.cache.entries, cache.entries)
+        cache = HashCache.load(self.filename, part_size=1)
+        self.assertEqual({}, cache.entries)
+
+    def test_load_missing(self):
+        self.assertEqual({}, HashCache.load(self.filename).entries)
+
+    def test_load_corrupt(self):
+        os.makedirs(os.path.dirname(self.filename))
+        utils.write_file('{', self.filename)
+        self.assertEqual({}, HashCache.load(self.filename).entries)
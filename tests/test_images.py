@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `images` module."""
+
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from PIL import Image
+
+from statikos import images, stage
+from statikos.exceptions import MissingDependency
+from statikos.hashing import hash_file
+from statikos.images import Images
+from statikos.sync import LocalFile
+
+from .base import BaseTestCase
+
+
+def jpeg(width, height, **kwargs):
+    data = io.BytesIO()
+    Image.effect_noise((width, height), 20).convert('RGB').save(
+        data, 'JPEG', quality=100, **kwargs
+    )
+    return data.getvalue()
+
+
+def png(width, height):
+    data = io.BytesIO()
+    Image.new('RGBA', (width, height), (255, 0, 0, 128)).save(data, 'PNG')
+    return data.getvalue()
+
+
+class OptimizeImageTestCase(BaseTestCase):
+    def setUp(self):
+        super(OptimizeImageTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(self.tmp.name, 'photo.jpg')
+        self.dst = os.path.join(self.tmp.name, 'out')
+
+    def write(self, data):
+        with open(self.src, 'wb') as f:
+            f.write(data)
+
+    def test_optimize_image(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees.
+        exif[0x010f] = 'Camera'
+        self.write(jpeg(400, 200, exif=exif.tobytes()))
+        variants = images.optimize_image(
+            self.src, self.dst, 'JPEG', [100, 300], 150, 80, 75
+        )
+        self.assertEqual(
+            [('', '.jpg'), ('', '.webp'), ('-100w', '.jpg'),
+             ('-100w', '.webp')],
+            [(v[0], v[1]) for v in variants]
+        )
+        with Image.open(f'{self.dst}.jpg') as image:
+            self.assertEqual((150, 300), image.size)
+            self.assertEqual({}, dict(image.getexif()))
+        with Image.open(f'{self.dst}-100w.webp') as image:
+            self.assertEqual('WEBP', image.format)
+            self.assertEqual((100, 200), image.size)
+        suffix, extension, size, md5, etag = variants[0]
+        self.assertEqual(os.path.getsize(f'{self.dst}.jpg'), size)
+        self.assertEqual(hash_file(f'{self.dst}.jpg').md5, md5)
+
+    def test_optimize_image_no_upscale(self):
+        self.write(png(50, 50))
+        variants = images.optimize_image(
+            self.src, self.dst, 'PNG', [100], 2560, 80, None
+        )
+        self.assertEqual([('', '.png')], [(v[0], v[1]) for v in variants])
+
+    def test_optimize_image_invalid(self):
+        self.write(b'not an image')
+        self.assertEqual([], images.optimize_image(
+            self.src, self.dst, 'JPEG', [100], 2560, 80, 75
+        ))
+
+
+class ImagesTestCase(BaseTestCase):
+    def setUp(self):
+        super(ImagesTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = os.path.join(self.tmp.name, 'cache', 'images')
+        self.files = [
+            self.local_file('img/photo.jpg', jpeg(600, 400)),
+            self.local_file('img/logo.png', png(100, 100)),
+            self.local_file('index.html', b'<html></html>'),
+        ]
+        self.mock_optimize_image = patch.object(
+            images, '_optimize_image', wraps=images._optimize_image
+        ).start()
+        # Mocks cannot be sent to worker processes.
+        self.patch_executor = patch.object(
+            stage, 'ProcessPoolExecutor', ThreadPoolExecutor
+        )
+        self.patch_executor.start()
+
+    def local_file(self, key, data):
+        path = os.path.join(self.tmp.name, 'src', key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        digest = hash_file(path)
+        return LocalFile(key, path, len(data), digest.md5, digest.etag)
+
+    def test_init_missing_pillow(self):
+        with patch.dict('sys.modules', {'PIL': None}):
+            with self.assertRaises(MissingDependency):
+                Images(self.cache_dir)
+
+    def test_optimizable(self):
+        i = Images(self.cache_dir)
+        self.assertEqual(
+            [True, True, False], [i.optimizable(f) for f in self.files]
+        )
+        f = self.files[0]._replace(headers={'ContentEncoding': 'gzip'})
+        self.assertFalse(i.optimizable(f))
+        i = Images(self.cache_dir, extensions=['.png', '.gif'])
+        self.assertEqual(['.png'], i.extensions)
+
+    def test_call(self):
+        i = Images(self.cache_dir, widths=[200, 1000])
+        output = i(self.files)
+        self.assertEqual([
+            'img/photo.jpg', 'img/photo.webp', 'img/photo-200w.jpg',
+            'img/photo-200w.webp', 'img/logo.png', 'img/logo.webp',
+            'index.html'
+        ], [f.key for f in output])
+        photo = output[0]
+        self.assertTrue(photo.path.startswith(self.cache_dir))
+        self.assertLess(photo.size, self.files[0].size)
+        self.assertEqual(hash_file(photo.path).md5, photo.hash)
+        self.assertEqual(
+            self.files[0].size + self.files[1].size - photo.size -
+            output[4].size,
+            i.saved
+        )
+        with Image.open(output[2].path) as image:
+            self.assertEqual((200, 133), image.size)
+        self.assertEqual(self.files[2], output[6])
+
+    def test_call_keeps_smaller_original(self):
+        i = Images(self.cache_dir, widths=[], webp=False)
+        with patch.object(images, '_optimize_image') as mock_optimize:
+            mock_optimize.return_value = [['', '.jpg', 10 ** 9, 'md5', 'e']]
+            output = i(self.files[:1])
+        self.assertEqual(self.files[:1], output)
+        self.assertEqual(0, i.saved)
+
+    def test_call_key_taken(self):
+        files = self.files + [self.local_file('img/photo.webp', b'webp')]
+        output = Images(self.cache_dir, widths=[])(files)
+        webp = [f for f in output if f.key == 'img/photo.webp']
+        self.assertEqual([files[3]], webp)
+
+    def test_call_cached(self):
+        Images(self.cache_dir)(self.files)
+        self.assertEqual(2, self.mock_optimize_image.call_count)
+        output = Images(self.cache_dir)(self.files)
+        self.assertEqual(2, self.mock_optimize_image.call_count)
+        self.assertEqual('img/photo.webp', output[1].key)
+        Images(self.cache_dir, quality=50)(self.files)
+        self.assertEqual(4, self.mock_optimize_image.call_count)
+
+    def test_call_prunes(self):
+        i = Images(self.cache_dir, widths=[])
+        i(self.files)
+        i(self.files[1:])
+        name = f'{self.files[1].hash}-{i.settings_key}'
+        self.assertEqual(
+            sorted(['index.json', f'{name}.png', f'{name}.webp']),
+            sorted(os.listdir(self.cache_dir))
+        )
+
+    def test_call_missing_variant(self):
+        i = Images(self.cache_dir, widths=[])
+        i(self.files[:1])
+        os.remove(i(self.files[:1])[1].path)
+        output = i(self.files[:1])
+        self.assertEqual(2, self.mock_optimize_image.call_count)
+        self.assertTrue(os.path.exists(output[1].path))
+
+    def test_call_parallel(self):
+        patch.stopall()
+        output = Images(self.cache_dir, widths=[])(self.files)
+        self.assertEqual(5, len(output))
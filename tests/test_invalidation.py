@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `invalidation` module."""
+
+from statikos import invalidation
+
+from .base import BaseTestCase
+
+
+class InvalidationTestCase(BaseTestCase):
+    def setUp(self):
+        super(InvalidationTestCase, self).setUp()
+
+    def test_paths(self):
+        keys = [
+            'index.html', 'blog/index.html', 'blog/post.html', 'blog/post.html'
+        ]
+        self.assertEqual([
+            '/',
+            '/blog/',
+            '/blog/index.html',
+            '/blog/post.html',
+            '/index.html',
+        ], invalidation.paths(keys))
+
+    def test_paths_quoted(self):
+        self.assertEqual(['/a%20b%2A.html'], invalidation.paths(['a b*.html']))
+
+    def test_group(self):
+        paths = ['/blog/a.html', '/blog/2020/b.html', '/index.html']
+        self.assertEqual(
+            {'/blog/': ['/blog/a.html', '/blog/2020/b.html']},
+            invalidation._group(paths, 1)
+        )
+        self.assertEqual(
+            {'/blog/2020/': ['/blog/2020/b.html']},
+            invalidation._group(paths, 2)
+        )
+
+    def test_coalesce_within_limits(self):
+        paths = ['/b.html', '/a.html']
+        self.assertEqual(['/a.html', '/b.html'], invalidation.coalesce(paths))
+
+    def test_coalesce(self):
+        paths = ['/index.html', '/blog/a.html', '/blog/b.html', '/blog/c.html']
+        self.assertEqual(['/blog/*', '/index.html'],
+                         invalidation.coalesce(paths, max_paths=3))
+
+    def test_coalesce_deepest_first(self):
+        paths = [f'/a/b/{i}' for i in range(5)] + \
+            [f'/a/c/{i}' for i in range(5)] + ['/x']
+        self.assertEqual(['/a/b/*', '/a/c/*', '/x'],
+                         invalidation.coalesce(paths, max_paths=3))
+        self.assertEqual(['/a/*', '/x'],
+                         invalidation.coalesce(paths, max_paths=2))
+
+    def test_coalesce_largest_first(self):
+        paths = [f'/a/{i}' for i in range(3)] + [f'/b/{i}' for i in range(5)]
+        self.assertEqual(['/a/0', '/a/1', '/a/2', '/b/*'],
+                         invalidation.coalesce(paths, max_paths=4))
+
+    def test_coalesce_index(self):
+        paths = invalidation.paths(['blog/index.html', 'blog/a.html'])
+        self.assertEqual(['/blog/*'],
+                         invalidation.coalesce(paths, max_paths=1))
+
+    def test_coalesce_wildcards(self):
+        paths = [f'/d{i}/{j}/x' for i in range(3) for j in range(2)]
+        result = invalidation.coalesce(paths, max_paths=3, max_wildcards=2)
+        self.assertEqual(['/*'], result)
+        paths = [f'/a/d{i}/*' for i in range(3)] + ['/b/x']
+        self.assertEqual(['/a/*', '/b/x'],
+                         invalidation.coalesce(paths, max_wildcards=2))
+
+    def test_coalesce_everything(self):
+        self.assertEqual(['/*'], invalidation.coalesce(['/a'], max_paths=0))
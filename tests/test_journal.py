@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `journal` module."""
+
+import os
+import tempfile
+
+from statikos import utils
+from statikos.journal import Journal
+
+from .base import BaseTestCase
+
+
+class JournalTestCase(BaseTestCase):
+    def setUp(self):
+        super(JournalTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.filename = \
+            os.path.join(self.tmp.name, '.statikos', 'journal.jsonl')
+        self.journal = Journal(self.filename, 'bucket')
+        self.addCleanup(self.journal.close)
+
+    def record(self):
+        self.journal.complete('index.html', 1, 'hash', 'etag')
+        self.journal.begin('video.mp4', 'md5', 'upload', {'ContentType': 'a'})
+        self.journal.part('video.mp4', 2, 'etag2')
+        self.journal.part('video.mp4', 1, 'etag1')
+        self.journal.begin('audio.mp3', 'md5', 'upload2')
+        self.journal.abort('audio.mp3')
+
+    def test_record_and_load(self):
+        self.record()
+        journal = Journal.load(self.filename, 'bucket')
+        self.assertEqual({
+            'index.html': {
+                'size': 1, 'hash': 'hash', 'etag': 'etag', 'headers': None
+            }
+        }, journal.completed)
+        self.assertEqual({
+            'video.mp4': {
+                'hash': 'md5',
+                'upload_id': 'upload',
+                'headers': {'ContentType': 'a'},
+                'parts': {1: 'etag1', 2: 'etag2'},
+            }
+        }, journal.uploads)
+        self.assertEqual(self.journal.uploads, journal.uploads)
+
+    def test_complete_ends_upload(self):
+        self.journal.begin('video.mp4', 'md5', 'upload')
+        self.journal.complete('video.mp4', 1, 'md5', 'etag-1')
+        self.assertEqual({}, self.journal.uploads)
+
+    def test_load_missing(self):
+        journal = Journal.load(self.filename, 'bucket')
+        self.assertEqual({}, journal.completed)
+        self.assertEqual({}, journal.uploads)
+
+    def test_load_other_bucket(self):
+        self.record()
+        self.assertEqual({}, Journal.load(self.filename, 'other').completed)
+
+    def test_load_corrupt(self):
+        os.makedirs(os.path.dirname(self.filename))
+        utils.write_file('[]\n', self.filename)
+        self.assertEqual({}, Journal.load(self.filename, 'bucket').completed)
+
+    def test_load_torn(self):
+        self.record()
+        self.journal.close()
+        size = os.path.getsize(self.filename)
+        utils.append_file('{"op": "done", "key": "a.html"', self.filename)
+        journal = Journal.load(self.filename, 'bucket')
+        self.assertEqual(['index.html'], list(journal.completed))
+        journal.complete('b.html', 1, 'hash', 'etag')
+        journal.close()
+        self.assertLess(size, os.path.getsize(self.filename))
+        self.assertEqual(
+            ['index.html', 'b.html'],
+            list(Journal.load(self.filename, 'bucket').completed)
+        )
+
+    def test_compact(self):
+        self.record()
+        self.journal.compact()
+        self.assertEqual({}, self.journal.completed)
+        journal = Journal.load(self.filename, 'bucket')
+        self.assertEqual({}, journal.completed)
+        self.assertEqual(self.journal.uploads, journal.uploads)
+        journal.part('video.mp4', 3, 'etag3')
+        journal.close()
+        self.assertEqual(
+            {1: 'etag1', 2: 'etag2', 3: 'etag3'},
+            Journal.load(self.filename, 'bucket').uploads['video.mp4']['parts']
+        )
+
+    def test_compact_empty(self):
+        self.journal.complete('index.html', 1, 'hash', 'etag')
+        self.journal.compact()
+        self.assertFalse(os.path.exists(self.filename))
+        self.journal.compact()
+        self.journal.complete('index.html', 1, 'hash', 'etag')
+        self.journal.close()
+        self.assertEqual(
+            ['index.html'],
+            list(Journal.load(self.filename, 'bucket').completed)
+        )
+
+    def test_in_memory(self):
+        journal = Journal(None, 'bucket')
+        journal.complete('index.html', 1, 'hash', 'etag')
+        journal.compact()
+        self.assertEqual({}, journal.completed)
+        self.assertFalse(os.path.exists(os.path.dirname(self.filename)))
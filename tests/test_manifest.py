@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `manifest` module."""
+
+import os
+import tempfile
+from collections import namedtuple
+from unittest.mock import Mock
+
+from statikos import utils
+from statikos.manifest import Manifest, Plan, headers_digest
+
+from .base import BaseTestCase
+
+File = namedtuple('File', ['key', 'size', 'hash', 'etag'])
+
+
+class PlanTestCase(BaseTestCase):
+    def setUp(self):
+        super(PlanTestCase, self).setUp()
+
+    def test_str(self):
+        plan = Plan()
+        plan.upload = [1, 2]
+        plan.delete = [3]
+        self.assertEqual('2 to upload, 1 to delete, 0 unchanged', str(plan))
+
+
+class ManifestTestCase(BaseTestCase):
+    def setUp(self):
+        super(ManifestTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.filename = \
+            os.path.join(self.tmp.name, '.statikos', 'manifest.json')
+        self.manifest = Manifest(self.filename, 'bucket')
+
+    def test_init(self):
+        self.assertTrue(self.manifest.stale)
+        self.assertEqual({}, self.manifest.entries)
+
+    def test_save_and_load(self):
+        self.manifest.update('index.html', 1, 'hash', 'etag')
+        self.manifest.save()
+        self.assertFalse(os.path.exists(f'{self.filename}.tmp'))
+        manifest = Manifest.load(self.filename, 'bucket')
+        self.assertFalse(manifest.stale)
+        self.assertEqual(self.manifest.entries, manifest.entries)
+
+    def test_load_missing(self):
+        manifest = Manifest.load(self.filename, 'bucket')
+        self.assertTrue(manifest.stale)
+
+    def test_load_corrupt(self):
+        os.makedirs(os.path.dirname(self.filename))
+        utils.write_file('{', self.filename)
+        self.assertTrue(Manifest.load(self.filename, 'bucket').stale)
+        utils.write_file('[]', self.filename)
+        self.assertTrue(Manifest.load(self.filename, 'bucket').stale)
+
+    def test_load_other_bucket(self):
+        self.manifest.save()
+        self.assertTrue(Manifest.load(self.filename, 'other').stale)
+
+    def test_load_other_version(self):
+        os.makedirs(os.path.dirname(self.filename))
+        utils.write_json_file({
+            'version': 0,
+            'bucket': 'bucket',
+            'entries': {}
+        }, self.filename)
+        self.assertTrue(Manifest.load(self.filename, 'bucket').stale)
+
+    def test_rebuild(self):
+        s3 = Mock()
+        s3.list_objects.return_value = [
+            {'Key': 'index.html', 'Size': 1, 'ETag': '"etag"'},
+        ]
+        self.manifest.rebuild(s3)
+        s3.list_objects.assert_called_once_with('bucket')
+        self.assertFalse(self.manifest.stale)
+        self.assertEqual({
+            'index.html': {
+                'size': 1,
+                'hash': None,
+                'etag': 'etag',
+                'headers': None,
+            }
+        }, self.manifest.entries)
+
+    def test_unchanged(self):
+        self.manifest.update('a', 1, 'hash', 'etag')
+        self.assertTrue(self.manifest.unchanged('a', 1, 'hash'))
+        self.assertFalse(self.manifest.unchanged('a', 2, 'hash'))
+        self.assertFalse(self.manifest.unchanged('a', 1, 'other', 'etag'))
+        self.assertFalse(self.manifest.unchanged('b', 1, 'hash'))
+
+    def test_unchanged_headers(self):
+        self.manifest.update('a', 1, 'hash', 'etag', 'h1')
+        self.assertTrue(self.manifest.unchanged('a', 1, 'hash', None, 'h1'))
+        self.assertFalse(self.manifest.unchanged('a', 1, 'hash', None, 'h2'))
+        self.assertTrue(self.manifest.unchanged('a', 1, 'hash'))
+        # Parameters of rebuilt entries are unknown.
+        self.manifest.update('b', 1, 'hash', 'etag')
+        self.assertTrue(self.manifest.unchanged('b', 1, 'hash', None, 'h2'))
+
+    def test_unchanged_rebuilt(self):
+        self.manifest.entries['a'] = {'size': 1, 'hash': None, 'etag': 'md5'}
+        self.manifest.entries['b'] = {
+            'size': 1,
+            'hash': None,
+            'etag': 'etag-2'
+        }
+        self.assertTrue(self.manifest.unchanged('a', 1, 'md5', 'md5'))
+        self.assertTrue(self.manifest.unchanged('b', 1, 'md5', 'etag-2'))
+        self.assertFalse(self.manifest.unchanged('b', 1, 'md5', 'etag-3'))
+
+    def test_plan(self):
+        self.manifest.update('same', 1, 'hash', 'etag')
+        self.manifest.update('changed', 1, 'hash', 'etag')
+        self.manifest.update('deleted', 1, 'hash', 'etag')
+        same = File('same', 1, 'hash', 'hash')
+        changed = File('changed', 1, 'other', 'other')
+        new = File('new', 1, 'hash', 'hash')
+        plan = self.manifest.plan([same, changed, new])
+        self.assertEqual([same], plan.skip)
+        self.assertEqual([changed, new], plan.upload)
+        self.assertEqual(['deleted'], plan.delete)
+        plan = self.manifest.plan([same], delete=False)
+        self.assertEqual([], plan.delete)
+
+    def test_plan_headers(self):
+        headers = headers_digest({'ContentType': 'text/html'})
+        self.manifest.update('a', 1, 'hash', 'etag', headers)
+        f = File('a', 1, 'hash', 'hash')
+        plan = self.manifest.plan([f], headers=lambda f: {
+            'ContentType': 'text/html'
+        })
+        self.assertEqual([f], plan.skip)
+        plan = self.manifest.plan([f], headers=lambda f: {
+            'ContentType': 'text/html', 'CacheControl': 'no-cache'
+        })
+        self.assertEqual([f], plan.upload)
+
+    def test_remove(self):
+        self.manifest.update('a', 1, 'hash', 'etag')
+        self.manifest.remove('a')
+        self.manifest.remove('b')
+        self.assertEqual({}, self.manifest.entries)
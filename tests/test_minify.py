@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `minify` module."""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from statikos import minify, stage
+from statikos.exceptions import InvalidConfig
+from statikos.hashing import hash_file
+from statikos.minify import (
+    CSSMinifier, HTMLMinifier, JSMinifier, Minifier, Minify, TokenMinifier
+)
+from statikos.sync import LocalFile
+
+from .base import BaseTestCase
+
+HTML = '''<!DOCTYPE html>
+<html>
+  <!-- Navigation -->
+  <head>
+    <title>  Hello,   world </title>
+    <style> a  {  color: red  } </style>
+  </head>
+  <body class="a  b"
+        id="main" >
+    <pre>  keep
+      this </pre>
+    <!--[if IE]><p>IE</p><![endif]-->
+    <p>1 < 2</p>
+  </body>
+</html>
+'''
+
+CSS = '''/* Comment */
+/*! License */
+a :hover , ul > li {
+  color : red ;
+  margin: 0  auto;
+}
+@media screen and (max-width: 600px) {
+  .x { content: " ; } " ; width: calc(100% - 2px); }
+}
+'''
+
+JS = r'''/*! License */
+// Comment
+var a = 1 ,  b = "x // y" ;
+function f ( x ) {
+    return /a\/b[/]*/g.test( x ) // Comment
+}
+const t = `a ${ b + `${ c }` }  z`
+x = a / b / c
+if ( a ) {
+  y++
+}
+return
+  z
+'''
+
+
+class UpperMinifier(Minifier):
+    """Minifier that upper-cases its input, for pipeline tests."""
+
+    def feed(self, text):
+        return text.upper()
+
+    def close(self):
+        return ''
+
+
+def minify_text(minifier, text, size=None):
+    if size is None:
+        return minifier.feed(text) + minifier.close()
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    return ''.join(minifier.feed(c) for c in chunks) + minifier.close()
+
+
+class MinifierTestCase(BaseTestCase):
+    def assertStreams(self, cls, text):
+        expected = minify_text(cls(), text)
+        for size in range(1, 16):
+            self.assertEqual(expected, minify_text(cls(), text, size))
+
+    def test_html(self):
+        self.assertEqual(
+            '<!DOCTYPE html> <html> <head> <title> Hello, world </title> '
+            '<style> a  {  color: red  } </style> </head> '
+            '<body class="a  b" id="main"> <pre>  keep\n      this </pre> '
+            '<!--[if IE]><p>IE</p><![endif]--> <p>1 < 2</p> </body> </html>',
+            minify_text(HTMLMinifier(), HTML)
+        )
+        self.assertStreams(HTMLMinifier, HTML)
+
+    def test_css(self):
+        self.assertEqual(
+            '/*! License */a :hover,ul>li{color :red;margin:0 auto}'
+            '@media screen and (max-width:600px){.x{content:" ; } ";'
+            'width:calc(100% - 2px)}}',
+            minify_text(CSSMinifier(), CSS)
+        )
+        self.assertStreams(CSSMinifier, CSS)
+
+    def test_css_trailing_semicolon(self):
+        self.assertEqual(
+            '@import "a.css";', minify_text(CSSMinifier(), '@import "a.css";')
+        )
+
+    def test_js(self):
+        self.assertEqual(
+            '/*! License */\n'
+            'var a=1,b="x // y";function f(x){return /a\\/b[/]*/g.test(x)}\n'
+            'const t=`a ${b + `${c}`}  z`\n'
+            'x=a / b / c\n'
+            'if(a){y++}\n'
+            'return\n'
+            'z',
+            minify_text(JSMinifier(), JS)
+        )
+        self.assertStreams(JSMinifier, JS)
+
+    def test_js_comment_separates_tokens(self):
+        self.assertEqual(
+            'a b\nc', minify_text(JSMinifier(), 'a/* x */b/*\n*/c')
+        )
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            Minifier()
+        with self.assertRaises(TypeError):
+            TokenMinifier()
+
+    def test_unterminated(self):
+        self.assertEqual('a', minify_text(CSSMinifier(), 'a /* b'))
+        self.assertEqual('x="a', minify_text(JSMinifier(), 'x = "a'))
+
+    def test_load_minifier(self):
+        self.assertIs(JSMinifier, minify.load_minifier('js'))
+        self.assertIs(
+            UpperMinifier,
+            minify.load_minifier('tests.test_minify:UpperMinifier')
+        )
+        for name in ['svg', 'tests.test_minify:Missing', 'missing:X']:
+            with self.assertRaises(InvalidConfig):
+                minify.load_minifier(name)
+
+    def test_pipeline(self):
+        minifier = minify.create_minifier(
+            ['css', 'tests.test_minify:UpperMinifier']
+        )
+        self.assertEqual('A{B:C}', minify_text(minifier, 'a { b: c; }', 3))
+
+
+class MinifyFileTestCase(BaseTestCase):
+    def setUp(self):
+        super(MinifyFileTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(self.tmp.name, 'site.css')
+        self.dst = os.path.join(self.tmp.name, 'site.min.css')
+
+    def test_minify_file(self):
+        with open(self.src, 'w', encoding='utf-8') as f:
+            f.write(CSS * 1000)
+        with patch.object(minify, 'CHUNK_SIZE', 100):
+            self.assertTrue(minify.minify_file(self.src, self.dst, ['css']))
+        with open(self.dst, encoding='utf-8') as f:
+            self.assertEqual(minify_text(CSSMinifier(), CSS * 1000), f.read())
+
+    def test_minify_file_not_utf8(self):
+        with open(self.src, 'wb') as f:
+            f.write(b'\xff\xfe a { }')
+        self.assertFalse(minify.minify_file(self.src, self.dst, ['css']))
+        self.assertEqual(['site.css'], os.listdir(self.tmp.name))
+
+
+class MinifyTestCase(BaseTestCase):
+    def setUp(self):
+        super(MinifyTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = os.path.join(self.tmp.name, 'cache', 'minified')
+        self.files = [
+            self.local_file('index.html', HTML.encode()),
+            self.local_file('css/site.css', CSS.encode()),
+            self.local_file('js/app.js', b'a();'),
+            self.local_file('image.png', b'\x89PNG'),
+        ]
+        self.mock_minify_file = patch.object(
+            minify, '_minify_file', wraps=minify._minify_file
+        ).start()
+        # Mocks cannot be sent to worker processes.
+        self.patch_executor = patch.object(
+            stage, 'ProcessPoolExecutor', ThreadPoolExecutor
+        )
+        self.patch_executor.start()
+
+    def local_file(self, key, data):
+        path = os.path.join(self.tmp.name, 'src', key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        digest = hash_file(path)
+        return LocalFile(key, path, len(data), digest.md5, digest.etag)
+
+    def test_init(self):
+        m = Minify(self.cache_dir, transforms={
+            '.CSS': ['css', 'tests.test_minify:UpperMinifier'],
+            '.js': None,
+        })
+        self.assertEqual(
+            ['css', 'tests.test_minify:UpperMinifier'],
+            m.transforms['.css'][0]
+        )
+        self.assertNotIn('.js', m.transforms)
+        self.assertEqual(['html'], m.transforms['.html'][0])
+        with self.assertRaises(InvalidConfig):
+            Minify(self.cache_dir, transforms={'.svg': 'svg'})
+
+    def test_call(self):
+        m = Minify(self.cache_dir)
+        output = m(self.files)
+        self.assertEqual(
+            [f.key for f in self.files], [f.key for f in output]
+        )
+        html, css = output[0], output[1]
+        self.assertTrue(html.path.startswith(self.cache_dir))
+        with open(css.path, encoding='utf-8') as f:
+            self.assertEqual(minify_text(CSSMinifier(), CSS), f.read())
+        self.assertEqual(hash_file(css.path).md5, css.hash)
+        self.assertEqual(os.path.getsize(css.path), css.size)
+        # Already minified, and not minifiable.
+        self.assertEqual(self.files[2:], output[2:])
+        self.assertEqual(
+            self.files[0].size + self.files[1].size - html.size - css.size,
+            m.saved
+        )
+
+    def test_call_compressed(self):
+        files = [self.files[1]._replace(headers={'ContentEncoding': 'gzip'})]
+        self.assertEqual(files, Minify(self.cache_dir)(files))
+        self.assertEqual(0, self.mock_minify_file.call_count)
+
+    def test_call_not_utf8(self):
+        files = [self.local_file('latin1.css', b'a { content: "\xe9" }')]
+        self.assertEqual(files, Minify(self.cache_dir)(files))
+        self.assertEqual(files, Minify(self.cache_dir)(files))
+        self.assertEqual(1, self.mock_minify_file.call_count)
+
+    def test_call_cached(self):
+        Minify(self.cache_dir)(self.files)
+        self.assertEqual(3, self.mock_minify_file.call_count)
+        output = Minify(self.cache_dir)(self.files)
+        self.assertEqual(3, self.mock_minify_file.call_count)
+        self.assertTrue(output[1].path.startswith(self.cache_dir))
+        Minify(self.cache_dir, transforms={'.css': None})(self.files)
+        self.assertEqual(3, self.mock_minify_file.call_count)
+        Minify(
+            self.cache_dir,
+            transforms={'.css': ['css', 'tests.test_minify:UpperMinifier']}
+        )(self.files)
+        self.assertEqual(4, self.mock_minify_file.call_count)
+
+    def test_call_prunes(self):
+        m = Minify(self.cache_dir)
+        output = m(self.files)
+        m(self.files[1:])
+        self.assertEqual(
+            sorted([
+                'index.json',
+                os.path.basename(output[1].path),
+                os.path.basename(m._path(self.files[2])),
+            ]),
+            sorted(os.listdir(self.cache_dir))
+        )
+
+    def test_call_parallel(self):
+        patch.stopall()
+        output = Minify(self.cache_dir)(self.files)
+        self.assertEqual(4, len(output))
+        self.assertLess(output[0].size, self.files[0].size)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `ratelimit` module."""
+
+import threading
+from unittest.mock import call, patch
+
+from statikos import ratelimit
+from statikos.ratelimit import TokenBucket
+
+from .base import BaseTestCase
+
+
+class TokenBucketTestCase(BaseTestCase):
+    def setUp(self):
+        super(TokenBucketTestCase, self).setUp()
+        self.now = 100.0
+        patch.object(
+            ratelimit.time, 'monotonic', side_effect=lambda: self.now
+        ).start()
+        self.mock_sleep = patch.object(ratelimit.time, 'sleep').start()
+
+    def test_init(self):
+        bucket = TokenBucket(4)
+        self.assertEqual(4, bucket.capacity)
+        self.assertEqual(4, bucket.tokens)
+        self.assertEqual(8, TokenBucket(4, capacity=8).capacity)
+
+    def test_acquire_burst(self):
+        bucket = TokenBucket(2)
+        self.assertEqual(0, bucket.acquire())
+        self.assertEqual(0, bucket.acquire())
+        self.mock_sleep.assert_not_called()
+
+    def test_acquire_wait(self):
+        bucket = TokenBucket(2)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(0.5, bucket.acquire())
+        self.assertEqual(1.0, bucket.acquire())
+        self.mock_sleep.assert_has_calls([call(0.5), call(1.0)])
+        self.assertEqual(1.5, bucket.waited)
+
+    def test_acquire_refill(self):
+        bucket = TokenBucket(2)
+        bucket.acquire()
+        bucket.acquire()
+        self.now += 0.5
+        self.assertEqual(0, bucket.acquire())
+        self.now += 60
+        bucket.acquire()
+        self.assertEqual(1, bucket.tokens)
+
+    def test_acquire_threads(self):
+        bucket = TokenBucket(10)
+        threads = [
+            threading.Thread(target=bucket.acquire) for _ in range(20)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(-10, bucket.tokens)
+        self.assertEqual(10, self.mock_sleep.call_count)
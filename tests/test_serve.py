@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `serve` module."""
+
+import asyncio
+import gzip
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from statikos import serve
+from statikos.compress import Compress
+from statikos.hashing import hash_file
+from statikos.serve import Server
+from statikos.sync import LocalFile
+
+from .base import BaseTestCase
+
+HTML = b'<html><body>' + b'<p>Hello, world!</p>' * 100 + b'</body></html>'
+
+
+class ServeTestCase(BaseTestCase):
+    def test_to_header(self):
+        self.assertEqual('Cache-Control', serve.to_header('CacheControl'))
+        self.assertEqual('Content-Type', serve.to_header('ContentType'))
+        self.assertEqual('Expires', serve.to_header('Expires'))
+
+    def test_negotiate(self):
+        available = ['identity', 'gzip', 'br']
+        self.assertEqual('identity', serve.negotiate(None, available))
+        self.assertEqual('identity', serve.negotiate('', available))
+        self.assertEqual('br', serve.negotiate('gzip, br', available))
+        self.assertEqual('gzip', serve.negotiate('gzip, br', ['identity',
+                                                              'gzip']))
+        self.assertEqual(
+            'gzip', serve.negotiate('gzip, br;q=0.5', available)
+        )
+        self.assertEqual('br', serve.negotiate('*', available))
+        self.assertEqual(
+            'identity', serve.negotiate('gzip;q=0, br;q=0', available)
+        )
+        self.assertEqual('identity', serve.negotiate('*;q=0', available))
+        self.assertEqual('gzip', serve.negotiate('GZIP', available))
+
+    def test_routes(self):
+        index = LocalFile('index.html', 'build/index.html', 10, 'a', 'a')
+        gz = index._replace(
+            path='cache/a-9.gz', headers={'ContentEncoding': 'gzip'}
+        )
+        br = index._replace(
+            key='index.html.br',
+            path='cache/a-11.br',
+            headers={'ContentEncoding': 'br'}
+        )
+        image = LocalFile('image.png', 'build/image.png', 10, 'b', 'b')
+        self.assertEqual(
+            {
+                'index.html': {'identity': index, 'gzip': gz, 'br': br},
+                'image.png': {'identity': image},
+            },
+            serve.routes([index, image], [gz, br, image])
+        )
+        self.assertEqual(
+            {'index.html': {'identity': index}}, serve.routes([index])
+        )
+
+
+class ServerTestCase(BaseTestCase):
+    def setUp(self):
+        super(ServerTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.files = [
+            self.local_file('index.html', HTML),
+            self.local_file('404.html', b'Not here'),
+            self.local_file('blog/index.html', b'Blog'),
+            self.local_file(
+                'css/site.css',
+                b'body {}',
+                headers={'CacheControl': 'public, max-age=31536000'}
+            ),
+        ]
+        patch(
+            'statikos.stage.ProcessPoolExecutor', ThreadPoolExecutor
+        ).start()
+        stage = Compress(
+            os.path.join(self.tmp.name, 'cache'),
+            encodings=['gzip', 'br'],
+            siblings=True
+        )
+        self.server = Server(serve.routes(self.files, stage(self.files)))
+
+    def local_file(self, key, data, headers=None):
+        path = os.path.join(self.tmp.name, 'build', *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        digest = hash_file(path)
+        return LocalFile(
+            key, path, len(data), digest.md5, digest.etag, headers
+        )
+
+    def request(self, *requests):
+        """
+        Send raw requests on one connection and return the raw response.
+        """
+        async def run():
+            server = await self.server.start('127.0.0.1', 0)
+            async with server:
+                port = server.sockets[0].getsockname()[1]
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port
+                )
+                writer.write(b''.join(requests))
+                await writer.drain()
+                data = await reader.read()
+                writer.close()
+                return data
+
+        return asyncio.run(run())
+
+    def get(self, path, *headers, method='GET'):
+        """
+        Send a single request and return the status, headers, and body.
+        """
+        data = self.request(
+            f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'.encode() +
+            b''.join(f'{h}\r\n'.encode() for h in headers) +
+            b'Connection: close\r\n\r\n'
+        )
+        head, _, body = data.partition(b'\r\n\r\n')
+        lines = head.decode().split('\r\n')
+        status = int(lines[0].split(' ')[1])
+        response = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(': ')
+            response[name.lower()] = value
+        return status, response, body
+
+    def test_resolve(self):
+        self.assertEqual((200, 'index.html'), self.server.resolve('/'))
+        self.assertEqual(
+            (200, 'blog/index.html'), self.server.resolve('/blog/')
+        )
+        self.assertEqual((302, '/blog/'), self.server.resolve('/blog'))
+        self.assertEqual(
+            (200, 'css/site.css'), self.server.resolve('/css/site.css')
+        )
+        self.assertEqual((404, '404.html'), self.server.resolve('/missing'))
+        self.assertEqual((404, '404.html'), self.server.resolve('/css/'))
+
+    def test_get_index(self):
+        status, headers, body = self.get('/')
+        self.assertEqual(200, status)
+        self.assertEqual(HTML, body)
+        self.assertEqual('text/html', headers['content-type'])
+        self.assertEqual(str(len(HTML)), headers['content-length'])
+        self.assertEqual('Accept-Encoding', headers['vary'])
+        self.assertNotIn('content-encoding', headers)
+        self.assertEqual(f'"{self.files[0].etag}"', headers['etag'])
+
+    def test_get_compressed(self):
+        status, headers, body = self.get(
+            '/index.html', 'Accept-Encoding: gzip'
+        )
+        self.assertEqual(200, status)
+        self.assertEqual('gzip', headers['content-encoding'])
+        self.assertEqual(HTML, gzip.decompress(body))
+        self.assertEqual(str(len(body)), headers['content-length'])
+        status, headers, body = self.get(
+            '/index.html', 'Accept-Encoding: gzip, deflate, br'
+        )
+        self.assertEqual('br', headers['content-encoding'])
+
+    def test_get_cache_control(self):
+        status, headers, body = self.get('/css/site.css')
+        self.assertEqual(200, status)
+        self.assertEqual(b'body {}', body)
+        self.assertEqual('text/css', headers['content-type'])
+        self.assertEqual('public, max-age=31536000', headers['cache-control'])
+        self.assertNotIn('vary', headers)
+
+    def test_get_not_found(self):
+        status, headers, body = self.get('/missing.html')
+        self.assertEqual(404, status)
+        self.assertEqual(b'Not here', body)
+
+    def test_get_not_found_no_error_document(self):
+        del self.server.routes['404.html']
+        status, headers, body = self.get('/missing.html')
+        self.assertEqual(404, status)
+        self.assertEqual(b'Not Found', body)
+
+    def test_get_redirect(self):
+        status, headers, body = self.get('/blog')
+        self.assertEqual(302, status)
+        self.assertEqual('/blog/', headers['location'])
+
+    def test_get_not_modified(self):
+        etag = f'"{self.files[3].etag}"'
+        status, headers, body = self.get(
+            '/css/site.css', f'If-None-Match: {etag}'
+        )
+        self.assertEqual(304, status)
+        self.assertEqual(etag, headers['etag'])
+        self.assertEqual('public, max-age=31536000', headers['cache-control'])
+        self.assertEqual(b'', body)
+
+    def test_head(self):
+        status, headers, body = self.get('/', method='HEAD')
+        self.assertEqual(200, status)
+        self.assertEqual(str(len(HTML)), headers['content-length'])
+        self.assertEqual(b'', body)
+
+    def test_method_not_allowed(self):
+        status, headers, body = self.get('/', method='POST')
+        self.assertEqual(405, status)
+        self.assertEqual('GET, HEAD', headers['allow'])
+
+    def test_bad_request(self):
+        data = self.request(b'nonsense\r\n\r\n')
+        self.assertTrue(data.startswith(b'HTTP/1.1 400 Bad Request\r\n'))
+
+    def test_keep_alive(self):
+        data = self.request(
+            b'GET /css/site.css HTTP/1.1\r\n\r\n',
+            b'GET /blog/ HTTP/1.1\r\nConnection: close\r\n\r\n'
+        )
+        self.assertEqual(2, data.count(b'HTTP/1.1 200 OK\r\n'))
+        self.assertIn(b'Connection: keep-alive\r\n', data)
+        self.assertTrue(data.endswith(b'Blog'))
+
+    def test_http_1_0_closes(self):
+        data = self.request(
+            b'GET /css/site.css HTTP/1.0\r\n\r\n',
+            b'GET /blog/ HTTP/1.0\r\n\r\n'
+        )
+        self.assertEqual(1, data.count(b'HTTP/1.1 200 OK\r\n'))
+        self.assertIn(b'Connection: close\r\n', data)
+
+    def test_idle_timeout(self):
+        self.server.idle_timeout = 0.01
+        self.assertEqual(b'', self.request(b'GET / HTTP/1.1\r\n'))
+
+    def test_concurrent_connections(self):
+        async def run():
+            server = await self.server.start('127.0.0.1', 0)
+            async with server:
+                port = server.sockets[0].getsockname()[1]
+
+                async def fetch():
+                    reader, writer = await asyncio.open_connection(
+                        '127.0.0.1', port
+                    )
+                    writer.write(
+                        b'GET / HTTP/1.1\r\nConnection: close\r\n\r\n'
+                    )
+                    data = await reader.read()
+                    writer.close()
+                    return data
+
+                return await asyncio.gather(*[fetch() for _ in range(200)])
+
+        responses = asyncio.run(run())
+        self.assertEqual(200, len(responses))
+        for data in responses:
+            self.assertTrue(data.endswith(HTML))
+
+    def test_serve_forever(self):
+        urls = []
+
+        async def run():
+            task = asyncio.ensure_future(
+                self.server.serve_forever('127.0.0.1', 0, urls.append)
+            )
+            while not urls:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(run())
+        self.assertRegex(urls[0], r'^http://127\.0\.0\.1:\d+/$')
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `stage` module."""
+
+import os
+import tempfile
+from unittest.mock import Mock, patch
+
+from statikos import stage
+from statikos.stage import CachedStage
+
+from .base import BaseTestCase
+
+
+def _double(n):
+    return n * 2
+
+
+class CachedStageTestCase(BaseTestCase):
+    def setUp(self):
+        super(CachedStageTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.stage = CachedStage()
+        self.stage.cache_dir = self.tmp.name
+
+    def touch(self, name):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb'):
+            pass
+        return path
+
+    def test_load_index_missing(self):
+        self.assertEqual({}, self.stage._load_index())
+
+    def test_load_index_corrupt(self):
+        with open(self.stage.index_file, 'w') as f:
+            f.write('{')
+        self.assertEqual({}, self.stage._load_index())
+
+    def test_save_index(self):
+        path = os.path.join(self.tmp.name, 'other.json')
+        self.stage._save_index({'a': [1]})
+        self.stage._save_index({'b': [2]}, path)
+        self.assertEqual({'a': [1]}, self.stage._load_index())
+        self.assertEqual({'b': [2]}, self.stage._load_index(path))
+        self.assertEqual(
+            ['index.json', 'other.json'], sorted(os.listdir(self.tmp.name))
+        )
+
+    def test_prune(self):
+        self.stage._save_index({})
+        for name in ['used', 'skipped', 'stale', 'other.json']:
+            self.touch(name)
+        self.stage._prune(
+            {'used': [1], 'skipped': None},
+            keep=[os.path.join(self.tmp.name, 'other.json')]
+        )
+        self.assertEqual(
+            ['index.json', 'other.json', 'used'],
+            sorted(os.listdir(self.tmp.name))
+        )
+
+    def test_map_inline(self):
+        executor = patch.object(stage, 'ProcessPoolExecutor').start()
+        initializer = Mock()
+        self.assertEqual(
+            [4], self.stage._map(_double, [2], initializer, ('arg', ))
+        )
+        initializer.assert_called_once_with('arg')
+        executor.assert_not_called()
+
+    def test_map_pool(self):
+        executor = patch.object(stage, 'ProcessPoolExecutor').start()
+        pool = executor.return_value.__enter__.return_value
+        pool.map.return_value = iter([2, 4])
+        self.stage.processes = 3
+        self.assertEqual([2, 4], self.stage._map(_double, [1, 2]))
+        executor.assert_called_once_with(
+            max_workers=3, initializer=None, initargs=()
+        )
+        pool.map.assert_called_once_with(_double, [1, 2])
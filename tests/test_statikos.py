@@ -1,10 +1,20 @@
 # -*- coding: utf-8 -*-
 """Tests for the `statikos` module."""
 
-from unittest.mock import Mock, patch
+import datetime
+import hashlib
+import os
+import time
+from unittest.mock import Mock, call, patch
 
-from statikos import statikos, utils
-from statikos.exceptions import ConfigNotFound
+from statikos import (
+    api, compress, diff, fingerprint, hashing, images, journal, manifest,
+    minify, serve, sync, template, utils, validation, watch
+)
+from statikos import __version__
+from statikos.exceptions import (
+    ConfigNotFound, SourceNotFound, TemplateTooLarge, TemplateValidationError
+)
 from statikos.statikos import Statikos
 
 from .base import BaseTestCase
@@ -14,9 +24,20 @@ class StatikosTestCase(BaseTestCase):
     def setUp(self):
         super(StatikosTestCase, self).setUp()
         self.mock_cfn = Mock()
-        self.mock_cloudformation = patch.object(statikos,
+        self.mock_cfn.NEW_STACK_STATUSES = [None, 'REVIEW_IN_PROGRESS']
+        self.mock_cfn.MAX_TEMPLATE_BODY = 51200
+        self.mock_cfn.describe.return_value = {
+            'id': 'stack_id',
+            'status': 'CREATE_COMPLETE',
+            'outputs': {},
+            'resources': {'CloudFrontDistribution': 'distribution_id'}
+        }
+        self.mock_cloudformation = patch.object(api,
                                                 'CloudFormation').start()
         self.mock_cloudformation.return_value = self.mock_cfn
+        self.mock_cf = Mock()
+        self.mock_cloudfront = patch.object(api, 'CloudFront').start()
+        self.mock_cloudfront.return_value = self.mock_cf
 
         self.mock_touch = patch.object(utils, 'touch').start()
         self.mock_mkdir = patch.object(utils, 'mkdir').start()
@@ -25,7 +46,14 @@ class StatikosTestCase(BaseTestCase):
                                                  'write_json_file').start()
 
         self.mock_read_file = patch.object(utils, 'read_file').start()
-        self.mock_read_file.return_value = {}
+        self.mock_read_file.return_value = 'stack_name: stack_name'
+        self.fingerprint = hashlib.sha256(
+            (__version__ + 'stack_name: stack_name').encode()
+        ).hexdigest()
+
+        self.mock_read_json_file = patch.object(utils,
+                                                'read_json_file').start()
+        self.mock_read_json_file.side_effect = FileNotFoundError
 
         self.mock_write_file = patch.object(utils, 'write_file').start()
 
@@ -34,7 +62,7 @@ class StatikosTestCase(BaseTestCase):
         self.mock_read_yaml_file.return_value = {}
 
         self.mock_template = Mock()
-        self.mock_create_template = patch.object(statikos,
+        self.mock_create_template = patch.object(template,
                                                  'create_template').start()
         self.mock_create_template.return_value = self.mock_template
 
@@ -48,15 +76,72 @@ class StatikosTestCase(BaseTestCase):
         self.patch_create = patch.object(Statikos, 'create')
         self.mock_create = self.patch_create.start()
 
+        self.patch_validate_template = \
+            patch.object(Statikos, 'validate_template')
+        self.mock_validate_template = self.patch_validate_template.start()
+
     def test_init(self):
         kwargs = {'a': 1, 'b': 2, 'c': 3}
         s = Statikos(**kwargs)
         self.assertEqual(1, s.a)
         self.assertEqual(2, s.b)
         self.assertEqual(3, s.c)
-        self.mock_cloudformation.assert_called_once()
+        self.mock_cloudformation.assert_not_called()
         self.mock_get_config.assert_called_once()
 
+    def test_cfn(self):
+        s = Statikos()
+        self.assertEqual(self.mock_cfn, s.cfn)
+        self.assertEqual(self.mock_cfn, s.cfn)
+        self.mock_cloudformation.assert_called_once()
+
+    def test_cfn_limiter(self):
+        limiter = Mock()
+        s = Statikos(limiters={'cloudformation': limiter})
+        s.cfn
+        self.mock_cloudformation.assert_called_once_with(
+            profile=None,
+            limiter=limiter,
+            max_pool_connections=None,
+            config={},
+            tracer=None
+        )
+
+    def test_aws(self):
+        self.mock_get_config.return_value = {
+            'aws': {
+                'profile': 'profile',
+                'max_pool_connections': 16,
+                'read_timeout': 5,
+            }
+        }
+        s = Statikos(max_pool_connections={'s3': 64, 'cloudfront': 4})
+        self.assertEqual({
+            'profile': 'profile',
+            'limiter': None,
+            'max_pool_connections': 64,
+            'config': {'read_timeout': 5},
+            'tracer': None,
+        }, s._aws('s3', max_pool_connections=8))
+        self.assertEqual(16, s._aws('cloudfront', max_pool_connections=8)[
+            'max_pool_connections'])
+
+    def test_root(self):
+        s = Statikos(root='sites/a')
+        self.patch_get_config.stop()
+        self.patch_configure.stop()
+        s._get_config()
+        self.mock_read_yaml_file.assert_called_with('sites/a/statikos.yml')
+        s._configure()
+        self.mock_touch.assert_called_once_with(
+            'sites/a/.statikos/cloudformation.json'
+        )
+        self.assertEqual('sites/a/build', s._source())
+        s._set_state(a=1)
+        self.mock_write_json_file.assert_called_with(
+            {'a': 1}, 'sites/a/.statikos/state.json', sort_keys=True
+        )
+
     def test_get_config(self):
         s = Statikos()
         self.patch_get_config.stop()
@@ -81,9 +166,70 @@ class StatikosTestCase(BaseTestCase):
             ('.statikos/cloudformation.json')
         )
 
+    def test_fingerprint(self):
+        s = Statikos()
+        self.assertEqual(self.fingerprint, s.fingerprint)
+        self.mock_read_file.assert_called_with('statikos.yml')
+
+    def test_get_state(self):
+        s = Statikos()
+        self.assertEqual({}, s._get_state())
+        self.mock_read_json_file.side_effect = None
+        self.mock_read_json_file.return_value = {'a': 1}
+        self.assertEqual({'a': 1}, s._get_state())
+        self.mock_read_json_file.assert_called_with('.statikos/state.json')
+
+    def test_set_state(self):
+        self.mock_read_json_file.side_effect = None
+        self.mock_read_json_file.return_value = {'a': 1}
+        s = Statikos()
+        s._set_state(b=2)
+        self.mock_mkdir.assert_called_once_with('.statikos')
+        self.mock_write_json_file.assert_called_once_with({
+            'a': 1,
+            'b': 2
+        }, '.statikos/state.json', sort_keys=True)
+
+    def test_is_deployed_state(self):
+        self.mock_read_json_file.side_effect = None
+        self.mock_read_json_file.return_value = {
+            'fingerprint': self.fingerprint
+        }
+        s = Statikos()
+        self.assertTrue(s.is_deployed())
+        self.mock_read_json_file.return_value = {'fingerprint': 'other'}
+        self.assertFalse(s.is_deployed())
+        self.mock_cfn.get_template.assert_not_called()
+
+    def test_is_deployed_template(self):
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.get_template.return_value = {
+            'Metadata': {
+                'Statikos': {
+                    'Fingerprint': self.fingerprint
+                }
+            }
+        }
+        s = Statikos()
+        self.assertTrue(s.is_deployed())
+        self.mock_cfn.get_template.assert_called_once_with('stack_name')
+        self.mock_write_json_file.assert_called_once_with(
+            {'fingerprint': self.fingerprint},
+            '.statikos/state.json',
+            sort_keys=True
+        )
+
+    def test_is_deployed_template_changed(self):
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.get_template.return_value = None
+        s = Statikos()
+        self.assertFalse(s.is_deployed())
+        self.mock_write_json_file.assert_not_called()
+
     def test_create(self):
         self.patch_create.stop()
         self.mock_get_config.return_value = {'a': 1, 'b': 2, 'c': 3}
+        self.mock_template.to_dict.return_value = {'Resources': {}}
         s = Statikos()
         s.create()
         self.mock_configure.assert_called_once()
@@ -94,22 +240,787 @@ class StatikosTestCase(BaseTestCase):
                 'c': 3
             }
         )
+        self.mock_write_json_file.assert_called_once_with({
+            'Resources': {},
+            'Metadata': {
+                'Statikos': {
+                    'Fingerprint': self.fingerprint,
+                    'Version': __version__
+                }
+            }
+        }, '.statikos/cloudformation.json', compact=True, sort_keys=True)
+
+    def test_stack_state(self):
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        patch.object(time, 'time', return_value=1000.0).start()
+        s = Statikos()
+        stack = s.stack_state()
+        self.assertEqual('CREATE_COMPLETE', stack['status'])
+        self.assertEqual('stack_name', stack['name'])
+        self.assertEqual(1000.0, stack['refreshed'])
         self.mock_write_json_file.assert_called_once_with(
-            self.mock_template.to_dict(), '.statikos/cloudformation.json'
+            {'stack': stack}, '.statikos/state.json', sort_keys=True
         )
 
-    def test_deploy(self):
+    def test_stack_state_cached(self):
         self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_read_json_file.side_effect = lambda filename: {
+            'stack': {'name': 'stack_name', 'refreshed': 1000.0}
+        }
+        mock_time = patch.object(time, 'time', return_value=1000.0).start()
         s = Statikos()
+        self.assertEqual(1000.0, s.stack_state()['refreshed'])
+        self.mock_cfn.describe.assert_not_called()
+        s.stack_state(refresh=True)
+        self.assertEqual(1, self.mock_cfn.describe.call_count)
+        mock_time.return_value = 1000.0 + Statikos.STATE_TTL
+        s.stack_state()
+        self.assertEqual(2, self.mock_cfn.describe.call_count)
+        mock_time.return_value = 1000.0
+        s.config['state'] = {'ttl': 0}
+        s.stack_state()
+        self.assertEqual(3, self.mock_cfn.describe.call_count)
+        s.config = {'stack_name': 'other'}
+        s.stack_state()
+        self.mock_cfn.describe.assert_called_with('other')
+
+    def test_state(self):
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_read_json_file.side_effect = \
+            lambda filename: {'fingerprint': 'abc'}
+        s = Statikos()
+        self.assertEqual({'fingerprint': 'abc'}, s.state(refresh=True))
+        self.mock_cfn.describe.assert_called_once_with('stack_name')
+
+    def test_deploy(self):
+        patch.object(Statikos, 'is_deployed', return_value=False).start()
+        mock_sync = patch.object(Statikos, 'sync').start()
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.deploy.return_value = {
+            'StackName': 'stack_name',
+            'Executed': True,
+            'Changes': [{
+                'Action': 'Modify',
+                'LogicalResourceId': 'CloudFrontDistribution',
+                'ResourceType': 'AWS::CloudFront::Distribution',
+                'Replacement': 'True'
+            }]
+        }
+        echo = Mock()
+        s = Statikos(echo=echo)
         s.deploy()
+        echo.assert_has_calls([
+            call('Deployed stack `stack_name` (1 change(s)):'),
+            call(
+                '  Modify CloudFrontDistribution '
+                '(AWS::CloudFront::Distribution) (replacement)'
+            ),
+        ])
         self.mock_create.assert_called_once()
         self.mock_cfn.deploy.assert_called_once_with(
             stack_name='stack_name',
-            template_file='.statikos/cloudformation.json'
+            template_file='.statikos/cloudformation.json',
+            callback=s._echo_event,
+            change_set_type='UPDATE',
+            template_url=None,
+            validate=False
+        )
+        template_hash = hashlib.sha256(b'stack_name: stack_name').hexdigest()
+        self.mock_validate_template.assert_called_once_with(
+            b'stack_name: stack_name', template_hash
+        )
+        self.mock_write_json_file.assert_called_with({
+            'fingerprint': self.fingerprint,
+            'template_hash': template_hash,
+            'stack': None
+        }, '.statikos/state.json', sort_keys=True)
+        self.mock_write_file.assert_called_once_with(
+            'stack_name: stack_name', '.statikos/deployed.json'
         )
+        mock_sync.assert_not_called()
+
+    def test_deploy_staged_template(self):
+        patch.object(Statikos, 'is_deployed', return_value=False).start()
+        mock_stage = patch.object(Statikos, 'stage_template').start()
+        mock_stage.return_value = 'https://url'
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.deploy.return_value = {
+            'StackName': 'stack_name',
+            'Executed': False,
+            'Changes': []
+        }
+        Statikos().deploy()
+        mock_stage.assert_called_once_with(b'stack_name: stack_name')
+        self.assertEqual(
+            'https://url', self.mock_cfn.deploy.call_args[1]['template_url']
+        )
+
+    def test_deploy_validate(self):
+        patch.object(Statikos, 'is_deployed', return_value=False).start()
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.deploy.return_value = {
+            'StackName': 'stack_name',
+            'Executed': False,
+            'Changes': []
+        }
+        Statikos().deploy(validate=True)
+        self.assertTrue(self.mock_cfn.deploy.call_args[1]['validate'])
+
+    def test_deploy_invalid_template(self):
+        patch.object(Statikos, 'is_deployed', return_value=False).start()
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_validate_template.side_effect = TemplateValidationError(
+            errors='  Resources: at least one resource is required'
+        )
+        with self.assertRaises(TemplateValidationError):
+            Statikos().deploy()
+        self.mock_cfn.deploy.assert_not_called()
+
+    def test_validate_template(self):
+        self.patch_validate_template.stop()
+        body = b'{"Resources": {"S3BucketRoot": {"Type": "AWS::S3::Bucket"}}}'
+        template_hash = hashlib.sha256(body).hexdigest()
+        s = Statikos()
+        s.validate_template(body)
+        self.mock_write_json_file.assert_called_once_with({
+            'validated': {
+                'spec': validation.spec_version(),
+                'template_hash': template_hash,
+            }
+        }, '.statikos/state.json', sort_keys=True)
+
+    def test_validate_template_cached(self):
+        self.patch_validate_template.stop()
+        self.mock_read_json_file.side_effect = None
+        self.mock_read_json_file.return_value = {
+            'validated': {
+                'spec': validation.spec_version(),
+                'template_hash': 'hash',
+            }
+        }
+        mock_validate = patch.object(validation, 'validate').start()
+        Statikos().validate_template(b'{}', 'hash')
+        mock_validate.assert_not_called()
+        self.mock_write_json_file.assert_not_called()
+
+    def test_validate_template_invalid(self):
+        self.patch_validate_template.stop()
+        s = Statikos()
+        with self.assertRaises(TemplateValidationError) as e:
+            s.validate_template(b'{"Resources": {}}')
+        self.assertIn('at least one resource is required', e.exception.msg)
+        self.mock_write_json_file.assert_not_called()
+
+    def test_stage_template(self):
+        mock_s3 = patch.object(api, 'S3').start()
+        s = Statikos()
+        self.assertIsNone(s.stage_template(b'{}'))
+        mock_s3.assert_not_called()
+
+    def test_stage_template_too_large(self):
+        mock_s3 = patch.object(api, 'S3').start()
+        s = Statikos()
+        with self.assertRaises(TemplateTooLarge) as e:
+            s.stage_template(b' ' * 51201)
+        self.assertIn('51201 bytes', e.exception.msg)
+        mock_s3.assert_not_called()
+
+    def test_stage_template_upload(self):
+        mock_s3 = patch.object(api, 'S3').start()
+        s3 = mock_s3.return_value
+        s3.object_exists.return_value = False
+        s3.object_url.return_value = 'https://url'
+        self.mock_get_config.return_value = {
+            'staging': {'bucket': 'staging', 'prefix': 'templates/'}
+        }
+        body = b' ' * 51201
+        key = f'templates/{hashlib.sha256(body).hexdigest()}.json'
+        s = Statikos()
+        self.assertEqual('https://url', s.stage_template(body))
+        s3.object_exists.assert_called_once_with('staging', key)
+        s3.put_object.assert_called_once_with(
+            'staging', key, body, headers={'ContentType': 'application/json'}
+        )
+        s3.object_url.assert_called_once_with('staging', key)
+        s3.reset_mock()
+        s3.object_exists.return_value = True
+        s.config['staging'] = {'bucket': 'staging'}
+        s.stage_template(body)
+        s3.put_object.assert_not_called()
+        s3.object_url.assert_called_once_with(
+            'staging', f'statikos/{hashlib.sha256(body).hexdigest()}.json'
+        )
+
+    def test_deploy_new_stack(self):
+        patch.object(Statikos, 'is_deployed', return_value=False).start()
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.describe.return_value['status'] = None
+        self.mock_cfn.deploy.return_value = {
+            'StackName': 'stack_name',
+            'Executed': True,
+            'Changes': []
+        }
+        Statikos().deploy()
+        self.assertEqual(
+            'CREATE', self.mock_cfn.deploy.call_args[1]['change_set_type']
+        )
+
+    def test_deploy_failed(self):
+        patch.object(Statikos, 'is_deployed', return_value=False).start()
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.deploy.side_effect = RuntimeError
+        with self.assertRaises(RuntimeError):
+            Statikos().deploy()
+        self.mock_write_json_file.assert_called_with(
+            {'stack': None}, '.statikos/state.json', sort_keys=True
+        )
+
+    def test_deploy_unchanged(self):
+        patch.object(Statikos, 'is_deployed', return_value=True).start()
+        patch.object(os.path, 'isdir', return_value=True).start()
+        mock_sync = patch.object(Statikos, 'sync').start()
+        mock_sync.return_value = 'Uploaded 1 file(s)'
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        echo = Mock()
+        s = Statikos(echo=echo)
+        s.deploy()
+        self.mock_create.assert_not_called()
+        self.mock_cloudformation.assert_not_called()
+        mock_sync.assert_called_once_with(wait=None)
+        echo.assert_has_calls([
+            call('Stack `stack_name` is up to date.'),
+            call('Uploaded 1 file(s)'),
+        ])
+
+    def test_deploy_force(self):
+        mock_is_deployed = patch.object(Statikos, 'is_deployed').start()
+        patch.object(Statikos, 'sync').start()
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.deploy.return_value = {
+            'StackName': 'stack_name',
+            'Executed': False,
+            'Changes': []
+        }
+        echo = Mock()
+        s = Statikos(echo=echo)
+        s.deploy(force=True)
+        mock_is_deployed.assert_not_called()
+        self.mock_cfn.deploy.assert_called_once()
+        echo.assert_called_once_with('Stack `stack_name` is up to date.')
+        self.assertNotIn('stack', self.mock_write_json_file.call_args[0][0])
+
+    def test_echo_event(self):
+        echo = Mock()
+        s = Statikos(echo=echo)
+        event = {
+            'Timestamp': datetime.datetime(2019, 10, 1, 12, 0, 1),
+            'ResourceStatus': 'CREATE_IN_PROGRESS',
+            'ResourceType': 'AWS::S3::Bucket',
+            'LogicalResourceId': 'S3BucketRoot',
+        }
+        s._echo_event(event)
+        echo.assert_called_with(
+            '12:00:01 CREATE_IN_PROGRESS   AWS::S3::Bucket  S3BucketRoot'
+        )
+        event['ResourceStatusReason'] = 'Resource creation Initiated'
+        s._echo_event(event)
+        echo.assert_called_with(
+            '12:00:01 CREATE_IN_PROGRESS   AWS::S3::Bucket  S3BucketRoot  '
+            'Resource creation Initiated'
+        )
+
+    def test_echo_without_echo(self):
+        Statikos()._echo('message')
 
     def test_remove(self):
+        mock_remove = patch('os.remove').start()
         self.mock_get_config.return_value = {'stack_name': 'stack_name'}
         s = Statikos()
         s.remove()
-        self.mock_cfn.delete.assert_called_once_with(stack_name='stack_name')
+        mock_remove.assert_called_once_with('.statikos/deployed.json')
+        self.mock_cfn.delete.assert_called_once_with(
+            stack_name='stack_name', callback=s._echo_event
+        )
+        self.mock_write_json_file.assert_called_once_with(
+            {'fingerprint': None, 'stack': None},
+            '.statikos/state.json',
+            sort_keys=True
+        )
+
+    def test_plan(self):
+        mock_plan_stack = patch.object(Statikos, 'plan_stack').start()
+        mock_plan_stack.return_value = [
+            diff.ResourceChange(
+                'Add', 'CloudFrontFunctionIndex', 'AWS::CloudFront::Function',
+                []
+            ),
+            diff.ResourceChange(
+                'Modify', 'CloudFrontDistribution',
+                'AWS::CloudFront::Distribution',
+                ['Properties/DistributionConfig/PriceClass']
+            ),
+        ]
+        mock_plan_content = patch.object(Statikos, 'plan_content').start()
+        plan = manifest.Plan()
+        plan.upload = [sync.LocalFile('index.html', 'build/index.html', 1,
+                                      'md5', 'md5')]
+        plan.delete = ['old.html']
+        mock_plan_content.return_value = plan
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        echo = Mock()
+        s = Statikos(echo=echo)
+        self.assertEqual(
+            (mock_plan_stack.return_value, plan),
+            s.plan(source='public', offline=True)
+        )
+        mock_plan_stack.assert_called_once_with(offline=True)
+        mock_plan_content.assert_called_once_with(source='public')
+        self.assertEqual([
+            call('Stack `stack_name`: 2 change(s):'),
+            call('  Add CloudFrontFunctionIndex (AWS::CloudFront::Function)'),
+            call(
+                '  Modify CloudFrontDistribution '
+                '(AWS::CloudFront::Distribution)'
+            ),
+            call('    Properties/DistributionConfig/PriceClass'),
+            call('Content: 1 to upload, 1 to delete, 0 unchanged'),
+            call('  + index.html'),
+            call('  - old.html'),
+        ], echo.call_args_list)
+
+    def test_plan_unknown(self):
+        patch.object(Statikos, 'plan_stack', return_value=None).start()
+        patch.object(Statikos, 'plan_content', return_value=None).start()
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        echo = Mock()
+        Statikos(echo=echo).plan()
+        self.assertEqual([
+            call('Stack `stack_name`: the deployed template is unknown.'),
+            call('Content: the source directory does not exist.'),
+        ], echo.call_args_list)
+
+    def test_plan_stack_unchanged(self):
+        self.mock_read_json_file.side_effect = None
+        self.mock_read_json_file.return_value = {
+            'fingerprint': self.fingerprint
+        }
+        s = Statikos()
+        self.assertEqual([], s.plan_stack())
+        self.mock_cloudformation.assert_not_called()
+        self.mock_create_template.assert_not_called()
+
+    def test_plan_stack(self):
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.get_template.return_value = {
+            'Resources': {
+                'S3BucketRoot': {'Type': 'AWS::S3::Bucket'},
+                'S3BucketLogs': {'Type': 'AWS::S3::Bucket'},
+            }
+        }
+        self.mock_template.to_dict.return_value = {
+            'Resources': {
+                'S3BucketRoot': {
+                    'Type': 'AWS::S3::Bucket',
+                    'DeletionPolicy': 'Retain'
+                },
+            }
+        }
+        s = Statikos()
+        self.assertEqual([
+            diff.ResourceChange(
+                'Remove', 'S3BucketLogs', 'AWS::S3::Bucket', []
+            ),
+            diff.ResourceChange(
+                'Modify', 'S3BucketRoot', 'AWS::S3::Bucket', ['DeletionPolicy']
+            ),
+        ], s.plan_stack())
+        self.mock_cfn.get_template.assert_called_once_with('stack_name')
+
+    def test_plan_stack_offline(self):
+        deployed = {'Resources': {'S3BucketRoot': {'Type': 'AWS::S3::Bucket'}}}
+
+        def read_json_file(filename):
+            if filename == '.statikos/deployed.json':
+                return deployed
+            raise FileNotFoundError
+
+        self.mock_read_json_file.side_effect = read_json_file
+        self.mock_template.to_dict.return_value = {
+            'Resources': {'S3BucketRoot': {'Type': 'AWS::S3::Bucket'}}
+        }
+        s = Statikos()
+        self.assertEqual([], s.plan_stack(offline=True))
+        self.mock_create_template.assert_called_once()
+        self.mock_read_json_file.side_effect = FileNotFoundError
+        self.assertIsNone(s.plan_stack(offline=True))
+        self.mock_cloudformation.assert_not_called()
+
+    def test_plan_content(self):
+        mock_s3 = patch.object(api, 'S3').start()
+        mock_sync = patch.object(sync, 'Sync').start()
+        mock_load = patch.object(manifest.Manifest, 'load').start()
+        mock_load.return_value.stale = True
+        mock_hash_cache = patch.object(hashing.HashCache, 'load').start()
+        mock_journal = patch.object(journal.Journal, 'load').start()
+        mock_stages = patch.object(
+            Statikos, '_sync_stages', return_value=[]
+        ).start()
+        patch('os.path.isdir', return_value=True).start()
+        self.mock_get_config.return_value = {
+            'stack_name': 'stack_name',
+            'sync': {'processes': 2, 'delete': False}
+        }
+        echo = Mock()
+        s = Statikos(echo=echo)
+        self.assertEqual(
+            mock_sync.return_value.plan.return_value, s.plan_content()
+        )
+        mock_s3.assert_not_called()
+        # The stages and the hash cache work on a scratch mirror of the
+        # caches, which is gone once the plan is made.
+        cache_dir = mock_stages.call_args[1]['cache_dir']
+        self.assertNotEqual(s._path(Statikos.CACHE_DIR), cache_dir)
+        self.assertFalse(os.path.exists(cache_dir))
+        mock_stages.assert_called_once_with(processes=2, cache_dir=cache_dir)
+        self.assertEqual(
+            os.path.join(os.path.dirname(cache_dir), 'hashes.json'),
+            mock_hash_cache.return_value.filename
+        )
+        mock_sync.assert_called_once_with(
+            None,
+            'stack_name-root',
+            'build',
+            mock_load.return_value,
+            mock_hash_cache.return_value,
+            processes=2,
+            delete=False,
+            stages=[],
+            tracer=None,
+            journal=mock_journal.return_value
+        )
+        mock_sync.return_value.plan.assert_called_once_with()
+        echo.assert_called_once()
+        self.assertIn('assumed to be empty', echo.call_args[0][0])
+
+    def test_plan_content_no_source(self):
+        mock_sync = patch.object(sync, 'Sync').start()
+        patch('os.path.isdir', return_value=False).start()
+        self.assertIsNone(Statikos().plan_content(source='public'))
+        mock_sync.assert_not_called()
+
+    def test_bucket_name(self):
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        s = Statikos()
+        self.assertEqual('stack_name-root', s.bucket_name)
+
+    def test_sync(self):
+        mock_s3 = patch.object(api, 'S3').start()
+        mock_sync = patch.object(sync, 'Sync').start()
+        mock_sync.DEFAULT_WORKERS = 32
+        mock_load = patch.object(manifest.Manifest, 'load').start()
+        mock_hash_cache = patch.object(hashing.HashCache, 'load').start()
+        mock_journal = patch.object(journal.Journal, 'load').start()
+        mock_sync.return_value.run.return_value.changed = []
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        s = Statikos()
+        result = s.sync()
+        mock_load.assert_called_once_with(
+            '.statikos/manifest.json', 'stack_name-root'
+        )
+        mock_s3.assert_called_once_with(
+            profile=None,
+            limiter=None,
+            max_pool_connections=32,
+            config={},
+            tracer=None
+        )
+        mock_sync.assert_called_once_with(
+            mock_s3.return_value,
+            'stack_name-root',
+            'build',
+            mock_load.return_value,
+            mock_hash_cache.return_value,
+            workers=32,
+            processes=None,
+            delete=True,
+            stages=[],
+            tracer=None,
+            journal=mock_journal.return_value
+        )
+        mock_hash_cache.assert_called_once_with('.statikos/hashes.json')
+        mock_journal.assert_called_once_with(
+            '.statikos/journal.jsonl', 'stack_name-root'
+        )
+        self.assertEqual(mock_sync.return_value.run.return_value, result)
+
+    def test_sync_invalidate(self):
+        patch.object(api, 'S3').start()
+        mock_sync = patch.object(sync, 'Sync').start()
+        patch.object(manifest.Manifest, 'load').start()
+        patch.object(hashing.HashCache, 'load').start()
+        mock_invalidate = patch.object(Statikos, 'invalidate').start()
+        mock_invalidate.return_value = ['/index.html']
+        result = mock_sync.return_value.run.return_value
+        result.changed = ['index.html']
+        self.mock_get_config.return_value = {
+            'stack_name': 'stack_name',
+            'invalidation': {'wait': True}
+        }
+        s = Statikos()
+        self.assertEqual(['/index.html'], s.sync().invalidated)
+        mock_invalidate.assert_called_once_with(['index.html'], wait=True)
+        mock_invalidate.reset_mock()
+        s.sync(wait=False)
+        mock_invalidate.assert_called_once_with(['index.html'], wait=False)
+        mock_invalidate.reset_mock()
+        s.config['invalidation'] = {'enabled': False}
+        s.sync()
+        mock_invalidate.assert_not_called()
+
+    def test_watch(self):
+        patch.object(api, 'S3').start()
+        mock_sync = patch.object(sync, 'Sync').start()
+        mock_sync.DEFAULT_WORKERS = 32
+        mock_sync.return_value.source = 'public'
+        patch.object(manifest.Manifest, 'load').start()
+        patch.object(hashing.HashCache, 'load').start()
+        patch.object(journal.Journal, 'load').start()
+        mock_watcher = patch.object(watch, 'Watcher').start()
+        self.mock_get_config.return_value = {
+            'stack_name': 'stack_name',
+            'watch': {
+                'debounce': 1,
+                'max_delay': 10,
+                'invalidation_interval': 60
+            }
+        }
+        echo = Mock()
+        s = Statikos(echo=echo)
+        s.watch(source='public', workers=8)
+        self.assertEqual('public', mock_sync.call_args[0][2])
+        self.assertEqual(8, mock_sync.call_args[1]['workers'])
+        mock_watcher.assert_called_once_with(
+            mock_sync.return_value,
+            debounce=1,
+            max_delay=10,
+            invalidate=s.invalidate,
+            invalidation_interval=60,
+            echo=s._echo
+        )
+        mock_watcher.return_value.run.assert_called_once_with()
+        echo.assert_called_once_with('Watching public for changes...')
+        s.config['invalidation'] = {'enabled': False}
+        s.watch()
+        self.assertIs(None, mock_watcher.call_args[1]['invalidate'])
+
+    def test_invalidate(self):
+        self.mock_get_config.return_value = {
+            'stack_name': 'stack_name',
+            'invalidation': {'max_paths': 2}
+        }
+        self.mock_cf.create_invalidation.return_value = 'invalidation_id'
+        s = Statikos()
+        paths = s.invalidate(['blog/index.html', 'blog/a.html', 'about.html'])
+        self.assertEqual(['/about.html', '/blog/*'], paths)
+        self.mock_cfn.describe.assert_called_once_with('stack_name')
+        self.mock_cf.create_invalidation.assert_called_once_with(
+            'distribution_id', paths
+        )
+        self.mock_cf.wait_for_invalidation.assert_not_called()
+
+    def test_invalidate_wait(self):
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cf.create_invalidation.return_value = 'invalidation_id'
+        s = Statikos()
+        self.assertEqual(
+            ['/', '/index.html'], s.invalidate(['index.html'], wait=True)
+        )
+        self.mock_cf.wait_for_invalidation.assert_called_once_with(
+            'distribution_id', 'invalidation_id'
+        )
+
+    def test_invalidate_no_distribution(self):
+        self.mock_get_config.return_value = {'stack_name': 'stack_name'}
+        self.mock_cfn.describe.return_value['resources'] = {}
+        s = Statikos()
+        self.assertEqual([], s.invalidate(['index.html']))
+        self.mock_cf.create_invalidation.assert_not_called()
+
+    def test_sync_settings(self):
+        mock_s3 = patch.object(api, 'S3').start()
+        mock_sync = patch.object(sync, 'Sync').start()
+        mock_load = patch.object(manifest.Manifest, 'load').start()
+        mock_load.return_value.stale = False
+        mock_hash_cache = patch.object(hashing.HashCache, 'load').start()
+        mock_journal = patch.object(journal.Journal, 'load').start()
+        mock_sync.return_value.run.return_value.changed = []
+        self.mock_get_config.return_value = {
+            'stack_name': 'stack_name',
+            'sync': {
+                'source': 'public',
+                'workers': 8,
+                'processes': 4,
+                'delete': False
+            }
+        }
+        s = Statikos()
+        s.sync(refresh=True)
+        self.assertTrue(mock_load.return_value.stale)
+        mock_s3.assert_called_once_with(
+            profile=None,
+            limiter=None,
+            max_pool_connections=8,
+            config={},
+            tracer=None
+        )
+        mock_sync.assert_called_once_with(
+            mock_s3.return_value,
+            'stack_name-root',
+            'public',
+            mock_load.return_value,
+            mock_hash_cache.return_value,
+            workers=8,
+            processes=4,
+            delete=False,
+            stages=[],
+            tracer=None,
+            journal=mock_journal.return_value
+        )
+
+    def test_serve(self):
+        mock_scan = patch.object(sync, 'scan').start()
+        mock_scan.return_value = ['file']
+        mock_hash_cache = patch.object(hashing.HashCache, 'load').start()
+        mock_routes = patch.object(serve, 'routes').start()
+        mock_server = patch.object(serve, 'Server').start()
+        mock_run = patch('asyncio.run').start()
+        patch('os.path.isdir', return_value=True).start()
+        mock_fingerprint = Mock(return_value=['fingerprinted'])
+        mock_compress = Mock(return_value=['compressed'])
+        mock_sync_stages = patch.object(
+            Statikos,
+            '_sync_stages',
+            return_value=[mock_fingerprint, mock_compress]
+        ).start()
+        self.mock_get_config.return_value = {'compression': None}
+        echo = Mock()
+        s = Statikos(echo=echo)
+        s.serve(port=0)
+        mock_scan.assert_called_once_with(
+            'build', mock_hash_cache.return_value, processes=None
+        )
+        mock_sync_stages.assert_called_once_with(
+            processes=None, siblings=True
+        )
+        mock_fingerprint.assert_called_once_with(['file'])
+        mock_compress.assert_called_once_with(['fingerprinted'])
+        mock_routes.assert_called_once_with(['fingerprinted'], ['compressed'])
+        mock_server.assert_called_once_with(mock_routes.return_value)
+        mock_run.assert_called_once_with(
+            mock_server.return_value.serve_forever.return_value
+        )
+        args, kwargs = mock_server.return_value.serve_forever.call_args
+        self.assertEqual(('127.0.0.1', 0), args)
+        kwargs['callback']('http://127.0.0.1:8000/')
+        echo.assert_called_once_with(
+            'Serving build at http://127.0.0.1:8000/'
+        )
+
+    def test_serve_source_not_found(self):
+        s = Statikos()
+        with self.assertRaises(SourceNotFound):
+            s.serve(source='missing')
+
+    def test_sync_stages(self):
+        s = Statikos()
+        self.assertEqual([], s._sync_stages())
+
+    def test_sync_stages_compression(self):
+        mock_compress = patch.object(compress, 'Compress').start()
+        self.mock_get_config.return_value = {
+            'compression': {
+                'encodings': ['gzip', 'br'],
+                'min_size': 0
+            }
+        }
+        s = Statikos()
+        self.assertEqual([mock_compress.return_value], s._sync_stages(2))
+        mock_compress.assert_called_once_with(
+            '.statikos/cache/compressed',
+            encodings=['gzip', 'br'],
+            extensions=None,
+            min_size=0,
+            max_ratio=None,
+            processes=2,
+            siblings=False
+        )
+
+    def test_sync_stages_images(self):
+        mock_images = patch.object(images, 'Images').start()
+        mock_fingerprint = patch.object(fingerprint, 'Fingerprint').start()
+        self.mock_get_config.return_value = {
+            'images': {
+                'widths': [640],
+                'webp': False
+            },
+            'fingerprint': None
+        }
+        s = Statikos()
+        self.assertEqual(
+            [mock_images.return_value, mock_fingerprint.return_value],
+            s._sync_stages(4)
+        )
+        mock_images.assert_called_once_with(
+            '.statikos/cache/images',
+            widths=[640],
+            max_width=None,
+            quality=None,
+            webp=False,
+            webp_quality=None,
+            extensions=None,
+            processes=4
+        )
+
+    def test_sync_stages_minify(self):
+        mock_images = patch.object(images, 'Images').start()
+        mock_minify = patch.object(minify, 'Minify').start()
+        mock_fingerprint = patch.object(fingerprint, 'Fingerprint').start()
+        self.mock_get_config.return_value = {
+            'images': None,
+            'minify': {
+                'transforms': {'.svg': 'example.minifiers:SVGMinifier'}
+            },
+            'fingerprint': None
+        }
+        s = Statikos()
+        self.assertEqual([
+            mock_images.return_value, mock_minify.return_value,
+            mock_fingerprint.return_value
+        ], s._sync_stages(2))
+        mock_minify.assert_called_once_with(
+            '.statikos/cache/minified',
+            transforms={'.svg': 'example.minifiers:SVGMinifier'},
+            processes=2
+        )
+
+    def test_sync_stages_fingerprint(self):
+        mock_fingerprint = patch.object(fingerprint, 'Fingerprint').start()
+        mock_compress = patch.object(compress, 'Compress').start()
+        self.mock_get_config.return_value = {
+            'fingerprint': {
+                'exclude': ['favicon.*']
+            },
+            'compression': None
+        }
+        s = Statikos()
+        self.assertEqual(
+            [mock_fingerprint.return_value, mock_compress.return_value],
+            s._sync_stages()
+        )
+        mock_fingerprint.assert_called_once_with(
+            '.statikos/cache/fingerprinted',
+            extensions=None,
+            exclude=['favicon.*'],
+            html_cache_control=None,
+            processes=None
+        )
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `sync` module."""
+
+import os
+import tempfile
+from unittest.mock import Mock
+
+from statikos import hashing, sync
+from statikos.exceptions import SourceNotFound, SyncFailed, UploadNotFound
+from statikos.hashing import HashCache
+from statikos.journal import Journal
+from statikos.manifest import Manifest, headers_digest
+from statikos.sync import FileChunk, Sync, SyncResult
+from statikos.trace import Tracer
+
+from .base import BaseTestCase
+
+
+def make_tree(root, files):
+    for name, data in files.items():
+        path = os.path.join(root, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+class SyncFunctionsTestCase(BaseTestCase):
+    def setUp(self):
+        super(SyncFunctionsTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = self.tmp.name
+
+    def test_walk(self):
+        make_tree(self.source, {
+            'index.html': b'',
+            'css/site.css': b'',
+            'a/b/c.txt': b'',
+        })
+        keys = sorted(key for _, key in sync.walk(self.source))
+        self.assertEqual(['a/b/c.txt', 'css/site.css', 'index.html'], keys)
+
+    def test_content_type(self):
+        self.assertEqual('text/html', sync.content_type('index.html'))
+        self.assertEqual('text/css', sync.content_type('css/site.css'))
+        self.assertEqual(
+            'application/octet-stream', sync.content_type('file.unknown')
+        )
+
+    def test_parts(self):
+        self.assertEqual([], sync.parts(0, 4))
+        self.assertEqual([(1, 0, 4)], sync.parts(4, 4))
+        self.assertEqual(
+            [(1, 0, 4), (2, 4, 4), (3, 8, 2)], sync.parts(10, 4)
+        )
+
+    def test_file_chunk(self):
+        make_tree(self.source, {'video.mp4': b'0123456789'})
+        path = os.path.join(self.source, 'video.mp4')
+        with FileChunk(path, 4, 4) as chunk:
+            self.assertEqual(4, len(chunk))
+            self.assertEqual(b'45', chunk.read(2))
+            self.assertEqual(2, chunk.tell())
+            self.assertEqual(b'67', chunk.read())
+            self.assertEqual(b'', chunk.read(1))
+            self.assertEqual(4, chunk.seek(0, os.SEEK_END))
+            self.assertEqual(3, chunk.seek(-1, os.SEEK_CUR))
+            self.assertEqual(0, chunk.seek(-10))
+            self.assertEqual(b'4567', chunk.read(10))
+
+    def test_format_bytes(self):
+        self.assertEqual('512 B', sync.format_bytes(512))
+        self.assertEqual('1.5 KB', sync.format_bytes(1536))
+        self.assertEqual('2.0 MB', sync.format_bytes(2 * 1024**2))
+        self.assertEqual('3.0 TB', sync.format_bytes(3 * 1024**4))
+
+
+class SyncResultTestCase(BaseTestCase):
+    def setUp(self):
+        super(SyncResultTestCase, self).setUp()
+
+    def test_rates(self):
+        result = SyncResult()
+        self.assertEqual(0.0, result.files_per_second)
+        self.assertEqual(0.0, result.bytes_per_second)
+        result.files, result.bytes, result.elapsed = 10, 2048, 2.0
+        self.assertEqual(5.0, result.files_per_second)
+        self.assertEqual(1024.0, result.bytes_per_second)
+        result.skipped, result.deleted = 3, 1
+        self.assertEqual(
+            'Uploaded 10 file(s) (2.0 KB) in 2.0s (5.0 files/s, 1.0 KB/s), '
+            'skipped 3 unchanged, deleted 1', str(result)
+        )
+        result.saved = 1536
+        self.assertTrue(str(result).endswith(', saved 1.5 KB'))
+        result.invalidated = ['/a', '/b']
+        self.assertTrue(str(result).endswith(', invalidated 2 path(s)'))
+
+
+class SyncTestCase(BaseTestCase):
+    def setUp(self):
+        super(SyncTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = os.path.join(self.tmp.name, 'build')
+        self.s3 = Mock()
+        self.s3.put_object.return_value = {'ETag': '"etag"'}
+        self.s3.list_objects.return_value = []
+        self.manifest = Manifest(
+            os.path.join(self.tmp.name, '.statikos', 'manifest.json'),
+            'bucket'
+        )
+        self.hash_cache = HashCache(
+            os.path.join(self.tmp.name, '.statikos', 'hashes.json')
+        )
+        make_tree(self.source, {
+            'index.html': b'<html></html>',
+            'css/site.css': b'body {}',
+        })
+
+    def sync(self, source=None, manifest=None, **kwargs):
+        return Sync(
+            self.s3, 'bucket', source or self.source, manifest
+            or self.manifest, self.hash_cache, **kwargs
+        )
+
+    def test_run(self):
+        callback = Mock()
+        result = self.sync(workers=2, callback=callback).run()
+        self.assertEqual(2, result.files)
+        self.assertEqual(20, result.bytes)
+        self.assertEqual(2, callback.call_count)
+        self.s3.list_objects.assert_called_once_with('bucket')
+        calls = {
+            c[0][1]: c[1]['headers']
+            for c in self.s3.put_object.call_args_list
+        }
+        self.assertEqual({
+            'index.html': {'ContentType': 'text/html'},
+            'css/site.css': {'ContentType': 'text/css'},
+        }, calls)
+        for c in self.s3.put_object.call_args_list:
+            self.assertEqual('bucket', c[0][0])
+        self.assertEqual({
+            'size': 13,
+            'hash': hashing.hash_file(
+                os.path.join(self.source, 'index.html')
+            ).md5,
+            'etag': 'etag',
+            'headers': headers_digest({'ContentType': 'text/html'}),
+        }, self.manifest.entries['index.html'])
+        self.assertTrue(os.path.exists(self.manifest.filename))
+        self.assertTrue(os.path.exists(self.hash_cache.filename))
+
+    def test_plan(self):
+        self.sync().run()
+        self.s3.reset_mock()
+        make_tree(self.source, {'index.html': b'<html>changed</html>'})
+        os.remove(os.path.join(self.source, 'css', 'site.css'))
+        manifest = Manifest.load(self.manifest.filename, 'bucket')
+        mtime = os.stat(manifest.filename).st_mtime_ns
+        plan = Sync(
+            None, 'bucket', self.source, manifest, self.hash_cache
+        ).plan()
+        self.assertEqual(['index.html'], [f.key for f in plan.upload])
+        self.assertEqual(['css/site.css'], plan.delete)
+        self.assertEqual(mtime, os.stat(manifest.filename).st_mtime_ns)
+        self.assertEqual([], self.s3.method_calls)
+
+    def test_plan_source_not_found(self):
+        s = self.sync(source=os.path.join(self.source, 'missing'))
+        with self.assertRaises(SourceNotFound):
+            s.plan()
+
+    def test_run_tracer(self):
+        tracer = Tracer()
+        self.sync(
+            tracer=tracer, stages=[Mock(side_effect=lambda f: f, saved=0)]
+        ).run()
+        self.assertEqual(
+            ['manifest', 'scan', 'mock', 'upload'],
+            [s['name'] for s in tracer.spans]
+        )
+        self.assertEqual({'files': 2}, tracer.spans[-1]['args'])
+
+    def test_run_incremental(self):
+        self.sync().run()
+        self.s3.reset_mock()
+        make_tree(self.source, {'index.html': b'<html>changed</html>'})
+        os.remove(os.path.join(self.source, 'css', 'site.css'))
+        manifest = Manifest.load(self.manifest.filename, 'bucket')
+        result = self.sync(manifest=manifest).run()
+        self.s3.list_objects.assert_not_called()
+        self.assertEqual(1, self.s3.put_object.call_count)
+        self.assertEqual('index.html', self.s3.put_object.call_args[0][1])
+        self.s3.delete_objects.assert_called_once_with(
+            'bucket', ['css/site.css']
+        )
+        self.assertNotIn('css/site.css', manifest.entries)
+        self.assertEqual(1, result.files)
+        self.assertEqual(1, result.deleted)
+        self.assertEqual(0, result.skipped)
+        self.assertEqual(['css/site.css', 'index.html'], result.changed)
+
+    def test_run_headers_changed(self):
+        self.sync().run()
+        self.s3.reset_mock()
+        stage = Mock(side_effect=lambda files: [
+            f._replace(headers={'CacheControl': 'no-cache'}) for f in files
+        ], saved=0)
+        result = self.sync(stages=[stage]).run()
+        self.assertEqual(2, self.s3.put_object.call_count)
+        self.assertEqual(['css/site.css', 'index.html'], result.changed)
+        self.s3.reset_mock()
+        self.sync(stages=[stage]).run()
+        self.s3.put_object.assert_not_called()
+
+    def test_run_changed_excludes_new_files(self):
+        result = self.sync().run()
+        self.assertEqual([], result.changed)
+
+    def test_run_unchanged(self):
+        self.sync().run()
+        self.s3.reset_mock()
+        result = self.sync().run()
+        self.s3.put_object.assert_not_called()
+        self.s3.delete_objects.assert_not_called()
+        self.assertEqual(2, result.skipped)
+
+    def test_run_rebuilt_manifest(self):
+        digest = hashing.hash_file(os.path.join(self.source, 'index.html'))
+        self.s3.list_objects.return_value = [{
+            'Key': 'index.html',
+            'Size': 13,
+            'ETag': f'"{digest.etag}"'
+        }]
+        result = self.sync().run()
+        self.assertEqual(1, result.skipped)
+        self.assertEqual(1, result.files)
+
+    def test_run_stages(self):
+        def stage(files):
+            return [
+                f._replace(headers={'CacheControl': 'no-cache'})
+                for f in files if f.key == 'index.html'
+            ]
+
+        stage.saved = 1536
+        result = self.sync(stages=[stage]).run()
+        self.s3.put_object.assert_called_once()
+        self.assertEqual(1536, result.saved)
+        self.assertEqual({
+            'ContentType': 'text/html',
+            'CacheControl': 'no-cache'
+        }, self.s3.put_object.call_args[1]['headers'])
+
+    def test_run_no_delete(self):
+        self.manifest.stale = False
+        self.manifest.update('old.html', 1, 'hash', 'etag')
+        self.sync(delete=False).run()
+        self.s3.delete_objects.assert_not_called()
+
+    def test_run_default_workers(self):
+        self.assertEqual(Sync.DEFAULT_WORKERS, self.sync().workers)
+
+    def test_run_source_not_found(self):
+        s = self.sync(source=os.path.join(self.source, 'missing'))
+        with self.assertRaises(SourceNotFound):
+            s.run()
+
+    def test_run_upload_failed(self):
+        self.s3.put_object.side_effect = RuntimeError
+        with self.assertRaises(SyncFailed) as e:
+            self.sync(workers=2).run()
+        self.assertIn('2 file(s)', e.exception.msg)
+        self.assertEqual({}, self.manifest.entries)
+
+    def test_run_files(self):
+        s = self.sync()
+        files = s.scan()
+        self.hash_cache.hash_files = Mock()
+        make_tree(self.source, {'about.html': b'<html></html>'})
+        result = s.run(files[:1])
+        self.hash_cache.hash_files.assert_not_called()
+        self.assertEqual(1, result.files)
+        self.assertEqual([files[0].key], list(self.manifest.entries))
+
+    def test_run_result(self):
+        s = self.sync()
+        s.run()
+        make_tree(self.source, {'index.html': b'<html>changed</html>'})
+        self.s3.put_object.side_effect = RuntimeError
+        result = SyncResult()
+        with self.assertRaises(SyncFailed):
+            s.run(result=result)
+        self.assertEqual([], result.changed)
+        self.s3.put_object.side_effect = None
+        self.assertIs(result, s.run(result=result))
+        self.assertEqual(1, result.files)
+        self.assertEqual(['index.html'], result.changed)
+
+    def test_run_failed_does_not_delete(self):
+        self.sync().run()
+        self.s3.reset_mock()
+        make_tree(self.source, {
+            'index.html': b'<html>changed</html>',
+            'about.html': b'<html>about</html>',
+        })
+        os.remove(os.path.join(self.source, 'css', 'site.css'))
+
+        def put_object(bucket, key, *args, **kwargs):
+            if key == 'index.html':
+                raise RuntimeError
+            return {'ETag': '"etag"'}
+
+        self.s3.put_object.side_effect = put_object
+        result = SyncResult()
+        with self.assertRaises(SyncFailed):
+            self.sync().run(result=result)
+        self.s3.delete_objects.assert_not_called()
+        self.assertIn('css/site.css', self.manifest.entries)
+        self.assertIn('about.html', self.manifest.entries)
+        self.assertEqual(0, result.deleted)
+        self.assertEqual([], result.changed)
+
+
+class SyncMultipartTestCase(BaseTestCase):
+    def setUp(self):
+        super(SyncMultipartTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = os.path.join(self.tmp.name, 'build')
+        self.statikos_dir = os.path.join(self.tmp.name, '.statikos')
+        self.s3 = Mock()
+        self.s3.put_object.return_value = {'ETag': '"etag"'}
+        self.s3.list_objects.return_value = []
+        self.s3.create_multipart_upload.return_value = 'upload'
+        self.s3.upload_part.side_effect = self.upload_part
+        self.s3.complete_multipart_upload.return_value = 'etag-3'
+        self.bodies = {}
+        make_tree(self.source, {
+            'index.html': b'<>',
+            'video.mp4': b'0123456789',
+        })
+        self.digest = hashing.hash_file(
+            os.path.join(self.source, 'video.mp4'), 4
+        )
+        self.journal_file = os.path.join(self.statikos_dir, 'journal.jsonl')
+
+    def upload_part(self, bucket, key, upload_id, number, body):
+        self.bodies[number] = body.read()
+        return f'etag{number}'
+
+    def sync(self):
+        journal = Journal.load(self.journal_file, 'bucket')
+        self.addCleanup(journal.close)
+        return Sync(
+            self.s3,
+            'bucket',
+            self.source,
+            Manifest.load(
+                os.path.join(self.statikos_dir, 'manifest.json'), 'bucket'
+            ),
+            HashCache(
+                os.path.join(self.statikos_dir, 'hashes.json'), part_size=4
+            ),
+            workers=2,
+            journal=journal
+        )
+
+    def begin(self, digest=None, parts=None):
+        index = hashing.hash_file(os.path.join(self.source, 'index.html'))
+        journal = Journal(self.journal_file, 'bucket')
+        journal.complete('index.html', 2, index.md5, index.etag)
+        journal.begin(
+            'video.mp4', digest or self.digest.md5, 'upload',
+            {'ContentType': 'video/mp4'}
+        )
+        for number in parts or []:
+            journal.part('video.mp4', number, f'etag{number}')
+        journal.close()
+
+    def test_run(self):
+        s = self.sync()
+        result = s.run()
+        self.assertEqual(2, result.files)
+        self.s3.put_object.assert_called_once()
+        self.s3.create_multipart_upload.assert_called_once_with(
+            'bucket', 'video.mp4', headers={'ContentType': 'video/mp4'}
+        )
+        self.assertEqual({1: b'0123', 2: b'4567', 3: b'89'}, self.bodies)
+        self.s3.complete_multipart_upload.assert_called_once_with(
+            'bucket', 'video.mp4', 'upload',
+            {1: 'etag1', 2: 'etag2', 3: 'etag3'}
+        )
+        self.assertEqual({
+            'size': 10,
+            'hash': self.digest.md5,
+            'etag': 'etag-3',
+            'headers': headers_digest({'ContentType': 'video/mp4'}),
+        }, s.manifest.entries['video.mp4'])
+        self.assertFalse(os.path.exists(self.journal_file))
+
+    def test_run_resume(self):
+        self.begin(parts=[1, 3])
+        result = self.sync().run()
+        self.s3.put_object.assert_not_called()
+        self.s3.create_multipart_upload.assert_not_called()
+        self.s3.abort_multipart_upload.assert_not_called()
+        self.assertEqual({2: b'4567'}, self.bodies)
+        self.s3.complete_multipart_upload.assert_called_once_with(
+            'bucket', 'video.mp4', 'upload',
+            {1: 'etag1', 2: 'etag2', 3: 'etag3'}
+        )
+        self.assertEqual(1, result.files)
+        self.assertEqual(1, result.skipped)
+
+    def test_run_resume_all_parts(self):
+        self.begin(parts=[1, 2, 3])
+        self.sync().run()
+        self.s3.upload_part.assert_not_called()
+        self.s3.complete_multipart_upload.assert_called_once()
+
+    def test_run_abort_stale(self):
+        self.begin(digest='changed', parts=[1])
+        self.sync().run()
+        self.s3.abort_multipart_upload.assert_called_once_with(
+            'bucket', 'video.mp4', 'upload'
+        )
+        self.s3.create_multipart_upload.assert_called_once()
+        self.assertEqual(3, len(self.bodies))
+
+    def test_run_part_failed(self):
+        self.s3.upload_part.side_effect = [
+            'etag1', RuntimeError, 'etag3'
+        ]
+        with self.assertRaises(SyncFailed) as e:
+            self.sync().run()
+        self.assertIn('1 file(s)', e.exception.msg)
+        self.s3.complete_multipart_upload.assert_not_called()
+        upload = Journal.load(self.journal_file, 'bucket').uploads['video.mp4']
+        self.assertEqual(2, len(upload['parts']))
+
+    def test_run_create_failed(self):
+        self.s3.create_multipart_upload.side_effect = RuntimeError
+        with self.assertRaises(SyncFailed):
+            self.sync().run()
+        self.s3.upload_part.assert_not_called()
+
+    def test_run_upload_not_found(self):
+        self.begin(parts=[1, 2, 3])
+        self.s3.complete_multipart_upload.side_effect = \
+            UploadNotFound(key='video.mp4')
+        with self.assertRaises(SyncFailed):
+            self.sync().run()
+        journal = Journal.load(self.journal_file, 'bucket')
+        self.assertEqual({}, journal.uploads)
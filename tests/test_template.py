@@ -1,9 +1,238 @@
 # -*- coding: utf-8 -*-
 """Tests for the `template` module."""
 
+from statikos.exceptions import InvalidConfig
+from statikos.template import create_template
+
 from .base import BaseTestCase
 
 
 class TemplateTestCase(BaseTestCase):
     def setUp(self):
         super(TemplateTestCase, self).setUp()
+        self.parameters = {
+            'stack_name': 'example',
+            'domain_name': 'example.com',
+        }
+
+    def resources(self, **parameters):
+        parameters = dict(self.parameters, **parameters)
+        return create_template(parameters).to_dict()['Resources']
+
+    def distribution(self, resources):
+        return resources['CloudFrontDistribution']['Properties'][
+            'DistributionConfig']
+
+    def cache_key(self, policy):
+        config = policy['Properties']['CachePolicyConfig']
+        return config['ParametersInCacheKeyAndForwardedToOrigin']
+
+    def test_default_cache_behavior(self):
+        resources = self.resources()
+        config = self.distribution(resources)
+        self.assertNotIn('CacheBehaviors', config)
+        behavior = config['DefaultCacheBehavior']
+        self.assertEqual(
+            {'Ref': 'CloudFrontCachePolicyDefault'}, behavior['CachePolicyId']
+        )
+        self.assertNotIn('ForwardedValues', behavior)
+        self.assertTrue(behavior['Compress'])
+        self.assertEqual('S3-example-root', behavior['TargetOriginId'])
+        policy = resources['CloudFrontCachePolicyDefault']
+        self.assertEqual({
+            'Name': 'example-default',
+            'MinTTL': 0,
+            'DefaultTTL': 86400,
+            'MaxTTL': 31536000,
+        }, {
+            k: v
+            for k, v in policy['Properties']['CachePolicyConfig'].items()
+            if k != 'ParametersInCacheKeyAndForwardedToOrigin'
+        })
+        self.assertEqual({
+            'CookiesConfig': {'CookieBehavior': 'none'},
+            'EnableAcceptEncodingBrotli': True,
+            'EnableAcceptEncodingGzip': True,
+            'HeadersConfig': {'HeaderBehavior': 'none'},
+            'QueryStringsConfig': {'QueryStringBehavior': 'none'},
+        }, self.cache_key(policy))
+
+    def test_default_cache_behavior_settings(self):
+        resources = self.resources(
+            default_cache_behavior={
+                'default_ttl': 300,
+                'query_strings': ['page']
+            }
+        )
+        policy = resources['CloudFrontCachePolicyDefault']
+        self.assertEqual(
+            300, policy['Properties']['CachePolicyConfig']['DefaultTTL']
+        )
+        self.assertEqual({
+            'QueryStringBehavior': 'whitelist',
+            'QueryStrings': ['page']
+        }, self.cache_key(policy)['QueryStringsConfig'])
+
+    def test_cache_behaviors(self):
+        resources = self.resources(
+            cache_behaviors=[{
+                'path_pattern': 'assets/*',
+                'min_ttl': 31536000,
+                'default_ttl': 31536000,
+            }, {
+                'path_pattern': 'api/*',
+                'max_ttl': 60,
+                'compress': False,
+                'headers': ['Origin'],
+                'cookies': ['session'],
+            }]
+        )
+        behaviors = self.distribution(resources)['CacheBehaviors']
+        self.assertEqual(['assets/*', 'api/*'],
+                         [b['PathPattern'] for b in behaviors])
+        self.assertEqual({'Ref': 'CloudFrontCachePolicy1'},
+                         behaviors[1]['CachePolicyId'])
+        self.assertFalse(behaviors[1]['Compress'])
+        config = resources['CloudFrontCachePolicy0']['Properties'][
+            'CachePolicyConfig']
+        self.assertEqual('example-0', config['Name'])
+        self.assertEqual(31536000, config['MinTTL'])
+        key = self.cache_key(resources['CloudFrontCachePolicy1'])
+        self.assertEqual({
+            'HeaderBehavior': 'whitelist',
+            'Headers': ['Origin']
+        }, key['HeadersConfig'])
+        self.assertEqual({
+            'CookieBehavior': 'whitelist',
+            'Cookies': ['session']
+        }, key['CookiesConfig'])
+        self.assertFalse(key['EnableAcceptEncodingGzip'])
+
+    def test_cache_behaviors_no_path_pattern(self):
+        with self.assertRaises(InvalidConfig) as e:
+            self.resources(cache_behaviors=[{'default_ttl': 0}])
+        self.assertIn('cache_behaviors[0]', e.exception.msg)
+
+    def test_edge_default(self):
+        resources = self.resources()
+        config = self.distribution(resources)
+        self.assertEqual('http2', config['HttpVersion'])
+        self.assertEqual('PriceClass_All', config['PriceClass'])
+        origin = config['Origins'][0]
+        self.assertEqual(5, origin['CustomOriginConfig'][
+            'OriginKeepaliveTimeout'])
+        self.assertNotIn('OriginShield', origin)
+        self.assertNotIn('FunctionAssociations',
+                         config['DefaultCacheBehavior'])
+        root = resources['S3BucketRoot']['Properties']
+        self.assertEqual('PublicRead', root['AccessControl'])
+        self.assertNotIn('CloudFrontOriginAccessControl', resources)
+        self.assertNotIn('CloudFrontFunctionIndex', resources)
+
+    def test_edge_performance(self):
+        resources = self.resources(
+            performance={'origin_shield': 'us-east-2'},
+            cache_behaviors=[{'path_pattern': 'assets/*'}]
+        )
+        config = self.distribution(resources)
+        self.assertEqual('http2and3', config['HttpVersion'])
+        origin = config['Origins'][0]
+        self.assertEqual(
+            {'Fn::GetAtt': ['S3BucketRoot', 'RegionalDomainName']},
+            origin['DomainName']
+        )
+        self.assertEqual(
+            {'Fn::GetAtt': ['CloudFrontOriginAccessControl', 'Id']},
+            origin['OriginAccessControlId']
+        )
+        self.assertEqual(
+            {'OriginAccessIdentity': '', 'OriginReadTimeout': 60},
+            origin['S3OriginConfig']
+        )
+        self.assertNotIn('CustomOriginConfig', origin)
+        self.assertEqual(
+            {'Enabled': True, 'OriginShieldRegion': 'us-east-2'},
+            origin['OriginShield']
+        )
+        association = {
+            'EventType': 'viewer-request',
+            'FunctionARN': {
+                'Fn::GetAtt': [
+                    'CloudFrontFunctionIndex', 'FunctionMetadata.FunctionARN'
+                ]
+            },
+        }
+        for behavior in [
+            config['DefaultCacheBehavior'], config['CacheBehaviors'][0]
+        ]:
+            self.assertEqual([association], behavior['FunctionAssociations'])
+        root = resources['S3BucketRoot']['Properties']
+        self.assertNotIn('AccessControl', root)
+        self.assertNotIn('WebsiteConfiguration', root)
+        self.assertTrue(
+            root['PublicAccessBlockConfiguration']['RestrictPublicBuckets']
+        )
+        statement = resources['S3BucketPolicy']['Properties'][
+            'PolicyDocument']['Statement'][0]
+        self.assertEqual({'Service': 'cloudfront.amazonaws.com'},
+                         statement['Principal'])
+        self.assertIn('AWS:SourceArn', statement['Condition']['StringEquals'])
+        self.assertEqual('s3', resources['CloudFrontOriginAccessControl'][
+            'Properties']['OriginAccessControlConfig'][
+                'OriginAccessControlOriginType'])
+
+    def test_edge_performance_custom_origin(self):
+        resources = self.resources(
+            performance={'origin': 'custom', 'http_version': 'http3'}
+        )
+        config = self.distribution(resources)
+        self.assertEqual('http3', config['HttpVersion'])
+        origin_config = config['Origins'][0]['CustomOriginConfig']
+        self.assertEqual(60, origin_config['OriginKeepaliveTimeout'])
+        self.assertEqual(60, origin_config['OriginReadTimeout'])
+        self.assertNotIn('CloudFrontOriginAccessControl', resources)
+
+    def test_edge_performance_empty(self):
+        config = self.distribution(self.resources(performance=None))
+        self.assertIn('S3OriginConfig', config['Origins'][0])
+
+    def test_edge_performance_invalid_origin(self):
+        with self.assertRaises(InvalidConfig) as e:
+            self.resources(performance={'origin': 'website'})
+        self.assertIn('performance.origin', e.exception.msg)
+
+    def test_edge_performance_directories(self):
+        resources = self.resources(
+            performance={'directories': ['docs/', '/blog', '/']}
+        )
+        code = resources['CloudFrontFunctionIndex']['Properties'][
+            'FunctionCode']
+        self.assertTrue(
+            code.startswith('var DIRECTORIES = ["/docs", "/blog", ""];\n')
+        )
+        self.assertIn('querystring(request.querystring)', code)
+
+    def test_edge_performance_no_directories(self):
+        code = self.resources(performance={})['CloudFrontFunctionIndex'][
+            'Properties']['FunctionCode']
+        self.assertTrue(code.startswith('var DIRECTORIES = [];\n'))
+
+    def test_edge_performance_invalid_directories(self):
+        with self.assertRaises(InvalidConfig) as e:
+            self.resources(performance={'directories': 'docs'})
+        self.assertIn('performance.directories', e.exception.msg)
+
+    def test_edge_performance_s3_keepalive_timeout(self):
+        with self.assertRaises(InvalidConfig) as e:
+            self.resources(performance={'keepalive_timeout': 30})
+        self.assertIn('performance.keepalive_timeout', e.exception.msg)
+
+    def test_record_sets(self):
+        record_sets = self.resources()['Route53RecordSetGroup'][
+            'Properties']['RecordSets']
+        self.assertEqual([
+            ('example.com', 'A'),
+            ('example.com', 'AAAA'),
+            ('www.example.com', 'A'),
+            ('www.example.com', 'AAAA'),
+        ], [(r['Name'], r['Type']) for r in record_sets])
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `trace` module."""
+
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import Mock
+
+import botocore.session
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+from statikos import trace
+from statikos.trace import Tracer
+
+from .base import BaseTestCase
+
+
+class TraceTestCase(BaseTestCase):
+    def setUp(self):
+        super(TraceTestCase, self).setUp()
+        self.tracer = Tracer()
+
+    def client(self):
+        client = botocore.session.get_session().create_client(
+            's3',
+            region_name='us-east-1',
+            aws_access_key_id='key',
+            aws_secret_access_key='secret'
+        )
+        self.tracer.instrument(client)
+        return client
+
+    def test_span(self):
+        with self.tracer.span('deploy'):
+            with self.tracer.span('create', files=1):
+                pass
+        create, deploy = self.tracer.spans
+        self.assertEqual('create', create['name'])
+        self.assertEqual(1, create['depth'])
+        self.assertEqual({'files': 1}, create['args'])
+        self.assertEqual('deploy', deploy['name'])
+        self.assertEqual(0, deploy['depth'])
+        self.assertLessEqual(deploy['start'], create['start'])
+        self.assertGreaterEqual(deploy['end'], create['end'])
+
+    def test_span_error(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span('deploy'):
+                raise ValueError
+        self.assertEqual('deploy', self.tracer.spans[0]['name'])
+
+    def test_span_no_tracer(self):
+        with trace.span(None, 'deploy'):
+            pass
+        with trace.span(self.tracer, 'deploy'):
+            pass
+        self.assertEqual(1, len(self.tracer.spans))
+
+    def test_threads(self):
+        thread = threading.Thread(
+            target=lambda: self.tracer.add('upload', 'aws', 0, 1),
+            name='worker'
+        )
+        thread.start()
+        thread.join()
+        self.tracer.add('scan', 'phase', 0, 1)
+        self.assertEqual(
+            [1, 2], [s['tid'] for s in self.tracer.spans]
+        )
+        metadata = [
+            e for e in self.tracer.to_chrome()['traceEvents']
+            if e['ph'] == 'M'
+        ]
+        self.assertEqual('worker', metadata[0]['args']['name'])
+
+    def test_instrument(self):
+        client = self.client()
+        self.tracer.instrument(client)
+        with Stubber(client) as stubber:
+            stubber.add_response('list_buckets', {'Buckets': []})
+            stubber.add_client_error('head_bucket', 'NoSuchBucket', '', 404)
+            client.list_buckets()
+            with self.assertRaises(ClientError):
+                client.head_bucket(Bucket='bucket')
+        self.assertEqual(
+            ['s3.ListBuckets', 's3.HeadBucket'],
+            [s['name'] for s in self.tracer.spans]
+        )
+        self.assertEqual('aws', self.tracer.spans[0]['category'])
+        self.assertEqual({'attempts': 0}, self.tracer.spans[0]['args'])
+        self.assertEqual(
+            'NoSuchBucket', self.tracer.spans[1]['args']['error']
+        )
+
+    def test_attempts(self):
+        model = Mock(name='ListBuckets')
+        model.name = 'ListBuckets'
+        model.service_model.service_name = 's3'
+        context = {}
+        self.tracer._before_call(context=context)
+        self.tracer._response_received(context=context)
+        self.tracer._response_received(context=context)
+        self.tracer._after_call_error(
+            exception=ConnectionError(), model=model, context=context
+        )
+        self.assertEqual(
+            {'attempts': 2, 'error': 'ConnectionError'},
+            self.tracer.spans[0]['args']
+        )
+        self.tracer._after_call(parsed={}, model=model, context=context)
+        self.assertEqual(1, len(self.tracer.spans))
+
+    def test_to_chrome(self):
+        start = self.tracer.start
+        self.tracer.add('deploy', 'phase', start + 1, start + 3, {'a': 1})
+        chrome = self.tracer.to_chrome()
+        self.assertEqual('ms', chrome['displayTimeUnit'])
+        event = chrome['traceEvents'][-1]
+        self.assertEqual('deploy', event['name'])
+        self.assertEqual('phase', event['cat'])
+        self.assertEqual('X', event['ph'])
+        self.assertEqual(1e6, event['ts'])
+        self.assertEqual(2e6, event['dur'])
+        self.assertEqual({'a': 1}, event['args'])
+        self.assertEqual(os.getpid(), event['pid'])
+
+    def test_save(self):
+        self.tracer.add('deploy', 'phase', 0, 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'trace.json')
+            self.tracer.save(filename)
+            with open(filename) as f:
+                self.assertEqual(self.tracer.to_chrome(), json.load(f))
+
+    def test_stats(self):
+        self.tracer.add('deploy', 'phase', 0, 10, depth=0)
+        self.tracer.add('create', 'phase', 1, 2, depth=1)
+        self.tracer.add('create', 'phase', 3, 6, depth=1)
+        self.tracer.add('s3.PutObject', 'aws', 4, 5, {'attempts': 1})
+        self.tracer.add(
+            'cloudformation.DescribeStackEvents', 'aws', 5, 8,
+            {'attempts': 3, 'error': 'Throttling'}
+        )
+        lines = self.tracer.stats().splitlines()
+        self.assertEqual(['Phase', 'Count', 'Total', 'Max'], lines[0].split())
+        self.assertEqual(['deploy', '1', '10.00s', '10.00s'], lines[1].split())
+        self.assertTrue(lines[2].startswith('  create'))
+        self.assertEqual(['create', '2', '4.00s', '3.00s'], lines[2].split())
+        self.assertEqual(
+            ['cloudformation.DescribeStackEvents', '1', '3', '1', '3.00s'],
+            lines[4].split()
+        )
+        self.assertEqual(
+            ['s3.PutObject', '1', '1', '0', '1.00s'], lines[5].split()
+        )
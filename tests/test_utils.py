@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 """Tests for the `utils` module."""
 
+import os
+import tempfile
 from unittest.mock import Mock, mock_open, patch
 
 from statikos import utils
@@ -67,7 +69,19 @@ class UtilsTestCase(BaseTestCase):
             utils.write_json_file(data, 'filename')
         self.mock_open.assert_called_once_with('filename', 'w')
         self.mock_json_dump.assert_called_once_with(
-            data, mock_file.return_value, indent=2
+            data, mock_file.return_value, indent=2, sort_keys=False
+        )
+
+    def test_write_json_file_compact(self):
+        data = {'a': 1, 'b': 2, 'c': 3}
+        with patch('builtins.open', self.mock_open) as mock_file:
+            utils.write_json_file(data, 'filename', compact=True)
+        self.mock_open.assert_called_once_with('filename', 'w')
+        self.mock_json_dump.assert_called_once_with(
+            data,
+            mock_file.return_value,
+            separators=(',', ':'),
+            sort_keys=False
         )
 
     def test_read_yaml_file(self):
@@ -91,3 +105,37 @@ class UtilsTestCase(BaseTestCase):
         self.mock_yaml_dump.assert_called_once_with(
             data, mock_file.return_value, default_flow_style=False
         )
+
+
+class LinkTreeTestCase(BaseTestCase):
+    def setUp(self):
+        super(LinkTreeTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(self.tmp.name, 'src')
+        self.dst = os.path.join(self.tmp.name, 'dst')
+
+    def test_link_tree(self):
+        os.makedirs(os.path.join(self.src, 'a'))
+        for name in ['index.json', 'a/x', 'a/x.tmp']:
+            with open(os.path.join(self.src, name), 'w') as f:
+                f.write(name)
+        utils.link_tree(self.src, self.dst)
+        self.assertEqual(['x'], os.listdir(os.path.join(self.dst, 'a')))
+        with open(os.path.join(self.dst, 'a', 'x')) as f:
+            self.assertEqual('a/x', f.read())
+        # Replacing or removing a file in the mirror leaves the original.
+        with open(os.path.join(self.dst, 'index.json.tmp'), 'w') as f:
+            f.write('{}')
+        os.replace(
+            os.path.join(self.dst, 'index.json.tmp'),
+            os.path.join(self.dst, 'index.json')
+        )
+        os.remove(os.path.join(self.dst, 'a', 'x'))
+        with open(os.path.join(self.src, 'index.json')) as f:
+            self.assertEqual('index.json', f.read())
+        self.assertTrue(os.path.exists(os.path.join(self.src, 'a', 'x')))
+
+    def test_link_tree_missing(self):
+        utils.link_tree(self.src, self.dst)
+        self.assertFalse(os.path.exists(self.dst))
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `validation` module."""
+
+from statikos import validation
+from statikos.template import create_template
+
+from .base import BaseTestCase
+
+
+class ValidationTestCase(BaseTestCase):
+    def setUp(self):
+        super(ValidationTestCase, self).setUp()
+        self.template = create_template({
+            'stack_name': 'example',
+            'domain_name': 'example.com',
+        }).to_dict()
+        self.resources = self.template['Resources']
+
+    def distribution(self):
+        return self.resources['CloudFrontDistribution']['Properties'][
+            'DistributionConfig']
+
+    def test_load_spec(self):
+        spec = validation.load_spec()
+        self.assertIs(spec, validation.load_spec())
+        self.assertEqual(
+            spec['ResourceSpecificationVersion'], validation.spec_version()
+        )
+        for resource in self.resources.values():
+            self.assertIn(resource['Type'], spec['ResourceTypes'])
+
+    def test_validate(self):
+        self.assertEqual([], validation.validate(self.template, size=1024))
+
+    def test_validate_size(self):
+        errors = validation.validate(self.template, size=1024 * 1024 + 1)
+        self.assertEqual(
+            ['Template: 1048577 bytes exceeds the limit of 1048576 bytes'],
+            errors
+        )
+
+    def test_validate_not_object(self):
+        self.assertEqual(
+            ['Template: expected an object'], validation.validate([])
+        )
+
+    def test_validate_no_resources(self):
+        self.assertEqual(
+            ['Resources: at least one resource is required'],
+            validation.validate({'Resources': {}})
+        )
+
+    def test_validate_limits(self):
+        template = {
+            'Resources': {
+                f'Bucket{i}': {'Type': 'AWS::S3::Bucket'} for i in range(501)
+            }
+        }
+        self.assertEqual(
+            ['Resources: 501 exceeds the limit of 500'],
+            validation.validate(template)
+        )
+
+    def test_validate_logical_id(self):
+        self.resources['S3-Bucket'] = {'Type': 'AWS::S3::Bucket'}
+        self.assertEqual(
+            ['Resources/S3-Bucket: invalid logical ID'],
+            validation.validate(self.template)
+        )
+
+    def test_validate_resource_type(self):
+        self.resources['Queue'] = {'Type': 'AWS::SQS::Queue'}
+        self.resources['Custom'] = {'Type': 'Custom::Thing'}
+        self.resources['Untyped'] = {}
+        self.assertEqual([
+            'Resources/Queue: unknown resource type `AWS::SQS::Queue`',
+            'Resources/Untyped: missing resource type',
+        ], validation.validate(self.template))
+
+    def test_validate_required_property(self):
+        del self.distribution()['DefaultCacheBehavior']
+        del self.distribution()['Origins'][0]['Id']
+        self.assertEqual([
+            'Resources/CloudFrontDistribution/Properties/DistributionConfig:'
+            ' missing required property `DefaultCacheBehavior`',
+            'Resources/CloudFrontDistribution/Properties/DistributionConfig'
+            '/Origins/0: missing required property `Id`',
+        ], validation.validate(self.template))
+
+    def test_validate_unknown_property(self):
+        self.distribution()['Enable'] = True
+        self.assertEqual([
+            'Resources/CloudFrontDistribution/Properties/DistributionConfig'
+            '/Enable: unknown property'
+        ], validation.validate(self.template))
+
+    def test_validate_intrinsic(self):
+        self.distribution()['Logging'] = {
+            'Fn::If': ['Logging', {}, {'Ref': 'AWS::NoValue'}]
+        }
+        self.assertEqual([], validation.validate(self.template))
+
+    def test_validate_ref(self):
+        self.resources['S3BucketPolicy']['Properties']['Bucket'] = \
+            {'Ref': 'S3Bucket'}
+        self.assertEqual([
+            'Resources/S3BucketPolicy/Properties/Bucket/Ref: unknown '
+            'reference `S3Bucket`'
+        ], validation.validate(self.template))
+
+    def test_validate_ref_parameter(self):
+        self.template['Parameters'] = {'Bucket': {'Type': 'String'}}
+        self.resources['S3BucketPolicy']['Properties']['Bucket'] = \
+            {'Ref': 'Bucket'}
+        self.assertEqual([], validation.validate(self.template))
+
+    def test_validate_get_att(self):
+        self.distribution()['Logging']['Bucket'] = \
+            {'Fn::GetAtt': ['S3BucketLogs', 'DomainNam']}
+        self.distribution()['Origins'][0]['DomainName'] = \
+            {'Fn::GetAtt': 'S3BucketRoot.RegionalDomainName'}
+        self.assertEqual([
+            'Resources/CloudFrontDistribution/Properties/DistributionConfig'
+            '/Logging/Bucket/Fn::GetAtt: `AWS::S3::Bucket` has no attribute '
+            '`DomainNam`'
+        ], validation.validate(self.template))
+
+    def test_validate_sub(self):
+        self.template['Outputs'] = {
+            'URL': {
+                'Value': {
+                    'Fn::Sub': [
+                        'https://${Domain}/${AWS::Region}/${!Literal}/'
+                        '${CloudFrontDistribution.DomainName}/${Missing}',
+                        {'Domain': {'Ref': 'Parameter'}}
+                    ]
+                }
+            }
+        }
+        self.assertEqual([
+            'Outputs/URL/Value/Fn::Sub/1/Domain/Ref: unknown reference '
+            '`Parameter`',
+            'Outputs/URL/Value/Fn::Sub: unknown reference `Missing`',
+        ], validation.validate(self.template))
+
+    def test_validate_depends_on(self):
+        self.resources['S3BucketPolicy']['DependsOn'] = 'S3Bucket'
+        self.assertEqual([
+            'Resources/S3BucketPolicy/DependsOn: unknown resource `S3Bucket`'
+        ], validation.validate(self.template))
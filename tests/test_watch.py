@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `watch` module."""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import Mock, patch
+
+from watchdog.events import (
+    DirModifiedEvent, FileClosedNoWriteEvent, FileModifiedEvent,
+    FileMovedEvent
+)
+
+from statikos import hashing
+from statikos.exceptions import (
+    MissingDependency, SourceNotFound, SyncFailed
+)
+from statikos.hashing import HashCache
+from statikos.manifest import Manifest
+from statikos.sync import Sync
+from statikos.watch import Watcher
+
+from .base import BaseTestCase
+from .test_sync import make_tree
+
+
+class WatcherTestCase(BaseTestCase):
+    def setUp(self):
+        super(WatcherTestCase, self).setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = os.path.join(self.tmp.name, 'build')
+        self.s3 = Mock()
+        self.s3.put_object.return_value = {'ETag': '"etag"'}
+        self.s3.list_objects.return_value = []
+        self.manifest = Manifest(
+            os.path.join(self.tmp.name, '.statikos', 'manifest.json'),
+            'bucket'
+        )
+        self.hash_cache = HashCache(
+            os.path.join(self.tmp.name, '.statikos', 'hashes.json')
+        )
+        self.invalidate = Mock(
+            side_effect=lambda keys: ['/' + key for key in keys]
+        )
+        self.echo = Mock()
+        make_tree(self.source, {
+            'index.html': b'<html></html>',
+            'css/site.css': b'body {}',
+        })
+
+    def watcher(self, source=None, **kwargs):
+        s = Sync(
+            self.s3, 'bucket', source or self.source, self.manifest,
+            self.hash_cache
+        )
+        kwargs.setdefault('invalidate', self.invalidate)
+        return Watcher(s, echo=self.echo, **kwargs)
+
+    def path(self, key):
+        return os.path.join(self.source, *key.split('/'))
+
+    def uploaded(self):
+        return sorted(c[0][1] for c in self.s3.put_object.call_args_list)
+
+    def test_init(self):
+        w = self.watcher()
+        self.assertEqual(0.5, w.debounce)
+        self.assertEqual(5.0, w.max_delay)
+        self.assertEqual(10.0, w.invalidation_interval)
+        w = self.watcher(debounce=0, invalidation_interval=0)
+        self.assertEqual(0, w.debounce)
+        self.assertEqual(0, w.invalidation_interval)
+
+    def test_init_missing_dependency(self):
+        with patch.dict(sys.modules, {'watchdog': None}):
+            with self.assertRaises(MissingDependency):
+                self.watcher()
+
+    def test_dispatch(self):
+        w = self.watcher()
+        w.dispatch(FileClosedNoWriteEvent(self.path('index.html')))
+        w.dispatch(DirModifiedEvent(self.path('css')))
+        self.assertEqual(set(), w._pending)
+        w.dispatch(FileModifiedEvent(self.path('index.html')))
+        w.dispatch(
+            FileMovedEvent(self.path('css/.tmp'), self.path('css/site.css'))
+        )
+        self.assertEqual({
+            self.path('index.html'),
+            self.path('css/.tmp'),
+            self.path('css/site.css'),
+        }, w._pending)
+
+    def test_wait(self):
+        w = self.watcher(debounce=0.05)
+        self.assertEqual(set(), w.wait(0.01))
+        w.notify(['a'])
+        timer = threading.Timer(0.02, w.notify, [['b']])
+        timer.start()
+        start = time.monotonic()
+        self.assertEqual({'a', 'b'}, w.wait())
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(set(), w._pending)
+        timer.join()
+
+    def test_wait_max_delay(self):
+        w = self.watcher(debounce=60, max_delay=0.05)
+        w.notify(['a'])
+        start = time.monotonic()
+        self.assertEqual({'a'}, w.wait())
+        self.assertLess(time.monotonic() - start, 30)
+
+    def test_wait_stopped(self):
+        w = self.watcher(debounce=60)
+        w.notify(['a'])
+        threading.Timer(0.01, w.stop).start()
+        self.assertIs(None, w.wait())
+
+    def test_update(self):
+        w = self.watcher()
+        w.files = {f.key: f for f in w.sync.scan()}
+        make_tree(self.source, {
+            'index.html': b'<html>changed</html>',
+            'about.html': b'<html>about</html>',
+        })
+        os.rename(self.path('css'), os.path.join(self.tmp.name, 'css'))
+        make_tree(self.tmp.name, {'blog/a/index.html': b'<html>a</html>'})
+        os.rename(os.path.join(self.tmp.name, 'blog'), self.path('blog'))
+        with patch.object(
+            hashing, '_hash_file', wraps=hashing._hash_file
+        ) as mock_hash_file:
+            w.update({
+                self.path('index.html'),
+                self.path('about.html'),
+                self.path('css'),
+                self.path('blog'),
+                self.path('missing.html'),
+                self.source,
+                self.tmp.name,
+            })
+        self.assertEqual(3, mock_hash_file.call_count)
+        self.assertEqual(
+            ['about.html', 'blog/a/index.html', 'index.html'], sorted(w.files)
+        )
+        f = w.files['index.html']
+        self.assertEqual(self.path('index.html'), f.path)
+        self.assertEqual(20, f.size)
+        self.assertEqual(hashing.hash_file(f.path).md5, f.hash)
+
+    def test_flush(self):
+        w = self.watcher()
+        w.files = {f.key: f for f in w.sync.scan()}
+        w.flush()
+        self.assertEqual(['css/site.css', 'index.html'], self.uploaded())
+        self.s3.reset_mock()
+        make_tree(self.source, {'index.html': b'<html>changed</html>'})
+        os.remove(self.path('css/site.css'))
+        result = w.flush({self.path('index.html'), self.path('css/site.css')})
+        self.assertEqual(['index.html'], self.uploaded())
+        self.s3.delete_objects.assert_called_once_with(
+            'bucket', ['css/site.css']
+        )
+        self.assertEqual(['css/site.css', 'index.html'], result.changed)
+        self.assertEqual({'css/site.css', 'index.html'}, w.changed)
+        self.s3.list_objects.assert_not_called()
+
+    def test_flush_failed(self):
+        w = self.watcher()
+        w.files = {f.key: f for f in w.sync.scan()}
+        w.flush()
+        make_tree(self.source, {'index.html': b'<html>changed</html>'})
+        self.s3.put_object.side_effect = RuntimeError
+        with self.assertRaises(SyncFailed):
+            w.flush({self.path('index.html')})
+        self.assertEqual(set(), w.changed)
+        self.s3.put_object.side_effect = None
+        self.assertEqual(1, w.flush({self.path('index.html')}).files)
+        self.assertEqual({'index.html'}, w.changed)
+
+    def test_flush_invalidations(self):
+        w = self.watcher(invalidation_interval=60)
+        self.assertEqual([], w.flush_invalidations())
+        w.changed.update(['index.html', 'about.html'])
+        self.assertEqual(
+            ['/about.html', '/index.html'], w.flush_invalidations()
+        )
+        self.assertEqual(set(), w.changed)
+        w.changed.add('index.html')
+        self.assertEqual([], w.flush_invalidations())
+        self.assertEqual(['/index.html'], w.flush_invalidations(force=True))
+        self.assertEqual(2, self.invalidate.call_count)
+        self.echo.assert_called_with('Invalidated 1 path(s)')
+
+    def test_flush_invalidations_failed(self):
+        self.invalidate.side_effect = RuntimeError
+        w = self.watcher()
+        w.changed.add('index.html')
+        with self.assertRaises(RuntimeError):
+            w.flush_invalidations()
+        self.assertEqual({'index.html'}, w.changed)
+
+    def test_flush_invalidations_disabled(self):
+        w = self.watcher(invalidate=None)
+        w.changed.add('index.html')
+        self.assertEqual([], w.flush_invalidations())
+        self.assertIs(None, w._timeout())
+
+    def test_run(self):
+        w = self.watcher(debounce=0.05, invalidation_interval=0)
+        thread = threading.Thread(target=w.run)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(w.stop)
+
+        def wait_for(condition):
+            deadline = time.monotonic() + 10
+            while not condition() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(condition())
+
+        wait_for(lambda: len(self.uploaded()) == 2)
+        self.s3.reset_mock()
+        make_tree(self.source, {'index.html': b'<html>changed</html>'})
+        shutil.rmtree(self.path('css'))
+        # Both changes are usually synced in one batch, but may be split.
+        wait_for(lambda: ['css/site.css', 'index.html'] == sorted(
+            k for c in self.invalidate.call_args_list for k in c[0][0]
+        ))
+        self.assertEqual(['index.html'], self.uploaded())
+        self.s3.delete_objects.assert_called_once_with(
+            'bucket', ['css/site.css']
+        )
+        w.stop()
+        thread.join()
+        self.assertFalse(thread.is_alive())
+
+    def test_run_source_not_found(self):
+        w = self.watcher(source=os.path.join(self.source, 'missing'))
+        with self.assertRaises(SourceNotFound):
+            w.run()
+
+    def test_step(self):
+        w = self.watcher()
+        w._step(Mock(side_effect=RuntimeError('boom')))
+        self.echo.assert_called_once_with('Error: boom')